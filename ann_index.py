@@ -0,0 +1,162 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+ANN Index - Indice approssimato IVF-Flat per la ricerca semantica su grandi cataloghi.
+
+La similarità coseno a forza bruta su tutta la matrice SigLIP va benissimo a
+decine di migliaia di foto, ma oltre il milione domina la latenza. L'indice
+IVF (inverted file) divide gli embedding in `nlist` gruppi con un k-means
+sferico: a query si confrontano solo i `nprobe` gruppi più vicini.
+
+  - nprobe è la manopola recall/latenza (config_new.yaml → search.ann.nprobe)
+  - i centroidi e le assegnazioni per image id sono salvati accanto al DB
+    (cartella dello store embedding), quindi l'addestramento avviene una volta
+  - le foto nuove vengono assegnate al centroide più vicino, senza riaddestrare
+
+NumPy puro, nessuna dipendenza esterna. Usato da embedding_index.EmbeddingMatrix.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Default della sezione search.ann in config_new.yaml
+ANN_DEFAULTS = {
+    'enabled': True,
+    'min_photos': 500000,   # sotto questa soglia: sempre forza bruta
+    'nlist': 0,             # 0 = automatico (≈ √N)
+    'nprobe': 32,           # gruppi esplorati per query: più alto = più recall, più lento
+    'exact_below': 50000,   # sottoinsiemi filtrati più piccoli: forza bruta esatta
+}
+
+# Righe per blocco nelle moltiplicazioni centroidi × embedding
+_CHUNK = 16384
+
+
+def ann_config(config: dict) -> dict:
+    """Legge search.ann dal config applicando i default."""
+    cfg = dict(ANN_DEFAULTS)
+    cfg.update((config or {}).get('search', {}).get('ann', {}) or {})
+    return cfg
+
+
+def auto_nlist(n_vectors: int) -> int:
+    """Numero di gruppi automatico: ≈ √N, limitato a [16, 4096]."""
+    return int(min(4096, max(16, round(np.sqrt(max(n_vectors, 1))))))
+
+
+class IVFIndex:
+    """Centroidi k-means sferici (normalizzati) per un indice IVF-Flat.
+
+    L'indice non contiene i vettori: le assegnazioni riga → gruppo vivono
+    in EmbeddingMatrix accanto alla matrice, così una foto aggiunta o
+    cancellata aggiorna un solo intero.
+    """
+
+    def __init__(self, centroids: np.ndarray, trained_count: int):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.trained_count = int(trained_count)
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.centroids.shape[1])
+
+    # ── Addestramento ────────────────────────────────────────────────
+
+    @classmethod
+    def train(cls, sample: np.ndarray, nlist: int, trained_count: int,
+              iterations: int = 10, seed: int = 0, cancel_flag=None) -> Optional['IVFIndex']:
+        """K-means sferico su un campione di vettori già normalizzati.
+
+        Args:
+            sample: (S, D) vettori normalizzati, S ≥ nlist
+            nlist: numero di gruppi
+            trained_count: dimensione del catalogo al momento dell'addestramento
+            iterations: iterazioni di Lloyd
+            cancel_flag: callable opzionale, True per interrompere
+
+        Returns:
+            IVFIndex oppure None se annullato o campione insufficiente
+        """
+        n = sample.shape[0]
+        nlist = min(nlist, n)
+        if nlist < 2:
+            return None
+        rng = np.random.default_rng(seed)
+        centroids = sample[rng.choice(n, size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            if cancel_flag is not None and cancel_flag():
+                return None
+            assign = _nearest(sample, centroids)
+            # Somme per gruppo: ordinamento + reduceat (np.add.at è molto più lento)
+            counts = np.bincount(assign, minlength=nlist)
+            order = np.argsort(assign, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+            if empty.any():
+                # Gruppi vuoti: rimpiazzati da punti casuali del campione
+                sums[empty] = sample[rng.choice(n, size=int(empty.sum()), replace=False)]
+            centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+
+        return cls(centroids, trained_count)
+
+    # ── Query ────────────────────────────────────────────────────────
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Gruppo più vicino per ogni vettore (normalizzato), a blocchi."""
+        return _nearest(vectors, self.centroids)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Indici dei nprobe gruppi più vicini alla query."""
+        sims = self.centroids @ query
+        nprobe = max(1, min(int(nprobe), self.nlist))
+        if nprobe >= self.nlist:
+            return np.arange(self.nlist)
+        return np.argpartition(-sims, nprobe - 1)[:nprobe]
+
+    # ── Persistenza ──────────────────────────────────────────────────
+
+    def save(self, path: Path, ids: np.ndarray, assign: np.ndarray):
+        """Salva centroidi e assegnazioni per image id (scrittura atomica)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, centroids=self.centroids,
+                     trained_count=np.int64(self.trained_count),
+                     ids=np.asarray(ids, dtype=np.int64),
+                     assign=np.asarray(assign, dtype=np.int32))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional[Tuple['IVFIndex', np.ndarray, np.ndarray]]:
+        """Ritorna (indice, ids, assegnazioni) oppure None se assente/illeggibile."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                index = cls(data['centroids'], int(data['trained_count']))
+                return index, data['ids'].astype(np.int64), data['assign'].astype(np.int32)
+        except Exception as e:
+            logger.warning(f"Indice ANN illeggibile ({path.name}), verrà ricostruito: {e}")
+            return None
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _CHUNK):
+        block = vectors[start:start + _CHUNK]
+        out[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
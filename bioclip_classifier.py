@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+BioCLIP Classifier - TreeOfLifeClassifier con modello locale e predizione batch.
+
+Prima il wrapper costruito in EmbeddingGenerator._init_bioclip prendeva solo
+images[0]: una forward pass e una softmax/top-k su tutte le ~450k specie per
+ogni foto, il modello più lento su CPU.
+
+Qui predict_batch:
+  - preprocess impilato e una sola encode_image sulle N immagini
+  - le foto sono raggruppate per sottoinsieme GeoSpecies (stessa cella =
+    stesso GeoSubset): una matmul e una topk batch per gruppo
+
+predict() resta compatibile con TreeOfLifeClassifier (lista piatta di
+predizioni per la prima immagine).
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Temperature scaling della softmax (come TreeOfLifeClassifier)
+LOGIT_SCALE = 100
+
+
+def parse_treeoflife_entry(entry) -> Optional[Dict]:
+    """Voce di txt_emb_species.json → campi tassonomici (None se non riconosciuta)."""
+    # Formato lista: [[kingdom,phylum,class,order,family,genus,species], common_name]
+    if isinstance(entry, list) and len(entry) >= 2:
+        taxon = entry[0] if isinstance(entry[0], list) else []
+        common_name = entry[1] if isinstance(entry[1], str) else ''
+        kingdom = taxon[0] if len(taxon) > 0 else ''
+        phylum = taxon[1] if len(taxon) > 1 else ''
+        tax_class = taxon[2] if len(taxon) > 2 else ''
+        order = taxon[3] if len(taxon) > 3 else ''
+        family = taxon[4] if len(taxon) > 4 else 'Unknown'
+        genus = taxon[5] if len(taxon) > 5 else 'Unknown'
+        species_epithet = taxon[6] if len(taxon) > 6 else ''
+        species = f"{genus} {species_epithet}".strip() if species_epithet else genus
+    elif isinstance(entry, str):
+        # Formato stringa semplice (vecchio formato)
+        parts = entry.replace('_', ' ').split()
+        genus = parts[0] if parts else 'Unknown'
+        species = ' '.join(parts[:2]) if len(parts) >= 2 else entry
+        family = 'Unknown'
+        common_name = ''
+        kingdom = phylum = tax_class = order = ''
+        species_epithet = parts[1] if len(parts) >= 2 else ''
+    else:
+        return None
+
+    return {
+        'species': species,
+        'genus': genus,
+        'family': family,
+        'common_name': common_name,
+        'taxonomy': [kingdom, phylum, tax_class, order, family, genus, species_epithet]
+    }
+
+
+class LocalTreeOfLifeClassifier:
+    """TreeOfLifeClassifier con modello locale, interfaccia compatibile"""
+
+    def __init__(self, model, preprocess, txt_emb, txt_names, device):
+        self.model = model
+        self.preprocess = preprocess
+        self.txt_embeddings = txt_emb   # (N_specie, dim) sul device del modello
+        self.txt_names = txt_names
+        self.device = device
+
+    def predict(self, images, rank=None, k=5, min_prob=0.0, subset=None):
+        """
+        Predice le top-k specie per la prima immagine della lista.
+        Interfaccia compatibile con TreeOfLifeClassifier.
+
+        Args:
+            images: Lista di PIL Images (o percorsi)
+            rank: Ignorato (per compatibilità)
+            k: Numero di predizioni top
+            min_prob: Probabilità minima per includere risultato
+            subset: GeoSubset (geospecies_cache) — softmax solo sulle
+                    specie della cella invece che su tutto TreeOfLife
+
+        Returns:
+            Lista di dict con species, genus, family, common_name, score, taxonomy
+        """
+        if not images:
+            return []
+        return self.predict_batch(images[:1], k=k, min_prob=min_prob, subsets=[subset])[0]
+
+    def predict_batch(self, images: Sequence, k: int = 5, min_prob: float = 0.0,
+                      subsets: Optional[Sequence] = None) -> List[List[Dict]]:
+        """Top-k specie per N immagini con una sola forward pass.
+
+        Args:
+            images: PIL Images (o percorsi)
+            k / min_prob: come predict()
+            subsets: GeoSubset o None per ogni immagine (None = TreeOfLife completo)
+
+        Returns:
+            Una lista di predizioni per immagine, nello stesso ordine.
+        """
+        import torch
+        from PIL import Image
+
+        if not images:
+            return []
+        if subsets is None:
+            subsets = [None] * len(images)
+
+        tensors = []
+        for image in images:
+            if isinstance(image, (str, Path)):
+                image = Image.open(image).convert('RGB')
+            elif hasattr(image, 'convert'):
+                image = image.convert('RGB')
+            tensors.append(self.preprocess(image))
+
+        # Foto della stessa cella condividono il sottoinsieme (stesso oggetto dalla LRU)
+        groups: Dict[int, List[int]] = {}
+        group_subset = {}
+        for pos, subset in enumerate(subsets):
+            key = id(subset) if subset is not None else 0
+            groups.setdefault(key, []).append(pos)
+            group_subset[key] = subset
+
+        results: List[List[Dict]] = [[] for _ in images]
+        with torch.no_grad():
+            image_tensor = torch.stack(tensors).to(self.device)
+            image_features = self.model.encode_image(image_tensor)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+
+            for key, positions in groups.items():
+                subset = group_subset[key]
+                txt_embeddings = subset.embeddings if subset is not None else self.txt_embeddings
+                feats = image_features[positions]
+                if feats.dtype != txt_embeddings.dtype:
+                    feats = feats.to(txt_embeddings.dtype)
+
+                # Similarità con gli embeddings del gruppo (softmax per probabilità)
+                probs = torch.softmax((feats @ txt_embeddings.T) * LOGIT_SCALE, dim=-1)
+                top_probs, top_indices = probs.topk(min(k, probs.shape[-1]), dim=-1)
+
+                for row, pos in enumerate(positions):
+                    results[pos] = self._format(top_probs[row].tolist(), top_indices[row].tolist(),
+                                                subset, min_prob)
+        return results
+
+    def _format(self, probs, indices, subset, min_prob) -> List[Dict]:
+        out = []
+        for prob_val, idx in zip(probs, indices):
+            if prob_val < min_prob:
+                continue
+            if subset is not None:
+                idx = int(subset.indices[idx])
+            # Parsing tassonomico completo da TreeOfLife (7 livelli)
+            parsed = parse_treeoflife_entry(self.txt_names[idx])
+            if parsed is None:
+                continue
+            parsed['score'] = prob_val
+            out.append(parsed)
+        return out
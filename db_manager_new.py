@@ -6,18 +6,48 @@ Versione pulita senza migrazioni - richiede database ricreato da zero
 SPLIT: tags = solo tag umani, llm_tags = solo tag generati da LLM, bioclip_taxonomy separato per tassonomia BioCLIP
 """
 
+import os
 import sqlite3
 import threading
 import logging
 import json
 import pickle
+import time
 import numpy as np
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Cartella di un filepath in SQL: tutto ciò che precede l'ultimo separatore
+# (rtrim toglie il nome file, il secondo rtrim il separatore finale)
+_SQL_DIRNAME = "rtrim(rtrim({0}, replace(replace({0}, '/', ''), '\\', '')), '/\\')"
+
+# File system case-insensitive (Windows, come os.path.normcase): i filtri
+# cartella ignorano maiuscole/minuscole come faceva filepath LIKE
+_DIR_COLLATE = " COLLATE NOCASE" if os.path.normcase('A') == 'a' else ""
+
+
+def directory_filter(directories) -> Tuple[str, list]:
+    """Frammento WHERE e parametri per le foto nelle cartelle indicate (sotto-cartelle incluse).
+
+    Usa la colonna indicizzata directory: uguaglianza più intervallo sul
+    prefisso "cartella + separatore", al posto di filepath LIKE che non può
+    usare un indice. Su Windows i confronti sono COLLATE NOCASE (indice
+    idx_directory_nocase). Nessuna cartella → "1=1".
+    """
+    clauses, params = [], []
+    c = _DIR_COLLATE
+    for d in directories or []:
+        d = str(d).rstrip('/\\')
+        clauses.append(f"(directory = ?{c} OR (directory >= ?{c} AND directory < ?{c}))")
+        params.extend([d, d + os.sep, d + chr(ord(os.sep) + 1)])
+    if not clauses:
+        return "1=1", []
+    return f"({' OR '.join(clauses)})", params
+
+
 class DatabaseManager:
     """Gestore database con schema completo XMP Lightroom e tags unificati"""
     
@@ -38,6 +68,7 @@ class DatabaseManager:
             self.conn.execute("PRAGMA synchronous=NORMAL")
             self.conn.execute("PRAGMA wal_autocheckpoint=0")  # disabilita checkpoint automatico
             self.create_tables()
+            self._init_embedding_stores()
             
         except Exception as e:
             logger.error(f"Errore inizializzazione database: {e}")
@@ -330,7 +361,165 @@ class DatabaseManager:
             logger.info("Migrazione DB completata: filename non è più UNIQUE")
 
         self.conn.commit()
+
+        # Migrazioni versionate (PRAGMA user_version): dopo la ricostruzione
+        # tabella sopra, che non conosce le colonne aggiunte qui
+        self._run_migrations()
+        self.ensure_search_index()
         logger.info(f"Database schema completo inizializzato: {self.db_path}")
+
+    # ─────────────────────────────────────────────────────────────
+    # MIGRAZIONI VERSIONATE
+    # ─────────────────────────────────────────────────────────────
+    # Ogni passo porta il DB da versione n-1 a n dentro una transazione,
+    # insieme all'aggiornamento di PRAGMA user_version. Le ALTER TABLE
+    # in try/except di create_tables restano come base per i DB storici.
+    # Nuove modifiche di schema: aggiungere un passo in coda a _MIGRATIONS.
+
+    _MIGRATIONS = [
+        (1, "colonna quick_hash (pre-check duplicati)", '_migrate_quick_hash'),
+        (2, "indici filepath, sync_state, color_label, camera_make, lens_model", '_migrate_lookup_indexes'),
+        (3, "colonna directory indicizzata per i filtri cartella", '_migrate_directory_column'),
+        (4, "statistiche query planner (ANALYZE)", '_migrate_analyze'),
+        (5, "indice full-text FTS5 di tag, titolo e descrizione", '_migrate_search_index'),
+        (6, "colonna xmp_sync_info (cache stato badge XMP)", '_migrate_xmp_sync_info'),
+        (7, "indice directory case-insensitive (filtri cartella su Windows)", '_migrate_directory_nocase'),
+        (8, "tabelle snapshot della scansione cartelle", '_migrate_scan_snapshot'),
+    ]
+
+    SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
+    def _run_migrations(self):
+        """Applica in ordine i passi con versione > PRAGMA user_version."""
+        current = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if current > self.SCHEMA_VERSION:
+            logger.warning(f"Schema DB v{current} più recente dell'applicazione (v{self.SCHEMA_VERSION})")
+            return
+        pending = [m for m in self._MIGRATIONS if m[0] > current]
+        if not pending:
+            return
+
+        _t_all = time.monotonic()
+        for version, description, method in pending:
+            # BEGIN IMMEDIATE: più DatabaseManager aperti insieme non migrano due volte
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    self.conn.commit()
+                    continue
+                logger.info(f"Migrazione DB v{version}: {description}...")
+                _t = time.monotonic()
+                getattr(self, method)()
+                self.conn.execute(f"PRAGMA user_version = {int(version)}")
+                self.conn.commit()
+                logger.info(f"Migrazione DB v{version} completata in {time.monotonic() - _t:.2f}s")
+            except Exception as e:
+                self.conn.rollback()
+                logger.error(f"Migrazione DB v{version} fallita ({description}): {e}")
+                raise
+        logger.info(f"Schema DB v{current} → v{self.SCHEMA_VERSION} in {time.monotonic() - _t_all:.2f}s")
+
+    def _add_column_if_missing(self, column: str, decl: str):
+        cols = {r[1] for r in self.conn.execute("PRAGMA table_info(images)").fetchall()}
+        if column not in cols:
+            self.conn.execute(f"ALTER TABLE images ADD COLUMN {column} {decl}")
+
+    def _migrate_quick_hash(self):
+        # quick_hash = dimensione + primo/ultimo MB (utils/hashing.quick_hash)
+        self._add_column_if_missing('quick_hash', 'TEXT')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_quick_hash ON images(quick_hash)")
+
+    def _migrate_lookup_indexes(self):
+        # filepath: filepath_exists / get_image_by_filepath / had_processing_errors
+        # e pre-check bulk del processing; gli altri: filtri e raggruppamenti
+        # di ricerca e statistiche
+        for column in ('filepath', 'sync_state', 'color_label', 'camera_make', 'lens_model'):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{column} ON images({column})")
+
+    def _migrate_directory_column(self):
+        # Cartella del file senza separatore finale, mantenuta da trigger:
+        # vale anche per chi scrive filepath fuori da DatabaseManager (tools/).
+        # I filtri cartella usano directory_filter() → ricerca per intervallo sull'indice.
+        self._add_column_if_missing('directory', 'TEXT')
+        self.conn.execute(f"UPDATE images SET directory = {_SQL_DIRNAME.format('filepath')}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_directory ON images(directory)")
+        self.conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_images_directory_insert AFTER INSERT ON images
+            BEGIN
+                UPDATE images SET directory = {_SQL_DIRNAME.format('NEW.filepath')} WHERE id = NEW.id;
+            END
+        """)
+        self.conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_images_directory_update AFTER UPDATE OF filepath ON images
+            BEGIN
+                UPDATE images SET directory = {_SQL_DIRNAME.format('NEW.filepath')} WHERE id = NEW.id;
+            END
+        """)
+
+    def _migrate_analyze(self):
+        # Statistiche complete una volta sola; poi PRAGMA optimize alla chiusura
+        self.conn.execute("ANALYZE")
+
+    def _migrate_search_index(self):
+        # Tabella images_fts + trigger (search_index); senza FTS5 la ricerca
+        # per tag resta sulla pipeline Python
+        import search_index
+        search_index.ensure(self.conn)
+
+    def _migrate_xmp_sync_info(self):
+        # JSON {key, state, info} scritto da xmp_sync_cache: lo stato badge
+        # resta valido finché file, sidecar e campi confrontati non cambiano
+        self._add_column_if_missing('xmp_sync_info', 'TEXT')
+
+    def _migrate_directory_nocase(self):
+        # directory_filter() confronta con COLLATE NOCASE dove il file system
+        # ignora maiuscole/minuscole: serve un indice con la stessa collation
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_directory_nocase ON images(directory COLLATE NOCASE)")
+
+    def _migrate_scan_snapshot(self):
+        # Snapshot per cartella di file_scanner.DirectoryScanner: mtime della
+        # cartella, formati e sotto-cartelle, più dimensione e mtime dei file
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_dirs (
+                dirpath TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                formats TEXT NOT NULL,
+                subdirs TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_files (
+                filepath TEXT PRIMARY KEY,
+                dirpath TEXT NOT NULL,
+                file_size INTEGER,
+                mtime REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_files_dirpath ON scan_files(dirpath)")
+
+    def ensure_search_index(self) -> bool:
+        """Riallinea i trigger FTS alle colonne di images (es. vernacular_name
+        aggiunta dal plugin BioNomen) ricostruendo l'indice. True se utilizzabile."""
+        import search_index
+        try:
+            if search_index.is_current(self.conn):
+                return True
+            if search_index.unsupported():
+                return False
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] < 5:
+                return False  # migrazione non applicata (DB più recente o fallita)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                ok = search_index.ensure(self.conn)
+                self.conn.commit()
+                return ok
+            except Exception:
+                self.conn.rollback()
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Indice di ricerca FTS5 non aggiornato: {e}")
+            return False
     
     def insert_image(self, image_data: Dict[str, Any]) -> Optional[int]:
         """
@@ -365,8 +554,9 @@ class DatabaseManager:
                     tags, llm_tags, bioclip_taxonomy, geo_hierarchy,
                     ai_description_hash, model_used,
                     processing_time, embedding_generated, llm_generated, success, error_message, app_version,
-                    sync_state, last_xmp_mtime, last_sync_at, last_sync_check_at, last_import_mtime, processed_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    sync_state, last_xmp_mtime, last_sync_at, last_sync_check_at, last_import_mtime, processed_date,
+                    quick_hash
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 # File base
                 image_data.get('filename'),
@@ -475,19 +665,85 @@ class DatabaseManager:
                 None,  # last_sync_at
                 None,  # last_sync_check_at
                 None,  # last_import_mtime
-                datetime.now().isoformat()
+                datetime.now().isoformat(),
+
+                # Pre-check duplicati
+                image_data.get('quick_hash')
             ))
             
             image_id = self.cursor.lastrowid
+            # Store su disco scritto nella stessa transazione: se fallisce, la riga non entra
+            self._write_embedding_stores(image_id, image_data)
             self.conn.commit()
+            self._sync_embedding_matrix(image_id, image_data)
             
             logger.debug(f"Immagine inserita: {image_data.get('filename')} (ID: {image_id})")
             return image_id
             
         except Exception as e:
             logger.error(f"Errore insert_image: {e}", exc_info=True)
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
             raise  # Propaga l'eccezione al chiamante per diagnostica dettagliata
 
+    def _init_embedding_stores(self):
+        """Apre lo store embedding su disco (embedding_store) accanto al DB.
+
+        Su DB nuovo (nessuna immagine) lo store viene creato già completo e da
+        lì in poi resta allineato. Su DB esistenti senza store serve la
+        migrazione una tantum tools/migrate_embedding_store.py.
+        """
+        self._embedding_stores = {}
+        try:
+            from embedding_store import get_embedding_store, STORE_COLUMNS
+            is_empty = self.conn.execute("SELECT 1 FROM images LIMIT 1").fetchone() is None
+            for column in STORE_COLUMNS:
+                store = get_embedding_store(self.db_path, column)
+                if not store.exists and is_empty:
+                    store.create(complete=True)
+                    logger.info(f"Store embedding creato: {store.data_path}")
+                if store.exists:
+                    self._embedding_stores[column] = store
+        except Exception as e:
+            logger.warning(f"Store embedding non disponibile: {e}")
+            self._embedding_stores = {}
+
+    def _write_embedding_stores(self, image_id, data: Dict[str, Any]) -> None:
+        """Scrive nello store su disco gli embedding presenti in data.
+
+        Chiamata prima del commit: un'eccezione qui annulla anche la riga SQLite.
+        Stessa regola di _serialize_embedding: ciò che non è ndarray diventa NULL.
+        """
+        for column, store in self._embedding_stores.items():
+            if column in data:
+                value = data[column]
+                store.write(image_id, value if isinstance(value, np.ndarray) else None)
+
+    def _sync_embedding_matrix(self, image_id, data: Optional[Dict[str, Any]]) -> None:
+        """Allinea le matrici embedding in memoria (embedding_index) dopo una scrittura.
+
+        Solo le matrici già caricate da una ricerca o da "trova simili":
+        altrimenti il primo caricamento leggerà comunque il valore aggiornato.
+        data=None: immagine cancellata, rimossa da tutte le matrici.
+        """
+        from embedding_index import find_embedding_matrix
+        for column in ('clip_embedding', 'dinov2_embedding'):
+            if data is not None and column not in data:
+                continue
+            try:
+                matrix = find_embedding_matrix(self.db_path, column)
+                if matrix is None:
+                    continue
+                embedding = data[column] if data is not None else None
+                if isinstance(embedding, np.ndarray):
+                    matrix.upsert(image_id, embedding)
+                else:
+                    matrix.remove(image_id)
+            except Exception as e:
+                logger.debug(f"Aggiornamento matrice {column} fallito (id={image_id}): {e}")
+
     def _serialize_embedding(self, embedding) -> Optional[bytes]:
         """Serializza embedding numpy come raw float32 bytes per storage database"""
         if embedding is None:
@@ -539,6 +795,17 @@ class DatabaseManager:
             logger.error(f"Errore image_exists: {e}")
             return False
 
+    def quick_hash_exists(self, quick_hash: Optional[str]) -> bool:
+        """True se almeno una foto ha lo stesso quick hash (candidato duplicato)."""
+        if not quick_hash:
+            return False
+        try:
+            self.cursor.execute("SELECT 1 FROM images WHERE quick_hash = ? LIMIT 1", (quick_hash,))
+            return self.cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(f"Errore quick_hash_exists: {e}")
+            return False
+
     def filepath_exists(self, filepath: str) -> bool:
         """Verifica se un'immagine con questo filepath è già presente nel DB."""
         if not filepath:
@@ -669,6 +936,15 @@ class DatabaseManager:
             logger.error(f"Errore get_all_images: {e}")
             return []
     
+    def get_all_filepaths(self) -> List[str]:
+        """Solo i filepath del catalogo (scansione cartelle: niente blob embedding)."""
+        try:
+            self.cursor.execute("SELECT filepath FROM images")
+            return [row[0] for row in self.cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Errore get_all_filepaths: {e}")
+            return []
+
     def get_stats(self):
         """Recupera statistiche database"""
         try:
@@ -910,10 +1186,13 @@ class DatabaseManager:
             
             query = f"UPDATE images SET {', '.join(fields)} WHERE id = ?"
             self.cursor.execute(query, values)
+            if self.cursor.rowcount > 0:
+                self._write_embedding_stores(image_id, kwargs)
             self.conn.commit()
             
             rows_affected = self.cursor.rowcount
             if rows_affected > 0:
+                self._sync_embedding_matrix(image_id, kwargs)
                 logger.info(f"Metadata aggiornati per image_id {image_id}: {list(kwargs.keys())}")
                 return True
             else:
@@ -953,6 +1232,9 @@ class DatabaseManager:
 
             rows_affected = self.cursor.rowcount
             if rows_affected > 0:
+                for store in self._embedding_stores.values():
+                    store.delete(image_id)
+                self._sync_embedding_matrix(image_id, None)
                 logger.info(f"🗑️ Immagine eliminata dal DB: {filename} (id={image_id})")
                 return True
             else:
@@ -1024,7 +1306,8 @@ class DatabaseManager:
                 'tags', 'llm_tags', 'bioclip_taxonomy', 'geo_hierarchy',
                 'ai_description_hash', 'model_used',
                 'processing_time', 'embedding_generated', 'llm_generated', 'success', 'error_message', 'app_version',
-                'sync_state', 'last_xmp_mtime', 'last_sync_at', 'last_sync_check_at', 'last_import_mtime', 'processed_date'
+                'sync_state', 'last_xmp_mtime', 'last_sync_at', 'last_sync_check_at', 'last_import_mtime', 'processed_date',
+                'quick_hash'
             }
             
             # Filtra solo i campi validi dal database
@@ -1084,6 +1367,11 @@ class DatabaseManager:
         """Chiudi connessione database thread-safe"""
         try:
             if hasattr(self, 'conn') and self.conn:
+                # Aggiorna le statistiche del planner solo dove servono (di solito nulla)
+                try:
+                    self.conn.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
                 self.conn.close()
         except sqlite3.ProgrammingError:
             # Ignora errori thread se oggetto creato in thread diverso
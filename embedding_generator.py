@@ -14,6 +14,7 @@ from typing import Dict, List, Optional
 import warnings
 import os
 
+from query_cache import normalize_query
 from utils.paths import get_app_dir
 from utils.tag_utils import normalize_tags
 
@@ -22,11 +23,69 @@ os.environ['TRANSFORMERS_VERBOSITY'] = 'error'
 
 logger = logging.getLogger(__name__)
 
+
+class _ModelAttr:
+    """Attributo di un modello AI gestito da ModelRegistry.
+
+    In modalità lazy (embedding.loading.mode) il primo accesso carica il
+    modello: tutti i punti che leggono self.clip_model & co. restano invariati.
+    Senza registry (modalità llm_only / bioclip_only) è un attributo normale.
+    """
+
+    def __init__(self, model_key: str, default=None):
+        self.model_key = model_key
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.slot = f'_{name}_value'
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        registry = obj.__dict__.get('_model_registry')
+        if registry is not None:
+            registry.ensure(self.model_key)
+        return obj.__dict__.get(self.slot, self.default)
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.slot] = value
+
+
 class EmbeddingGenerator:
     """Generatore embedding multipli con supporto LLM Vision e BioCLIP"""
 
-    def __init__(self, config, initialization_mode='full'):
+    # Attributi dei modelli (vedi _ModelAttr): chiave registry = chiave config
+    clip_model = _ModelAttr('clip')
+    clip_processor = _ModelAttr('clip')
+    clip_enabled = _ModelAttr('clip', False)
+    dinov2_model = _ModelAttr('dinov2')
+    dinov2_processor = _ModelAttr('dinov2')
+    dinov2_enabled = _ModelAttr('dinov2', False)
+    aesthetic_model = _ModelAttr('aesthetic')
+    aesthetic_head = _ModelAttr('aesthetic')
+    aesthetic_processor = _ModelAttr('aesthetic')
+    aesthetic_enabled = _ModelAttr('aesthetic', False)
+    musiq_model = _ModelAttr('technical')
+    musiq_available = _ModelAttr('technical', False)
+    bioclip_classifier = _ModelAttr('bioclip')
+    bioclip_enabled = _ModelAttr('bioclip', False)
+
+    # Modelli caricati dal registry: (chiave config, etichetta, metodo init,
+    # attributo di disponibilità, sotto-cartelle pesi in models_dir)
+    _MODEL_SPECS = (
+        ('clip', 'SigLIP', '_init_clip', 'clip_enabled', ('clip',)),
+        ('dinov2', 'DINOv2', '_init_dinov2', 'dinov2_enabled', ('dinov2',)),
+        ('aesthetic', 'Aesthetic', '_init_aesthetic', 'aesthetic_enabled', ('aesthetic',)),
+        ('technical', 'MUSIQ', '_init_musiq', 'musiq_available', ('musiq',)),
+        ('bioclip', 'BioCLIP', '_init_bioclip', 'bioclip_enabled', ('bioclip', 'treeoflife')),
+    )
+
+    def __init__(self, config, initialization_mode='full', progress_callback=None):
+        """progress_callback: listener ModelRegistry per l'avanzamento per modello
+        (usato dallo splash), attivo solo durante il costruttore."""
         self.config = config
+        self._model_registry = None
+        self._progress_callback = progress_callback
         self.embedding_config = config.get('embedding', {})
         self.enabled = self.embedding_config.get('enabled', False)
 
@@ -43,6 +102,14 @@ class EmbeddingGenerator:
         self.musiq_device = 'cpu'  # MUSIQ gira su CPU di default (leggero, 0.28s/foto)
         self.bioclip_classifier = None
         self.bioclip_on_cpu = False
+        self._geo_species_cache = None   # GeoSpeciesCache (solo classificatore locale)
+
+        # LRU embedding testuali / traduzioni delle query (query_cache), create al primo uso
+        import threading
+        self._query_caches = None
+        self._query_caches_lock = threading.Lock()
+        self._clip_text_id = None
+        self._llm_cache = None   # LLMResponseCache (llm_cache), False = disattivata
 
         # Flag GPU crash: True dopo device removed (TDR Windows) — salta chiamate GPU successive
         self._gpu_dead = False
@@ -57,45 +124,25 @@ class EmbeddingGenerator:
         # La tab li scarica nell'area log al momento della sua creazione.
         self.startup_log: list[tuple[str, str]] = []  # lista di (messaggio, livello)
 
-        # Device per-modello (allocazione da config o auto-detect)
-        from device_allocator import detect_hardware, resolve_device, MODEL_VRAM_ESTIMATES
-        self._hardware = detect_hardware()
-        self._hw_backend = self._hardware['backend']
+        # Device per-modello (allocazione da config o auto-detect).
+        # detect_hardware() importa torch e interroga la GPU: si esegue al primo
+        # device risolto (proprietà _hardware), cioè al caricamento del primo modello
+        self._hardware_info = None
+        self._hardware_lock = threading.Lock()
         self._model_devices = {}  # cache device risolti per modello
 
-        # Avviso VRAM: controlla se la somma dei modelli configurati su GPU
-        # supera la VRAM disponibile (solo CUDA/DirectML — MPS è unified memory).
-        if self._hw_backend in ('cuda', 'directml'):
-            vram_total = self._hardware.get('vram_total_gb') or 0.0
-            if vram_total > 0:
-                models_cfg = self.embedding_config.get('models', {})
-                gpu_vram_requested = sum(
-                    MODEL_VRAM_ESTIMATES.get(key, 0)
-                    for key, cfg in models_cfg.items()
-                    if isinstance(cfg, dict) and cfg.get('device', 'gpu') == 'gpu'
-                    and key in MODEL_VRAM_ESTIMATES
-                )
-                if gpu_vram_requested > vram_total * 0.90:
-                    msg = (
-                        f"⚠️ VRAM: i modelli configurati su GPU richiedono ~{gpu_vram_requested:.1f} GB "
-                        f"ma la GPU ha {vram_total:.1f} GB (soglia 90% = {vram_total*0.90:.1f} GB). "
-                        f"Alcuni modelli potrebbero fallire o scalare su CPU automaticamente."
-                    )
-                    logger.warning(msg)
-                    self.startup_log.append((msg, 'warning'))
-
         # CARICAMENTO PROFILI OTTIMIZZAZIONE DA CONFIG
         self.optimization_profiles = self._load_optimization_profiles()
 
-        # Traduttore query → EN (per CLIP)
+        # Traduttori Argos: query → EN (per CLIP) ed EN → lingua contenuti (per
+        # ricerca tag). In modalità lazy si preparano al primo uso, come i modelli
         self.translator = None
-        if self.embedding_config.get('translation', {}).get('enabled', True):
-            self._init_translator()
-
-        # Traduttore EN → lingua contenuti (per ricerca tag)
         self._tag_lang = self.config.get('ui', {}).get('llm_output_language', 'it')
         self._tag_translator_ready = False
-        self._init_tag_translator()
+        self._translators_ready = False
+        self._translators_lock = threading.Lock()
+        if not self._lazy_loading():
+            self.ensure_translators()
 
         # Plugin LLM Vision (Ollama / LM Studio / altro)
         self.llm_plugin = None
@@ -186,6 +233,47 @@ class EmbeddingGenerator:
                     f"embedding GPU saltati per le immagini rimanenti"
                 )
 
+    @property
+    def _hardware(self) -> dict:
+        """Hardware rilevato (detect_hardware), una volta sola al primo uso."""
+        if self._hardware_info is None:
+            with self._hardware_lock:
+                if self._hardware_info is None:
+                    from device_allocator import detect_hardware
+                    hardware = detect_hardware()
+                    self._warn_vram_budget(hardware)
+                    self._hardware_info = hardware
+        return self._hardware_info
+
+    @property
+    def _hw_backend(self) -> str:
+        return self._hardware['backend']
+
+    def _warn_vram_budget(self, hardware: dict):
+        """Avviso VRAM: controlla se la somma dei modelli configurati su GPU
+        supera la VRAM disponibile (solo CUDA/DirectML — MPS è unified memory)."""
+        from device_allocator import MODEL_VRAM_ESTIMATES
+        if hardware['backend'] not in ('cuda', 'directml'):
+            return
+        vram_total = hardware.get('vram_total_gb') or 0.0
+        if vram_total <= 0:
+            return
+        models_cfg = self.embedding_config.get('models', {})
+        gpu_vram_requested = sum(
+            MODEL_VRAM_ESTIMATES.get(key, 0)
+            for key, cfg in models_cfg.items()
+            if isinstance(cfg, dict) and cfg.get('device', 'gpu') == 'gpu'
+            and key in MODEL_VRAM_ESTIMATES
+        )
+        if gpu_vram_requested > vram_total * 0.90:
+            msg = (
+                f"⚠️ VRAM: i modelli configurati su GPU richiedono ~{gpu_vram_requested:.1f} GB "
+                f"ma la GPU ha {vram_total:.1f} GB (soglia 90% = {vram_total*0.90:.1f} GB). "
+                f"Alcuni modelli potrebbero fallire o scalare su CPU automaticamente."
+            )
+            logger.warning(msg)
+            self.startup_log.append((msg, 'warning'))
+
     def _device_for(self, model_key: str) -> str:
         """Restituisce device torch per un modello specifico (con cache)."""
         if model_key not in self._model_devices:
@@ -324,6 +412,19 @@ class EmbeddingGenerator:
         except Exception:
             logger.warning("Argos: pulizia directory orfane fallita", exc_info=True)
 
+    def ensure_translators(self):
+        """Prepara i traduttori Argos una volta sola: nel costruttore, o al primo
+        uso in modalità lazy (da chiamare nel main thread prima di un worker)."""
+        if self._translators_ready:
+            return
+        with self._translators_lock:
+            if self._translators_ready:
+                return
+            if self.embedding_config.get('translation', {}).get('enabled', True):
+                self._init_translator()
+            self._init_tag_translator()
+            self._translators_ready = True
+
     def _init_translator(self):
         """Inizializza traduttore Argos IT->EN.
         Priorità: modelli locali (installer) → repo congelato HF → server Argos ufficiale."""
@@ -522,16 +623,16 @@ class EmbeddingGenerator:
     def _translate_to_tag_language(self, text_en: str) -> str:
         """Traduce la query EN nella lingua dei contenuti per il matching tag.
         Ritorna il testo originale se la traduzione non è disponibile."""
+        self.ensure_translators()
         if self._tag_lang == 'en' or not self._tag_translator_ready:
             return text_en
         try:
-            import argostranslate.translate
             if ',' in text_en:
                 parts = [p.strip() for p in text_en.split(',')]
-                translated = [argostranslate.translate.translate(p, 'en', self._tag_lang) for p in parts if p]
+                translated = [self._translate_cached(p, 'en', self._tag_lang) for p in parts if p]
                 result = ', '.join(translated)
             else:
-                result = argostranslate.translate.translate(text_en, 'en', self._tag_lang)
+                result = self._translate_cached(text_en, 'en', self._tag_lang)
 
             # Controllo di plausibilità: se il testo in ingresso è GIÀ nella lingua
             # dei tag, il modello EN→xx produce spazzatura anziché rifiutarsi.
@@ -553,6 +654,118 @@ class EmbeddingGenerator:
             logger.debug(f"Traduzione EN→{self._tag_lang} fallita: {e}")
             return text_en
 
+    def _translate_cached(self, text: str, from_code: str, to_code: str) -> str:
+        """argostranslate.translate.translate con LRU per (coppia di lingue, testo)."""
+        cache = self._query_cache('translation')
+        key = (f"{from_code}-{to_code}", text)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            return cached
+        import argostranslate.translate
+        result = argostranslate.translate.translate(text, from_code, to_code)
+        if cache is not None:
+            cache.put(key, result)
+        return result
+
+    def _query_cache(self, kind: str):
+        """LRU della ricerca per 'text_embedding' o 'translation' (None = disattivata).
+
+        search.query_cache:
+          enabled     — default True
+          max_entries — voci per tipo (default 512)
+          persist     — salva le voci in query_cache.sqlite accanto al catalogo
+        """
+        if self._query_caches is None:
+            with self._query_caches_lock:
+                if self._query_caches is None:
+                    self._query_caches = self._init_query_caches()
+        return self._query_caches.get(kind)
+
+    def _init_query_caches(self) -> Dict:
+        from query_cache import (LRUCache, QueryStore, STORE_FILENAME, DEFAULT_MAX_ENTRIES,
+                                 encode_embedding, decode_embedding)
+
+        cache_cfg = self.config.get('search', {}).get('query_cache', {}) or {}
+        if not cache_cfg.get('enabled', True):
+            return {}
+        max_entries = cache_cfg.get('max_entries') or DEFAULT_MAX_ENTRIES
+
+        store = None
+        if cache_cfg.get('persist', True):
+            db_rel = self.config.get('paths', {}).get('database') or 'database/offgallery.sqlite'
+            db_path = Path(db_rel)
+            db_path = db_path if db_path.is_absolute() else get_app_dir() / db_path
+            try:
+                store = QueryStore(db_path.parent / STORE_FILENAME)
+            except Exception as e:
+                logger.warning(f"Cache query non persistente ({e}): solo in memoria")
+
+        return {
+            'text_embedding': LRUCache('text_embedding', max_entries,
+                                       encode_embedding, decode_embedding, store),
+            'translation': LRUCache('translation', max_entries, store=store),
+        }
+
+    def query_cache_stats(self) -> Dict[str, Dict]:
+        """Contatori hit/miss/size/hit_rate per tipo di cache della ricerca."""
+        if not self._query_caches:
+            return {}
+        return {kind: cache.stats() for kind, cache in self._query_caches.items()}
+
+    def _llm_response_cache(self):
+        """Cache delle risposte LLM Vision (None = disattivata).
+
+        embedding.models.llm_vision.cache:
+          enabled     — default True
+          max_entries — risposte salvate in llm_cache.sqlite (default 20000)
+        """
+        if self._llm_cache is None:
+            with self._query_caches_lock:
+                if self._llm_cache is None:
+                    self._llm_cache = self._init_llm_cache()
+        return self._llm_cache or None
+
+    def _init_llm_cache(self):
+        from llm_cache import LLMResponseCache, STORE_FILENAME, DEFAULT_MAX_ENTRIES
+
+        llm_config = self.embedding_config.get('models', {}).get('llm_vision', {})
+        cache_cfg = llm_config.get('cache', {}) or {}
+        if not cache_cfg.get('enabled', True):
+            return False
+        db_rel = self.config.get('paths', {}).get('database') or 'database/offgallery.sqlite'
+        db_path = Path(db_rel)
+        db_path = db_path if db_path.is_absolute() else get_app_dir() / db_path
+        try:
+            return LLMResponseCache(db_path.parent / STORE_FILENAME,
+                                    cache_cfg.get('max_entries') or DEFAULT_MAX_ENTRIES)
+        except Exception as e:
+            logger.warning(f"Cache risposte LLM non disponibile ({e})")
+            return False
+
+    def llm_cache_stats(self) -> Dict:
+        """Contatori hit/miss/size/hit_rate della cache risposte LLM ({} se non in uso)."""
+        return self._llm_cache.stats() if self._llm_cache else {}
+
+    def _clip_text_model_id(self) -> str:
+        """Identificativo dei pesi SigLIP per la chiave degli embedding testuali.
+
+        Dalla config e dai file in models_dir, senza toccare il modello: in
+        modalità lazy una query già in cache non lo carica.
+        """
+        if self._clip_text_id is None:
+            model_name = (
+                self.embedding_config.get('models', {}).get('clip', {}).get('model_name')
+                or 'google/siglip-so400m-patch14-384'
+            )
+            clip_subfolder = self.config.get('models_repository', {}).get('models', {}).get('clip') or 'clip'
+            weights = self._get_models_dir() / clip_subfolder / 'model.safetensors'
+            try:
+                st = weights.stat()
+                self._clip_text_id = f"{model_name}@{st.st_size}:{int(st.st_mtime)}"
+            except OSError:
+                self._clip_text_id = model_name
+        return self._clip_text_id
+
     def _get_models_dir(self) -> Path:
         """Restituisce il percorso assoluto della directory modelli dal config."""
         # "or" e non il default di .get(): in YAML una voce "models_dir:" senza
@@ -563,7 +776,87 @@ class EmbeddingGenerator:
         return p if p.is_absolute() else get_app_dir() / p
 
     def _initialize_models(self):
-        """Inizializza modelli abilitati.
+        """Registra i modelli abilitati e, in modalità eager, li carica.
+
+        embedding.loading.mode:
+          eager (default) — caricamento all'avvio nel thread chiamante, con
+                            prefetch parallelo dei file pesi dal disco
+          lazy            — ogni modello si carica al primo utilizzo
+                            (ricerca, processing, ...): avvio in pochi secondi
+        """
+        from model_registry import ModelRegistry, prefetch_files, WEIGHT_SUFFIXES
+
+        loading_cfg = self.embedding_config.get('loading', {}) or {}
+        lazy = self._lazy_loading()
+        models_config = self.embedding_config.get('models', {})
+
+        registry = ModelRegistry()
+        weight_dirs = []
+        models_dir = self._get_models_dir()
+        repo_models = self.config.get('models_repository', {}).get('models', {}) or {}
+        for key, label, init_name, flag, subfolders in self._MODEL_SPECS:
+            if not models_config.get(key, {}).get('enabled', False):
+                continue
+            registry.register(key, label, self._model_loader(getattr(self, init_name), flag))
+            weight_dirs.extend(models_dir / (repo_models.get(sf) or sf) for sf in subfolders)
+        self._model_registry = registry
+
+        if lazy:
+            logger.info(f"🕒 {len(registry.keys)} modelli AI verranno caricati al primo utilizzo")
+            return
+
+        if self._progress_callback is not None:
+            registry.add_listener(self._progress_callback)
+
+        prefetch_workers = int(loading_cfg.get('prefetch_workers', 4) or 0)
+        if prefetch_workers > 0:
+            weights = [f for d in weight_dirs if d.is_dir()
+                       for f in d.rglob('*') if f.suffix.lower() in WEIGHT_SUFFIXES]
+            prefetch_files(weights, workers=prefetch_workers)
+        try:
+            registry.load_all()
+        finally:
+            registry.remove_listener(self._progress_callback)
+
+    def _lazy_loading(self) -> bool:
+        """embedding.loading.mode: lazy (modelli e traduttori al primo utilizzo)."""
+        loading_cfg = self.embedding_config.get('loading', {}) or {}
+        return str(loading_cfg.get('mode', 'eager')).lower() == 'lazy'
+
+    @property
+    def lazy_models(self) -> bool:
+        """True se ci sono modelli registrati non ancora caricati."""
+        return bool(self._model_registry is not None and self._model_registry.pending())
+
+    def preload_models(self, keys=None, progress_callback=None):
+        """Carica subito, nel thread chiamante, i modelli lazy ancora da caricare.
+
+        Da chiamare nel main thread prima di avviare un worker che usa i
+        modelli: l'inizializzazione torch/CUDA/ctranslate2 deve restare lì.
+        keys: chiavi config dei modelli (None = tutti i registrati);
+        progress_callback: listener ModelRegistry, come nel costruttore.
+        """
+        registry = self._model_registry
+        if registry is None:
+            return
+        pending = [k for k in registry.pending() if keys is None or k in keys]
+        if not pending:
+            return
+        if progress_callback is not None:
+            registry.add_listener(progress_callback)
+        try:
+            registry.load_all(pending)
+        finally:
+            registry.remove_listener(progress_callback)
+
+    def model_state(self, model_key: str) -> str:
+        """Stato di un modello senza caricarlo: disabled | pending | loading | ready | failed."""
+        if self._model_registry is None:
+            return 'disabled'
+        return self._model_registry.state(model_key)
+
+    def _model_loader(self, init_fn, flag: str):
+        """Loader per il registry: esegue init_fn e ritorna la disponibilità del modello.
         Tutti i messaggi logger emessi durante l'init vengono anche accumulati
         in self.startup_log, così la tab li mostra all'apertura.
         """
@@ -577,26 +870,19 @@ class EmbeddingGenerator:
                 level = 'warning' if record.levelno >= _logging.WARNING else 'info'
                 self._buf.append((record.getMessage(), level))
 
-        _handler = _StartupLogHandler(self.startup_log)
-        _handler.setLevel(_logging.DEBUG)
-        logger.addHandler(_handler)
+        def _load():
+            _handler = _StartupLogHandler(self.startup_log)
+            _handler.setLevel(_logging.DEBUG)
+            logger.addHandler(_handler)
+            try:
+                init_fn()
+                if flag == 'bioclip_enabled':
+                    self.bioclip_enabled = self.bioclip_classifier is not None
+                return getattr(self, flag)
+            finally:
+                logger.removeHandler(_handler)
 
-        try:
-            models_config = self.embedding_config.get('models', {})
-            if models_config.get('clip', {}).get('enabled', False):
-                self._init_clip()
-            if models_config.get('dinov2', {}).get('enabled', False):
-                self._init_dinov2()
-            if models_config.get('aesthetic', {}).get('enabled', False):
-                self._init_aesthetic()
-            # MUSIQ/Technical: valutazione qualità tecnica
-            if models_config.get('technical', {}).get('enabled', False):
-                self._init_musiq()
-            if models_config.get('bioclip', {}).get('enabled', False):
-                self._init_bioclip()
-                self.bioclip_enabled = hasattr(self, 'bioclip_classifier') and self.bioclip_classifier is not None
-        finally:
-            logger.removeHandler(_handler)
+        return _load
 
     def _init_clip(self):
         """Inizializza SigLIP (drop-in per CLIP): prima da models_dir locale, poi repo congelato, poi fallback ufficiale.
@@ -1142,103 +1428,21 @@ class EmbeddingGenerator:
                     with open(treeoflife_dir / 'txt_emb_species.json', 'r', encoding='utf-8') as f:
                         txt_names = json.load(f)
 
-                    # Crea classifier wrapper compatibile con TreeOfLifeClassifier
-                    class LocalTreeOfLifeClassifier:
-                        """TreeOfLifeClassifier con modello locale, interfaccia compatibile"""
-                        def __init__(self, model, preprocess, txt_emb, txt_names, device):
-                            self.model = model
-                            self.preprocess = preprocess
-                            self.txt_embeddings = txt_emb
-                            self.txt_names = txt_names
-                            self.device = device
-
-                        def predict(self, images, rank=None, k=5, min_prob=0.0):
-                            """
-                            Predice le top-k specie per una lista di immagini.
-                            Interfaccia compatibile con TreeOfLifeClassifier.
-
-                            Args:
-                                images: Lista di PIL Images
-                                rank: Ignorato (per compatibilità)
-                                k: Numero di predizioni top
-                                min_prob: Probabilità minima per includere risultato
-
-                            Returns:
-                                Lista di dict con species, genus, family, common_name, score
-                            """
-                            from PIL import Image
-
-                            if not images:
-                                return []
-
-                            # Prendi la prima immagine (batch di 1)
-                            image = images[0]
-                            if isinstance(image, (str, Path)):
-                                image = Image.open(image).convert('RGB')
-                            elif hasattr(image, 'convert'):
-                                image = image.convert('RGB')
-
-                            # Preprocess e inference
-                            image_tensor = self.preprocess(image).unsqueeze(0).to(self.device)
-
-                            with torch.no_grad():
-                                image_features = self.model.encode_image(image_tensor)
-                                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-
-                                # Similarità con tutti gli embeddings (softmax per probabilità)
-                                similarities = (image_features @ self.txt_embeddings.T).squeeze(0)
-                                probs = torch.softmax(similarities * 100, dim=0)  # Temperature scaling
-
-                                # Top-k
-                                top_probs, top_indices = probs.topk(k)
-
-                                results = []
-                                for prob, idx in zip(top_probs, top_indices):
-                                    prob_val = prob.item()
-                                    if prob_val < min_prob:
-                                        continue
-
-                                    # Parsing tassonomico completo da TreeOfLife (7 livelli)
-                                    entry = self.txt_names[idx.item()]
-
-                                    # Formato lista: [[kingdom,phylum,class,order,family,genus,species], common_name]
-                                    if isinstance(entry, list) and len(entry) >= 2:
-                                        taxon = entry[0] if isinstance(entry[0], list) else []
-                                        common_name = entry[1] if isinstance(entry[1], str) else ''
-                                        kingdom = taxon[0] if len(taxon) > 0 else ''
-                                        phylum = taxon[1] if len(taxon) > 1 else ''
-                                        tax_class = taxon[2] if len(taxon) > 2 else ''
-                                        order = taxon[3] if len(taxon) > 3 else ''
-                                        family = taxon[4] if len(taxon) > 4 else 'Unknown'
-                                        genus = taxon[5] if len(taxon) > 5 else 'Unknown'
-                                        species_epithet = taxon[6] if len(taxon) > 6 else ''
-                                        species = f"{genus} {species_epithet}".strip() if species_epithet else genus
-                                    elif isinstance(entry, str):
-                                        # Formato stringa semplice (vecchio formato)
-                                        parts = entry.replace('_', ' ').split()
-                                        genus = parts[0] if parts else 'Unknown'
-                                        species = ' '.join(parts[:2]) if len(parts) >= 2 else entry
-                                        family = 'Unknown'
-                                        common_name = ''
-                                        kingdom = phylum = tax_class = order = ''
-                                        species_epithet = parts[1] if len(parts) >= 2 else ''
-                                    else:
-                                        continue
-
-                                    results.append({
-                                        'species': species,
-                                        'genus': genus,
-                                        'family': family,
-                                        'common_name': common_name,
-                                        'score': prob_val,
-                                        'taxonomy': [kingdom, phylum, tax_class, order, family, genus, species_epithet]
-                                    })
-
-                                return results
-
+                    # Classifier locale compatibile con TreeOfLifeClassifier (predizione batch)
+                    from bioclip_classifier import LocalTreeOfLifeClassifier
                     self.bioclip_classifier = LocalTreeOfLifeClassifier(
                         model, preprocess, txt_emb, txt_names, bioclip_device
                     )
+
+                    # GeoSpecies: sottoinsiemi per cella = righe di txt_emb, senza ricodifica testo
+                    from geospecies_cache import GeoSpeciesCache, DEFAULT_MAX_CELLS
+                    geo_cfg = self.embedding_config.get('models', {}).get('bioclip', {}).get('geo_cache', {})
+                    self._geo_species_cache = GeoSpeciesCache(
+                        txt_names,
+                        slicer=lambda idx: txt_emb.index_select(0, torch.from_numpy(idx).to(txt_emb.device)),
+                        max_cells=geo_cfg.get('max_cells', DEFAULT_MAX_CELLS),
+                        persist=geo_cfg.get('persist', True),
+                    )
                     self.bioclip_on_cpu = (bioclip_device == 'cpu')
                     if self.bioclip_on_cpu:
                         logger.info("[OK] BioCLIP caricato (CPU — VRAM insufficiente per GPU)")
@@ -1269,13 +1473,23 @@ class EmbeddingGenerator:
             return False
 
     def test_models(self):
-        """Testa disponibilità modelli"""
+        """Testa disponibilità modelli senza caricarli.
+
+        Un modello lazy non ancora caricato (pending/loading) conta come
+        disponibile: leggerne gli attributi lo caricherebbe nel thread
+        chiamante (es. ProcessingWorker) anziché nel main thread.
+        """
+        def _available(key, read):
+            if self.model_state(key) in ('pending', 'loading'):
+                return True
+            return read()
+
         return {
-            'clip': getattr(self, 'clip_enabled', False),
-            'dinov2': getattr(self, 'dinov2_enabled', False),
-            'aesthetic': getattr(self, 'aesthetic_enabled', False),
-            'musiq': self.musiq_available,
-            'bioclip': self.bioclip_classifier is not None
+            'clip': _available('clip', lambda: getattr(self, 'clip_enabled', False)),
+            'dinov2': _available('dinov2', lambda: getattr(self, 'dinov2_enabled', False)),
+            'aesthetic': _available('aesthetic', lambda: getattr(self, 'aesthetic_enabled', False)),
+            'musiq': _available('technical', lambda: self.musiq_available),
+            'bioclip': _available('bioclip', lambda: self.bioclip_classifier is not None)
         }
 
     def generate_embeddings(self, input_data, original_path=None):
@@ -1294,6 +1508,13 @@ class EmbeddingGenerator:
         # 1. LOGICA TESTO (Ricerca Semantica)
         # Se l'input è una stringa e NON esiste come file fisico, è testo per la ricerca
         if isinstance(input_data, str) and not os.path.exists(input_data):
+            # Stessa query (es. ricerca rilanciata con un filtro diverso): nessuna inferenza
+            cache = self._query_cache('text_embedding')
+            cache_key = (self._clip_text_model_id(), normalize_query(input_data))
+            cached = cache.get(cache_key) if cache is not None else None
+            if cached is not None:
+                return {'text_embedding': cached.copy()}
+
             try:
                 if self.clip_model is None or self.clip_processor is None:
                     logger.error(" Modello CLIP o Processor non inizializzati.")
@@ -1311,6 +1532,8 @@ class EmbeddingGenerator:
                 text_emb = text_features.cpu().numpy().flatten()
                 text_emb = (text_emb / np.linalg.norm(text_emb)).astype(np.float32)
                 logger.debug(f"SigLIP text embedding: shape={text_emb.shape}, norm={np.linalg.norm(text_emb):.4f}")
+                if cache is not None:
+                    cache.put(cache_key, text_emb.copy())
 
                 return {'text_embedding': text_emb}
                 
@@ -1372,6 +1595,71 @@ class EmbeddingGenerator:
                 logger.error(f"Errore CLIP immagine: {e}")
                 return None
 
+    def _bioclip_geo_classifier(self, gps_lat, gps_lon, geo_hierarchy=None):
+        """Classificatore e argomenti di predict() per le coordinate della foto.
+
+        Returns:
+            (classifier, predict_kwargs): con il classificatore locale il
+            sottoinsieme della cella è predict_kwargs['subset']; con il
+            TreeOfLifeClassifier standard un CustomLabelsClassifier dedicato.
+        """
+        # Solo cache locale — nessuna chiamata API durante elaborazione.
+        # Se la cache per il paese non esiste, fallback silenzioso a TreeOfLife.
+        active_classifier = self.bioclip_classifier
+        self._last_geospecies_meta = None
+        predict_kwargs = {}
+
+        if gps_lat is None or gps_lon is None:
+            self.geospecies_skipped_no_gps += 1
+
+        geo_cache = getattr(self, '_geo_species_cache', None)
+        if gps_lat is not None and gps_lon is not None and geo_cache is not None:
+            # Classificatore locale: sottoinsieme per cella dalla cache (vedi geospecies_cache)
+            try:
+                subset = geo_cache.get(float(gps_lat), float(gps_lon), geo_hierarchy)
+                if subset is not None:
+                    predict_kwargs['subset'] = subset
+                    self._last_geospecies_meta = {"species_count": len(subset.indices)}
+                    logger.debug(
+                        f"GeoSpecies: classificatore geografico attivo "
+                        f"({len(subset.indices)} specie, cella {subset.cell})"
+                    )
+                else:
+                    logger.debug(f"GeoSpecies: cache assente per {geo_hierarchy}, uso TreeOfLife")
+            except ImportError:
+                pass  # Plugin GeoSpecies non installato
+            except Exception as e:
+                logger.debug(f"GeoSpecies: errore ({e}), uso TreeOfLife standard")
+
+        elif gps_lat is not None and gps_lon is not None:
+            try:
+                from plugins.geospecies.geospecies import get_species_subset
+                species_subset = get_species_subset(
+                    lat=float(gps_lat),
+                    lon=float(gps_lon),
+                    geo_hierarchy=geo_hierarchy,
+                )
+                if species_subset and len(species_subset) >= 10:
+                    try:
+                        from bioclip import CustomLabelsClassifier
+                        geo_classifier = CustomLabelsClassifier(cls_ary=species_subset)
+                        active_classifier = geo_classifier
+                        self._last_geospecies_meta = {"species_count": len(species_subset)}
+                        logger.debug(
+                            f"GeoSpecies: classificatore geografico attivo "
+                            f"({len(species_subset)} specie)"
+                        )
+                    except Exception as e:
+                        logger.debug(f"GeoSpecies: CustomLabelsClassifier non disponibile ({e}), uso TreeOfLife")
+                else:
+                    logger.debug(f"GeoSpecies: cache assente per {geo_hierarchy}, uso TreeOfLife")
+            except ImportError:
+                pass  # Plugin GeoSpecies non installato
+            except Exception as e:
+                logger.debug(f"GeoSpecies: errore ({e}), uso TreeOfLife standard")
+
+        return active_classifier, predict_kwargs
+
     def _predict_bioclip(self, image_input, input_type, geo_hierarchy=None,
                          gps_lat=None, gps_lon=None):
         """Esegue predizione BioCLIP usando configurazione da config.yaml.
@@ -1448,40 +1736,8 @@ class EmbeddingGenerator:
             # ─────────────────────────────────────
             # GeoSpecies: subset geografico specie
             # ─────────────────────────────────────
-            # Solo cache locale — nessuna chiamata API durante elaborazione.
-            # Se la cache per il paese non esiste, fallback silenzioso a TreeOfLife.
-            active_classifier = self.bioclip_classifier
-            self._last_geospecies_meta = None
-
-            if gps_lat is None or gps_lon is None:
-                self.geospecies_skipped_no_gps += 1
-
-            if gps_lat is not None and gps_lon is not None:
-                try:
-                    from plugins.geospecies.geospecies import get_species_subset
-                    species_subset = get_species_subset(
-                        lat=float(gps_lat),
-                        lon=float(gps_lon),
-                        geo_hierarchy=geo_hierarchy,
-                    )
-                    if species_subset and len(species_subset) >= 10:
-                        try:
-                            from bioclip import CustomLabelsClassifier
-                            geo_classifier = CustomLabelsClassifier(cls_ary=species_subset)
-                            active_classifier = geo_classifier
-                            self._last_geospecies_meta = {"species_count": len(species_subset)}
-                            logger.debug(
-                                f"GeoSpecies: classificatore geografico attivo "
-                                f"({len(species_subset)} specie)"
-                            )
-                        except Exception as e:
-                            logger.debug(f"GeoSpecies: CustomLabelsClassifier non disponibile ({e}), uso TreeOfLife")
-                    else:
-                        logger.debug(f"GeoSpecies: cache assente per {geo_hierarchy}, uso TreeOfLife")
-                except ImportError:
-                    pass  # Plugin GeoSpecies non installato
-                except Exception as e:
-                    logger.debug(f"GeoSpecies: errore ({e}), uso TreeOfLife standard")
+            active_classifier, predict_kwargs = self._bioclip_geo_classifier(
+                gps_lat, gps_lon, geo_hierarchy)
 
             # ─────────────────────────────────────
             # Predizione BioCLIP
@@ -1490,7 +1746,8 @@ class EmbeddingGenerator:
                 images=[image],
                 rank=Rank.SPECIES,
                 k=max_tags,
-                min_prob=threshold
+                min_prob=threshold,
+                **predict_kwargs
             )
 
             if not predictions:
@@ -1508,6 +1765,42 @@ class EmbeddingGenerator:
             logger.error(f"Errore predizione BioCLIP: {e}")
             return []
 
+    def _predict_bioclip_batch(self, images: list, geo: list) -> list:
+        """Predizioni BioCLIP per una lista di PIL Image con una sola forward pass.
+
+        Args:
+            images: PIL Image già in RGB (pre-caricate dal thread chiamante)
+            geo: per ogni immagine un dict con geo_hierarchy / gps_lat / gps_lon
+
+        Returns:
+            Una lista di predizioni per immagine ([] se nessuna o errore).
+        """
+        bioclip_cfg = self.embedding_config.get('models', {}).get('bioclip', {})
+        max_tags = int(bioclip_cfg.get('max_tags', 5))
+        threshold = float(bioclip_cfg.get('threshold', 0.1))
+
+        try:
+            prepared = [self._prepare_image_for_model(img, 'bioclip_classification') for img in images]
+            subsets = []
+            for g in geo:
+                _, kwargs = self._bioclip_geo_classifier(
+                    g.get('gps_lat'), g.get('gps_lon'), g.get('geo_hierarchy'))
+                subsets.append(kwargs.get('subset'))
+
+            results = self.bioclip_classifier.predict_batch(
+                prepared, k=max_tags, min_prob=threshold, subsets=subsets)
+            n_cells = len({id(sub) for sub in subsets if sub is not None})
+            logger.info(
+                f"BioCLIP batch {len(images)} foto: "
+                f"{sum(1 for r in results if r)} con predizioni "
+                f"(k={max_tags}, threshold={threshold}, celle GeoSpecies={n_cells})"
+            )
+            return results
+        except Exception as e:
+            self._mark_gpu_dead('BioCLIP', e)
+            logger.error(f"Errore predizione BioCLIP batch: {e}")
+            return [[] for _ in images]
+
     def _generate_clip_embedding(self, image_input, input_type):
         """Genera embedding SigLIP per ricerca semantica.
         Il processor SigLIP gestisce internamente resize+center-crop a 384x384:
@@ -1715,6 +2008,7 @@ class EmbeddingGenerator:
             import torch
             if not getattr(self, 'clip_enabled', False): 
                 return None
+            self.ensure_translators()
             translated = self._translate_to_english(text_query) if self.translator else text_query
             inputs = self.clip_processor(text=[translated], return_tensors="pt", padding=True).to(self._device_for('clip'))
             with torch.no_grad():
@@ -1742,7 +2036,7 @@ class EmbeddingGenerator:
             # Tentiamo sempre la traduzione IT→EN: anche parole brevi come
             # "coro", "mare", "neve" devono diventare "choir", "sea", "snow"
             # per ottenere score CLIP significativi (CLIP è addestrato su EN)
-            translated = argostranslate.translate.translate(text, "it", "en")
+            translated = self._translate_cached(text, "it", "en")
         
             # Debug interno
             if translated.lower() == text.lower():
@@ -1865,6 +2159,41 @@ class EmbeddingGenerator:
         taxonomy = self._extract_best_taxonomy(predictions)
         return flat_tags, taxonomy
     
+    def generate_bioclip_tags_batch(self, images: list, geo: list = None) -> list:
+        """Come generate_bioclip_tags per una lista di PIL Image.
+
+        Con il classificatore locale usa una sola forward pass (foto della
+        stessa cella GeoSpecies condividono il sottoinsieme); con il
+        TreeOfLifeClassifier standard elabora una foto alla volta.
+
+        Args:
+            images: PIL Image
+            geo: per ogni immagine un dict con geo_hierarchy / gps_lat / gps_lon
+        Returns:
+            Lista di tuple (flat_tags, taxonomy_array), una per immagine.
+        """
+        geo = geo or [{} for _ in images]
+        if not images:
+            return []
+
+        if self.bioclip_classifier is None:
+            if not self._init_bioclip():
+                logger.error("BioCLIP non disponibile")
+                return [([], None) for _ in images]
+
+        if not hasattr(self.bioclip_classifier, 'predict_batch'):
+            return [
+                self.generate_bioclip_tags(img, geo_hierarchy=g.get('geo_hierarchy'),
+                                           gps_lat=g.get('gps_lat'), gps_lon=g.get('gps_lon'))
+                for img, g in zip(images, geo)
+            ]
+
+        out = []
+        for predictions in self._predict_bioclip_batch(images, geo):
+            predictions = self._filter_by_known_kingdom(predictions)
+            out.append((self._format_bioclip_tags(predictions), self._extract_best_taxonomy(predictions)))
+        return out
+
     def _filter_by_known_kingdom(self, predictions):
         """
         Filtra le predizioni BioCLIP mantenendo solo quelle con un regno biologico riconoscibile.
@@ -2084,16 +2413,22 @@ class EmbeddingGenerator:
 
     # ===== LLM VISION METHODS =====
 
-    def _prepare_llm_image(self, image_input) -> Optional[str]:
+    def _prepare_llm_image(self, image_input, file_hash: Optional[str] = None) -> Optional[str]:
         """Prepara immagine per LLM: ridimensiona al profilo llm_vision e codifica in base64.
 
         Input PIL (batch pipeline): resize in memoria + encode diretto (no file temporaneo).
         Input path (gallery on-demand): estrae thumbnail via RAWProcessor.
-        Usa cache interna per evitare elaborazioni ripetute sulla stessa immagine.
+        Con file_hash il JPEG viene letto/salvato nella cache payload su disco
+        (utils.llm_payload_cache): una foto già vista dal processing non viene
+        riaperta. Usa cache interna per evitare elaborazioni ripetute sulla stessa immagine.
         """
         import base64
-        import io
-        from PIL import Image
+
+        if file_hash:
+            cached = self.cached_llm_payload(file_hash)
+            if cached:
+                logger.debug(f"Payload LLM dalla cache su disco ({file_hash[:12]})")
+                return cached
 
         input_type = self._detect_input_type(image_input)
 
@@ -2114,10 +2449,7 @@ class EmbeddingGenerator:
         self._cleanup_llm_image_cache()
 
         # Parametri dal profilo llm_vision
-        llm_profile = self.optimization_profiles.get('llm_vision', {})
-        llm_target_size = llm_profile.get('target_size', 512)
-        llm_quality = llm_profile.get('quality', 85)
-        llm_resampling = llm_profile.get('resampling', Image.Resampling.LANCZOS)
+        llm_target_size = self.optimization_profiles.get('llm_vision', {}).get('target_size', 512)
 
         try:
             import time as _t
@@ -2140,25 +2472,12 @@ class EmbeddingGenerator:
                 img = image_input
 
             _t1 = _t.time()
-            # Ridimensiona al target_size del profilo (il work thumb può essere più grande)
-            resized = False
-            if max(img.size) > llm_target_size:
-                img = img.copy()
-                img.thumbnail((llm_target_size, llm_target_size), llm_resampling)
-                resized = True
+            image_b64 = self.encode_llm_image(img, file_hash=file_hash)
 
             _t2 = _t.time()
-            # Codifica JPEG direttamente in memoria (no file temporaneo su disco)
-            buf = io.BytesIO()
-            img.save(buf, format='JPEG', quality=llm_quality)
-            b64_bytes = buf.getvalue()
-            image_b64 = base64.b64encode(b64_bytes).decode('utf-8')
-
-            _t3 = _t.time()
             logger.debug(
-                f"⏱ _prepare_llm_image: input={_t1-_t0:.3f}s resize={_t2-_t1:.3f}s "
-                f"encode={_t3-_t2:.3f}s total={_t3-_t0:.3f}s "
-                f"(size={img.size}, jpeg={len(b64_bytes)//1024}KB, resized={resized})")
+                f"⏱ _prepare_llm_image: input={_t1-_t0:.3f}s resize+encode={_t2-_t1:.3f}s "
+                f"total={_t2-_t0:.3f}s (b64={len(image_b64)//1024}KB)")
 
             self._llm_image_cache = {
                 'source': cache_key, 'base64': image_b64, 'temp_path': None}
@@ -2168,6 +2487,55 @@ class EmbeddingGenerator:
             logger.error(f"Errore preparazione immagine LLM: {e}")
             return None
 
+    def encode_llm_image(self, img, file_hash: Optional[str] = None) -> str:
+        """PIL → base64 JPEG al target_size/resampling del profilo llm_vision.
+
+        Con file_hash il JPEG viene salvato anche nella cache payload su disco.
+        Senza stato: usabile da più thread (stadio encode di llm_dispatcher).
+        """
+        import base64
+        from utils.llm_payload_cache import encode_llm_payload
+
+        target_size, resampling = self._llm_profile()
+        # Ridimensiona al target_size del profilo (il work thumb può essere più grande)
+        data = encode_llm_payload(img, target_size, resampling)
+        if file_hash:
+            self._store_llm_payload(file_hash, data)
+        return base64.b64encode(data).decode('utf-8')
+
+    def _llm_profile(self):
+        """(target_size, resampling) del profilo llm_vision."""
+        from PIL import Image
+        llm_profile = self.optimization_profiles.get('llm_vision', {})
+        return (llm_profile.get('target_size', 512),
+                llm_profile.get('resampling', Image.Resampling.LANCZOS))
+
+    def cached_llm_payload(self, file_hash: str) -> Optional[str]:
+        """Payload base64 dalla cache su disco per questo file_hash e profilo, o None."""
+        import base64
+        from utils.llm_payload_cache import get_payload_store, payload_key
+
+        store = get_payload_store(self.config)
+        if store is None or not file_hash:
+            return None
+        try:
+            data = store.get(payload_key(file_hash, *self._llm_profile()))
+        except Exception as e:
+            logger.debug(f"Cache payload LLM: lettura fallita ({e})")
+            return None
+        return base64.b64encode(data).decode('utf-8') if data else None
+
+    def _store_llm_payload(self, file_hash: str, data: bytes):
+        from utils.llm_payload_cache import get_payload_store, payload_key
+
+        store = get_payload_store(self.config)
+        if store is None:
+            return
+        try:
+            store.put(payload_key(file_hash, *self._llm_profile()), data)
+        except Exception as e:
+            logger.debug(f"Cache payload LLM: scrittura fallita ({e})")
+
     def _cleanup_llm_image_cache(self):
         """Pulisce la cache immagine LLM."""
         # temp_path mantenuto per compatibilità, ma non più usato dal flusso in-memory
@@ -2215,7 +2583,9 @@ class EmbeddingGenerator:
                               bioclip_context: Optional[str] = None,
                               category_hint: Optional[str] = None,
                               location_hint: Optional[str] = None,
-                              vernacular_name: Optional[str] = None) -> dict:
+                              vernacular_name: Optional[str] = None,
+                              image_b64: Optional[str] = None,
+                              file_hash: Optional[str] = None) -> dict:
         """Genera tags/descrizione/titolo con UNA SOLA chiamata LLM.
 
         Tutti i modi (singoli o combinati) passano per _call_llm_vision_unified
@@ -2224,6 +2594,9 @@ class EmbeddingGenerator:
 
         Args:
             modes: lista con qualsiasi combinazione di 'tags', 'description', 'title'
+            image_b64: payload già codificato (encode_llm_image); image_input ignorato
+            file_hash: identità dell'immagine per le cache payload e risposte
+                (default per le risposte: hash del payload)
 
         Returns:
             dict con le chiavi richieste (es. {'tags': [...], 'description': '...', 'title': '...'})
@@ -2231,7 +2604,8 @@ class EmbeddingGenerator:
         if not modes:
             return {}
         try:
-            image_b64 = self._prepare_llm_image(image_input)
+            if image_b64 is None:
+                image_b64 = self._prepare_llm_image(image_input, file_hash=file_hash)
             if not image_b64:
                 return {}
 
@@ -2259,7 +2633,7 @@ class EmbeddingGenerator:
                 image_b64, effective_modes, max_tags if not anchor_added else 5,
                 max_description_words, max_title_words,
                 category_hint=category_hint, location_hint=location_hint,
-                vernacular_name=vernacular_name
+                vernacular_name=vernacular_name, file_hash=file_hash
             )
 
             # Rimuovi i campi ancora se non erano richiesti dall'utente
@@ -2401,7 +2775,7 @@ class EmbeddingGenerator:
 
         return result
 
-    def generate_llm_content(self, image_input, mode='description', max_tags: int = 10, max_description_words: int = 100, max_title_words: int = 5, bioclip_context: Optional[str] = None, category_hint: Optional[str] = None, location_hint: Optional[str] = None):
+    def generate_llm_content(self, image_input, mode='description', max_tags: int = 10, max_description_words: int = 100, max_title_words: int = 5, bioclip_context: Optional[str] = None, category_hint: Optional[str] = None, location_hint: Optional[str] = None, file_hash: Optional[str] = None):
         """Metodo unificato per contenuti LLM con parametri completi.
 
         Traduce la stringa mode in lista di modi e delega a generate_llm_combined
@@ -2436,6 +2810,7 @@ class EmbeddingGenerator:
                 bioclip_context=bioclip_context,
                 category_hint=category_hint,
                 location_hint=location_hint,
+                file_hash=file_hash,
             )
             return result if result else None
 
@@ -2448,7 +2823,8 @@ class EmbeddingGenerator:
                                   max_title_words: int = 5,
                                   category_hint: Optional[str] = None,
                                   location_hint: Optional[str] = None,
-                                  vernacular_name: Optional[str] = None) -> dict:
+                                  vernacular_name: Optional[str] = None,
+                                  file_hash: Optional[str] = None) -> dict:
         """Nucleo unificato per tutte le chiamate LLM Vision.
 
         Sostituisce _call_llm_vision (singolo) e _call_llm_vision_combined.
@@ -2459,6 +2835,7 @@ class EmbeddingGenerator:
 
         Args:
             modes: lista con qualsiasi combinazione di 'tags', 'description', 'title'
+            file_hash: chiave immagine per la cache risposte (llm_cache)
         Returns:
             dict con le chiavi richieste (es. {'tags': [...], 'description': '...', 'title': '...'})
         """
@@ -2484,8 +2861,7 @@ class EmbeddingGenerator:
             category_hint_en = category_hint
             if category_hint:
                 try:
-                    import argostranslate.translate as _at
-                    category_hint_en = _at.translate(category_hint, 'it', 'en') or category_hint
+                    category_hint_en = self._translate_cached(category_hint, 'it', 'en') or category_hint
                 except Exception:
                     pass
 
@@ -2626,7 +3002,25 @@ class EmbeddingGenerator:
                 f"[LLM] PROMPT:\n{prompt}"
             )
 
-            response = self.llm_plugin.generate(image_data_b64, prompt, max_tokens, params)
+            # Stesso file, modello, prompt e parametri → stessa richiesta: risposta dalla cache
+            cache = self._llm_response_cache()
+            cache_key = None
+            response = None
+            if cache is not None:
+                from llm_cache import response_key, payload_hash
+                from utils.llm_payload_cache import payload_key
+                # Con il file_hash l'immagine inviata dipende anche dal profilo llm_vision
+                image_id = (payload_key(file_hash, *self._llm_profile()) if file_hash
+                            else payload_hash(image_data_b64))
+                cache_key = response_key(
+                    image_id, type(self.llm_plugin).__name__, prompt, params, max_tokens)
+                response = cache.get(cache_key)
+            if response:
+                logger.info(f"[LLM] risposta dalla cache ({cache_key[:12]})")
+            else:
+                response = self.llm_plugin.generate(image_data_b64, prompt, max_tokens, params)
+                if cache is not None and response:
+                    cache.put(cache_key, response)
             logger.info(f"[LLM] RISPOSTA RAW:\n{response}")
 
             if not response:
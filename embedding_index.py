@@ -0,0 +1,561 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Embedding Index - Matrice embedding persistente in memoria per la ricerca.
+
+Prima ogni ricerca semantica rileggeva tutti i blob clip_embedding dal DB,
+li deserializzava riga per riga, li impilava e li rinormalizzava: su cataloghi
+da centinaia di migliaia di foto erano secondi persi prima del prodotto scalare.
+
+Qui la matrice (N, D) float32 già normalizzata vive per tutta la sessione:
+  - caricata una sola volta, al primo utilizzo
+  - aggiornata in modo incrementale da DatabaseManager (insert/update/delete)
+  - interrogata con una sola moltiplicazione matrice-vettore, con i filtri SQL
+    applicati come maschera sugli id
+
+Le istanze sono condivise per percorso (DB, colonna): ricerca, processing e
+gallery creano ognuno il proprio DatabaseManager, ma vedono la stessa matrice.
+La stessa classe serve clip_embedding (ricerca) e dinov2_embedding ("trova simili").
+
+Su cataloghi molto grandi la matrice si affianca a un indice IVF (ann_index):
+costruito in background, interroga solo i gruppi più vicini alla query.
+Modulo senza dipendenze PyQt.
+"""
+
+import logging
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ann_index import IVFIndex, auto_nlist
+
+logger = logging.getLogger(__name__)
+
+# Righe lette per ogni fetchmany durante il caricamento (check cancel tra un batch e l'altro)
+_LOAD_BATCH = 500
+
+
+def decode_embedding_blob(raw_data) -> Optional[np.ndarray]:
+    """Converte un blob embedding del DB in vettore float32.
+
+    Formati supportati: raw float32 bytes (attuale) e pickle legacy
+    (ndarray o dict con 'image_embedding'). Ritorna None se illeggibile.
+    """
+    if raw_data is None:
+        return None
+    try:
+        if isinstance(raw_data, bytes):
+            if len(raw_data) >= 2 and raw_data[0] == 0x80 and raw_data[1] in (2, 3, 4, 5):
+                emb_raw = pickle.loads(raw_data)
+                if isinstance(emb_raw, dict):
+                    emb_raw = emb_raw.get('image_embedding')
+                return np.asarray(emb_raw, dtype=np.float32).ravel()
+            if len(raw_data) >= 4 and len(raw_data) % 4 == 0:
+                return np.frombuffer(raw_data, dtype=np.float32)
+            return None
+        return np.asarray(raw_data, dtype=np.float32).ravel()
+    except Exception:
+        return None
+
+
+class EmbeddingMatrix:
+    """Matrice embedding normalizzata di una colonna del DB, con array id parallelo.
+
+    Le righe sono compatte: una cancellazione sposta l'ultima riga nel buco.
+    La capacità cresce per raddoppio, così gli inserimenti durante il
+    processing costano O(1) ammortizzato invece di una copia dell'intera matrice.
+
+    Tutte le operazioni avvengono sotto lock: gli aggiornamenti dai thread
+    modello e le query dal thread di ricerca non si vedono mai a metà.
+
+    Con l'indice ANN attivo, _assign tiene per ogni riga il gruppo IVF
+    (-1 = non ancora assegnata: la riga resta sempre tra i candidati).
+    """
+
+    def __init__(self, column: str = 'clip_embedding', db_path=None):
+        self.column = column
+        self.db_path = db_path    # per lo store su disco (embedding_store), se presente
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dim: Optional[int] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._count = 0
+        self._row_of: Dict[int, int] = {}     # image_id → indice di riga
+        self._off_dim: set = set()            # id con dimensione diversa da _dim
+        # Indice ANN (IVF): centroidi + gruppo per riga, costruito in background
+        self._assign = np.empty(0, dtype=np.int32)
+        self._ivf: Optional[IVFIndex] = None
+        self._ann_cfg: Optional[dict] = None
+        self._ann_building = False
+        self._generation = 0                  # cambia a ogni ricarica: invalida build in corso
+
+    # ── Stato ────────────────────────────────────────────────────────
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def skipped(self) -> int:
+        """Embedding ignorati perché di dimensione diversa dalla matrice."""
+        return len(self._off_dim)
+
+    @property
+    def ann_ready(self) -> bool:
+        return self._ivf is not None
+
+    def invalidate(self):
+        """Scarta la matrice: verrà ricaricata dal DB al prossimo utilizzo."""
+        with self._lock:
+            self._loaded = False
+            self._dim = None
+            self._set_rows(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+            self._off_dim = set()
+
+    def _set_rows(self, ids: np.ndarray, matrix: np.ndarray):
+        """Sostituisce in blocco righe e id (l'indice ANN va ricostruito)."""
+        self._matrix = matrix
+        self._ids = ids
+        self._count = int(ids.shape[0])
+        self._row_of = {int(i): r for r, i in enumerate(ids)}
+        self._assign = np.full(ids.shape[0], -1, dtype=np.int32)
+        self._ivf = None
+        self._generation += 1
+
+    # ── Caricamento ──────────────────────────────────────────────────
+
+    def ensure_loaded(self, conn, cancel_flag=None) -> bool:
+        """Carica la matrice dal DB se non è già in memoria.
+
+        Args:
+            conn: connessione sqlite3 (si usa un cursore dedicato)
+            cancel_flag: callable opzionale, True per interrompere il caricamento
+
+        Returns:
+            True se la matrice è pronta, False se il caricamento è stato annullato
+        """
+        with self._lock:
+            if self._loaded:
+                return True
+
+            if self._load_from_store():
+                return True
+
+            cur = conn.cursor()
+            cur.execute(f"SELECT id, {self.column} FROM images WHERE {self.column} IS NOT NULL")
+
+            ids, vecs = [], []
+            while True:
+                if cancel_flag is not None and cancel_flag():
+                    logger.info("Caricamento matrice embedding annullato")
+                    return False
+                rows = cur.fetchmany(_LOAD_BATCH)
+                if not rows:
+                    break
+                for row_id, raw_data in rows:
+                    emb = decode_embedding_blob(raw_data)
+                    if emb is not None and emb.size:
+                        ids.append(row_id)
+                        vecs.append(emb)
+
+            self._build(ids, vecs)
+            self._loaded = True
+            logger.info(
+                f"Matrice {self.column} caricata: {self._count} embedding "
+                f"(dim={self._dim}, ignorati={self.skipped})"
+            )
+            return True
+
+    def _load_from_store(self) -> bool:
+        """Caricamento veloce dallo store memmap, se completo (nessun blob da decodificare)."""
+        if self.db_path is None:
+            return False
+        try:
+            from embedding_store import get_embedding_store
+            store = get_embedding_store(self.db_path, self.column)
+            if not store.is_complete:
+                return False
+            loaded = store.load_valid()
+        except Exception as e:
+            logger.warning(f"Store embedding {self.column} illeggibile, uso il DB: {e}")
+            return False
+
+        self._off_dim = set()
+        if loaded is None:
+            self._dim = store.dim
+            self._set_rows(np.empty(0, dtype=np.int64),
+                           np.empty((0, self._dim or 0), dtype=np.float32))
+        else:
+            ids, matrix = loaded
+            matrix /= (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8)
+            self._dim = int(matrix.shape[1])
+            self._set_rows(ids, matrix)
+        self._loaded = True
+        logger.info(f"Matrice {self.column} caricata dallo store su disco: "
+                    f"{self._count} embedding (dim={self._dim})")
+        return True
+
+    def _build(self, ids, vecs):
+        """Costruisce la matrice dalla lista di vettori grezzi.
+
+        La dimensione di riferimento è quella più frequente: embedding di un
+        modello precedente (dimensione diversa) restano fuori e vengono contati.
+        """
+        self._off_dim = set()
+        if not vecs:
+            self._dim = None
+            self._set_rows(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+            return
+
+        dims, counts = np.unique([v.shape[0] for v in vecs], return_counts=True)
+        dim = int(dims[np.argmax(counts)])
+
+        keep_ids = []
+        keep_vecs = []
+        for img_id, v in zip(ids, vecs):
+            if v.shape[0] == dim:
+                keep_ids.append(img_id)
+                keep_vecs.append(v)
+            else:
+                self._off_dim.add(img_id)
+
+        matrix = np.stack(keep_vecs).astype(np.float32, copy=False)
+        matrix /= (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8)
+
+        self._dim = dim
+        self._set_rows(np.asarray(keep_ids, dtype=np.int64), matrix)
+
+    # ── Aggiornamenti incrementali ───────────────────────────────────
+
+    def upsert(self, image_id: int, embedding) -> None:
+        """Inserisce o sostituisce l'embedding di un'immagine.
+
+        Ignorato se la matrice non è ancora caricata: il caricamento
+        successivo leggerà comunque il valore aggiornato dal DB.
+        """
+        if embedding is None:
+            self.remove(image_id)
+            return
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        if not vec.size or not np.all(np.isfinite(vec)):
+            self.remove(image_id)
+            return
+        image_id = int(image_id)
+
+        with self._lock:
+            if not self._loaded:
+                return
+            if self._dim is None:
+                self._dim = vec.shape[0]
+                self._matrix = np.empty((0, self._dim), dtype=np.float32)
+            if vec.shape[0] != self._dim:
+                self._remove_row(image_id)
+                self._off_dim.add(image_id)
+                return
+            self._off_dim.discard(image_id)
+
+            vec = vec / (np.linalg.norm(vec) + 1e-8)
+            row = self._row_of.get(image_id)
+            if row is None:
+                row = self._count
+                self._reserve(row + 1)
+                self._ids[row] = image_id
+                self._row_of[image_id] = row
+                self._count += 1
+            self._matrix[row] = vec
+            # Riga nuova o aggiornata: assegnata al gruppo IVF più vicino (niente riaddestramento)
+            self._assign[row] = self._ivf.assign(vec[None, :])[0] if self._ivf is not None else -1
+
+    def remove(self, image_id: int) -> None:
+        """Rimuove l'embedding di un'immagine (cancellata o con embedding azzerato)."""
+        with self._lock:
+            if not self._loaded:
+                return
+            image_id = int(image_id)
+            self._off_dim.discard(image_id)
+            self._remove_row(image_id)
+
+    def _remove_row(self, image_id: int):
+        row = self._row_of.pop(image_id, None)
+        if row is None:
+            return
+        last = self._count - 1
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._assign[row] = self._assign[last]
+            self._row_of[moved_id] = row
+        self._count = last
+
+    def _reserve(self, needed: int):
+        """Garantisce capacità per almeno `needed` righe (crescita per raddoppio)."""
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2, 64)
+        matrix = np.empty((new_cap, self._dim), dtype=np.float32)
+        ids = np.empty(new_cap, dtype=np.int64)
+        assign = np.full(new_cap, -1, dtype=np.int32)
+        matrix[:self._count] = self._matrix[:self._count]
+        ids[:self._count] = self._ids[:self._count]
+        assign[:self._count] = self._assign[:self._count]
+        self._matrix = matrix
+        self._ids = ids
+        self._assign = assign
+
+    # ── Indice ANN (IVF) ─────────────────────────────────────────────
+
+    def _ann_path(self) -> Optional[Path]:
+        if self.db_path is None:
+            return None
+        from embedding_store import get_store_dir
+        return get_store_dir(self.db_path) / f"{self.column}.ivf.npz"
+
+    def configure_ann(self, cfg: dict) -> None:
+        """Applica la configurazione search.ann e avvia la costruzione se serve.
+
+        La costruzione (caricamento da disco o addestramento k-means) gira in
+        un thread separato: nel frattempo le query restano a forza bruta.
+        Si riaddestra quando il catalogo supera di 4× quello dell'addestramento.
+        """
+        with self._lock:
+            self._ann_cfg = cfg
+            if not cfg.get('enabled') or not self._loaded or self._ann_building:
+                return
+            if self._count < int(cfg.get('min_photos', 0)):
+                return
+            ivf = self._ivf
+            if ivf is not None and ivf.dim == self._dim and self._count <= 4 * ivf.trained_count:
+                return
+            self._ann_building = True
+            generation = self._generation
+            retrain = ivf is not None
+        threading.Thread(target=self._build_ann, args=(cfg, generation, retrain),
+                         daemon=True, name=f"ann-{self.column}").start()
+
+    def _build_ann(self, cfg: dict, generation: int, retrain: bool):
+        """Thread di costruzione dell'indice IVF."""
+        import time
+        try:
+            path = self._ann_path()
+            cancelled = lambda: self._generation != generation
+
+            with self._lock:
+                n, dim = self._count, self._dim
+
+            loaded = IVFIndex.load(path) if (path is not None and not retrain) else None
+            if loaded is not None and loaded[0].dim == dim and n <= 4 * loaded[0].trained_count:
+                index, p_ids, p_assign = loaded
+                order = np.argsort(p_ids)
+                p_ids, p_assign = p_ids[order], p_assign[order]
+                with self._lock:
+                    if cancelled():
+                        return
+                    ids = self._ids[:self._count]
+                    if p_ids.size:
+                        pos = np.clip(np.searchsorted(p_ids, ids), 0, p_ids.size - 1)
+                        hit = (p_ids[pos] == ids) & (p_assign[pos] < index.nlist)
+                        self._assign[:self._count] = np.where(hit, p_assign[pos], -1)
+                    self._ivf = index
+                logger.info(f"Indice ANN {self.column} caricato: {index.nlist} gruppi")
+            else:
+                nlist = int(cfg.get('nlist') or 0) or auto_nlist(n)
+                t0 = time.monotonic()
+                with self._lock:
+                    if cancelled():
+                        return
+                    # Campione per il k-means: ~32 punti per gruppo bastano
+                    size = min(self._count, nlist * 32)
+                    rows = np.sort(np.random.default_rng(0).choice(self._count, size=size, replace=False))
+                    sample = self._matrix[rows].copy()
+                    trained_count = self._count
+                index = IVFIndex.train(sample, nlist, trained_count, cancel_flag=cancelled)
+                sample = None
+                if index is None:
+                    return
+                with self._lock:
+                    if cancelled():
+                        return
+                    self._assign[:self._count] = -1
+                    self._ivf = index
+                logger.info(f"Indice ANN {self.column} addestrato: {index.nlist} gruppi "
+                            f"su {trained_count} embedding in {time.monotonic() - t0:.1f}s")
+
+            if not self._assign_missing(index, cancelled):
+                return
+
+            if path is not None:
+                with self._lock:
+                    if cancelled():
+                        return
+                    ids = self._ids[:self._count].copy()
+                    assign = self._assign[:self._count].copy()
+                index.save(path, ids, assign)
+        except Exception as e:
+            logger.warning(f"Costruzione indice ANN {self.column} fallita, resta la forza bruta: {e}")
+        finally:
+            self._ann_building = False
+
+    def _assign_missing(self, index: IVFIndex, cancelled) -> bool:
+        """Assegna a blocchi le righe senza gruppo. Il calcolo avviene fuori dal
+        lock: le righe possono spostarsi nel frattempo, quindi si rimappa per id."""
+        from ann_index import _CHUNK
+        while True:
+            with self._lock:
+                if cancelled():
+                    return False
+                missing = np.flatnonzero(self._assign[:self._count] < 0)[:_CHUNK]
+                if not missing.size:
+                    return True
+                ids = self._ids[missing].copy()
+                vecs = self._matrix[missing].copy()
+            groups = index.assign(vecs)
+            with self._lock:
+                if cancelled():
+                    return False
+                for img_id, group in zip(ids.tolist(), groups.tolist()):
+                    row = self._row_of.get(img_id)
+                    if row is not None:
+                        self._assign[row] = group
+
+    # ── Query ────────────────────────────────────────────────────────
+
+    def count_ids(self, allowed_ids) -> int:
+        """Quanti degli id indicati hanno un embedding nella matrice."""
+        with self._lock:
+            if not self._count:
+                return 0
+            return int(np.isin(self._ids[:self._count], allowed_ids).sum())
+
+    def vector(self, image_id: int) -> Optional[np.ndarray]:
+        """Copia dell'embedding normalizzato di un'immagine, None se assente."""
+        with self._lock:
+            row = self._row_of.get(int(image_id))
+            return None if row is None else self._matrix[row].copy()
+
+    def similarities(self, query_emb, allowed_ids=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Similarità coseno tra la query e ogni riga della matrice.
+
+        Args:
+            query_emb: vettore query (qualsiasi norma)
+            allowed_ids: id ammessi dai filtri SQL (None = tutte le righe)
+
+        Returns:
+            (ids, similarità) come array paralleli. Vuoti se la dimensione
+            della query non corrisponde a quella della matrice.
+        """
+        query = np.asarray(query_emb, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) + 1e-8)
+
+        with self._lock:
+            n = self._count
+            if not n or query.shape[0] != self._dim:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            ids = self._ids[:n]
+            matrix = self._matrix[:n]
+            mask = np.isin(ids, allowed_ids) if allowed_ids is not None else None
+
+            # ANN solo su cataloghi grandi e sottoinsiemi filtrati non piccoli:
+            # sotto exact_below la forza bruta è già veloce ed è esatta
+            cfg = self._ann_cfg or {}
+            use_ann = (self._ivf is not None and cfg.get('enabled')
+                       and n >= int(cfg.get('min_photos', 0))
+                       and (mask is None or int(mask.sum()) >= int(cfg.get('exact_below', 0))))
+            if use_ann:
+                probes = self._ivf.probe(query, cfg.get('nprobe', 32))
+                assign = self._assign[:n]
+                ann_mask = np.isin(assign, probes) | (assign < 0)
+                mask = ann_mask if mask is None else (mask & ann_mask)
+                logger.debug(f"Ricerca ANN: {len(probes)}/{self._ivf.nlist} gruppi, "
+                             f"{int(mask.sum())} candidati su {n}")
+
+            if mask is not None:
+                ids = ids[mask]
+                matrix = matrix[mask]
+            return ids.copy(), matrix @ query
+
+    def similarities_from_db(self, conn, query_emb, allowed_ids=None,
+                             cancel_flag=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Come similarities(), per una query di dimensione diversa da quella della matrice.
+
+        Catalogo a metà migrazione tra due modelli: la matrice tiene la
+        dimensione prevalente, qui si leggono dal DB i soli embedding della
+        dimensione della query (come faceva la ricerca prima della matrice).
+        Nessuna cache: il percorso resta lento finché le foto non sono rielaborate.
+        """
+        query = np.asarray(query_emb, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) + 1e-8)
+        dim = query.shape[0]
+
+        cur = conn.cursor()
+        cur.execute(f"SELECT id, {self.column} FROM images WHERE {self.column} IS NOT NULL")
+        ids, vecs = [], []
+        while True:
+            if cancel_flag is not None and cancel_flag():
+                break
+            rows = cur.fetchmany(_LOAD_BATCH)
+            if not rows:
+                break
+            for row_id, raw_data in rows:
+                emb = decode_embedding_blob(raw_data)
+                if emb is not None and emb.shape[0] == dim:
+                    ids.append(row_id)
+                    vecs.append(emb)
+
+        if not vecs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        matrix = np.stack(vecs).astype(np.float32, copy=False)
+        if allowed_ids is not None:
+            mask = np.isin(ids, allowed_ids)
+            ids, matrix = ids[mask], matrix[mask]
+        matrix /= (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-8)
+        return ids, matrix @ query
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Registro per percorso DB
+# ─────────────────────────────────────────────────────────────────────
+
+_registry: Dict[Tuple[str, str], EmbeddingMatrix] = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(db_path, column: str) -> Tuple[str, str]:
+    return (str(Path(db_path).resolve()), column)
+
+
+def get_embedding_matrix(db_path, column: str = 'clip_embedding') -> EmbeddingMatrix:
+    """Ritorna la matrice condivisa per (DB, colonna), creandola se serve (non caricata)."""
+    key = _registry_key(db_path, column)
+    with _registry_lock:
+        matrix = _registry.get(key)
+        if matrix is None:
+            matrix = EmbeddingMatrix(column, db_path=key[0])
+            _registry[key] = matrix
+        return matrix
+
+
+def find_embedding_matrix(db_path, column: str = 'clip_embedding') -> Optional[EmbeddingMatrix]:
+    """Come get_embedding_matrix ma senza crearla: None se nessuno l'ha mai usata.
+
+    Usata da DatabaseManager per gli aggiornamenti incrementali: finché
+    nessuna ricerca ha caricato la matrice non c'è niente da tenere allineato.
+    """
+    if not _registry:
+        return None
+    with _registry_lock:
+        return _registry.get(_registry_key(db_path, column))
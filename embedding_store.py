@@ -0,0 +1,260 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Embedding Store - Archivio colonnare su disco per gli embedding, accanto al DB SQLite.
+
+I blob clip_embedding / dinov2_embedding in SQLite costringono ogni scansione
+a passare dalla page cache di SQLite e da oggetti bytes Python. Qui ogni
+modello ha un file float32 a passo fisso, leggibile con np.memmap senza copie:
+la cache del sistema operativo serve le query ripetute.
+
+Struttura (per DB database/offgallery.sqlite):
+    database/offgallery_embeddings/
+        clip_embedding.f32      righe float32 di `dim` valori, riga = image id
+        clip_embedding.valid    bitmap (1 bit per riga): 1 = embedding presente
+        clip_embedding.json     {"dim": 1152, "complete": true}
+
+La bitmap fa da tombstone: cancellare un'immagine azzera solo il suo bit.
+Il flag "complete" indica che il file contiene TUTTI gli embedding del DB:
+viene acceso alla creazione su DB vuoto o dal tool tools/migrate_embedding_store.py.
+Finché non è acceso, i lettori ricadono sulla lettura dei blob SQLite.
+
+Modulo senza dipendenze PyQt.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+# Colonne DB che hanno un file nello store
+STORE_COLUMNS = ('clip_embedding', 'dinov2_embedding')
+
+
+def get_store_dir(db_path) -> Path:
+    """Directory dello store per un DB: {cartella_db}/{nome_db}_embeddings/"""
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}_embeddings"
+
+
+class EmbeddingStore:
+    """File float32 a passo fisso per una colonna embedding, indicizzato per image id.
+
+    Scritture sotto lock: dati prima, bit di validità dopo. Un'interruzione a
+    metà lascia la riga non valida, mai un embedding parziale visibile.
+    """
+
+    def __init__(self, directory: Path, column: str):
+        self.directory = Path(directory)
+        self.column = column
+        self.data_path = self.directory / f"{column}.f32"
+        self.valid_path = self.directory / f"{column}.valid"
+        self.meta_path = self.directory / f"{column}.json"
+        self._lock = threading.RLock()
+        self._meta: Optional[dict] = None
+
+    # ── Metadati ─────────────────────────────────────────────────────
+
+    def _load_meta(self) -> Optional[dict]:
+        if self._meta is None and self.meta_path.exists():
+            try:
+                self._meta = json.loads(self.meta_path.read_text(encoding='utf-8'))
+            except Exception as e:
+                logger.warning(f"Store embedding {self.column}: metadati illeggibili ({e})")
+                self._meta = None
+        return self._meta
+
+    def _save_meta(self):
+        tmp = self.meta_path.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps(self._meta), encoding='utf-8')
+        tmp.replace(self.meta_path)
+
+    @property
+    def exists(self) -> bool:
+        return self._load_meta() is not None
+
+    @property
+    def is_complete(self) -> bool:
+        meta = self._load_meta()
+        return bool(meta and meta.get('complete') and meta.get('dim'))
+
+    @property
+    def dim(self) -> Optional[int]:
+        meta = self._load_meta()
+        return meta.get('dim') if meta else None
+
+    def create(self, dim: Optional[int] = None, complete: bool = False):
+        """Crea (o azzera) i file dello store."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.data_path.write_bytes(b'')
+            self.valid_path.write_bytes(b'')
+            self._meta = {'version': STORE_VERSION, 'dim': dim, 'complete': complete}
+            self._save_meta()
+
+    def set_complete(self, complete: bool):
+        with self._lock:
+            if self._load_meta() is None:
+                return
+            if bool(self._meta.get('complete')) != complete:
+                self._meta['complete'] = complete
+                self._save_meta()
+                if not complete:
+                    logger.warning(
+                        f"Store embedding {self.column} non più allineato al DB: "
+                        f"lettura dai blob SQLite finché non si riesegue "
+                        f"tools/migrate_embedding_store.py")
+
+    def rebuild(self, dim: int, n_rows: int, batches) -> int:
+        """Riscrive lo store da zero in blocco (usato dal tool di migrazione).
+
+        Args:
+            dim: dimensione degli embedding
+            n_rows: righe da allocare (max image id + 1)
+            batches: iterabile di (ids, matrice) con ids int e matrice (len(ids), dim)
+
+        Returns:
+            Numero di embedding scritti. Lo store viene marcato completo solo
+            a scrittura terminata: un'interruzione lo lascia inutilizzato.
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._meta = {'version': STORE_VERSION, 'dim': dim, 'complete': False}
+            self._save_meta()
+
+            with open(self.data_path, 'wb') as f:
+                f.truncate(n_rows * dim * 4)
+            valid = np.zeros(n_rows, dtype=bool)
+            written = 0
+            if n_rows:
+                mm = np.memmap(self.data_path, dtype=np.float32, mode='r+', shape=(n_rows, dim))
+                for ids, matrix in batches:
+                    ids = np.asarray(ids, dtype=np.int64)
+                    if not ids.size:
+                        continue
+                    mm[ids] = matrix
+                    valid[ids] = True
+                    written += int(ids.size)
+                mm.flush()
+                del mm
+            self.valid_path.write_bytes(np.packbits(valid).tobytes())
+
+            self._meta['complete'] = True
+            self._save_meta()
+            return written
+
+    # ── Scrittura ────────────────────────────────────────────────────
+
+    def write(self, image_id: int, embedding) -> bool:
+        """Scrive l'embedding di un'immagine (None = tombstone). Ritorna True se scritto."""
+        if embedding is None:
+            self.delete(image_id)
+            return True
+        vec = np.ascontiguousarray(np.asarray(embedding, dtype=np.float32).ravel())
+        image_id = int(image_id)
+
+        with self._lock:
+            if self._load_meta() is None:
+                return False
+            dim = self._meta.get('dim')
+            if dim is None:
+                dim = vec.shape[0]
+                self._meta['dim'] = dim
+                self._save_meta()
+            if vec.shape[0] != dim:
+                # Modello cambiato: il file non può più rappresentare il DB
+                self.set_complete(False)
+                self._set_bit(image_id, False)
+                return False
+
+            with open(self.data_path, 'r+b') as f:
+                f.seek(image_id * dim * 4)
+                f.write(vec.tobytes())
+            self._set_bit(image_id, True)
+            return True
+
+    def delete(self, image_id: int):
+        """Tombstone: azzera il bit di validità (i dati restano, non più visibili)."""
+        with self._lock:
+            if self._load_meta() is None:
+                return
+            self._set_bit(int(image_id), False)
+
+    def _set_bit(self, image_id: int, value: bool):
+        byte_idx, bit = divmod(image_id, 8)
+        with open(self.valid_path, 'r+b') as f:
+            f.seek(0, 2)
+            size = f.tell()
+            if byte_idx >= size:
+                if not value:
+                    return  # oltre la fine: già non valido
+                f.write(b'\x00' * (byte_idx + 1 - size))
+                current = 0
+            else:
+                f.seek(byte_idx)
+                current = f.read(1)[0]
+            mask = 0x80 >> bit   # ordine bit di np.packbits/unpackbits
+            new = (current | mask) if value else (current & ~mask)
+            if new != current:
+                f.seek(byte_idx)
+                f.write(bytes((new,)))
+
+    # ── Lettura ──────────────────────────────────────────────────────
+
+    def open_matrix(self) -> Optional[Tuple[np.memmap, np.ndarray]]:
+        """Mappa il file in memoria senza copie.
+
+        Returns:
+            (matrix, valid): matrix è un np.memmap (righe, dim) in sola lettura,
+            valid un array bool parallelo. None se lo store è vuoto o assente.
+            Le righe non valide (id mai scritti o cancellati) vanno ignorate.
+        """
+        with self._lock:
+            dim = self.dim
+            if not dim or not self.data_path.exists():
+                return None
+            n_rows = self.data_path.stat().st_size // (dim * 4)
+            if n_rows == 0:
+                return None
+            matrix = np.memmap(self.data_path, dtype=np.float32, mode='r', shape=(n_rows, dim))
+            bits = np.fromfile(self.valid_path, dtype=np.uint8) if self.valid_path.exists() \
+                else np.empty(0, dtype=np.uint8)
+        valid = np.unpackbits(bits)[:n_rows].astype(bool)
+        if valid.shape[0] < n_rows:
+            valid = np.concatenate([valid, np.zeros(n_rows - valid.shape[0], dtype=bool)])
+        return matrix, valid
+
+    def load_valid(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Ritorna (ids, matrice) delle sole righe valide, come array in RAM."""
+        mapped = self.open_matrix()
+        if mapped is None:
+            return None
+        matrix, valid = mapped
+        ids = np.flatnonzero(valid).astype(np.int64)
+        return ids, np.asarray(matrix[ids])
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Registro per percorso DB (un'istanza per file: il lock è condiviso)
+# ─────────────────────────────────────────────────────────────────────
+
+_registry: Dict[Tuple[str, str], EmbeddingStore] = {}
+_registry_lock = threading.Lock()
+
+
+def get_embedding_store(db_path, column: str) -> EmbeddingStore:
+    """Ritorna lo store condiviso per (DB, colonna)."""
+    key = (str(Path(db_path).resolve()), column)
+    with _registry_lock:
+        store = _registry.get(key)
+        if store is None:
+            store = EmbeddingStore(get_store_dir(key[0]), column)
+            _registry[key] = store
+        return store
@@ -0,0 +1,351 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Export Jobs - Copia foto dell'export in parallelo, con manifest per la ripresa.
+
+Prima ExportTab._copy_photos copiava un file alla volta nel thread GUI
+(shutil.copy2 + un processo exiftool per lo strip GPS/EXIF), dietro un
+QProgressDialog modale: un export annullato o interrotto ripartiva da zero,
+e verso un NAS la rete restava in attesa del file successivo. Inoltre
+_get_images_from_db caricava SELECT * (embedding compresi) solo per
+leggere i metadati.
+
+Qui:
+  - export_columns()/load_export_rows(): lettura del catalogo senza le
+    colonne BLOB (embedding CLIP/DINOv2)
+  - CopyExportEngine: pool di `workers` thread, con al massimo
+    `per_device` copie contemporanee verso lo stesso device di
+    destinazione; shutil.copyfile usa le vie rapide del sistema
+    (sendfile/copy_file_range su Linux, fcopyfile su macOS)
+  - foto con la stessa destinazione (copia piatta di IMG.JPG da cartelle
+    diverse) vengono copiate una dopo l'altra nello stesso job, come nel
+    ciclo seriale: mai due thread sullo stesso file
+  - ogni copia scrive su un file temporaneo nella stessa directory, esegue
+    lo strip GPS/EXIF su processi ExifTool stay_open e solo alla fine lo
+    rinomina: un file di destinazione presente è sempre completo
+  - ExportManifest: JSON nella directory di output con lo stato per file;
+    un export ripetuto con le stesse opzioni salta le copie già concluse
+    (sorgente e destinazione invariate) anche con "sovrascrivi" attivo.
+    Il manifest viene rimosso quando il job termina senza errori
+
+Modulo senza dipendenze PyQt.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.copy_helpers import compute_common_roots, compute_dest_path
+from xmp_export import (ExportResult, STATUS_OK, STATUS_FAILED, STATUS_SKIPPED,
+                        parse_write_output)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.offgallery_export.json'
+MANIFEST_VERSION = 1
+
+DEFAULT_COPY_WORKERS = 4
+DEFAULT_PER_DEVICE = 4
+
+# Copia già conclusa in un'esecuzione precedente del job
+STATUS_RESUMED = 'resumed'
+
+# Scrittura del manifest: al più una ogni N secondi durante il job
+_MANIFEST_FLUSH_INTERVAL = 2.0
+
+# Opzioni che cambiano il contenuto o la posizione delle copie
+_SIGNATURE_OPTIONS = ('copy_preserve_structure', 'copy_exclude_gps', 'copy_exclude_exif')
+
+
+def export_columns(cursor) -> List[str]:
+    """Colonne di images utili all'export: tutte tranne le BLOB (embedding)."""
+    cursor.execute("PRAGMA table_info(images)")
+    return [row[1] for row in cursor.fetchall()
+            if (row[2] or '').upper() != 'BLOB']
+
+
+def load_export_rows(cursor, where: str = '', params=()) -> List[Dict[str, Any]]:
+    """Righe di images (dict) per l'export, ordinate per filepath."""
+    cols = export_columns(cursor)
+    select = ', '.join(f'"{c}"' for c in cols)
+    cursor.execute(f"SELECT {select} FROM images {where} ORDER BY filepath", list(params))
+    return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+
+def copy_signature(options: dict) -> str:
+    """Identità del job di copia: directory di output + opzioni che cambiano le copie."""
+    fmt = options.get('format', {})
+    raw = json.dumps([str(Path(options['path']['single_dir']).resolve())]
+                     + [bool(fmt.get(k, False)) for k in _SIGNATURE_OPTIONS])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _file_state(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class ExportManifest:
+    """Stato per file di un job di copia, salvato in output_dir/MANIFEST_NAME."""
+
+    def __init__(self, output_dir: Path, signature: str):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.signature = signature
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = 0.0
+
+    @classmethod
+    def open(cls, output_dir: Path, signature: str) -> 'ExportManifest':
+        """Manifest esistente se appartiene allo stesso job, altrimenti uno nuovo."""
+        manifest = cls(output_dir, signature)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION and data.get('signature') == signature:
+                manifest.files = data.get('files', {})
+                done = sum(1 for e in manifest.files.values() if e.get('status') == STATUS_OK)
+                logger.info(f"Export: ripresa job precedente ({done} copie già concluse)")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Manifest export non leggibile, job ripartito: {e}")
+        return manifest
+
+    def is_done(self, source: Path, dest: Path) -> bool:
+        """True se la copia source → dest è conclusa e nessuno dei due file è cambiato."""
+        entry = self.files.get(str(source))
+        if not entry or entry.get('status') != STATUS_OK or entry.get('dest') != str(dest):
+            return False
+        return (entry.get('source_state') == _file_state(source)
+                and entry.get('dest_state') == _file_state(dest))
+
+    def record(self, source: Path, dest: Optional[Path], status: str, message: str = ''):
+        entry = {'status': status, 'dest': str(dest) if dest else None}
+        if status == STATUS_OK:
+            entry['source_state'] = _file_state(source)
+            entry['dest_state'] = _file_state(dest)
+        elif message:
+            entry['message'] = message
+        with self._lock:
+            self.files[str(source)] = entry
+            self._dirty = True
+        if time.monotonic() - self._last_flush > _MANIFEST_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Scrittura atomica (file temporaneo + replace)."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {'version': MANIFEST_VERSION, 'signature': self.signature,
+                        'files': dict(self.files)}
+                self._dirty = False
+                self._last_flush = time.monotonic()
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.warning(f"Manifest export non salvato: {e}")
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug(f"Manifest export non rimosso: {e}")
+
+
+def _partial_path(dest: Path) -> Path:
+    """File temporaneo della copia: stessa directory, stessa estensione (serve a ExifTool),
+    nome unico per copia."""
+    return dest.with_name(f".{dest.stem}.{uuid.uuid4().hex[:8]}.part{dest.suffix}")
+
+
+class CopyExportEngine:
+    """
+    Copia delle foto originali nella directory di output con un pool di thread.
+
+    Args:
+        options: opzioni di ExportTab.get_export_options()
+        workers: copie in parallelo in totale
+        per_device: copie in parallelo verso lo stesso device di destinazione
+    """
+
+    def __init__(self, options: dict, workers: int = DEFAULT_COPY_WORKERS,
+                 per_device: int = DEFAULT_PER_DEVICE):
+        self.options = options
+        self.workers = max(1, int(workers))
+        self.per_device = max(1, int(per_device))
+        self._cancel = threading.Event()
+        self._device_slots: Dict[Any, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def canceled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self, items: List[Dict[str, Any]],
+            progress: Optional[Callable[[int, str], None]] = None) -> List[ExportResult]:
+        """Copia gli item; progress(foto concluse, filename) in ordine di completamento.
+
+        Le foto non elaborate per annullamento non compaiono nei risultati.
+        """
+        from raw_processor import ExifToolStayOpen
+
+        fmt = self.options['format']
+        output_dir = Path(self.options['path']['single_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        groups = self._plan(items, output_dir)
+        manifest = ExportManifest.open(output_dir, copy_signature(self.options))
+
+        strip_args = []
+        if fmt.get('copy_exclude_gps'):
+            strip_args.append('-GPS:All=')
+        if fmt.get('copy_exclude_exif'):
+            strip_args.append('-EXIF:All=')
+        procs: "queue.Queue[ExifToolStayOpen]" = queue.Queue()
+        all_procs = [ExifToolStayOpen(merge_stderr=True)
+                     for _ in range(self.workers if strip_args else 0)]
+        for et in all_procs:
+            procs.put(et)
+
+        results: List[ExportResult] = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export-copy') as pool:
+                futures = [pool.submit(self._copy_group, group, manifest, strip_args, procs)
+                           for group in groups]
+                for future in as_completed(futures):
+                    for result in future.result():
+                        results.append(result)
+                        if progress is not None:
+                            progress(len(results), Path(result.filepath).name)
+        finally:
+            for et in all_procs:
+                et.close()
+            manifest.flush()
+
+        if not self.canceled and all(r.status != STATUS_FAILED for r in results):
+            manifest.remove()
+        return results
+
+    # ── Interni ──────────────────────────────────────────────────────
+
+    def _plan(self, items, output_dir: Path):
+        """Gruppi di (sorgente, destinazione) con la stessa destinazione, in ordine di catalogo.
+
+        La destinazione è calcolata come nel ciclo seriale; un gruppo viene
+        copiato da un solo thread, quindi con "sovrascrivi" vince l'ultima
+        foto e senza viene copiata solo la prima.
+        """
+        from raw_processor import _source_key
+
+        common_roots = {}
+        if self.options['format'].get('copy_preserve_structure', False):
+            common_roots = compute_common_roots(items)
+            logger.debug(
+                f"Struttura attiva: {len(common_roots)} device rilevati, "
+                f"multi-disco={'Sì' if len(common_roots) > 1 else 'No'}"
+            )
+        groups: Dict[str, List] = {}
+        for image_data in items:
+            source = Path(image_data.get('filepath', ''))
+            if common_roots:
+                dest = compute_dest_path(source, output_dir, common_roots)
+            else:
+                # Copia piatta: nome file invariato nella directory di output
+                dest = output_dir / source.name
+            groups.setdefault(_source_key(dest), []).append((source, dest))
+        return list(groups.values())
+
+    def _slots_for(self, directory: Path) -> threading.BoundedSemaphore:
+        try:
+            device = os.stat(directory).st_dev
+        except OSError:
+            device = None
+        with self._slots_lock:
+            slots = self._device_slots.get(device)
+            if slots is None:
+                slots = self._device_slots[device] = threading.BoundedSemaphore(self.per_device)
+            return slots
+
+    def _copy_group(self, group, manifest: ExportManifest,
+                    strip_args: List[str], procs) -> List[ExportResult]:
+        results = []
+        for source, dest in group:
+            result = self._copy_one(source, dest, manifest, strip_args, procs)
+            if result is None:
+                break
+            results.append(result)
+        return results
+
+    def _copy_one(self, source: Path, dest: Path, manifest: ExportManifest,
+                  strip_args: List[str], procs) -> Optional[ExportResult]:
+        if self.canceled:
+            return None
+        if not source.exists():
+            logger.warning(f"File non trovato per copia: {source}")
+            manifest.record(source, dest, STATUS_FAILED, "file non trovato")
+            return ExportResult(str(source), 'copy', STATUS_FAILED, str(dest), "file non trovato")
+        if manifest.is_done(source, dest):
+            return ExportResult(str(source), 'copy', STATUS_RESUMED, str(dest))
+        # Gestione conflitti coerente in entrambe le modalità
+        if dest.exists() and not self.options['format'].get('copy_overwrite', False):
+            logger.debug(f"File già presente, saltato: {dest.name}")
+            return ExportResult(str(source), 'copy', STATUS_SKIPPED, str(dest), "già presente")
+
+        partial = _partial_path(dest)
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with self._slots_for(dest.parent):
+                if self.canceled:
+                    return None
+                shutil.copyfile(source, partial)
+                shutil.copystat(source, partial)
+
+            # Strip GPS e/o EXIF dalla copia (mai dall'originale)
+            if strip_args:
+                et = procs.get()
+                try:
+                    ok, message = parse_write_output(
+                        et.execute_text('-overwrite_original', *strip_args, str(partial)))
+                finally:
+                    procs.put(et)
+                if not ok:
+                    raise OSError(f"strip metadati fallito: {message}")
+
+            os.replace(partial, dest)
+        except Exception as e:
+            logger.error(f"Errore copia {source.name}: {e}")
+            try:
+                partial.unlink()
+            except OSError:
+                pass
+            manifest.record(source, dest, STATUS_FAILED, str(e))
+            return ExportResult(str(source), 'copy', STATUS_FAILED, str(dest), str(e))
+
+        manifest.record(source, dest, STATUS_OK)
+        return ExportResult(str(source), 'copy', STATUS_OK, str(dest))
+
@@ -0,0 +1,204 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+File Scanner - Scansione incrementale delle cartelle di input.
+
+Prima la scansione faceva un rglob per estensione e per variante
+maiuscola/minuscola (≈ 2×N visite dell'albero), poi SELECT * su tutte le
+immagini (blob embedding compresi) solo per sapere quali percorsi erano
+già nel catalogo.
+
+Qui:
+  - una sola visita con os.scandir: nome, dimensione e mtime dal DirEntry
+  - snapshot per cartella nel DB (tabelle scan_dirs / scan_files, create
+    dalla migrazione v8 di DatabaseManager): ogni
+    cartella viene sempre elencata (i file nuovi compaiono anche dove l'mtime
+    della cartella non è affidabile: FAT/exFAT a 2 s, SMB/NFS che non lo
+    aggiornano); se mtime della cartella e formati non sono cambiati, i file
+    già noti prendono dimensione e mtime dallo snapshot senza stat
+  - risultati come generatore di ScanEntry (new / changed / unchanged /
+    missing) rispetto alla scansione precedente, consumabile a mano a mano
+
+Limite noto: in una cartella con mtime invariato un file riscritto sul
+posto con lo stesso nome non viene visto come modificato (l'mtime della
+cartella cambia solo con creazioni, rinomine e cancellazioni).
+full=True rilegge dimensione e mtime di tutti i file.
+
+Modulo senza dipendenze PyQt.
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_NEW = 'new'
+STATUS_CHANGED = 'changed'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_MISSING = 'missing'
+
+# Cartelle tra un commit e l'altro dello snapshot
+_COMMIT_EVERY = 200
+
+
+class ScanEntry(NamedTuple):
+    status: str      # new | changed | unchanged | missing
+    path: str
+    size: Optional[int]
+    mtime: Optional[float]
+
+
+class DirectoryScanner:
+    """Visita a passata singola con snapshot per cartella.
+
+    Args:
+        conn: connessione SQLite del catalogo aperto da DatabaseManager
+              (None = nessuno snapshot, ogni file risulta 'new')
+        formats: estensioni supportate (image_processing.supported_formats)
+        recursive: scende nelle sotto-cartelle
+    """
+
+    def __init__(self, conn, formats: Iterable[str], recursive: bool = True):
+        self.conn = conn
+        self.extensions = {
+            (f if f.startswith('.') else f'.{f}').lower() for f in formats
+        }
+        self.formats_key = ",".join(sorted(self.extensions))
+        self.recursive = recursive
+        # Contatori dell'ultima scansione: uno per stato + dirs_scanned /
+        # dirs_skipped / dirs_known (cartelle già presenti nello snapshot)
+        self.stats: Counter = Counter()
+
+    def scan(self, root, full: bool = False) -> Iterator[ScanEntry]:
+        """Genera un ScanEntry per ogni file supportato sotto root.
+
+        Lo snapshot di una cartella viene aggiornato dopo averne emesso i
+        file: interrompere il generatore lascia lo snapshot coerente.
+        """
+        self.stats.clear()
+        stack = [os.path.abspath(str(root))]
+        visited = 0
+        try:
+            while stack:
+                dirpath = stack.pop()
+                subdirs = yield from self._scan_dir(dirpath, full)
+                if self.recursive:
+                    stack.extend(os.path.join(dirpath, d) for d in sorted(subdirs, reverse=True))
+                visited += 1
+                if self.conn is not None and visited % _COMMIT_EVERY == 0:
+                    self.conn.commit()
+        finally:
+            if self.conn is not None:
+                self.conn.commit()
+
+    # ── Singola cartella ─────────────────────────────────────────────
+
+    def _scan_dir(self, dirpath: str, full: bool):
+        try:
+            dir_mtime = os.stat(dirpath).st_mtime
+        except OSError as e:
+            logger.warning(f"Cartella non accessibile {dirpath}: {e}")
+            return []
+
+        snapshot, prev_files = None, {}
+        if self.conn is not None:
+            snapshot = self.conn.execute(
+                "SELECT mtime, formats, subdirs FROM scan_dirs WHERE dirpath = ?", (dirpath,)
+            ).fetchone()
+            if snapshot is not None:
+                self.stats['dirs_known'] += 1
+                prev_files = {
+                    path: (size, mtime) for path, size, mtime in self.conn.execute(
+                        "SELECT filepath, file_size, mtime FROM scan_files WHERE dirpath = ?",
+                        (dirpath,))
+                }
+
+        # Cartella invariata: l'elenco si rilegge sempre, lo stat solo dei file nuovi
+        known = None
+        if (not full and snapshot is not None
+                and snapshot[0] == dir_mtime and snapshot[1] == self.formats_key):
+            self.stats['dirs_skipped'] += 1
+            known = prev_files
+
+        self.stats['dirs_scanned'] += 1
+        files, subdirs = self._list_dir(dirpath, known)
+
+        for path, size, mtime in files:
+            prev = prev_files.pop(path, None)
+            if prev is None:
+                status = STATUS_NEW
+            elif prev == (size, mtime):
+                status = STATUS_UNCHANGED
+            else:
+                status = STATUS_CHANGED
+            self.stats[status] += 1
+            yield ScanEntry(status, path, size, mtime)
+
+        for path in sorted(prev_files):
+            self.stats[STATUS_MISSING] += 1
+            yield ScanEntry(STATUS_MISSING, path, None, None)
+
+        if self.conn is None:
+            return subdirs
+
+        # Sotto-cartelle sparite: tutti i loro file risultano mancanti
+        if snapshot is not None:
+            for gone in set(json.loads(snapshot[2])) - set(subdirs):
+                yield from self._purge_tree(os.path.join(dirpath, gone))
+
+        self.conn.execute("DELETE FROM scan_files WHERE dirpath = ?", (dirpath,))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scan_files (filepath, dirpath, file_size, mtime) VALUES (?, ?, ?, ?)",
+            [(path, dirpath, size, mtime) for path, size, mtime in files])
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scan_dirs (dirpath, mtime, formats, subdirs) VALUES (?, ?, ?, ?)",
+            (dirpath, dir_mtime, self.formats_key, json.dumps(subdirs, ensure_ascii=False)))
+        return subdirs
+
+    def _list_dir(self, dirpath: str, known: Optional[dict] = None):
+        """File supportati (percorso, dimensione, mtime) e nomi delle sotto-cartelle.
+
+        known: {percorso: (dimensione, mtime)} da riusare senza stat.
+        """
+        files: List[tuple] = []
+        subdirs: List[str] = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    try:
+                        # Come rglob: i link simbolici a cartelle non vengono seguiti
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                            continue
+                        # Salta file nascosti (es. ._filename.jpg su macOS/Linux)
+                        if entry.name.startswith('.') or not entry.is_file():
+                            continue
+                        if os.path.splitext(entry.name)[1].lower() not in self.extensions:
+                            continue
+                        if known is not None and entry.path in known:
+                            files.append((entry.path,) + tuple(known[entry.path]))
+                            continue
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime))
+                    except OSError as e:
+                        logger.debug(f"Voce non leggibile {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Impossibile leggere la cartella {dirpath}: {e}")
+        files.sort()
+        subdirs.sort()
+        return files, subdirs
+
+    def _purge_tree(self, dirpath: str):
+        """Rimuove dallo snapshot una cartella sparita, emettendo i suoi file come missing."""
+        prefix = dirpath + os.sep
+        where = "dirpath = ? OR substr(dirpath, 1, ?) = ?"
+        params = (dirpath, len(prefix), prefix)
+        for (path,) in self.conn.execute(
+                f"SELECT filepath FROM scan_files WHERE {where} ORDER BY filepath", params).fetchall():
+            self.stats[STATUS_MISSING] += 1
+            yield ScanEntry(STATUS_MISSING, path, None, None)
+        self.conn.execute(f"DELETE FROM scan_files WHERE {where}", params)
+        self.conn.execute(f"DELETE FROM scan_dirs WHERE {where}", params)
@@ -0,0 +1,211 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+GeoSpecies Cache - Sottoinsiemi TreeOfLife per cella 1°×1°.
+
+Prima _predict_bioclip, per ogni foto con GPS, rileggeva da disco le
+checklist JSON della cella e costruiva un CustomLabelsClassifier nuovo, che
+ricodificava con la text tower centinaia o migliaia di nomi di specie.
+
+Qui:
+  - le specie della checklist diventano indici di riga della matrice
+    txt_emb_species.npy già caricata (nessuna codifica di testo)
+  - il sottoinsieme (indici + righe estratte) resta in una LRU per cella
+  - gli indici sono salvati in .npy accanto alle checklist GeoSpecies e
+    riusati alle sessioni successive finché le checklist non cambiano
+
+Le specie della checklist assenti da TreeOfLife vengono ignorate.
+
+Modulo senza dipendenze PyQt.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Specie minime riconosciute per usare il sottoinsieme (come prima)
+MIN_SPECIES = 10
+
+DEFAULT_MAX_CELLS = 16
+
+
+class GeoSubset(NamedTuple):
+    cell: str                 # etichetta cella, es. '45°N, 9°E'
+    indices: np.ndarray       # righe di txt_emb_species (int64, ordinate)
+    embeddings: Any           # righe estratte dallo slicer (es. tensore torch)
+
+
+def species_key(entry) -> Optional[str]:
+    """Nome 'genere epiteto' minuscolo di una voce di txt_emb_species.json."""
+    if isinstance(entry, list) and entry and isinstance(entry[0], list):
+        taxon = entry[0]
+        genus = taxon[5] if len(taxon) > 5 else ''
+        epithet = taxon[6] if len(taxon) > 6 else ''
+        name = f"{genus} {epithet}".strip()
+    elif isinstance(entry, str):
+        name = ' '.join(entry.replace('_', ' ').split()[:2])
+    else:
+        return None
+    return name.lower() or None
+
+
+class GeoSpeciesCache:
+    """LRU per cella dei sottoinsiemi TreeOfLife usati da BioCLIP.
+
+    Args:
+        txt_names: voci di txt_emb_species.json (una per riga della matrice)
+        slicer: slicer(indices) → righe della matrice embedding per quegli indici
+        max_cells: celle tenute in memoria
+        persist: salva/rilegge gli indici .npy accanto alle checklist
+    """
+
+    def __init__(self, txt_names: List, slicer: Callable[[np.ndarray], Any],
+                 max_cells: int = DEFAULT_MAX_CELLS, persist: bool = True):
+        self.txt_names = txt_names
+        self.slicer = slicer
+        self.max_cells = max(1, int(max_cells))
+        self.persist = persist
+        self._name_index: Optional[Dict[str, List[int]]] = None
+        # cella → (firma checklist, GeoSubset o None)
+        self._cells: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._config = None
+        self._config_mtime = None
+
+    # ── API ──────────────────────────────────────────────────────────
+
+    def get(self, lat: float, lon: float, geo_hierarchy: Optional[str] = None) -> Optional[GeoSubset]:
+        """Sottoinsieme per la cella delle coordinate; None se non disponibile."""
+        from plugins.geospecies.geospecies import cell_from_coords
+
+        if lat is None or lon is None or (lat == 0.0 and lon == 0.0):
+            return None
+
+        cell = cell_from_coords(lat, lon)
+        config = self._plugin_config()
+        signature = self._signature(cell, config)
+
+        with self._lock:
+            cached = self._cells.get(cell)
+            if cached is not None and cached[0] == signature:
+                self._cells.move_to_end(cell)
+                return cached[1]
+
+            subset = self._build(cell, lat, lon, geo_hierarchy, config, signature) if signature else None
+            self._cells[cell] = (signature, subset)
+            self._cells.move_to_end(cell)
+            while len(self._cells) > self.max_cells:
+                self._cells.popitem(last=False)
+            return subset
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+
+    # ── Interni ──────────────────────────────────────────────────────
+
+    def _plugin_config(self) -> dict:
+        """Config del plugin, riletta solo se config.json è cambiato."""
+        from plugins.geospecies.geospecies import config_mtime, load_config
+
+        mtime = config_mtime()
+        if self._config is None or mtime != self._config_mtime:
+            self._config = load_config()
+            self._config_mtime = mtime
+        return self._config
+
+    def _signature(self, cell, config) -> Optional[str]:
+        """Firma delle checklist valide della cella (None = nessuna checklist)."""
+        from plugins.geospecies.geospecies import cell_checklist_files
+
+        files = cell_checklist_files(cell[0], cell[1], config)
+        if not files:
+            return None
+        parts = [str(len(self.txt_names))]
+        for path in files:
+            try:
+                parts.append(f"{path.name}:{path.stat().st_mtime_ns}")
+            except OSError:
+                continue
+        return hashlib.blake2b("|".join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+    def _build(self, cell, lat, lon, geo_hierarchy, config, signature) -> Optional[GeoSubset]:
+        from plugins.geospecies.geospecies import cell_key, cell_label
+
+        c_key = cell_key(*cell)
+        label = cell_label(*cell)
+        indices = self._load_indices(c_key, signature, config)
+
+        if indices is None:
+            from plugins.geospecies.geospecies import get_species_subset
+
+            species = get_species_subset(lat=float(lat), lon=float(lon),
+                                         geo_hierarchy=geo_hierarchy, config=config)
+            if not species:
+                return None
+            indices = self._indices_for(species)
+            logger.info(
+                f"GeoSpecies: {len(indices)} righe TreeOfLife per cella {label} "
+                f"({len(species)} specie in checklist)"
+            )
+            self._save_indices(c_key, signature, config, indices)
+
+        if len(indices) < MIN_SPECIES:
+            logger.debug(f"GeoSpecies: solo {len(indices)} specie note per {label}, uso TreeOfLife")
+            return None
+        return GeoSubset(label, indices, self.slicer(indices))
+
+    def _indices_for(self, species: List[str]) -> np.ndarray:
+        if self._name_index is None:
+            index: Dict[str, List[int]] = {}
+            for row, entry in enumerate(self.txt_names):
+                key = species_key(entry)
+                if key:
+                    index.setdefault(key, []).append(row)
+            self._name_index = index
+        rows = set()
+        for name in species:
+            rows.update(self._name_index.get(' '.join(name.lower().split()[:2]), ()))
+        return np.array(sorted(rows), dtype=np.int64)
+
+    # ── Persistenza .npy ─────────────────────────────────────────────
+
+    def _index_path(self, c_key: str, signature: str, config) -> Path:
+        from plugins.geospecies.geospecies import SUBSET_INDEX_PREFIX, subset_index_dir
+        return subset_index_dir(config) / f"{SUBSET_INDEX_PREFIX}{c_key}_{signature}.npy"
+
+    def _load_indices(self, c_key, signature, config) -> Optional[np.ndarray]:
+        if not self.persist:
+            return None
+        path = self._index_path(c_key, signature, config)
+        if not path.exists():
+            return None
+        try:
+            indices = np.load(path)
+            if indices.size and int(indices.max()) >= len(self.txt_names):
+                return None
+            return indices.astype(np.int64, copy=False)
+        except Exception as e:
+            logger.debug(f"GeoSpecies: indice {path.name} non leggibile ({e})")
+            return None
+
+    def _save_indices(self, c_key, signature, config, indices: np.ndarray):
+        if not self.persist:
+            return
+        path = self._index_path(c_key, signature, config)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Indici della stessa cella con firma diversa: checklist cambiate
+            for stale in path.parent.glob(path.name.rsplit('_', 1)[0] + "_*.npy"):
+                if stale != path:
+                    stale.unlink()
+            np.save(path, indices)
+        except OSError as e:
+            logger.debug(f"GeoSpecies: salvataggio indice {path.name} fallito ({e})")
@@ -2177,6 +2177,7 @@ class ConfigTab(QWidget):
             supported_formats = [fmt.strip() for fmt in formats_text.split('\n') if fmt.strip()]
             
             self.config['image_processing'] = {
+                **self.config.get('image_processing', {}),
                 'supported_formats': supported_formats,
             }
             
@@ -2199,6 +2200,7 @@ class ConfigTab(QWidget):
             
             # Search
             self.config['search'] = {
+                **self.config.get('search', {}),
                 'fuzzy_enabled': self.fuzzy_enabled_checkbox.isChecked(),
                 'max_results': self.config.get('search', {}).get('max_results', 100),
                 'semantic_threshold': self.semantic_threshold_spin.value(),
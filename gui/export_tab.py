@@ -14,7 +14,6 @@ from PyQt6.QtWidgets import (
     QProgressDialog,
     QFileDialog,
     QMessageBox,
-    QApplication,
     QLineEdit,
     QDialog,
     QDialogButtonBox,
@@ -25,15 +24,13 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal
 from pathlib import Path
 import yaml
-import shutil
 import json
 from datetime import datetime
 import logging
 from gui.gallery_widgets import apply_popup_style
 from gui.directory_dialog import DirectoryTreeWidget
 from xmp_badge_manager import refresh_xmp_badges
-from utils.copy_helpers import compute_common_roots, compute_dest_path
-from utils.subprocess_utils import subprocess_creation_kwargs
+from xmp_export import parse_tags
 from utils.paths import get_app_dir, get_database_dir
 from i18n import t
 
@@ -662,17 +659,15 @@ class ExportTab(QWidget):
             return []
         try:
             if self._selected_dirs:
-                clauses = " OR ".join(["filepath LIKE ?" for _ in self._selected_dirs])
-                params = [str(d) + "%" for d in self._selected_dirs]
-                where = f"WHERE ({clauses})"
+                from db_manager_new import directory_filter
+                clauses, params = directory_filter(self._selected_dirs)
+                where = f"WHERE {clauses}"
             else:
                 where = ""
                 params = []
-            self.db_manager.cursor.execute(
-                f"SELECT * FROM images {where} ORDER BY filepath", params
-            )
-            rows = self.db_manager.cursor.fetchall()
-            cols = [desc[0] for desc in self.db_manager.cursor.description]
+            # Solo colonne di metadati: gli embedding (BLOB) non servono all'export
+            from export_jobs import load_export_rows
+            rows = load_export_rows(self.db_manager.cursor, where, params)
 
             # Costruisce oggetti compatibili con image_item usato nell'export
             class _FakeItem:
@@ -680,7 +675,7 @@ class ExportTab(QWidget):
                     self.image_data = data
                     self.filepath = data.get('filepath', '')
 
-            return [_FakeItem(dict(zip(cols, row))) for row in rows]
+            return [_FakeItem(row) for row in rows]
         except Exception as e:
             logger.error(f"Errore caricamento immagini da DB per export: {e}", exc_info=True)
             return []
@@ -1198,79 +1193,148 @@ class ExportTab(QWidget):
                 csv_success = self._write_csv_export(images_to_use, options)
 
             # --- XMP (sidecar e/o embedded) ---
-            success_count = 0
-            failed_count = 0
-            skipped_count = 0
-
+            # In un thread separato: copia foto e report ripartono da _finish_export
+            ctx = {
+                'images': images_to_use,
+                'options': options,
+                'export_xmp': export_xmp,
+                'export_csv': export_csv,
+                'export_copy': export_copy,
+                'csv_success': csv_success,
+                'location_msg': location_msg,
+                'xmp_results': [],
+                'xmp_canceled': False,
+                'copy_results': [],
+                'copy_canceled': False,
+            }
             if export_xmp:
-                progress = QProgressDialog(
-                    t("export.progress.xmp_running"),
-                    t("export.progress.cancel"),
-                    0,
-                    len(images_to_use),
-                    self
-                )
-                progress.setWindowTitle(t("export.progress.xmp_window"))
-                progress.setModal(True)
-                apply_popup_style(progress)
-                progress.show()
-                QApplication.processEvents()
-
-                for i, image_item in enumerate(images_to_use):
-                    if progress.wasCanceled():
-                        break
-
-                    progress.setValue(i)
-                    filename = image_item.image_data.get('filename', 'unknown')
-                    progress.setLabelText(t("export.progress.xmp_label", filename=filename))
-                    QApplication.processEvents()
-
-                    try:
-                        source_path = Path(image_item.image_data.get('filepath', ''))
-                        if not source_path.exists():
-                            logger.warning(f"File non esiste: {source_path}")
-                            failed_count += 1
-                            continue
-
-                        # XMP sidecar
-                        if options['format']['sidecar']:
-                            if self._write_xmp_sidecar(source_path, image_item, options):
-                                success_count += 1
-                            else:
-                                failed_count += 1
-
-                        # XMP embedded (con validazione compatibilità)
-                        if options['format']['embedded']:
-                            caps = self._get_file_capabilities(str(source_path))
-                            should_skip = False
-                            if caps['is_raw'] and not caps['is_dng']:
-                                should_skip = True
-                            elif caps['is_dng'] and not options['format']['dng_allow_embedded']:
-                                should_skip = True
-                            elif not caps['can_embedded']:
-                                should_skip = True
-
-                            if should_skip:
-                                skipped_count += 1
-                            else:
-                                if self._write_xmp_embedded(source_path, image_item, options):
-                                    success_count += 1
-                                else:
-                                    failed_count += 1
-
-                    except Exception as e:
-                        failed_count += 1
-                        logger.error(f"Errore export XMP per {filename}: {e}", exc_info=True)
-
-                progress.setValue(len(images_to_use))
-                progress.close()
-
-            # --- Copia foto ---
-            copy_count = 0
-            copy_failed = 0
-            copy_skipped = 0
-            if export_copy:
-                copy_count, copy_failed, copy_skipped = self._copy_photos(images_to_use, options)
+                self._start_xmp_export(ctx)
+            else:
+                self._start_copy_export(ctx)
+
+        except Exception as e:
+            logger.error(f"Errore globale in _do_export: {e}", exc_info=True)
+            QMessageBox.critical(self, t("export.msg.error_export_title"), t("export.msg.error_export", error=e))
+
+    def _run_export_worker(self, worker, total, window_title, running_text, label_key, on_completed):
+        """Avvia un worker di export (XMP o copia) con un progress dialog annullabile."""
+        progress = QProgressDialog(
+            running_text,
+            t("export.progress.cancel"),
+            0,
+            total,
+            self
+        )
+        progress.setWindowTitle(window_title)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        apply_popup_style(progress)
+
+        def _on_progress(done, filename):
+            progress.setValue(done)
+            progress.setLabelText(t(label_key, filename=filename))
+
+        def _on_completed(results, canceled):
+            _close()
+            on_completed(results, canceled)
+
+        def _on_error(message):
+            _close()
+            QMessageBox.critical(self, t("export.msg.error_export_title"),
+                                 t("export.msg.error_export", error=message))
+            on_completed([], True)
+
+        def _close():
+            progress.canceled.disconnect(worker.cancel)
+            progress.close()
+            self._export_worker = None
+            self.export_btn.setEnabled(True)
+
+        progress.canceled.connect(worker.cancel)
+        # Figlio della tab: resta raggiungibile da _stop_running_threads finché gira
+        worker.finished.connect(worker.deleteLater)
+        worker.progress.connect(_on_progress)
+        worker.completed.connect(_on_completed)
+        worker.error.connect(_on_error)
+
+        self._export_worker = worker   # riferimento finché il thread è vivo
+        self.export_btn.setEnabled(False)
+        progress.show()
+        worker.start()
+
+    def _start_xmp_export(self, ctx):
+        """Export XMP in XMPExportWorker, poi copia foto e report."""
+        from gui.export_worker import XMPExportWorker
+
+        images = ctx['images']
+        config = self._load_config() or {}
+        if self.db_manager is not None:
+            db_path = self.db_manager.db_path
+        else:
+            db_path = config.get('paths', {}).get('database')
+        writers = (config.get('image_processing', {}).get('exiftool') or {}).get('export_writers')
+
+        worker = XMPExportWorker([item.image_data for item in images], ctx['options'],
+                                 db_path=db_path, writers=writers, parent=self)
+
+        def _on_completed(results, canceled):
+            ctx['xmp_results'] = results
+            ctx['xmp_canceled'] = canceled
+            self._start_copy_export(ctx)
+
+        self._run_export_worker(worker, len(images), t("export.progress.xmp_window"),
+                                t("export.progress.xmp_running"), "export.progress.xmp_label",
+                                _on_completed)
+
+    def _start_copy_export(self, ctx):
+        """Copia foto in CopyExportWorker (se richiesta e l'XMP non è stato annullato), poi report."""
+        if not ctx['export_copy'] or ctx['xmp_canceled'] or not ctx['options']['path']['single_dir']:
+            self._finish_export(ctx)
+            return
+
+        from gui.export_worker import CopyExportWorker
+
+        images = ctx['images']
+        config = self._load_config() or {}
+        copy_cfg = config.get('image_processing', {}).get('export_copy') or {}
+
+        worker = CopyExportWorker([item.image_data for item in images], ctx['options'],
+                                  workers=copy_cfg.get('workers'),
+                                  per_device=copy_cfg.get('per_device'), parent=self)
+
+        def _on_completed(results, canceled):
+            ctx['copy_results'] = results
+            ctx['copy_canceled'] = canceled
+            self._finish_export(ctx)
+
+        self._run_export_worker(worker, len(images), t("export.group.copy_photos"),
+                                t("export.progress.copy_running"), "export.progress.copy_label",
+                                _on_completed)
+
+    def _finish_export(self, ctx):
+        """Report finale e segnale di completamento (dopo XMP e copia foto)."""
+        from xmp_export import STATUS_OK, STATUS_FAILED, STATUS_SKIPPED
+        from export_jobs import STATUS_RESUMED
+
+        export_xmp = ctx['export_xmp']
+        export_csv = ctx['export_csv']
+        export_copy = ctx['export_copy']
+        csv_success = ctx['csv_success']
+        location_msg = ctx['location_msg']
+        images_to_use = ctx['images']
+
+        try:
+            results = ctx['xmp_results']
+            success_count = sum(1 for r in results if r.status == STATUS_OK)
+            failed_count = sum(1 for r in results if r.status == STATUS_FAILED)
+            skipped_count = sum(1 for r in results if r.status == STATUS_SKIPPED)
+
+            copy_results = ctx['copy_results']
+            copy_count = sum(1 for r in copy_results if r.status == STATUS_OK)
+            copy_failed = sum(1 for r in copy_results if r.status == STATUS_FAILED)
+            copy_skipped = sum(1 for r in copy_results if r.status == STATUS_SKIPPED)
+            copy_resumed = sum(1 for r in copy_results if r.status == STATUS_RESUMED)
 
             # --- Report finale ---
             try:
@@ -1281,16 +1345,25 @@ class ExportTab(QWidget):
                     report_parts.append(t("export.report.xmp_errors", n=failed_count))
                 if export_xmp and skipped_count > 0:
                     report_parts.append(t("export.report.xmp_skipped", n=skipped_count))
+                if export_xmp and ctx['xmp_canceled']:
+                    processed = len({r.filepath for r in results})
+                    report_parts.append(t("export.report.xmp_canceled",
+                                          n=max(0, len(images_to_use) - processed)))
                 if export_csv and csv_success:
                     report_parts.append(t("export.report.csv_ok"))
                 elif export_csv and not csv_success:
                     report_parts.append(t("export.report.csv_error"))
                 if export_copy and copy_count > 0:
                     report_parts.append(t("export.report.photos_copied", n=copy_count))
+                if export_copy and copy_resumed > 0:
+                    report_parts.append(t("export.report.photos_resumed", n=copy_resumed))
                 if export_copy and copy_skipped > 0:
                     report_parts.append(t("export.report.photos_skipped", n=copy_skipped))
                 if export_copy and copy_failed > 0:
                     report_parts.append(t("export.report.photos_failed", n=copy_failed))
+                if export_copy and ctx['copy_canceled']:
+                    report_parts.append(t("export.report.copy_canceled",
+                                          n=max(0, len(images_to_use) - len(copy_results))))
 
                 if not report_parts:
                     report_parts.append(t("export.report.no_export"))
@@ -1300,7 +1373,19 @@ class ExportTab(QWidget):
                             location=location_msg)
 
                 try:
-                    QMessageBox.information(self, t("export.msg.done_title"), message)
+                    box = QMessageBox(QMessageBox.Icon.Information, t("export.msg.done_title"),
+                                      message, QMessageBox.StandardButton.Ok, self)
+                    # Dettaglio per file: errori e file saltati con il messaggio ExifTool
+                    details = [
+                        f"{'✗' if r.status == STATUS_FAILED else '–'} [{r.kind}] {r.filepath}"
+                        + (f" — {r.message}" if r.message else '')
+                        for r in results + copy_results if r.status == STATUS_FAILED
+                        or (r.status == STATUS_SKIPPED and r.kind != 'copy')
+                    ]
+                    if details:
+                        box.setDetailedText('\n'.join(details))
+                    apply_popup_style(box)
+                    box.exec()
                 except Exception as dialog_error:
                     logger.error(f"Errore dialog finale export: {dialog_error}", exc_info=True)
 
@@ -1326,9 +1411,9 @@ class ExportTab(QWidget):
                 logger.error(f"Errore emissione signal export: {signal_error}", exc_info=True)
 
         except Exception as e:
-            logger.error(f"Errore globale in _do_export: {e}", exc_info=True)
+            logger.error(f"Errore globale in _finish_export: {e}", exc_info=True)
             QMessageBox.critical(self, t("export.msg.error_export_title"), t("export.msg.error_export", error=e))
-    
+
     def _write_csv_export(self, image_items, options):
         """Esporta metadati completi in formato CSV per workflow fotografico professionale"""
         try:
@@ -1496,606 +1581,7 @@ class ExportTab(QWidget):
     
     def _parse_tags(self, tags_data):
         """Parse tags unificati JSON to list con gestione robusta"""
-        if not tags_data:
-            return []
-        try:
-            import json
-            if isinstance(tags_data, str):
-                # BUGFIX: Gestisci stringhe mal formattate da versioni precedenti
-                if tags_data.startswith('[') and not tags_data.startswith('["'):
-                    # Stringa tipo "[tag1, tag2]" invece di JSON corretto
-                    clean_str = tags_data.strip('[]')
-                    return [tag.strip(' "\'') for tag in clean_str.split(',') if tag.strip()]
-                else:
-                    return json.loads(tags_data)
-            elif isinstance(tags_data, list):
-                return tags_data
-            else:
-                return []
-        except Exception as e:
-            logger.debug(f"Parsing tags CSV fallito ({e!r}), uso fallback stringa")
-            if isinstance(tags_data, str):
-                clean_str = tags_data.strip('[]')
-                return [tag.strip(' "\'') for tag in clean_str.split(',') if tag.strip()]
-            return []
-
-    def _write_xmp_embedded(self, image_file: Path, image_item, options):
-        """Scrivi metadati XMP embedded nel file (JPG, TIFF, DNG)"""
-        try:
-
-            # Costruisci lista keywords unificata
-            tags_data = image_item.image_data.get('tags', '')
-            if not tags_data:
-                keywords = []
-            else:
-                try:
-                    if isinstance(tags_data, str) and tags_data.startswith('['):
-                        keywords = json.loads(tags_data)
-                    elif isinstance(tags_data, str):
-                        keywords = [tag.strip() for tag in tags_data.split(',') if tag.strip()]
-                    elif isinstance(tags_data, list):
-                        keywords = tags_data
-                    else:
-                        keywords = []
-                except Exception as e:
-                    logger.debug(f"Parsing keywords export XMP: {e}")
-                    keywords = []
-
-            if keywords:
-                keywords = list(dict.fromkeys(keywords))
-
-            import subprocess
-
-            # Flag preserve — stessi del sidecar, applicati al file embedded
-            do_merge_kw          = options['advanced'].get('xmp_merge_keywords', True)
-            do_overwrite_ai_tags = options['advanced'].get('xmp_overwrite_ai_tags', False)
-            do_pres_title        = options['advanced'].get('xmp_preserve_title', True)
-            do_pres_desc         = options['advanced'].get('xmp_preserve_description', True)
-            do_pres_rate         = options['advanced'].get('xmp_preserve_rating', True)
-            do_pres_color        = options['advanced'].get('xmp_preserve_color_label', True)
-
-            # Leggi campi esistenti dal file embedded se almeno un flag preserve è attivo
-            existing_emb = {}
-            any_preserve = do_pres_title or do_pres_desc or do_pres_rate or do_pres_color
-            if any_preserve:
-                existing_emb = self._read_existing_scalar_fields_from_xmp(image_file)
-
-            cmd = ["exiftool", "-overwrite_original"]
-
-            # KEYWORDS — merge=ON: legge keywords già nel file e unisce con quelli DB
-            # (stesso approccio del sidecar); merge=OFF: sostituisce completamente.
-            # In entrambi i casi: azzera e riscrive in un'unica chiamata ExifTool.
-            if do_merge_kw:
-                existing_emb_kws = self._read_existing_keywords_from_xmp(image_file)
-                seen_kw = {k.lower() for k in existing_emb_kws}
-                merged_kws = list(existing_emb_kws)
-                for kw in keywords:
-                    if kw.lower() not in seen_kw:
-                        merged_kws.append(kw)
-                        seen_kw.add(kw.lower())
-                keywords = merged_kws
-
-            # Azzera e riscrivi in un colpo solo (evita duplicati da += su valori preesistenti)
-            cmd.append("-XMP-dc:Subject=")
-            if keywords:
-                for kw in keywords:
-                    cmd.append(f"-XMP-dc:Subject+={kw}")
-
-            # TITLE
-            title = image_item.image_data.get('title', '') or ''
-            if not title:
-                title = image_item.image_data.get('filename', '').split('.')[0]
-            if title:
-                if not do_pres_title or not existing_emb.get('title'):
-                    cmd.append(f"-XMP-dc:Title={title}")
-
-            # DESCRIPTION
-            description = image_item.image_data.get('description', '')
-            if description:
-                description = description.replace("x-default ", "").strip()
-                if not do_pres_desc or not existing_emb.get('description'):
-                    cmd.append(f"-XMP-dc:Description={description}")
-
-            # RATING (XMP-xmp:Rating)
-            rating = image_item.image_data.get('lr_rating') or image_item.image_data.get('rating')
-            if rating is not None:
-                try:
-                    rating_int = int(rating)
-                    if 1 <= rating_int <= 5:
-                        if not do_pres_rate or existing_emb.get('rating') is None:
-                            cmd.append(f"-XMP-xmp:Rating={rating_int}")
-                except (ValueError, TypeError):
-                    pass
-
-            # COLOR LABEL (XMP-xmp:Label — standard Adobe/Lightroom)
-            color_label = image_item.image_data.get('color_label', '') or ''
-            if color_label:
-                if not do_pres_color or not existing_emb.get('color_label'):
-                    cmd.append(f"-XMP-xmp:Label={color_label}")
-
-            # HIERARCHICALSUBJECT embedded: lettura unica, filtro combinato, scrittura unica
-            # Evita il doppio "-HS=" nella stessa cmd che azzererebbe il ramo precedente
-            bioclip_taxonomy_raw = image_item.image_data.get('bioclip_taxonomy', '')
-            geo_hierarchy = image_item.image_data.get('geo_hierarchy', '')
-            llm_tags_raw_emb = image_item.image_data.get('llm_tags', '')
-
-            bioclip_hier_path_emb = None
-            if bioclip_taxonomy_raw:
-                try:
-                    from embedding_generator import EmbeddingGenerator
-                    taxonomy = json.loads(bioclip_taxonomy_raw) if isinstance(bioclip_taxonomy_raw, str) else bioclip_taxonomy_raw
-                    if taxonomy and isinstance(taxonomy, list):
-                        bioclip_hier_path_emb = EmbeddingGenerator.build_hierarchical_taxonomy(taxonomy, prefix="AI|Taxonomy")
-                except Exception as e:
-                    logger.warning(f"Errore build tassonomia BioCLIP embedded: {e}")
-
-            llm_hier_paths_emb = []
-            if llm_tags_raw_emb:
-                try:
-                    llm_list = json.loads(llm_tags_raw_emb) if isinstance(llm_tags_raw_emb, str) else llm_tags_raw_emb
-                    if isinstance(llm_list, list):
-                        llm_hier_paths_emb = [f"AI|Tags|{t}" for t in llm_list if t and str(t).strip()]
-                except Exception:
-                    pass
-
-            if bioclip_hier_path_emb or geo_hierarchy or llm_hier_paths_emb:
-                existing_hier_emb = []
-                try:
-                    hier_result = subprocess.run(
-                        ['exiftool', '-j', '-XMP-lr:HierarchicalSubject', str(image_file)],
-                        capture_output=True, text=True, timeout=10,
-                        **subprocess_creation_kwargs()
-                    )
-                    if hier_result.returncode == 0 and hier_result.stdout.strip():
-                        hier_data = json.loads(hier_result.stdout)
-                        if hier_data:
-                            hs = hier_data[0].get('HierarchicalSubject', [])
-                            if isinstance(hs, str):
-                                hs = [hs]
-                            existing_hier_emb = [
-                                s for s in hs
-                                if not (bioclip_hier_path_emb and s.startswith('AI|Taxonomy'))
-                                and not (geo_hierarchy and s.startswith('GeOFF|'))
-                                and not (do_overwrite_ai_tags and llm_hier_paths_emb and s.startswith('AI|Tags|'))
-                            ]
-                except Exception:
-                    pass
-
-                cmd.append("-XMP-lr:HierarchicalSubject=")
-                for subject in existing_hier_emb:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={subject}")
-                if bioclip_hier_path_emb:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={bioclip_hier_path_emb}")
-                if geo_hierarchy:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={geo_hierarchy}")
-                for llm_path in llm_hier_paths_emb:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={llm_path}")
-
-            cmd.append(str(image_file))
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30,
-                                    **subprocess_creation_kwargs())
-
-            if result.returncode == 0:
-                return True
-            else:
-                logger.error("ExifTool embedded errore: %s", result.stderr)
-                return False
-
-        except Exception as e:
-            logger.error("Errore scrittura XMP embedded: %s", e, exc_info=True)
-            return False
-
-    def _write_xmp_sidecar(self, image_file: Path, image_item, options: dict):
-        """Scrive XMP sidecar compatibile con Lightroom"""
-        try:
-
-            import subprocess
-
-            # Raccogli keywords
-            keywords = []
-            unified_tags_data = image_item.image_data.get('tags', '')
-            if unified_tags_data:
-                unified_tags = self._parse_tags(unified_tags_data)
-                keywords.extend(unified_tags)
-            _seen = set()
-            _kw_dedup = []
-            for k in keywords:
-                if k.lower() not in _seen:
-                    _seen.add(k.lower())
-                    _kw_dedup.append(k)
-            keywords = _kw_dedup
-
-            # Determina path XMP
-            naming = options['format'].get('sidecar_naming', 'lightroom')
-            if options['path']['original']:
-                if naming == 'darktable':
-                    sidecar_path = Path(str(image_file) + '.xmp')
-                else:
-                    sidecar_path = image_file.with_suffix('.xmp')
-            else:
-                single_dir = options['path']['single_dir']
-                if not single_dir:
-                    logger.error("Directory unica non specificata per %s", image_file.name)
-                    return False
-                output_dir = Path(single_dir)
-                if not output_dir.exists():
-                    output_dir.mkdir(parents=True, exist_ok=True)
-                if naming == 'darktable':
-                    sidecar_path = output_dir / (image_file.name + '.xmp')
-                else:
-                    sidecar_path = output_dir / f"{image_file.stem}.xmp"
-
-            # Comportamento per campo — controllo indipendente
-            do_merge_keywords    = options['advanced'].get('xmp_merge_keywords', True)
-            do_overwrite_ai_tags = options['advanced'].get('xmp_overwrite_ai_tags', False)
-            do_preserve_title = options['advanced'].get('xmp_preserve_title', True)
-            do_preserve_description = options['advanced'].get('xmp_preserve_description', True)
-
-            # Merge keywords o sostituzione
-            final_keywords = []
-            if do_merge_keywords and sidecar_path.exists():
-                existing_keywords = self._read_existing_keywords_from_xmp(sidecar_path)
-                existing_keywords = list(dict.fromkeys(existing_keywords))
-                all_keywords = existing_keywords[:]
-                all_keywords_lower = {k.lower() for k in all_keywords}
-                for kw in keywords:
-                    if kw.lower() not in all_keywords_lower:
-                        all_keywords.append(kw)
-                        all_keywords_lower.add(kw.lower())
-                final_keywords = all_keywords
-            else:
-                final_keywords = list(dict.fromkeys(keywords))
-
-            cmd = ["exiftool", "-overwrite_original", "-api", "Compact=OneDesc"]
-
-            # Azzera dc:Subject nella stessa cmd e riscrive: evita incoerenze tra due chiamate ExifTool separate
-            cmd.append("-XMP-dc:Subject=")
-            for kw in final_keywords:
-                cmd.append(f"-XMP-dc:Subject+={kw}")
-
-            # Comportamento per campo — tutti i flag
-            do_preserve_rating = options['advanced'].get('xmp_preserve_rating', True)
-            do_preserve_color_label = options['advanced'].get('xmp_preserve_color_label', True)
-
-            # Leggi campi scalari esistenti nel sidecar se almeno un campo è in modalità preserva
-            existing_scalar = {}
-            any_preserve = (do_preserve_title or do_preserve_description
-                            or do_preserve_rating or do_preserve_color_label)
-            if any_preserve and sidecar_path.exists():
-                existing_scalar = self._read_existing_scalar_fields_from_xmp(sidecar_path)
-
-            # TITLE
-            title = image_item.image_data.get('title', '') or ''
-            if not title:
-                title = image_item.image_data.get('filename', '').split('.')[0]
-            if title:
-                if not do_preserve_title or not existing_scalar.get('title'):
-                    cmd.append(f"-XMP-dc:Title={title}")
-
-            # DESCRIPTION
-            description = image_item.image_data.get('description', '')
-            if description:
-                description = description.replace("x-default ", "").strip()
-                if not do_preserve_description or not existing_scalar.get('description'):
-                    cmd.append(f"-XMP-dc:Description={description}")
-
-            # RATING (XMP-xmp:Rating)
-            rating = image_item.image_data.get('lr_rating') or image_item.image_data.get('rating')
-            if rating is not None:
-                try:
-                    rating_int = int(rating)
-                    if 1 <= rating_int <= 5:
-                        if not do_preserve_rating or existing_scalar.get('rating') is None:
-                            cmd.append(f"-XMP-xmp:Rating={rating_int}")
-                except (ValueError, TypeError):
-                    pass
-
-            # COLOR LABEL (XMP-xmp:Label — standard Adobe/Lightroom)
-            color_label = image_item.image_data.get('color_label', '') or ''
-            if color_label:
-                if not do_preserve_color_label or not existing_scalar.get('color_label'):
-                    cmd.append(f"-XMP-xmp:Label={color_label}")
-
-            # HIERARCHICALSUBJECT: lettura unica, filtro combinato, scrittura unica
-            # Gestisce tre rami: AI|Taxonomy (BioCLIP), GeOFF| (geo), AI|Tags| (LLM tags)
-            bioclip_taxonomy_raw = image_item.image_data.get('bioclip_taxonomy', '')
-            geo_hierarchy = image_item.image_data.get('geo_hierarchy', '')
-            llm_tags_raw = image_item.image_data.get('llm_tags', '')
-
-            bioclip_hier_path = None
-            if bioclip_taxonomy_raw:
-                try:
-                    from embedding_generator import EmbeddingGenerator
-                    taxonomy = json.loads(bioclip_taxonomy_raw) if isinstance(bioclip_taxonomy_raw, str) else bioclip_taxonomy_raw
-                    if taxonomy and isinstance(taxonomy, list):
-                        bioclip_hier_path = EmbeddingGenerator.build_hierarchical_taxonomy(taxonomy, prefix="AI|Taxonomy")
-                except Exception as e:
-                    logger.warning(f"Errore build tassonomia BioCLIP sidecar: {e}")
-
-            llm_hier_paths = []
-            if llm_tags_raw:
-                try:
-                    llm_list = json.loads(llm_tags_raw) if isinstance(llm_tags_raw, str) else llm_tags_raw
-                    if isinstance(llm_list, list):
-                        llm_hier_paths = [f"AI|Tags|{t}" for t in llm_list if t and str(t).strip()]
-                except Exception:
-                    pass
-
-            if bioclip_hier_path or geo_hierarchy or llm_hier_paths:
-                # Lettura unica degli HS esistenti: rimuove solo i rami che verranno riscritti.
-                existing_hier_base = []
-                if sidecar_path.exists():
-                    try:
-                        hier_result = subprocess.run(
-                            ['exiftool', '-j', '-XMP-lr:HierarchicalSubject', str(sidecar_path)],
-                            capture_output=True, text=True, timeout=10,
-                            **subprocess_creation_kwargs()
-                        )
-                        if hier_result.returncode == 0 and hier_result.stdout.strip():
-                            hier_data = json.loads(hier_result.stdout)
-                            if hier_data:
-                                hs = hier_data[0].get('HierarchicalSubject', [])
-                                if isinstance(hs, str):
-                                    hs = [hs]
-                                existing_hier_base = [
-                                    s for s in hs
-                                    if not (bioclip_hier_path and s.startswith('AI|Taxonomy'))
-                                    and not (geo_hierarchy and s.startswith('GeOFF|'))
-                                    and not (do_overwrite_ai_tags and llm_hier_paths and s.startswith('AI|Tags|'))
-                                ]
-                    except Exception:
-                        pass
-
-                # Scrittura unica: un solo "=" seguito da tutti i +=
-                cmd.append("-XMP-lr:HierarchicalSubject=")
-                for subject in existing_hier_base:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={subject}")
-                if bioclip_hier_path:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={bioclip_hier_path}")
-                if geo_hierarchy:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={geo_hierarchy}")
-                for llm_path in llm_hier_paths:
-                    cmd.append(f"-XMP-lr:HierarchicalSubject+={llm_path}")
-
-            cmd.append(str(sidecar_path))
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30,
-                                    **subprocess_creation_kwargs())
-
-            if result.returncode == 0:
-                self._update_database_sync_state(image_file, 'PERFECT_SYNC')
-                return True
-            else:
-                logger.error("ExifTool errore: %s", result.stderr)
-                return False
-
-        except Exception as e:
-            logger.error("Errore scrittura XMP Lightroom: %s", e, exc_info=True)
-            return False
-
-    def _update_database_sync_state(self, image_file: Path, new_state: str):
-        """Aggiorna sync_state nel database dopo export XMP"""
-        try:
-            config = self._load_config()
-            if not config:
-                return
-            
-            from db_manager_new import DatabaseManager
-            db_manager = DatabaseManager(config['paths']['database'])
-        
-            db_manager.cursor.execute(
-               "UPDATE images SET sync_state = ? WHERE filepath = ?",
-                (new_state, str(image_file))
-            )
-            db_manager.conn.commit()
-            db_manager.close()
-
-        except Exception as e:
-            logger.error("Errore aggiornamento sync_state: %s", e, exc_info=True)
-
-    def _read_existing_scalar_fields_from_xmp(self, xmp_path: Path) -> dict:
-        """Legge Title, Description, Rating e Color Label dal sidecar per evitare sovrascritture."""
-        result = {}
-        if not xmp_path.exists():
-            return result
-        try:
-            import subprocess, json
-            cmd = [
-                "exiftool", "-j",
-                "-XMP-dc:Title", "-XMP-dc:Description",
-                "-XMP-xmp:Rating", "-XMP-xmp:Label",
-                str(xmp_path)
-            ]
-            r = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
-                              **subprocess_creation_kwargs())
-            if r.returncode == 0 and r.stdout.strip():
-                data = json.loads(r.stdout)
-                if data:
-                    title_raw = data[0].get('Title', '')
-                    if isinstance(title_raw, dict):
-                        title_raw = title_raw.get('x-default', '') or next(iter(title_raw.values()), '')
-                    result['title'] = str(title_raw).strip() if title_raw else ''
-
-                    desc_raw = data[0].get('Description', '')
-                    if isinstance(desc_raw, dict):
-                        desc_raw = desc_raw.get('x-default', '') or next(iter(desc_raw.values()), '')
-                    result['description'] = str(desc_raw).strip() if desc_raw else ''
-
-                    rating_raw = data[0].get('Rating', None)
-                    if rating_raw is not None:
-                        try:
-                            result['rating'] = int(rating_raw)
-                        except (ValueError, TypeError):
-                            pass
-
-                    label_raw = data[0].get('Label', '')
-                    result['color_label'] = str(label_raw).strip() if label_raw else ''
-
-        except Exception as e:
-            logger.warning("Errore lettura campi scalari da sidecar esistente: %s", e, exc_info=True)
-        return result
-
-    def _read_existing_keywords_from_xmp(self, xmp_path: Path) -> list:
-        """Legge keywords esistenti da file XMP per merge intelligente"""
-        try:
-            if not xmp_path.exists():
-                return []
-            
-            import subprocess
-            
-            # Usa ExifTool per leggere keywords esistenti
-            cmd = ["exiftool", "-XMP-dc:Subject", "-j", str(xmp_path)]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10,
-                                    **subprocess_creation_kwargs())
-            
-            if result.returncode != 0:
-                logger.warning("Errore lettura XMP esistente: %s", result.stderr)
-                return []
-            
-            # Parse JSON output di ExifTool
-            import json
-            data = json.loads(result.stdout)
-            
-            if not data or not isinstance(data, list) or len(data) == 0:
-                return []
-            
-            # Estrai Subject (keywords)
-            subjects = data[0].get('Subject', [])
-            
-            # Normalizza in lista se è stringa singola
-            if isinstance(subjects, str):
-                subjects = [subjects]
-            elif not isinstance(subjects, list):
-                subjects = []
-            
-            # FILTRA KEYWORDS MALFORMATI (con pipe o altri separatori)
-            clean_keywords = []
-            for keyword in subjects:
-                if '|' in keyword:
-                    logger.warning("Scartato keyword malformato: %s", keyword)
-                    continue
-                elif keyword.strip():  # Aggiungi solo se non vuoto
-                    clean_keywords.append(keyword.strip())
-            
-            return clean_keywords
-            
-        except Exception as e:
-            logger.error("Errore lettura keywords XMP esistenti: %s", e, exc_info=True)
-            return []
-
-    def _copy_photos(self, image_items, options):
-        """
-        Copia foto originali nella directory di destinazione.
-
-        Se copy_preserve_structure=True usa compute_common_roots/compute_dest_path
-        per ricreare la struttura originale, gestendo foto da dischi diversi
-        (Windows: C_drive/D_drive, macOS: /Volumes/<Nome>, Linux: /mnt/<nome>).
-
-        Returns:
-            tuple: (copy_count, copy_failed, copy_skipped)
-        """
-        single_dir = options['path']['single_dir']
-        if not single_dir:
-            return 0, 0, 0
-
-        output_dir = Path(single_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        preserve_structure = options['format'].get('copy_preserve_structure', False)
-        overwrite = options['format'].get('copy_overwrite', False)
-        exclude_gps = options['format'].get('copy_exclude_gps', False)
-        exclude_exif = options['format'].get('copy_exclude_exif', False)
-
-        copy_count = 0
-        copy_failed = 0
-        copy_skipped = 0
-
-        # Pre-calcola radici comuni per device se struttura attiva
-        common_roots = {}
-        if preserve_structure:
-            common_roots = compute_common_roots(image_items)
-            logger.debug(
-                f"Struttura attiva: {len(common_roots)} device rilevati, "
-                f"multi-disco={'Sì' if len(common_roots) > 1 else 'No'}"
-            )
-
-        progress = QProgressDialog(
-            t("export.progress.copy_running"),
-            t("export.progress.cancel"),
-            0,
-            len(image_items),
-            self
-        )
-        progress.setWindowTitle(t("export.group.copy_photos"))
-        progress.setModal(True)
-        apply_popup_style(progress)
-        progress.show()
-        QApplication.processEvents()
-
-        for i, image_item in enumerate(image_items):
-            if progress.wasCanceled():
-                break
-
-            progress.setValue(i)
-            filename = image_item.image_data.get('filename', 'unknown')
-            progress.setLabelText(t("export.progress.copy_label", filename=filename))
-            QApplication.processEvents()
-
-            try:
-                source_path = Path(image_item.image_data.get('filepath', ''))
-                if not source_path.exists():
-                    logger.warning(f"File non trovato per copia: {source_path}")
-                    copy_failed += 1
-                    continue
-
-                if preserve_structure:
-                    # Calcola destinazione mantenendo la struttura originale
-                    dest_path = compute_dest_path(source_path, output_dir, common_roots)
-                    dest_path.parent.mkdir(parents=True, exist_ok=True)
-                else:
-                    # Copia piatta: nome file invariato nella directory di output
-                    dest_path = output_dir / source_path.name
-
-                # Gestione conflitti coerente in entrambe le modalità
-                if dest_path.exists():
-                    if not overwrite:
-                        logger.debug(f"File già presente, saltato: {dest_path.name}")
-                        copy_skipped += 1
-                        continue
-                    # overwrite=True: shutil.copy2 sovrascrive silenziosamente
-
-                shutil.copy2(source_path, dest_path)
-
-                # Strip GPS e/o EXIF dalla copia (mai dall'originale)
-                if exclude_gps or exclude_exif:
-                    strip_cmd = ["exiftool", "-overwrite_original"]
-                    if exclude_gps:
-                        strip_cmd.append("-GPS:All=")
-                    if exclude_exif:
-                        strip_cmd.append("-EXIF:All=")
-                    strip_cmd.append(str(dest_path))
-                    import subprocess as _sp
-                    _sp.run(strip_cmd, capture_output=True)
-
-                copy_count += 1
-
-            except Exception as e:
-                logger.error(f"Errore copia {filename}: {e}")
-                copy_failed += 1
-
-        progress.setValue(len(image_items))
-        progress.close()
-
-        return copy_count, copy_failed, copy_skipped
-
-    def _get_file_capabilities(self, filepath):
-        """Analizza le capacità di scrittura metadata per tipo file"""
-        ext = Path(filepath).suffix.lower()
-        return {
-            'can_embedded': ext in ['.jpg', '.jpeg', '.tif', '.tiff', '.dng'],
-            'is_raw': ext in ['.cr2', '.nef', '.arw', '.raf', '.orf', '.rw2', '.cr3', '.rwl', '.srw', '.pef', '.3fr', '.fff', '.iiq', '.mos', '.mrw', '.x3f'],
-            'is_dng': ext == '.dng',
-            'extension': ext
-        }
+        return parse_tags(tags_data)
 
     def _load_config(self):
         """Carica configurazione"""
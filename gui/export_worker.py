@@ -0,0 +1,102 @@
+"""
+Export Worker Thread - Export XMP e copia foto fuori dal thread GUI
+Scritture su ExifTool stay_open (xmp_export), copie in parallelo con
+manifest di ripresa (export_jobs), annullabili tra un file e l'altro
+"""
+
+from PyQt6.QtCore import QThread, pyqtSignal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class XMPExportWorker(QThread):
+    """
+    Worker thread per l'export XMP sidecar/embedded
+    Emette un risultato per file (ExportResult) a fine export
+    """
+
+    # Segnali
+    progress = pyqtSignal(int, str)           # foto concluse, filename
+    completed = pyqtSignal(list, bool)        # lista ExportResult, annullato
+    error = pyqtSignal(str)                   # messaggio errore
+
+    def __init__(self, items, options, db_path=None, writers=None, parent=None):
+        """
+        Args:
+            items: lista di dict image_data (righe catalogo)
+            options: opzioni di ExportTab.get_export_options()
+            db_path: catalogo per aggiornare sync_state dei sidecar scritti
+            writers: processi ExifTool di scrittura (None = default)
+            parent: tab di export (MainWindow ferma i QThread figli alla chiusura)
+        """
+        super().__init__(parent)
+        from xmp_export import XMPExportEngine, DEFAULT_WRITERS
+        self.items = items
+        self.db_path = db_path
+        self.engine = XMPExportEngine(options, writers or DEFAULT_WRITERS)
+
+    def run(self):
+        """Esegue l'export (thread worker)"""
+        try:
+            from xmp_export import STATUS_OK, mark_synced
+            results = self.engine.run(self.items, progress=self.progress.emit)
+            if self.db_path:
+                mark_synced(self.db_path, [r.filepath for r in results
+                                           if r.kind == 'sidecar' and r.status == STATUS_OK])
+            self.completed.emit(results, self.engine.canceled)
+        except Exception as e:
+            logger.error(f"Errore worker export XMP: {e}", exc_info=True)
+            self.error.emit(str(e))
+
+    def cancel(self):
+        """Richiesta di annullamento (chiamato dal main thread)"""
+        self.engine.cancel()
+
+    def stop(self):
+        """Alias di cancel() per MainWindow._stop_running_threads"""
+        self.cancel()
+
+
+class CopyExportWorker(QThread):
+    """
+    Worker thread per la copia delle foto originali
+    Emette un risultato per file (ExportResult, kind 'copy') a fine copia
+    """
+
+    # Segnali
+    progress = pyqtSignal(int, str)           # foto concluse, filename
+    completed = pyqtSignal(list, bool)        # lista ExportResult, annullato
+    error = pyqtSignal(str)                   # messaggio errore
+
+    def __init__(self, items, options, workers=None, per_device=None, parent=None):
+        """
+        Args:
+            items: lista di dict image_data (righe catalogo)
+            options: opzioni di ExportTab.get_export_options()
+            workers: copie in parallelo (None = default)
+            per_device: copie in parallelo per device di destinazione (None = default)
+            parent: tab di export (MainWindow ferma i QThread figli alla chiusura)
+        """
+        super().__init__(parent)
+        from export_jobs import CopyExportEngine, DEFAULT_COPY_WORKERS, DEFAULT_PER_DEVICE
+        self.items = items
+        self.engine = CopyExportEngine(options, workers or DEFAULT_COPY_WORKERS,
+                                       per_device or DEFAULT_PER_DEVICE)
+
+    def run(self):
+        """Esegue la copia (thread worker)"""
+        try:
+            results = self.engine.run(self.items, progress=self.progress.emit)
+            self.completed.emit(results, self.engine.canceled)
+        except Exception as e:
+            logger.error(f"Errore worker copia foto: {e}", exc_info=True)
+            self.error.emit(str(e))
+
+    def cancel(self):
+        """Richiesta di annullamento (chiamato dal main thread)"""
+        self.engine.cancel()
+
+    def stop(self):
+        """Alias di cancel() per MainWindow._stop_running_threads"""
+        self.cancel()
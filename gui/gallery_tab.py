@@ -4,10 +4,10 @@ Logica principale: ricerca, BioCLIP, gestione tag, XMP Sync
 """
 
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QScrollArea, QPushButton, QMessageBox,
+    QPushButton, QMessageBox,
     QApplication, QProgressDialog, QSizePolicy, QComboBox,
     QDialog, QFormLayout, QDoubleSpinBox, QSpinBox, QDialogButtonBox, QCheckBox,
     QRadioButton, QButtonGroup
@@ -24,9 +24,10 @@ from utils.tag_utils import normalize_tags
 
 # Import componenti UI dal modulo widgets
 from gui.gallery_widgets import (
-    ImageCard, FlowLayout, UserTagDialog, RemoveTagDialog, LLMTagDialog, COLORS,
+    ImageCard, UserTagDialog, RemoveTagDialog, LLMTagDialog, COLORS,
     apply_popup_style
 )
+from gui.gallery_view import GalleryModel, GalleryView
 
 # Import XMP Manager condiviso
 try:
@@ -100,8 +101,8 @@ class ViewportXMPManager:
     """Gestisce XMP check solo per card visibili"""
     def enable_viewport_checking(self):
         """Abilita controllo viewport + check automatico post-display"""
-        if hasattr(self.gallery, 'scroll_area'):
-            scroll_bar = self.gallery.scroll_area.verticalScrollBar()
+        if hasattr(self.gallery, 'view'):
+            scroll_bar = self.gallery.view.verticalScrollBar()
             scroll_bar.valueChanged.connect(self._on_scroll)
         
             # CHECK AUTOMATICO dopo che display_results è completato
@@ -155,28 +156,56 @@ class ViewportXMPManager:
     
     def _get_visible_cards(self):
         """
-        Calcola card attualmente visibili nel viewport dello scroll area.
-        Usa geometria reale: mapTo(viewport) + rect intersection.
-        (isVisible() ritorna True per tutte le card nel DOM — non usare)
+        Righe della gallery attualmente nel viewport (GalleryItem).
+        GalleryView.visible_items: ricerca binaria sulle posizioni della griglia,
+        non scorre tutti i risultati.
         """
-        if not hasattr(self.gallery, 'cards') or not hasattr(self.gallery, 'scroll_area'):
+        if not hasattr(self.gallery, 'view'):
             return []
+        return self.gallery.view.visible_items()
 
-        from PyQt6.QtCore import QPoint, QRect
-        viewport = self.gallery.scroll_area.viewport()
-        viewport_rect = viewport.rect()
 
-        visible_cards = []
-        for card in self.gallery.cards:
-            try:
-                pos = card.mapTo(viewport, QPoint(0, 0))
-                card_rect = QRect(pos.x(), pos.y(), card.width(), card.height())
-                if viewport_rect.intersects(card_rect):
-                    visible_cards.append(card)
-            except Exception:
-                continue
+class SimilarSearchWorker(QThread):
+    """Esegue "trova simili" DINOv2 (similarity_search) fuori dal thread GUI."""
+    finished = pyqtSignal(list)
+    error    = pyqtSignal(str)
+
+    def __init__(self, db_path, ref_id, threshold, max_results, ref_dt=None, session_minutes=None):
+        super().__init__()
+        self.db_path         = db_path
+        self.ref_id          = ref_id
+        self.threshold       = threshold
+        self.max_results     = max_results
+        self.ref_dt          = ref_dt
+        self.session_minutes = session_minutes
+        self.empty_reason    = None
+        self._cancelled      = False
+
+    def cancel(self):
+        self._cancelled = True
 
-        return visible_cards
+    def run(self):
+        db_manager = None
+        try:
+            from db_manager_new import DatabaseManager
+            from similarity_search import SimilaritySearch
+
+            db_manager = DatabaseManager(self.db_path)
+            engine = SimilaritySearch(db_manager)
+            results = engine.find_similar(
+                self.ref_id, self.threshold, self.max_results,
+                ref_dt=self.ref_dt, session_minutes=self.session_minutes,
+                cancel_flag=lambda: self._cancelled,
+            )
+            self.empty_reason = engine.last_empty_reason
+            if not self._cancelled:
+                self.finished.emit(results)
+        except Exception as e:
+            if not self._cancelled:
+                self.error.emit(str(e))
+        finally:
+            if db_manager is not None:
+                db_manager.close()
 #----------------------------------------------------------------
 
 
@@ -214,7 +243,8 @@ class GalleryTab(QWidget):
         self.current_results = []
         self.selected_items = []
         self.config_path = Path('config_new.yaml')
-        self.cards = []
+        # Righe della griglia virtualizzata (self.cards = gallery_model.items)
+        self.gallery_model = GalleryModel(self)
         # XMP Manager condiviso — inizializzato dopo init_ui() che crea i radio
         self.shared_xmp_manager = None  # verrà creato in init_ui dopo _build_sidecar_bar               
         # Imposta policy resize
@@ -232,7 +262,7 @@ class GalleryTab(QWidget):
             return
 
         # Prendi solo le card attualmente a schermo
-        visible_cards = [card for card in self.cards if card.isVisible()]
+        visible_cards = self.view.visible_items()
         if not visible_cards:
             return
 
@@ -445,14 +475,14 @@ class GalleryTab(QWidget):
         
         layout.addLayout(action_bar)
         
-        # Scroll area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.scroll_area.setStyleSheet(f"""
-            QScrollArea {{
+        # Griglia virtualizzata: widget e layout solo per le righe visibili
+        self.view = GalleryView()
+        self.view.setModel(self.gallery_model)
+        self.view.setStyleSheet(f"""
+            QListView {{
                 background-color: {COLORS['grafite']};
                 border: none;
+                padding: 5px;
             }}
             QScrollBar:vertical {{
                 background-color: {COLORS['grafite']};
@@ -468,31 +498,44 @@ class GalleryTab(QWidget):
             }}
         """)
         
-        self.scroll_widget = QWidget()
-        self.scroll_widget.setStyleSheet(f"background-color: {COLORS['grafite']};")
-        self.scroll_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
-        self.flow_layout = FlowLayout()
-        self.scroll_widget.setLayout(self.flow_layout)
-        
-        self.scroll_area.setWidget(self.scroll_widget)
-        layout.addWidget(self.scroll_area)
+        self.view.selectionModel().selectionChanged.connect(self._on_view_selection_changed)
+        self.view.context_menu_requested.connect(self._show_item_menu)
+        self.view.item_activated.connect(lambda item: self._action_host(item)._open_external())
+        layout.addWidget(self.view)
+
+        self.empty_label = QLabel(t("gallery.label.empty_state"))
+        self.empty_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.empty_label.setStyleSheet(f"color: {COLORS['grigio_medio']}; font-size: 14px; padding: 50px;")
+        self.empty_label.hide()
+        layout.addWidget(self.empty_label)
         # Abilita controllo viewport XMP dopo setup UI
         self.viewport_xmp_manager.enable_viewport_checking()
      
+    @property
+    def cards(self):
+        """Righe della gallery (GalleryItem) nell'ordine visualizzato."""
+        return self.gallery_model.items
+
     def get_selected_images(self):
         """Recupera la lista delle immagini selezionate nella gallery"""
         return [card for card in self.cards if card.is_selected()]   
-    
-    def resizeEvent(self, event):
-        """Ricalcola layout quando la finestra cambia dimensione"""
-        super().resizeEvent(event)
-        if self.cards:
-            QTimer.singleShot(50, self._do_relayout)
-    
-    def _do_relayout(self):
-        # Forza il ricalcolo del layout
-        self.flow_layout.invalidate()
-        self.flow_layout.activate()
+
+    def _action_host(self, item):
+        """ImageCard senza UI che esegue le azioni della card per una riga della vista."""
+        host = getattr(self, '_host_card', None)
+        if host is not None and host._item is item:
+            return host
+        if host is not None:
+            host.deleteLater()
+        host = ImageCard.for_item(item, self)
+        host.find_similar_requested.connect(self.find_similar)
+        host.bioclip_requested.connect(self.run_bioclip_batch)
+        host.llm_tagging_requested.connect(self.run_llm_tagging_batch)
+        self._host_card = host
+        return host
+
+    def _show_item_menu(self, item, global_pos):
+        self._action_host(item).show_context_menu(global_pos)
 
     def _toggle_sort_direction(self):
         """Inverte la direzione di ordinamento"""
@@ -506,7 +549,7 @@ class GalleryTab(QWidget):
         self._apply_sort()
 
     def _apply_sort(self):
-        """Riordina le card nel layout SENZA ricrearle (preserva badge XMP)"""
+        """Riordina le righe del modello SENZA ricrearle (preserva badge XMP e selezione)"""
         if not self.cards:
             return
 
@@ -550,27 +593,9 @@ class GalleryTab(QWidget):
                 return
             sorted_cards = sorted(self.cards, key=key_fn, reverse=reverse)
 
-        # Riordina _items nel FlowLayout senza distruggere i widget
-        item_map = {}
-        for item in self.flow_layout._items:
-            w = item.widget()
-            if w:
-                item_map[id(w)] = item
-
-        new_items = []
-        for card in sorted_cards:
-            item = item_map.get(id(card))
-            if item:
-                new_items.append(item)
-
-        self.flow_layout._items = new_items
-        self.cards = sorted_cards
+        self.gallery_model.set_order(sorted_cards)
         self.current_results = [c.image_data for c in sorted_cards]
-
-        # Ricalcola geometria senza ricreare widget
-        self.flow_layout.invalidate()
-        self.flow_layout.activate()
-        QTimer.singleShot(10, self._do_relayout)
+        self._sync_selection()
 
         # Accoda al worker XMP le card senza badge (ora potrebbero essere visibili)
         uncached = [c for c in sorted_cards if getattr(c, '_xmp_state_cache', None) is None]
@@ -578,16 +603,13 @@ class GalleryTab(QWidget):
             QTimer.singleShot(100, lambda: refresh_xmp_badges(uncached, "sort_reorder"))
 
     def display_results(self, results):
-        """Mostra risultati come griglia di card (creazione a batch per evitare freeze)"""
-        # Cancella eventuale batch in corso da ricerca precedente
-        self._batch_gen = getattr(self, '_batch_gen', 0) + 1
-
+        """Mostra risultati nella griglia virtualizzata (righe create al volo dal modello)"""
         # Resetta checker e badge queue prima di ogni nuova gallery
         # per liberare riferimenti a card stale di ricerche precedenti
         self.viewport_xmp_manager.reset_for_new_gallery()
 
-        self.flow_layout.clear_items()
-        self.cards.clear()
+        # Il reset del modello non emette selectionChanged
+        self.gallery_model.set_results(results)
         self.selected_items.clear()
 
         self.current_results = results
@@ -605,50 +627,14 @@ class GalleryTab(QWidget):
         self.select_all_btn.setEnabled(has_results)
         self.deselect_all_btn.setEnabled(False)
 
+        self.view.setVisible(has_results)
+        self.empty_label.setVisible(not has_results)
         if count == 0:
-            no_results = QLabel(t("gallery.label.empty_state"))
-            no_results.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            no_results.setStyleSheet(f"color: {COLORS['grigio_medio']}; font-size: 14px; padding: 50px;")
-            self.flow_layout.addWidget(no_results)
-            return
-
-        # Creazione a batch: cede controllo all'event loop tra un lotto e l'altro
-        self._batch_results = list(results)
-        self._batch_index = 0
-        self._batch_size = 25
-        self._create_next_batch(self._batch_gen)
-
-    def _create_next_batch(self, gen):
-        """Crea il prossimo lotto di card, cedendo controllo all'event loop tra i lotti"""
-        if gen != self._batch_gen:
             return
 
-        end = min(self._batch_index + self._batch_size, len(self._batch_results))
-
-        for i in range(self._batch_index, end):
-            image_data = self._batch_results[i]
-            card = ImageCard(image_data, parent=self)
-            card.selection_changed.connect(self._on_item_selection_changed)
-            card.find_similar_requested.connect(self.find_similar)
-            card.bioclip_requested.connect(self.run_bioclip_batch)
-            card.llm_tagging_requested.connect(self.run_llm_tagging_batch)
-            self.cards.append(card)
-            self.flow_layout.addWidget(card)
-
-        is_first_batch = (self._batch_index == 0)
-        self._batch_index = end
-
-        if self._batch_index < len(self._batch_results):
-            # Dopo il primo batch: relayout per mostrare subito le card visibili
-            if is_first_batch:
-                self._do_relayout()
-            QTimer.singleShot(0, lambda g=gen: self._create_next_batch(g))
-        else:
-            # Tutti i batch completati
-            self._batch_results = None  # Libera riferimento
-            QTimer.singleShot(10, self._do_relayout)
-            # Refresh badge XMP: card visibili nel viewport elaborate per prime
-            QTimer.singleShot(200, self._refresh_badges_viewport_first)
+        self.view.scrollToTop()
+        # Refresh badge XMP: righe visibili nel viewport elaborate per prime
+        QTimer.singleShot(200, self._refresh_badges_viewport_first)
     
     def _refresh_badges_viewport_first(self):
         """
@@ -664,14 +650,28 @@ class GalleryTab(QWidget):
                    [c for c in all_cards if id(c) not in visible_ids])
         refresh_xmp_badges(ordered, "gallery_loaded")
 
-    def _on_item_selection_changed(self, item, selected):
-        if selected:
-            if item not in self.selected_items:
-                self.selected_items.append(item)
-        else:
-            if item in self.selected_items:
-                self.selected_items.remove(item)
+    def _on_view_selection_changed(self, selected, deselected):
+        self._sync_selection()
+
+    def _sync_selection(self):
+        """Allinea flag delle righe e selected_items al selection model della vista."""
+        rows = {index.row() for index in self.view.selectionModel().selectedIndexes()}
+        for row, item in enumerate(self.cards):
+            item._selected = row in rows
+        # Stessa lista: main_window/export_tab ne tengono il riferimento
+        self.selected_items[:] = [item for item in self.cards if item._selected]
         self._update_selection_ui()
+
+    def remove_items(self, items):
+        """Toglie dalla griglia le righe indicate (foto eliminate dal catalogo)."""
+        self.gallery_model.remove_items(items)
+        self._sync_selection()
+        count_left = len(self.cards)
+        self.select_all_btn.setEnabled(count_left > 0)
+        self.count_label.setText(
+            t("gallery.label.count", count=count_left) if count_left > 0
+            else t("gallery.label.no_results_count")
+        )
     
     def _update_selection_ui(self):
         count = len(self.selected_items)
@@ -683,13 +683,10 @@ class GalleryTab(QWidget):
             self.deselect_all_btn.setEnabled(False)
     
     def select_all(self):
-        for card in self.cards:
-            card.set_selected(True)
+        self.view.selectAll()
     
     def deselect_all(self):
-        # Crea copia della lista prima di iterare (evita mutation durante ciclo)
-        for item in list(self.selected_items):
-            item.set_selected(False)
+        self.view.clearSelection()
     
     def _reload_sync_states_from_db(self):
         """Ricarica sync_state dal database per tutti i current_results"""
@@ -816,36 +813,6 @@ class GalleryTab(QWidget):
             filter_session = chk_session.isChecked()
             session_minutes = spin_minutes.value()
 
-            progress = QProgressDialog(self)
-            progress.setWindowTitle(t("gallery.progress.similar_title"))
-            progress.setLabelText(t("gallery.progress.similar_loading"))
-            progress.setCancelButtonText(t("gallery.progress.cancel"))
-            progress.setMinimumWidth(400)
-            progress.setMinimumDuration(0)
-            progress.setRange(0, 0)
-            progress.setWindowModality(Qt.WindowModality.WindowModal)
-            apply_popup_style(progress)
-            progress.show()
-            QApplication.processEvents()
-        
-            from db_manager_new import DatabaseManager
-            import numpy as np
-            import pickle
-        
-            db_manager = DatabaseManager(config['paths']['database'])
-        
-            ref_id = item.image_id
-            db_manager.cursor.execute(
-                "SELECT dinov2_embedding FROM images WHERE id = ?", (ref_id,)
-            )
-            row = db_manager.cursor.fetchone()
-
-            if not row or not row[0]:
-                progress.close()
-                QMessageBox.warning(self, t("gallery.msg.error_title"), t("gallery.msg.no_dinov2"))
-                db_manager.close()
-                return
-
             # Data di riferimento già disponibile nella card (evita seconda query e problemi di parsing)
             ref_date_str = (item.image_data.get('datetime_original')
                             or item.image_data.get('datetime_digitized')
@@ -858,106 +825,55 @@ class GalleryTab(QWidget):
                 QMessageBox.warning(self, t("gallery.msg.error_title"), t("gallery.msg.no_ref_date"))
                 filter_session = False
 
-            try:
-                # Deserializzazione corretta: raw float32 bytes (768 float = 3072 bytes)
-                # oppure pickle (formato legacy)
-                emb_raw = row[0]
-                if isinstance(emb_raw, bytes) and len(emb_raw) == 3072:
-                    ref_embedding = np.frombuffer(emb_raw, dtype=np.float32)
-                else:
-                    try:
-                        ref_embedding = np.frombuffer(emb_raw, dtype=np.float32)
-                        if ref_embedding.shape[0] != 768:
-                            ref_embedding = pickle.loads(emb_raw)
-                    except Exception:
-                        ref_embedding = pickle.loads(emb_raw)
-            except Exception as e:
-                logger.error(f"Errore deserializzazione embedding riferimento: {e}")
-                progress.close()
-                db_manager.close()
-                return
-
-            ref_norm = ref_embedding / np.linalg.norm(ref_embedding)
-            session_delta = timedelta(minutes=session_minutes) if filter_session else None
+            # Ricerca precedente ancora in corso: il risultato non interessa più
+            old_worker = getattr(self, '_similar_worker', None)
+            if old_worker is not None and old_worker.isRunning():
+                old_worker.cancel()
 
+            progress = QProgressDialog(self)
+            progress.setWindowTitle(t("gallery.progress.similar_title"))
             progress.setLabelText(t("gallery.progress.similar_comparing"))
-            QApplication.processEvents()
+            progress.setCancelButtonText(t("gallery.progress.cancel"))
+            progress.setMinimumWidth(400)
+            progress.setMinimumDuration(0)
+            progress.setRange(0, 0)
+            progress.setWindowModality(Qt.WindowModality.WindowModal)
+            apply_popup_style(progress)
 
-            db_manager.cursor.execute(
-                "SELECT * FROM images WHERE dinov2_embedding IS NOT NULL",
-                ()
+            # Matrice DINOv2 + top-k in background: la GUI resta reattiva
+            worker = SimilarSearchWorker(
+                config['paths']['database'], item.image_id, threshold, max_results,
+                ref_dt=ref_dt if filter_session else None,
+                session_minutes=session_minutes if filter_session else None,
             )
-            columns = [desc[0] for desc in db_manager.cursor.description]
-            all_rows = db_manager.cursor.fetchall()
-
-            progress.setRange(0, len(all_rows))
-            progress.setLabelText(t("gallery.progress.similar_analysis", n=len(all_rows)))
-
-            results = []
-            for i, row in enumerate(all_rows):
-                if progress.wasCanceled():
-                    db_manager.close()
-                    return
-
-                progress.setValue(i)
-                QApplication.processEvents()
-
-                image_data = dict(zip(columns, row))
-                emb_blob = image_data.get('dinov2_embedding')
-
-                if not emb_blob:
-                    continue
-
-                # Filtro sessione: scarta foto senza data o fuori finestra temporale
-                if session_delta is not None:
-                    img_date_str = (image_data.get('datetime_original')
-                                    or image_data.get('datetime_digitized')
-                                    or image_data.get('datetime_modified'))
-                    img_dt = _parse_db_datetime(img_date_str)
-                    if img_dt is None or abs((img_dt - ref_dt).total_seconds()) > session_delta.total_seconds():
-                        continue
+            self._similar_worker = worker
+            progress.canceled.connect(worker.cancel)
+            worker.finished.connect(lambda results: self._on_similar_finished(worker, progress, results, threshold))
+            worker.error.connect(lambda msg: self._on_similar_error(progress, msg))
+            worker.start()
+            progress.show()
 
-                try:
-                    # Deserializzazione corretta: raw float32 bytes (formato nuovo)
-                    # oppure pickle (formato legacy)
-                    if isinstance(emb_blob, bytes) and len(emb_blob) == 3072:
-                        img_embedding = np.frombuffer(emb_blob, dtype=np.float32)
-                    else:
-                        try:
-                            img_embedding = np.frombuffer(emb_blob, dtype=np.float32)
-                            if img_embedding.shape[0] != 768:
-                                img_embedding = pickle.loads(emb_blob)
-                        except Exception:
-                            img_embedding = pickle.loads(emb_blob)
-                    img_norm = img_embedding / np.linalg.norm(img_embedding)
-                    similarity = float(np.dot(ref_norm, img_norm))
-
-                    if similarity >= threshold:
-                        image_data['similarity_score'] = similarity
-                        results.append(image_data)
-                except Exception as e:
-                    logger.debug(f"Errore deserializzazione embedding DINOv2: {e}")
-                    continue
-                
-            
-            progress.close()
-            db_manager.close()
-            
-            results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            results = results[:max_results]
-            
-            if results:
-                self.display_results(results)
-                if self.parent_window:
-                    self.parent_window.update_status(t("gallery.status.similar_found", n=len(results)))
-            else:
-                QMessageBox.information(self, t("gallery.msg.result_title"), t("gallery.msg.no_similar", threshold=threshold))
-        
         except Exception as e:
             QMessageBox.critical(self, t("gallery.msg.critical_title"), t("gallery.msg.similar_error", error=e))
             import traceback
             traceback.print_exc()
 
+    def _on_similar_finished(self, worker, progress, results, threshold):
+        """Risultati di SimilarSearchWorker (thread GUI)."""
+        progress.close()
+        if worker.empty_reason == 'no_reference_embedding':
+            QMessageBox.warning(self, t("gallery.msg.error_title"), t("gallery.msg.no_dinov2"))
+        elif results:
+            self.display_results(results)
+            if self.parent_window:
+                self.parent_window.update_status(t("gallery.status.similar_found", n=len(results)))
+        else:
+            QMessageBox.information(self, t("gallery.msg.result_title"), t("gallery.msg.no_similar", threshold=threshold))
+
+    def _on_similar_error(self, progress, message):
+        progress.close()
+        QMessageBox.critical(self, t("gallery.msg.critical_title"), t("gallery.msg.similar_error", error=message))
+
     def run_bioclip_batch(self, items):
         """Esegui BioCLIP su batch di immagini"""
         try:
@@ -1201,14 +1117,20 @@ class GalleryTab(QWidget):
                 if not filepath.exists():
                     continue
                 #-------------------------------------------
+                # Payload salvato dal processing (cache su disco per file_hash):
+                # se presente nessuna decodifica del RAW
+                file_hash = item.image_data.get('file_hash')
+                llm_b64 = embedding_gen.cached_llm_payload(file_hash) if file_hash else None
+                llm_input = None
+
                 # Pre-processa immagine come nel Processing Tab
-                from raw_processor import RAWProcessor
-                raw_processor = RAWProcessor(config)
                 is_raw = filepath.suffix.lower() in ['.orf', '.cr2', '.nef', '.arw', '.dng', '.raf', '.cr3', '.nrw', '.srf', '.sr2', '.rw2', '.raw', '.pef', '.ptx', '.rwl', '.3fr', '.iiq', '.x3f']
 
-                if is_raw:
+                if not llm_b64 and is_raw:
+                    from raw_processor import RAWProcessor
+                    raw_processor = RAWProcessor(config)
                     llm_input = raw_processor.extract_thumbnail(filepath, profile_name='llm_vision')
-                else:
+                elif not llm_b64:
                     from PIL import Image
                     llm_profile = config.get('image_optimization', {}).get('profiles', {}).get('llm_vision', {})
                     llm_target = llm_profile.get('target_size', 768)
@@ -1303,6 +1225,8 @@ class GalleryTab(QWidget):
                         category_hint=category_hint,
                         location_hint=location_hint,
                         vernacular_name=vernacular_name,
+                        image_b64=llm_b64,
+                        file_hash=file_hash,
                     ) or {}
                 #-------------------------------------------
                 if not result:
@@ -1517,57 +1441,8 @@ class GalleryTab(QWidget):
             QMessageBox.critical(self, t("gallery.msg.clear_desc_error_title"), t("gallery.msg.clear_desc_error", error=e))
 
     def _refresh_cards(self, items):
-        """Ricrea le card aggiornate - Fix: mantiene posizione nel layout"""
-        updates = []
-        for item in items:
-            for i, card in enumerate(self.cards):
-                if card.image_id == item.image_id:
-                    # Trova posizione nel layout (può differire da self.cards)
-                    layout_pos = -1
-                    for li in range(self.flow_layout.count()):
-                        layout_item = self.flow_layout.itemAt(li)
-                        if layout_item and layout_item.widget() == card:
-                            layout_pos = li
-                            break
-                    updates.append((i, layout_pos, item.image_data, card.is_selected()))
-                    break
-
-        # Ordina per layout_pos decrescente per evitare shift degli indici
-        updates.sort(key=lambda x: x[1], reverse=True)
-
-        # Approccio sicuro: aggiorna le card interessate
-        for idx, layout_pos, image_data, was_selected in updates:
-            old_card = self.cards[idx]
-            if old_card in self.selected_items:
-                self.selected_items.remove(old_card)
-
-            # Rimuovi widget dal layout usando API corrette
-            self.flow_layout.removeWidget(old_card)
-            old_card.setParent(None)
-            old_card.deleteLater()
-
-            # Crea nuova card con parent=self per mantenere riferimento _gallery
-            new_card = ImageCard(image_data, parent=self)
-            new_card.selection_changed.connect(self._on_item_selection_changed)
-            new_card.find_similar_requested.connect(self.find_similar)
-            new_card.bioclip_requested.connect(self.run_bioclip_batch)
-            new_card.llm_tagging_requested.connect(self.run_llm_tagging_batch)
-            # Connetti segnali XMP Sync
-
-            # Aggiorna riferimenti
-            self.cards[idx] = new_card
-
-            # FIXED: Inserisci alla stessa posizione nel layout invece di appendere
-            if layout_pos >= 0:
-                self.flow_layout.insertWidget(layout_pos, new_card)
-            else:
-                self.flow_layout.addWidget(new_card)
-
-            if was_selected:
-                new_card.set_selected(True)
-                # NON aggiungere manualmente - set_selected emette segnale che lo fa
-
-        self._do_relayout()
+        """Aggiorna le righe con i dati nuovi (posizione, selezione e badge restano)"""
+        self.gallery_model.refresh_items(items)
     
     def _load_config(self):
         try:
@@ -1709,7 +1584,7 @@ class GalleryTab(QWidget):
             if hasattr(target_card, 'xmp_state') and target_card.xmp_state:
                 if 'OUT' in str(target_card.xmp_state) or 'DIRTY' in str(target_card.xmp_state):
                     # Attiva sincronizzazione automatica da XMP
-                    target_card._import_from_xmp_with_refresh([target_card])
+                    self._action_host(target_card)._import_from_xmp_with_refresh([target_card])
                     
                     if self.parent_window:
                         self.parent_window.update_status(f"Sincronizzati metadati XMP per {filepath.name}")
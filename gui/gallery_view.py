@@ -0,0 +1,651 @@
+"""
+Gallery View - Griglia virtualizzata dei risultati (modello + delegate)
+
+Prima GalleryTab creava per ogni risultato una ImageCard completa (QFrame
+con label, badge, checkbox, tooltip e connessioni), a lotti di 25 in un
+FlowLayout: 5000 risultati erano 5000 alberi di widget, e _do_layout li
+riposizionava tutti a ogni resize.
+
+Qui:
+  - GalleryItem: una riga (image_data, cache XMP e tooltip), oggetto Python
+    senza widget con l'interfaccia dati di ImageCard: è l'"item" passato
+    alle azioni, ai plugin, all'export e al badge manager
+  - GalleryModel: lista di GalleryItem; la thumbnail si chiede solo quando
+    il delegate dipinge la riga, cioè quando è visibile, più una pagina di
+    prefetch sotto il viewport a priorità bassa; le richieste delle righe
+    uscite dal viewport vengono annullate nel ThumbService. Lo stato del
+    file (disco/cartella/file mancante) lo verifica il lettore thumbnail,
+    non il delegate: nessuno stat nel thread GUI
+  - GalleryDelegate: disegna card, thumbnail, punteggi, badge XMP, rating
+  - GalleryView: QListView a griglia con dimensioni uniformi; la selezione
+    è quella del selection model, menu contestuale e doppio click passano
+    da una ImageCard senza UI (ImageCard.for_item) con le azioni esistenti
+
+Widget e layout dipendono solo dalle righe visibili, non dal numero di
+risultati.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PyQt6.QtWidgets import (
+    QListView, QStyledItemDelegate, QStyle, QStyleOptionButton,
+    QAbstractItemView, QApplication, QToolTip
+)
+from PyQt6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QItemSelectionModel, QObject, QRect,
+    QSize, QPoint, QEvent, QTimer, pyqtSignal
+)
+from PyQt6.QtGui import QPixmap, QPainter, QColor, QPen, QFont, QFontMetrics, QCursor
+
+from gui.gallery_widgets import (
+    ImageCard, COLORS, COLOR_LABELS, XMP_SUPPORT_AVAILABLE,
+    _ThumbSignals, _request_thumbnail, _get_cached_pixmap, _set_cached_pixmap,
+    _make_xmp_manager, _xmp_badge
+)
+from utils.thumb_service import get_thumb_service, PRIORITY_VISIBLE, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Geometria della card disegnata (stesse misure di ImageCard)
+CARD_WIDTH = ImageCard.CARD_WIDTH
+CARD_HEIGHT = 228
+THUMB_SIZE = ImageCard.THUMB_SIZE
+CARD_SPACING = 5            # metà della spaziatura del vecchio FlowLayout, per lato
+_MARGIN = 8
+_CHECK_SIZE = 16
+_THUMB_TOP = 32
+_SCORES_TOP = _THUMB_TOP + THUMB_SIZE + 6
+_STATUS_TOP = _SCORES_TOP + 18
+_CHIP_HEIGHT = 14
+
+_FILE_STATUS_LABELS = {
+    'no_disk': '⛔\nNO DISK',
+    'no_path': '⛔\nNO PATH',
+    'no_file': '⛔\nNO FILE',
+}
+
+
+class GalleryItem:
+    """Riga della gallery: stessa interfaccia dati di ImageCard, senza widget."""
+
+    def __init__(self, image_data, model=None):
+        self.image_data = image_data or {}
+        self.filepath = Path(self.image_data['filepath']) if self.image_data.get('filepath') else None
+        self.image_id = self.image_data.get('id')
+        self._model = model
+        self._selected = False
+        self._file_status = None
+        self._thumb_failed = False
+        # Cache stato XMP (scritta anche da XMPBadgeManager)
+        self._xmp_state_cache = None
+        self._xmp_info_cache = None
+        self.xmp_state = None
+        self.xmp_badge = None   # (testo, colore, classe, tooltip) dopo refresh_xmp_state
+
+    # Stesso codice di ImageCard: usano solo image_data, filepath e le cache
+    _check_file_status = ImageCard._check_file_status
+    get_unified_tags = ImageCard.get_unified_tags
+    _build_semantic_tooltip = ImageCard._build_semantic_tooltip
+
+    def file_status(self) -> Optional[str]:
+        """Stato del file dal lettore thumbnail (None finché non è verificato)."""
+        return self._file_status
+
+    def is_selected(self) -> bool:
+        return self._selected
+
+    def set_selected(self, selected: bool):
+        if self._model is not None:
+            self._model.select_item(self, selected)
+
+    def update(self):
+        """Ridisegna la riga nella vista."""
+        if self._model is not None:
+            self._model.item_changed(self)
+
+    def refresh_display(self):
+        self.update()
+
+    def _update_rating_color_display(self):
+        self.update()
+
+    def _invalidate_tooltip_cache(self):
+        """Invalida cache tooltip e tag unificati (dati della riga cambiati)."""
+        self.__dict__.pop('_cached_semantic_tooltip', None)
+        self.__dict__.pop('_unified_tags_cache', None)
+        self.update()
+
+    def refresh_xmp_state(self):
+        """Aggiorna il badge XMP dalla cache o analizzando i file (thread GUI)."""
+        if not XMP_SUPPORT_AVAILABLE or not self.filepath:
+            return
+        try:
+            if self._xmp_state_cache is not None and self._xmp_info_cache:
+                state, info = self._xmp_state_cache, self._xmp_info_cache
+            else:
+                state, info = _make_xmp_manager().analyze_xmp_sync_state(self.filepath, self.image_data)
+                if state is None or info is None:
+                    return
+                self._xmp_state_cache = state
+                self._xmp_info_cache = info
+            self.xmp_state = state
+            self.xmp_badge = _xmp_badge(state, info)
+            self.update()
+        except Exception as e:
+            logger.warning(f"Errore refresh stato XMP {self.filepath.name}: {e}")
+
+
+class _ItemThumbRequest(QObject):
+    """Richiesta thumbnail di una riga: riceve i segnali del loader nel thread GUI."""
+
+    def __init__(self, model: 'GalleryModel', item: GalleryItem, status_only: bool = False):
+        super().__init__(model)
+        self.model = model
+        self.item = item
+        self.status_only = status_only
+        self.signals = _ThumbSignals()
+        self.signals.status.connect(self._on_status)
+        self.signals.loaded.connect(self._on_loaded)
+        self.signals.failed.connect(self._on_failed)
+
+    def _on_status(self, status: str):
+        self.model._on_file_status(self, status)
+
+    def _on_loaded(self, data: bytes):
+        self.model._on_thumb_loaded(self, data)
+
+    def _on_failed(self):
+        self.model._on_thumb_loaded(self, None)
+
+
+class GalleryModel(QAbstractListModel):
+    """Risultati della gallery, una riga per foto."""
+
+    ItemRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items: List[GalleryItem] = []
+        self._rows: Dict[int, int] = {}                     # id(item) → riga
+        self._pending: Dict[str, _ItemThumbRequest] = {}    # filepath → richiesta in corso
+        self.selection_model = None                         # impostato da GalleryView
+
+    # ── QAbstractListModel ───────────────────────────────────────────
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.items):
+            return None
+        item = self.items[index.row()]
+        if role == self.ItemRole:
+            return item
+        if role == Qt.ItemDataRole.DisplayRole:
+            return item.image_data.get('filename', '')
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return item._build_semantic_tooltip()
+        return None
+
+    # ── Contenuto ────────────────────────────────────────────────────
+
+    def set_results(self, results):
+        """Sostituisce tutte le righe (nuova ricerca)."""
+        self.beginResetModel()
+        self.items = [GalleryItem(image_data, self) for image_data in results]
+        # Le thumbnail della ricerca precedente non ancora partite non servono più
+        service = get_thumb_service()
+        for key, request in self._pending.items():
+            if service.cancel(key):
+                request.deleteLater()
+        self._pending.clear()
+        self._reindex()
+        self.endResetModel()
+
+    def set_order(self, items: List[GalleryItem]):
+        """Riordina le righe mantenendo oggetti, selezione e cache."""
+        self.layoutAboutToBeChanged.emit()
+        old_items = self.items
+        self.items = list(items)
+        self._reindex()
+        # Indici persistenti (selezione, riga corrente) seguono il proprio item
+        old_indexes = self.persistentIndexList()
+        new_indexes = [
+            self.index_of(old_items[index.row()]) if index.row() < len(old_items) else QModelIndex()
+            for index in old_indexes
+        ]
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def remove_items(self, items):
+        """Toglie le righe indicate (es. foto eliminate dal catalogo)."""
+        rows = sorted({self._rows[id(item)] for item in items if id(item) in self._rows}, reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.items[row]
+            self.endRemoveRows()
+        if rows:
+            self._reindex()
+
+    def refresh_items(self, items):
+        """Righe con dati aggiornati nel DB: nuovi image_data, cache tooltip invalidate."""
+        updated = {item.image_id: item for item in items if getattr(item, 'image_id', None) is not None}
+        if not updated:
+            return
+        for item in self.items:
+            source = updated.get(item.image_id)
+            if source is None:
+                continue
+            if source is not item:
+                item.image_data = source.image_data
+            item._invalidate_tooltip_cache()
+
+    def index_of(self, item: GalleryItem) -> QModelIndex:
+        row = self._rows.get(id(item))
+        return self.index(row, 0) if row is not None else QModelIndex()
+
+    def item_changed(self, item: GalleryItem):
+        index = self.index_of(item)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+    def select_item(self, item: GalleryItem, selected: bool):
+        index = self.index_of(item)
+        if index.isValid() and self.selection_model is not None:
+            flag = QItemSelectionModel.SelectionFlag.Select if selected else QItemSelectionModel.SelectionFlag.Deselect
+            self.selection_model.select(index, flag)
+
+    def _reindex(self):
+        self._rows = {id(item): row for row, item in enumerate(self.items)}
+
+    # ── Thumbnail ────────────────────────────────────────────────────
+
+    def thumbnail(self, item: GalleryItem) -> Optional[QPixmap]:
+        """QPixmap in cache, altrimenti None e richiesta asincrona (una per file).
+
+        Stato del file non ancora verificato: anche con il QPixmap in cache
+        parte una richiesta, solo per lo stato.
+        """
+        if not item.filepath:
+            return None
+        pixmap = _get_cached_pixmap(str(item.filepath))
+        if pixmap is None or item.file_status() is None:
+            self._request(item, PRIORITY_VISIBLE, status_only=pixmap is not None)
+        return pixmap
+
+    def set_viewport(self, visible: List[GalleryItem], prefetch: List[GalleryItem]):
+        """Viewport cambiato: visibili in testa, prefetch dietro, il resto annullato."""
+        service = get_thumb_service()
+        visible_keys = {str(item.filepath) for item in visible if item.filepath}
+        keep = visible_keys | {str(item.filepath) for item in prefetch if item.filepath}
+        for key in [key for key in self._pending if key not in keep]:
+            # Già partita: arriva comunque e finisce nella cache QPixmap
+            if service.cancel(key):
+                self._pending.pop(key).deleteLater()
+        service.prioritize(key for key in visible_keys if key in self._pending)
+        for item in prefetch:
+            if (item.filepath and item.file_status() in (None, 'ok')
+                    and _get_cached_pixmap(str(item.filepath)) is None):
+                self._request(item, PRIORITY_BACKGROUND)
+
+    def _request(self, item: GalleryItem, priority: int, status_only: bool = False):
+        key = str(item.filepath)
+        if key in self._pending or item._thumb_failed:
+            return
+        request = _ItemThumbRequest(self, item, status_only)
+        self._pending[key] = request
+        _request_thumbnail(item.filepath, request.signals, priority, status_only)
+
+    def _on_file_status(self, request: _ItemThumbRequest, status: str):
+        """Stato del file dal lettore batch: se non c'è thumbnail da attendere, richiesta chiusa."""
+        item = request.item
+        item._file_status = status
+        if status != 'ok' or request.status_only:
+            key = str(item.filepath)
+            if self._pending.get(key) is request:
+                del self._pending[key]
+            request.deleteLater()
+        if status != 'ok':
+            self.item_changed(item)
+
+    def _on_thumb_loaded(self, request: _ItemThumbRequest, data: Optional[bytes]):
+        """Bytes dal worker (già 150px): QPixmap creato qui, nel thread GUI."""
+        item = request.item
+        key = str(item.filepath)
+        if self._pending.get(key) is request:
+            del self._pending[key]
+        request.deleteLater()
+
+        pixmap = QPixmap()
+        if data and pixmap.loadFromData(data):
+            # Scale solo se fallback sui bytes originali
+            if pixmap.width() > THUMB_SIZE or pixmap.height() > THUMB_SIZE:
+                pixmap = pixmap.scaled(
+                    THUMB_SIZE, THUMB_SIZE,
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation
+                )
+            _set_cached_pixmap(key, pixmap)
+        else:
+            item._thumb_failed = True
+        self.item_changed(item)
+
+
+def _score_chips(image_data) -> List[tuple]:
+    """Badge punteggi della prima riga: (testo, colore), come ImageCard."""
+    chips = []
+    for key, fmt, color in (
+        ('aesthetic_score', "AES: {:.1f}", COLORS['verde']),
+        ('technical_score', "TEC: {:.0f}", COLORS['blu_petrolio']),
+        ('similarity_score', "SEM: {:.2f}", COLORS['accento']),
+        ('final_score', "RANK: {:.2f}", COLORS['marrone_chiaro']),
+    ):
+        value = image_data.get(key)
+        if value is None:
+            continue
+        try:
+            chips.append((fmt.format(float(value)), color))
+        except (ValueError, TypeError):
+            pass
+    return chips
+
+
+def _rating_stars(image_data) -> str:
+    rating = image_data.get('lr_rating') or image_data.get('rating')
+    try:
+        rating_val = int(rating) if rating is not None else 0
+    except (ValueError, TypeError):
+        return ''
+    return '★' * rating_val if 1 <= rating_val <= 5 else ''
+
+
+def _color_label_hex(image_data) -> Optional[str]:
+    color_label = image_data.get('color_label')
+    if not color_label:
+        return None
+    color_hex = COLOR_LABELS.get(color_label)
+    if not color_hex:
+        for key, val in COLOR_LABELS.items():
+            if key.lower() == str(color_label).lower():
+                return val
+    return color_hex
+
+
+class GalleryDelegate(QStyledItemDelegate):
+    """Disegna una riga come la vecchia ImageCard."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._name_font = QFont()
+        self._name_font.setPixelSize(11)
+        self._name_font.setBold(True)
+        self._chip_font = QFont()
+        self._chip_font.setPixelSize(8)
+        self._chip_font.setBold(True)
+        self._chip_metrics = QFontMetrics(self._chip_font)
+        self._status_font = QFont()
+        self._status_font.setPixelSize(13)
+        self._status_font.setBold(True)
+        self._stars_font = QFont()
+        self._stars_font.setPixelSize(10)
+        self._stars_font.setBold(True)
+
+    def sizeHint(self, option, index):
+        return QSize(CARD_WIDTH, CARD_HEIGHT)
+
+    # ── Geometria ────────────────────────────────────────────────────
+
+    @staticmethod
+    def checkbox_rect(rect: QRect) -> QRect:
+        return QRect(rect.x() + _MARGIN, rect.y() + _MARGIN + 2, _CHECK_SIZE, _CHECK_SIZE)
+
+    @staticmethod
+    def thumb_rect(rect: QRect) -> QRect:
+        return QRect(rect.x() + (rect.width() - THUMB_SIZE) // 2, rect.y() + _THUMB_TOP, THUMB_SIZE, THUMB_SIZE)
+
+    def xmp_badge_rect(self, rect: QRect, item: GalleryItem) -> QRect:
+        if not item.xmp_badge:
+            return QRect()
+        width = self._chip_metrics.horizontalAdvance(item.xmp_badge[0]) + 8
+        return QRect(rect.x() + _MARGIN, rect.y() + _STATUS_TOP, width, _CHIP_HEIGHT)
+
+    # ── Disegno ──────────────────────────────────────────────────────
+
+    def paint(self, painter, option, index):
+        item = index.data(GalleryModel.ItemRole)
+        if item is None:
+            return
+        rect = option.rect
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        hover = bool(option.state & QStyle.StateFlag.State_MouseOver)
+
+        painter.save()
+        painter.setClipRect(rect)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        # Cornice: ambra se selezionata, come ImageCard._update_style
+        if selected:
+            border_color, bg_color = COLORS['ambra'], COLORS['grafite_light']
+        else:
+            border_color = COLORS['blu_petrolio_light'] if hover else COLORS['blu_petrolio']
+            bg_color = COLORS['grafite']
+        painter.setPen(QPen(QColor(border_color), 2))
+        painter.setBrush(QColor(bg_color))
+        painter.drawRoundedRect(rect.adjusted(1, 1, -1, -1), 6, 6)
+
+        # Header: checkbox + filename
+        check = QStyleOptionButton()
+        check.rect = self.checkbox_rect(rect)
+        check.state = QStyle.StateFlag.State_Enabled | (
+            QStyle.StateFlag.State_On if selected else QStyle.StateFlag.State_Off)
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_IndicatorCheckBox, check, painter, option.widget)
+
+        filename = item.image_data.get('filename', 'Unknown')
+        display_name = filename if len(filename) <= 22 else filename[:19] + "..."
+        painter.setFont(self._name_font)
+        painter.setPen(QColor(COLORS['grigio_chiaro']))
+        name_x = check.rect.right() + 6
+        painter.drawText(QRect(name_x, rect.y() + _MARGIN, rect.right() - _MARGIN - name_x, 20),
+                         Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, display_name)
+
+        self._paint_thumbnail(painter, index.model(), item, self.thumb_rect(rect))
+
+        # Prima riga: punteggi
+        x = rect.x() + _MARGIN
+        for text, color in _score_chips(item.image_data):
+            x = self._paint_chip(painter, x, rect.y() + _SCORES_TOP, text, color)
+
+        # Seconda riga: badge XMP a sinistra, rating e color label a destra
+        if item.xmp_badge:
+            self._paint_chip(painter, rect.x() + _MARGIN, rect.y() + _STATUS_TOP,
+                             item.xmp_badge[0], item.xmp_badge[1])
+        right = rect.right() - _MARGIN
+        color_hex = _color_label_hex(item.image_data)
+        if color_hex:
+            square = QRect(right - 12, rect.y() + _STATUS_TOP + 1, 12, 12)
+            painter.setPen(QPen(QColor(255, 255, 255, 128), 1))
+            painter.setBrush(QColor(color_hex))
+            painter.drawRoundedRect(square, 2, 2)
+            right = square.left() - 4
+        stars = _rating_stars(item.image_data)
+        if stars:
+            painter.setFont(self._stars_font)
+            painter.setPen(QColor(COLORS['rating_star']))
+            painter.drawText(QRect(rect.x() + _MARGIN, rect.y() + _STATUS_TOP - 1,
+                                   right - rect.x() - _MARGIN, _CHIP_HEIGHT + 2),
+                             Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight, stars)
+
+        painter.restore()
+
+    def _paint_thumbnail(self, painter, model, item: GalleryItem, box: QRect):
+        status = item.file_status()
+        if status not in (None, 'ok'):
+            painter.setPen(QPen(QColor(COLORS['rosso']), 2))
+            painter.setBrush(QColor(COLORS['grafite_light']))
+            painter.drawRoundedRect(box, 4, 4)
+            painter.setFont(self._status_font)
+            painter.drawText(box, Qt.AlignmentFlag.AlignCenter, _FILE_STATUS_LABELS.get(status, '⛔\nN/A'))
+            return
+
+        pixmap = model.thumbnail(item) if model is not None else None
+        if pixmap is None or pixmap.isNull():
+            painter.setPen(QPen(QColor(COLORS['blu_petrolio']), 1))
+            painter.setBrush(QColor(COLORS['grafite_light']))
+            painter.drawRoundedRect(box, 4, 4)
+            if item._thumb_failed:
+                painter.setPen(QColor(COLORS['grigio_chiaro']))
+                painter.drawText(box, Qt.AlignmentFlag.AlignCenter, "📷\nRAW")
+            return
+        painter.drawPixmap(box.x() + (box.width() - pixmap.width()) // 2,
+                           box.y() + (box.height() - pixmap.height()) // 2, pixmap)
+
+    def _paint_chip(self, painter, x: int, y: int, text: str, color: str) -> int:
+        chip = QRect(x, y, self._chip_metrics.horizontalAdvance(text) + 8, _CHIP_HEIGHT)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(color))
+        painter.drawRoundedRect(chip, 2, 2)
+        painter.setFont(self._chip_font)
+        painter.setPen(QColor('white'))
+        painter.drawText(chip, Qt.AlignmentFlag.AlignCenter, text)
+        return chip.right() + 5
+
+    # ── Tooltip ──────────────────────────────────────────────────────
+
+    def helpEvent(self, event, view, option, index):
+        """Tooltip sync sul badge XMP, tooltip semantico sul resto della card."""
+        if event is None or event.type() != QEvent.Type.ToolTip:
+            return super().helpEvent(event, view, option, index)
+        item = index.data(GalleryModel.ItemRole)
+        if item is None:
+            return False
+        try:
+            if self.xmp_badge_rect(option.rect, item).contains(event.pos()):
+                text = item.xmp_badge[3]
+            else:
+                text = item._build_semantic_tooltip()
+            QToolTip.showText(event.globalPos(), text, view)
+        except Exception as e:
+            logger.debug(f"Errore tooltip gallery: {e}")
+        return True
+
+
+class GalleryView(QListView):
+    """Griglia virtualizzata: solo le righe visibili vengono dipinte."""
+
+    context_menu_requested = pyqtSignal(object, QPoint)   # (GalleryItem, posizione globale)
+    item_activated = pyqtSignal(object)                   # doppio click
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # ListMode + wrapping a sinistra→destra: layout a segmenti, O(1) per riga
+        # con dimensioni uniformi (IconMode posizionerebbe ogni elemento)
+        self.setViewMode(QListView.ViewMode.ListMode)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setSpacing(CARD_SPACING)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setMouseTracking(True)
+        self.viewport().setAttribute(Qt.WidgetAttribute.WA_Hover)
+        self.viewport().setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self.setItemDelegate(GalleryDelegate(self))
+
+        # Viewport stabile per 120ms → priorità/annullamento thumbnail
+        self._viewport_timer = QTimer(self)
+        self._viewport_timer.setSingleShot(True)
+        self._viewport_timer.setInterval(120)
+        self._viewport_timer.timeout.connect(self._viewport_changed)
+        self.verticalScrollBar().valueChanged.connect(lambda _value: self._viewport_timer.start())
+
+    def setModel(self, model):
+        super().setModel(model)
+        if isinstance(model, GalleryModel):
+            model.selection_model = self.selectionModel()
+            model.modelReset.connect(self._viewport_timer.start)
+            model.layoutChanged.connect(lambda *_args: self._viewport_timer.start())
+            model.rowsRemoved.connect(lambda *_args: self._viewport_timer.start())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._viewport_timer.start()
+
+    def _viewport_changed(self):
+        model = self.model()
+        if not isinstance(model, GalleryModel):
+            return
+        rows = self.visible_rows()
+        # Prefetch: una schermata sotto il viewport
+        prefetch = range(rows.stop, min(model.rowCount(), rows.stop + len(rows)))
+        model.set_viewport([model.items[row] for row in rows], [model.items[row] for row in prefetch])
+
+    def item_at(self, pos: QPoint) -> Optional[GalleryItem]:
+        index = self.indexAt(pos)
+        return index.data(GalleryModel.ItemRole) if index.isValid() else None
+
+    def visible_rows(self) -> range:
+        """Righe nel viewport: ricerca binaria sulle visualRect (ordinate per y)."""
+        model = self.model()
+        count = model.rowCount() if model is not None else 0
+        if count == 0:
+            return range(0)
+        height = self.viewport().height()
+
+        def first(predicate):
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if predicate(self.visualRect(model.index(mid, 0))):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            return lo
+
+        start = first(lambda r: r.bottom() >= 0)
+        end = first(lambda r: r.top() > height)
+        return range(start, max(start, end))
+
+    def visible_items(self) -> List[GalleryItem]:
+        model = self.model()
+        if model is None:
+            return []
+        return [model.items[row] for row in self.visible_rows()]
+
+    # ── Eventi ───────────────────────────────────────────────────────
+
+    def mousePressEvent(self, event):
+        # Click sulla checkbox = toggle della sola riga (come Ctrl+click)
+        if event.button() == Qt.MouseButton.LeftButton:
+            pos = event.position().toPoint()
+            index = self.indexAt(pos)
+            if index.isValid() and GalleryDelegate.checkbox_rect(self.visualRect(index)).contains(pos):
+                self.selectionModel().select(index, QItemSelectionModel.SelectionFlag.Toggle)
+                self.selectionModel().setCurrentIndex(index, QItemSelectionModel.SelectionFlag.NoUpdate)
+                return
+        super().mousePressEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            item = self.item_at(event.position().toPoint())
+            if item is not None:
+                self.item_activated.emit(item)
+                return
+        super().mouseDoubleClickEvent(event)
+
+    def contextMenuEvent(self, event):
+        index = self.indexAt(event.pos())
+        if not index.isValid():
+            return
+        # Click destro fuori dalla selezione: il menu agisce sulla sola riga cliccata
+        if not self.selectionModel().isSelected(index):
+            self.selectionModel().select(index, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+            self.selectionModel().setCurrentIndex(index, QItemSelectionModel.SelectionFlag.NoUpdate)
+        self.context_menu_requested.emit(index.data(GalleryModel.ItemRole), event.globalPos())
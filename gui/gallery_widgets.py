@@ -1,7 +1,7 @@
 """
 Gallery Widgets - Componenti UI per la gallery
 VERSIONE COMPLETAMENTE RISCRITTA E FUNZIONANTE
-ImageCard, FlowLayout, Dialog per tag - TUTTI I BUG FIXATI
+ImageCard (host delle azioni di GalleryView), Dialog per tag - TUTTI I BUG FIXATI
 """
 
 from pathlib import Path
@@ -9,16 +9,14 @@ from typing import List, Dict, Any, Optional, Tuple
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QFrame, QCheckBox, QMenu, QDialog, QLineEdit,
-    QDialogButtonBox, QApplication, QSizePolicy, QGroupBox,
+    QDialogButtonBox, QApplication, QGroupBox,
     QRadioButton, QButtonGroup, QTextEdit, QMessageBox, QScrollArea,
     QPushButton, QSpinBox
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QThreadPool, QRunnable, QObject
-from PyQt6.QtGui import QPixmap, QCursor, QAction
+from PyQt6.QtCore import pyqtSignal, QTimer, QThreadPool, QRunnable, QObject
+from PyQt6.QtGui import QAction
 from PyQt6.QtWidgets import QToolTip
 from PyQt6 import QtCore
-from PyQt6.QtWidgets import QLayout, QSizePolicy
-from PyQt6.QtCore import QRect, QSize, Qt
 
 import json
 import logging
@@ -26,6 +24,7 @@ import subprocess
 import platform
 import yaml
 import os
+import threading
 from utils.subprocess_utils import subprocess_creation_kwargs
 import time
 from utils.paths import get_app_dir
@@ -56,6 +55,26 @@ def _make_xmp_manager():
         _style = 'standard'
     return XMPManagerExtended(sidecar_style=_style)
 
+
+def _xmp_badge(state, info) -> Tuple[str, str, str, str]:
+    """Badge XMP per lo stato di sync: (testo, colore, classe, tooltip)."""
+    category = info.get('category', 'standard')
+    ui_config = get_sync_ui_config(state)
+
+    if state == XMPSyncState.PERFECT_SYNC:
+        label_text = "XMP SYNC" if category == 'raw' else "EMB SYNC"
+    elif state == XMPSyncState.DB_ONLY:
+        label_text = "DB ONLY"
+    elif state == XMPSyncState.MIXED_STATE:
+        label_text = "MIX SYNC"
+    elif 'DIRTY' in str(state) or 'DIFF' in str(state) or state == XMPSyncState.MIXED_DIRTY:
+        label_text = "MIX DIFF" if state == XMPSyncState.MIXED_DIRTY else \
+                ("XMP DIFF" if category == 'raw' else "EMB DIFF")
+    else:
+        label_text = ui_config["label"]
+
+    return label_text, ui_config["color"], ui_config["class"], get_xmp_sync_tooltip(state, info)
+
 # NUOVO: Import RAW processor per verifiche
 try:
     from raw_processor import RAWProcessor, RAW_PROCESSOR_AVAILABLE
@@ -188,260 +207,143 @@ def _set_cached_pixmap(filepath_str, pixmap):
     _thumb_pixmap_cache[filepath_str] = pixmap
 
 
-class FlowLayout(QLayout):
-    """
-    FlowLayout reale con wrapping automatico.
-    Dispone i widget su più righe in base alla larghezza disponibile.
-    """
-
-    def __init__(self, parent=None, spacing=10):
-        super().__init__(parent)
-        self._items = []
-        self._spacing = spacing
-        self.setContentsMargins(10, 10, 10, 10)
-
-    # ───────────── API BASE QLayout ─────────────
-
-    def addItem(self, item):
-        self._items.append(item)
-
-    def addWidget(self, widget):
-        widget.setSizePolicy(
-            QSizePolicy.Policy.Preferred,
-            QSizePolicy.Policy.Preferred
-        )
-        super().addWidget(widget)
-
-    def removeWidget(self, widget):
-        """Rimuove widget dal layout e da _items"""
-        for i, item in enumerate(self._items):
-            if item.widget() == widget:
-                self._items.pop(i)
-                break
-        super().removeWidget(widget)
-
-    def insertWidget(self, index, widget):
-        """Inserisce widget alla posizione specificata invece che alla fine"""
-        widget.setSizePolicy(
-            QSizePolicy.Policy.Preferred,
-            QSizePolicy.Policy.Preferred
-        )
-        # Crea QWidgetItem e inserisci nella posizione corretta
-        from PyQt6.QtWidgets import QWidgetItem
-        item = QWidgetItem(widget)
-        widget.setParent(self.parentWidget())
-        widget.show()  # Assicura che il widget sia visibile
-        if 0 <= index <= len(self._items):
-            self._items.insert(index, item)
-        else:
-            self._items.append(item)
-        self.invalidate()
-        self.update()
-
-    def count(self):
-        return len(self._items)
+def _file_status(filepath: Optional[Path], dirs: Optional[Dict[Path, bool]] = None) -> str:
+    """Stato del file: distingue disco, percorso e file mancante.
 
-    def itemAt(self, index):
-        if 0 <= index < len(self._items):
-            return self._items[index]
-        return None
+    dirs: cache esistenza di disco/cartella condivisa da un lotto di file.
+    """
+    if not filepath:
+        return 'no_path'
+
+    def _exists(path: Path) -> bool:
+        if dirs is None:
+            return path.exists()
+        if path not in dirs:
+            dirs[path] = path.exists()
+        return dirs[path]
+
+    # Controlla se il disco/mount point esiste
+    anchor = filepath.anchor  # Es: 'D:\' o '/'
+    if anchor and not _exists(Path(anchor)):
+        return 'no_disk'
+    # Controlla se la directory padre esiste
+    if not _exists(filepath.parent):
+        return 'no_path'
+    # Controlla se il file esiste
+    if not filepath.exists():
+        return 'no_file'
+    return 'ok'
 
-    def takeAt(self, index):
-        if 0 <= index < len(self._items):
-            return self._items.pop(index)
-        return None
 
-    # ───────────── GEOMETRIA ─────────────
+class _ThumbSignals(QObject):
+    """Segnali cross-thread per le thumbnail (lettore batch e ThumbService)"""
+    loaded = pyqtSignal(bytes)
+    failed = pyqtSignal()
+    status = pyqtSignal(str)   # _file_status(), prima della thumbnail
 
-    def setGeometry(self, rect):
-        super().setGeometry(rect)
-        self._do_layout(rect, test_only=False)
 
-    def sizeHint(self):
-        return self.minimumSize()
+# Richieste thumbnail in attesa della lettura batch dalla cache: le card create
+# nello stesso giro di event loop (un lotto della gallery) finiscono in una query
+_thumb_requests: List[Tuple[Path, '_ThumbSignals', int, bool]] = []
+_thumb_requests_lock = threading.Lock()
 
-    def minimumSize(self):
-        size = QSize()
-        for item in self._items:
-            size = size.expandedTo(item.minimumSize())
-        
-        margins = self.contentsMargins()
-        size += QSize(margins.left() + margins.right(), margins.top() + margins.bottom())
-        return size
-
-    def hasHeightForWidth(self):
-        return True
-
-    def heightForWidth(self, width):
-        height = self._do_layout(QRect(0, 0, width, 0), test_only=True)
-        return height
-
-    # ───────────── ALGORITMO LAYOUT ─────────────
-
-    def _do_layout(self, rect, test_only=False):
-        # FIXED: Qt6 API - use individual margin methods instead of getCoords()
-        margins = self.contentsMargins()
-        left = margins.left()
-        top = margins.top()
-        right = margins.right()
-        bottom = margins.bottom()
-        
-        effective_rect = rect.adjusted(left, top, -right, -bottom)
-        x = effective_rect.x()
-        y = effective_rect.y()
-        line_height = 0
-        
-        for item in self._items:
-            widget = item.widget()
-            if widget is None:
-                continue
-                
-            space_x = self._spacing
-            space_y = self._spacing
-            
-            # Calcola dimensioni widget
-            size_hint = item.sizeHint()
-            min_size = item.minimumSize()
-            widget_width = max(size_hint.width(), min_size.width())
-            widget_height = max(size_hint.height(), min_size.height())
-            
-            # Check se il widget ci sta nella riga corrente
-            next_x = x + widget_width + space_x
-            if next_x - space_x > effective_rect.right() and line_height > 0:
-                # Va a capo
-                x = effective_rect.x()
-                y = y + line_height + space_y
-                line_height = 0
-            
-            # Posiziona il widget
-            if not test_only:
-                item.setGeometry(QRect(x, y, widget_width, widget_height))
-            
-            # Aggiorna posizione e altezza riga
-            x = x + widget_width + space_x
-            line_height = max(line_height, widget_height)
-        
-        return y + line_height - rect.y() + bottom
 
-    def clear_items(self):
-        """Rimuove tutti i widget dal layout"""
-        while self._items:
-            item = self._items.pop()
-            if item.widget():
-                item.widget().setParent(None)
+def _request_thumbnail(filepath: Path, signals: '_ThumbSignals', priority: int = 0,
+                       status_only: bool = False):
+    """Accoda la richiesta; il primo in coda avvia il lettore batch.
 
-    def removeWidget(self, widget):
-        """Rimuove un widget specifico dal layout"""
-        for i, item in enumerate(self._items):
-            if item.widget() == widget:
-                self._items.pop(i)
-                widget.setParent(None)
-                break
-
-
-class _ThumbSignals(QObject):
-    """Segnali per _ThumbnailLoader cross-thread (QRunnable non è QObject)"""
-    loaded = pyqtSignal(bytes)
-    failed = pyqtSignal()
+    priority: priorità nel ThumbService per i cache miss (0 = riga visibile).
+    status_only: solo il segnale status (QPixmap già in cache).
+    """
+    with _thumb_requests_lock:
+        _thumb_requests.append((filepath, signals, priority, status_only))
+        start = len(_thumb_requests) == 1
+    if start:
+        QThreadPool.globalInstance().start(_ThumbBatchReader())
 
 
-class _ThumbnailLoader(QRunnable):
+class _ThumbBatchReader(QRunnable):
     """
-    Carica thumbnail in background thread (fallback per cache miss).
-    Per RAW usa ExifTool -PreviewImage, per altri file legge i bytes raw.
-    Salva anche nella cache disco (worker thread — PIL/I-O sicuri qui).
-    Emette bytes al main thread tramite signals — QPixmap creato lì.
+    Verifica lo stato dei file (stat fuori dal thread GUI), poi legge dalla
+    cache tutte le thumbnail richieste finora con una sola query
+    (load_gallery_thumbs_many). Le mancanti passano al ThumbService: pool
+    dedicato, anteprima RAW con rawpy, coda a priorità cancellabile.
     """
-    _RAW_EXT = {'.cr2', '.cr3', '.nef', '.arw', '.orf', '.rw2',
-                '.pef', '.dng', '.nrw', '.srf', '.sr2'}
 
-    def __init__(self, filepath: Path, signals: '_ThumbSignals'):
+    def __init__(self):
         super().__init__()
-        self.filepath = filepath
-        self.signals = signals
         self.setAutoDelete(True)
 
     def run(self):
-        # Prima controlla cache disco (I/O nel worker thread, non blocca la GUI)
-        try:
-            from utils.thumb_cache import load_gallery_thumb_bytes
-            cached = load_gallery_thumb_bytes(self.filepath)
-            if cached:
-                self.signals.loaded.emit(cached)
-                return
-        except Exception:
-            pass
-
-        # Cache miss: estrazione thumbnail dal file originale
-        data = None
+        with _thumb_requests_lock:
+            requests = list(_thumb_requests)
+            _thumb_requests.clear()
+        dirs: Dict[Path, bool] = {}
+        batch = []
+        for filepath, signals, priority, status_only in requests:
+            status = _file_status(filepath, dirs)
+            try:
+                signals.status.emit(status)
+            except RuntimeError:
+                continue  # Destinatario già distrutto (nuova ricerca)
+            if status == 'ok' and not status_only:
+                batch.append((filepath, signals, priority))
+        if not batch:
+            return
         try:
-            if self.filepath.suffix.lower() in self._RAW_EXT:
-                result = subprocess.run(
-                    ['exiftool', '-b', '-PreviewImage', str(self.filepath)],
-                    capture_output=True, timeout=10,
-                    **subprocess_creation_kwargs()
-                )
-                if result.returncode == 0 and result.stdout:
-                    data = result.stdout
-            else:
-                with open(str(self.filepath), 'rb') as f:
-                    data = f.read()
+            from utils.thumb_cache import load_gallery_thumbs_many
+            found = load_gallery_thumbs_many(fp for fp, _, _ in batch)
         except Exception as e:
-            logger.debug(f"Thumbnail load error {self.filepath.name}: {e}")
+            logger.debug(f"Lettura batch cache thumbnail: {e}")
+            found = {}
+        service = None
+        for filepath, signals, priority in batch:
+            data = found.get(str(filepath))
+            if data:
+                signals.loaded.emit(data)
+                continue
+            if service is None:
+                from utils.thumb_service import get_thumb_service
+                service = get_thumb_service()
+            service.request(filepath, lambda data, s=signals: _emit_thumb(s, data), priority)
+
 
+def _emit_thumb(signals: '_ThumbSignals', data: Optional[bytes]):
+    """Callback ThumbService (thread worker) → segnali verso il thread GUI."""
+    try:
         if data:
-            thumb_bytes = self._resize_and_cache(data)
-            # Emetti bytes già ridimensionati a 150px (o originali come fallback)
-            self.signals.loaded.emit(thumb_bytes if thumb_bytes else data)
+            signals.loaded.emit(data)
         else:
-            self.signals.failed.emit()
-
-    def _resize_and_cache(self, data: bytes):
-        """Salva thumbnail 150px in cache disco, ritorna i bytes della thumb già ridimensionata."""
-        try:
-            from PIL import Image
-            import io
-            from utils.thumb_cache import save_gallery_thumb, load_gallery_thumb_bytes
-            img = Image.open(io.BytesIO(data))
-            img.load()  # Forza decodifica completa prima che BytesIO esca dallo scope
-            save_gallery_thumb(self.filepath, img)
-            # Rileggi i bytes della thumbnail appena salvata (già 150px JPEG, ~5KB)
-            return load_gallery_thumb_bytes(self.filepath)
-        except Exception as e:
-            logger.warning(f"Cache write fallita per {self.filepath.name}: {e}")
-            return None
+            signals.failed.emit()
+    except RuntimeError:
+        pass  # Destinatario già distrutto (nuova ricerca)
 
 
 class ImageCard(QFrame):
     """
-    Card verticale: thumbnail sopra, info sotto
-    VERSIONE COMPLETAMENTE RISCRITTA E FUNZIONANTE
+    Host senza UI delle azioni di una riga di GalleryView (ImageCard.for_item):
+    menu contestuale, editor esterni, dialog tag/descrizione, operazioni XMP.
+    La card non viene mai mostrata: la riga la disegna GalleryDelegate.
     """
     
     # Segnali
-    selection_changed = pyqtSignal(object, bool)
     find_similar_requested = pyqtSignal(object)
     bioclip_requested = pyqtSignal(list)
     llm_tagging_requested = pyqtSignal(list)
     analyze_xmp_requested = pyqtSignal(list)
     sync_from_lightroom_requested = pyqtSignal(list)
     
-    # Costanti
+    # Geometria della card disegnata da GalleryDelegate
     CARD_WIDTH = 220
     THUMB_SIZE = 150
     
-    def __init__(self, image_data, parent=None):
+    def __init__(self, image_data, parent=None, item=None):
         super().__init__(parent)
         self.image_data = image_data or {}
         self.filepath = Path(image_data.get('filepath', '')) if image_data.get('filepath') else None
         self.image_id = image_data.get('id')
-        self._selected = False
         self._gallery = parent  # Store reference to GalleryTab before Qt changes parent
         
-        # FIXED: Tooltip state management
-        self.setMouseTracking(True)
-        self._current_tooltip_area = None
-        
         # Usa XMP Manager condiviso dalla gallery (se disponibile)
         self.xmp_manager = getattr(parent, 'shared_xmp_manager', None) or \
                    (XMPManagerExtended() if XMP_SUPPORT_AVAILABLE else None)
@@ -452,288 +354,20 @@ class ImageCard(QFrame):
         
         # Configurazione editor esterni
         self.external_editors = self._load_external_editors()
-        
-        self.setFixedWidth(self.CARD_WIDTH)
-        self.setFrameStyle(QFrame.Shape.Box)
-        self.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
-        self.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Minimum)
-        
-        self._build_ui()
-        self._update_style()
-    
-    def _build_ui(self):
-        """Costruisce l'interfaccia della card"""
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(8, 8, 8, 8)
-        layout.setSpacing(4)
-        
-        # Header: checkbox + filename
-        header = QHBoxLayout()
-        header.setSpacing(4)
-        
-        self.checkbox = QCheckBox()
-        self.checkbox.stateChanged.connect(lambda state: self.set_selected(state == Qt.CheckState.Checked.value))
-        header.addWidget(self.checkbox)
-        
-        filename = self.image_data.get('filename', 'Unknown')
-        display_name = filename if len(filename) <= 22 else filename[:19] + "..."
-        self.filename_label = QLabel(f"<b>{display_name}</b>")
-        self.filename_label.setStyleSheet(f"font-size: 11px; color: {COLORS['grigio_chiaro']};")
-        # FIXED: No tooltip on filename to avoid conflicts
-        header.addWidget(self.filename_label, 1)
-        
-        layout.addLayout(header)
-        
-        # Thumbnail
-        self.thumbnail_label = QLabel()
-        self.thumbnail_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.thumbnail_label.setFixedSize(self.THUMB_SIZE, self.THUMB_SIZE)
-        self.thumbnail_label.setStyleSheet(f"""
-            background-color: {COLORS['grafite_light']};
-            border: 1px solid {COLORS['blu_petrolio']};
-            border-radius: 4px;
-        """)
-        layout.addWidget(self.thumbnail_label, 0, Qt.AlignmentFlag.AlignCenter)
-        self._load_thumbnail()
-        
-        # Info frame
-        self.info_frame = QFrame()
-        self.info_frame.setObjectName('info_frame')
-        info_vbox = QVBoxLayout(self.info_frame)
-        info_vbox.setContentsMargins(0, 0, 0, 0)
-        info_vbox.setSpacing(2)
-        self._build_scores_and_indicators(info_vbox)
-        layout.addWidget(self.info_frame)
-    
-    def _check_file_status(self):
-        """Verifica stato del file: distingue disco, percorso e file mancante"""
-        if not self.filepath:
-            return 'no_path'
-        # Controlla se il disco/mount point esiste
-        anchor = self.filepath.anchor  # Es: 'D:\' o '/'
-        if anchor and not Path(anchor).exists():
-            return 'no_disk'
-        # Controlla se la directory padre esiste
-        if not self.filepath.parent.exists():
-            return 'no_path'
-        # Controlla se il file esiste
-        if not self.filepath.exists():
-            return 'no_file'
-        return 'ok'
-
-    def _load_thumbnail(self):
-        """
-        Carica thumbnail dell'immagine.
-        1) Cache disco (veloce, ~5ms) — popolata dal processing
-        2) Fallback asincrono: ExifTool in background thread (cache miss)
-        """
-        try:
-            file_status = self._check_file_status()
-            if file_status != 'ok':
-                status_labels = {
-                    'no_disk': '⛔\nNO DISK',
-                    'no_path': '⛔\nNO PATH',
-                    'no_file': '⛔\nNO FILE',
-                }
-                self.thumbnail_label.setText(status_labels.get(file_status, '⛔\nN/A'))
-                self.thumbnail_label.setStyleSheet(f"""
-                    background-color: {COLORS['grafite_light']};
-                    border: 2px solid {COLORS['rosso']};
-                    border-radius: 4px;
-                    color: {COLORS['rosso']};
-                    font-size: 13px;
-                    font-weight: bold;
-                """)
-                return
-
-            # 0) CACHE IN-MEMORY (istantanea, nessun I/O disco)
-            if self.filepath:
-                cached_pm = _get_cached_pixmap(str(self.filepath))
-                if cached_pm is not None:
-                    self.thumbnail_label.setPixmap(cached_pm)
-                    return
-
-            # 1) Caricamento asincrono (cache disco + fallback ExifTool/file)
-            # Nessun I/O disco nel main thread — tutto nel worker thread
-            if not self.filepath:
-                return
-
-            self._thumb_signals = _ThumbSignals()
-            self._thumb_signals.loaded.connect(self._on_thumb_loaded)
-            self._thumb_signals.failed.connect(self._on_thumb_failed)
-            loader = _ThumbnailLoader(self.filepath, self._thumb_signals)
-            QThreadPool.globalInstance().start(loader)
-
-        except Exception as e:
-            logger.debug(f"Errore _load_thumbnail: {e}")
-            self.thumbnail_label.setText("❌\nError")
-
-    def _on_thumb_loaded(self, data: bytes):
-        """Riceve bytes dal worker thread (già 150px), crea QPixmap nel main thread."""
-        pixmap = QPixmap()
-        if pixmap.loadFromData(data):
-            # I bytes sono già ridimensionati dal worker; scale solo se fallback raw
-            if pixmap.width() > self.THUMB_SIZE or pixmap.height() > self.THUMB_SIZE:
-                pixmap = pixmap.scaled(
-                    self.THUMB_SIZE, self.THUMB_SIZE,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-            if self.filepath:
-                _set_cached_pixmap(str(self.filepath), pixmap)
-            self.thumbnail_label.setPixmap(pixmap)
-            self.thumbnail_label.setStyleSheet("")
-        else:
-            self._on_thumb_failed()
 
-    def _on_thumb_failed(self):
-        """Fallback quando thumbnail non disponibile neanche via ExifTool"""
-        self.thumbnail_label.setText("📷\nRAW")
+        # Riga di GalleryView servita da questa card: nessun widget figlio, mai mostrata
+        self._item = item
+        self.hide()
     
-    def _build_scores_and_indicators(self, layout):
-        """Costruisce badge qualità su due righe: scores + status XMP/sync"""
-        try:
-            # Container per il badge completo
-            badge_container = QVBoxLayout()
-            badge_container.setSpacing(2)
-            badge_container.setContentsMargins(0, 0, 0, 0)
-
-            # PRIMA RIGA: Scores (Aesthetic + Technical + Semantic + Rating + Color)
-            scores_layout = QHBoxLayout()
-            scores_layout.setSpacing(4)
-
-            # Aesthetic score
-            aesthetic = self.image_data.get('aesthetic_score')
-            if aesthetic is not None:
-                try:
-                    score_val = float(aesthetic)
-                    aesthetic_label = QLabel(f"AES: {score_val:.1f}")
-                    aesthetic_label.setStyleSheet(f"""
-                        background-color: {COLORS['verde']};
-                        color: white;
-                        padding: 2px 4px;
-                        border-radius: 2px;
-                        font-size: 8px;
-                        font-weight: bold;
-                    """)
-                    scores_layout.addWidget(aesthetic_label)
-                except (ValueError, TypeError):
-                    pass
-
-            # Technical score (MUSIQ - funziona su tutti i formati inclusi RAW)
-            technical = self.image_data.get('technical_score')
-            if technical is not None:
-                try:
-                    score_val = float(technical)
-                    technical_label = QLabel(f"TEC: {score_val:.0f}")
-                    technical_label.setStyleSheet(f"""
-                        background-color: {COLORS['blu_petrolio']};
-                        color: white;
-                        padding: 2px 4px;
-                        border-radius: 2px;
-                        font-size: 8px;
-                        font-weight: bold;
-                    """)
-                    scores_layout.addWidget(technical_label)
-                except (ValueError, TypeError):
-                    pass
-
-            # Semantic similarity score (dal search)
-            similarity = self.image_data.get('similarity_score')
-            if similarity is not None:
-                try:
-                    score_val = float(similarity)
-                    similarity_label = QLabel(f"SEM: {score_val:.2f}")
-                    similarity_label.setStyleSheet(f"""
-                        background-color: {COLORS['accento']};
-                        color: white;
-                        padding: 2px 4px;
-                        border-radius: 2px;
-                        font-size: 8px;
-                        font-weight: bold;
-                    """)
-                    scores_layout.addWidget(similarity_label)
-                except (ValueError, TypeError):
-                    pass
-
-            # Final score (ranking from search)
-            final_score = self.image_data.get('final_score')
-            if final_score is not None:
-                try:
-                    score_val = float(final_score)
-                    final_score_label = QLabel(f"RANK: {score_val:.2f}")
-                    final_score_label.setStyleSheet(f"""
-                        background-color: {COLORS['marrone_chiaro']};
-                        color: white;
-                        padding: 2px 4px;
-                        border-radius: 2px;
-                        font-size: 8px;
-                        font-weight: bold;
-                    """)
-                    scores_layout.addWidget(final_score_label)
-                except (ValueError, TypeError):
-                    pass
-
-            badge_container.addLayout(scores_layout)
-
-            # SECONDA RIGA: XMP Status + Rating/Color (a destra)
-            status_layout = QHBoxLayout()
-            status_layout.setSpacing(4)
-
-            # XMP placeholder - sarà popolato dal background thread
-            self.xmp_label = QLabel("")
-            self.xmp_label.hide()  # Nascosto finché non arrivano dati reali
-            status_layout.addWidget(self.xmp_label)
-
-            status_layout.addStretch()
-
-            # Rating stars (celeste chiaro) - a destra
-            self.rating_label = QLabel("")
-            self.rating_label.setStyleSheet(f"""
-                color: {COLORS['rating_star']};
-                font-size: 10px;
-                font-weight: bold;
-                padding: 0px 2px;
-            """)
-            self.rating_label.hide()
-            status_layout.addWidget(self.rating_label)
-
-            # Color label square - a destra del rating
-            self.color_label_indicator = QLabel("")
-            self.color_label_indicator.setFixedSize(12, 12)
-            self.color_label_indicator.hide()
-            status_layout.addWidget(self.color_label_indicator)
-
-            badge_container.addLayout(status_layout)
-
-            # Aggiorna display rating/color
-            self._update_rating_color_display()
+    @classmethod
+    def for_item(cls, item, gallery):
+        """Card senza UI che esegue menu contestuale e azioni per una riga di GalleryView."""
+        return cls(item.image_data, parent=gallery, item=item)
 
-            layout.addLayout(badge_container)
-
-        except Exception as e:
-            logger.error("ERRORE _build_scores_and_indicators: %s", e, exc_info=True)
-
-    def _get_xmp_status_text(self):
-        """RIMOSSO - Badge solo tramite background processing per evitare doppio rendering"""
-        return None  # Nessun badge iniziale
- 
     
-    def _get_tags_count(self):
-        """Conta tag unificati"""
-        try:
-            tags_raw = self.image_data.get('tags', '')
-            if not tags_raw:
-                return 0
-            
-            if isinstance(tags_raw, str):
-                tags = json.loads(tags_raw)
-            else:
-                tags = tags_raw
-                
-            return len(tags) if isinstance(tags, list) else 0
-        except Exception:
-            return 0
+    def _check_file_status(self):
+        """Verifica stato del file: distingue disco, percorso e file mancante"""
+        return _file_status(self.filepath)
     
     def get_unified_tags(self):
         """Ottieni lista tag unificati (umani + LLM) con cache invalidabile"""
@@ -777,36 +411,6 @@ class ImageCard(QFrame):
     #                          TOOLTIP SYSTEM
     # ═══════════════════════════════════════════════════════════════
     
-    def mouseMoveEvent(self, event):
-        """Tooltip semantico per tutta la card"""
-        try:
-            # SIMPLIFIED: Solo area semantic per tutta la card
-            if self._current_tooltip_area != 'semantic':
-                self._current_tooltip_area = 'semantic'
-                tooltip_text = self._build_semantic_tooltip()
-                self.setToolTip(tooltip_text)
-        except Exception as e:
-            logger.debug(f"Errore tooltip mouseMoveEvent: {e}")
-            
-        super().mouseMoveEvent(event)
-    
-    def enterEvent(self, event):
-        """Tooltip semantico all'ingresso"""
-        try:
-            tooltip_text = self._build_semantic_tooltip()
-            self._current_tooltip_area = 'semantic'
-            self.setToolTip(tooltip_text)
-        except Exception as e:
-            logger.debug(f"Errore tooltip enterEvent: {e}")
-            
-        super().enterEvent(event)
-    
-    def leaveEvent(self, event):
-        """Pulisce tooltip all'uscita"""
-        self.setToolTip("")
-        self._current_tooltip_area = None
-        super().leaveEvent(event)
-    
     def _build_semantic_tooltip(self):
         """Costruisce tooltip semantico con cache invalidabile"""
         try:
@@ -1014,165 +618,25 @@ class ImageCard(QFrame):
             filename = self.image_data.get('filename', 'Unknown') if self.image_data else 'Unknown'
             self._cached_semantic_tooltip = f"📝 {filename}"
             return self._cached_semantic_tooltip
-
-
-    def _build_technical_tooltip(self):
-        """Costruisce tooltip tecnico (EXIF + camera + file info)"""
-        try:
-            lines = []
-            
-            # File info
-            if self.filepath and self.filepath.exists():
-                try:
-                    size_mb = self.filepath.stat().st_size / (1024 * 1024)
-                    lines.append("📄 FILE")
-                    lines.append(f"{t('widgets.tooltip.label_name')} {self.filepath.name}")
-                    lines.append(f"{t('widgets.tooltip.label_format')} {self.filepath.suffix.upper().lstrip('.')}")
-                    lines.append(f"{t('widgets.tooltip.label_size')} {size_mb:.2f} MB")
-                    lines.append("")
-                except Exception:
-                    pass
-            
-            # Dimensioni dai campi DB
-            width = self.image_data.get('width')
-            height = self.image_data.get('height')
-            if width and height:
-                megapixels = (width * height) / 1000000
-                lines.append(t("widgets.tooltip.section_dims"))
-                lines.append(f"{width} × {height} px")
-                lines.append(f"📊 {megapixels:.1f} MP")
-                lines.append("")
-            
-            # CAMERA INFO - PRIORITÀ CAMPI DB
-            camera_make = self.image_data.get('camera_make')
-            camera_model = self.image_data.get('camera_model')
-            if camera_make or camera_model:
-                lines.append("📸 CAMERA")
-                camera_str = f"{camera_make or ''} {camera_model or ''}".strip()
-                lines.append(f"📷 {camera_str}")
-                
-                # Software dal campo DB se presente
-                software = self.image_data.get('software')
-                if software:
-                    lines.append(f"💾 {software}")
-                lines.append("")
-            
-            # IMPOSTAZIONI FOTOGRAFICHE - PRIORITÀ CAMPI DB
-            settings = []
-            
-            # Apertura
-            aperture = self.image_data.get('aperture')
-            if aperture:
-                settings.append(f"f/{aperture}")
-            
-            # Focale
-            focal_length = self.image_data.get('focal_length')
-            if focal_length:
-                settings.append(f"{focal_length}mm")
-            
-            # Shutter speed
-            shutter_speed = self.image_data.get('shutter_speed')
-            if shutter_speed:
-                settings.append(f"{shutter_speed}")
-            
-            # ISO
-            iso = self.image_data.get('iso')
-            if iso:
-                settings.append(f"ISO {iso}")
-            
-            if settings:
-                lines.append(t("widgets.tooltip.settings_header"))
-                lines.append(" | ".join(settings))
-                lines.append("")
-            
-            # FALLBACK: Solo se non ci sono dati DB, usa JSON EXIF come backup
-            if not (camera_make or camera_model or aperture or focal_length or shutter_speed or iso):
-                exif_json_str = self.image_data.get('exif_json')
-                if exif_json_str:
-                    try:
-                        exif_data = json.loads(exif_json_str)
-                        
-                        # Camera info da JSON come fallback
-                        make = exif_data.get('EXIF:Make')
-                        model = exif_data.get('EXIF:Model')
-                        if make or model:
-                            lines.append(t("widgets.tooltip.camera_from_exif"))
-                            camera_str = f"{make or ''} {model or ''}".strip()
-                            lines.append(f"📷 {camera_str}")
-                            lines.append("")
-                        
-                    except Exception as e:
-                        lines.append(t("widgets.tooltip.exif_fallback_error", error=str(e)))
-                        lines.append("")
-            
-            # AI Scores
-            scores = []
-            aesthetic = self.image_data.get('aesthetic_score')
-            if aesthetic is not None:
-                try:
-                    scores.append(f"🎨 Aesthetic: {float(aesthetic):.2f}")
-                except (ValueError, TypeError):
-                    pass
-                    
-            technical = self.image_data.get('technical_score')
-            if technical is not None:
-                try:
-                    scores.append(f"🔧 Technical: {float(technical):.0f}")
-                except (ValueError, TypeError):
-                    pass
-            
-            if scores:
-                lines.append("📊 AI SCORES")
-                lines.extend(scores)
-            
-            return "\n".join(lines) if lines else t("widgets.tooltip.no_tech_data")
-
-        except Exception as e:
-            logger.warning("Errore _build_technical_tooltip: %s", e, exc_info=True)
-            return t("widgets.tooltip.tech_data_error")
     
     # ═══════════════════════════════════════════════════════════════
     #                         EVENT HANDLERS
     # ═══════════════════════════════════════════════════════════════
     
-    def mousePressEvent(self, event):
-        """Gestisce click per selezione - Ctrl+click per multi-selezione"""
-        if event.button() == Qt.MouseButton.LeftButton:
-            ctrl_pressed = event.modifiers() & Qt.KeyboardModifier.ControlModifier
-            gallery = self._gallery
-
-            if ctrl_pressed:
-                # Ctrl+click = toggle questa card (aggiungi/rimuovi)
-                self.set_selected(not self._selected)
-            else:
-                # Click normale = seleziona SOLO questa card
-                if gallery and hasattr(gallery, 'selected_items'):
-                    # Prima deseleziona TUTTE (inclusa questa)
-                    for card in list(gallery.selected_items):
-                        card.set_selected(False)
-                    # Ora pulisci la lista
-                    gallery.selected_items.clear()
-                # Seleziona questa
-                self.set_selected(True)
-    
-    def mouseDoubleClickEvent(self, event):
-        """Gestisce doppio click"""
-        if event.button() == Qt.MouseButton.LeftButton:
-            # Apri immagine in viewer esterno
-            self._open_external()
-    
-    def contextMenuEvent(self, event):
-        """Menu contestuale"""
+    def show_context_menu(self, global_pos):
+        """Menu contestuale alla posizione indicata (anche per le righe di GalleryView)"""
         try:
+            # La riga della vista, se la card è solo host delle azioni
+            this_item = self._item if self._item is not None else self
             # Determina se multi-selezione (usa _gallery invece di parent() perché Qt cambia il parent)
             gallery = self._gallery
             if gallery and hasattr(gallery, 'selected_items'):
                 selected_items = gallery.selected_items
                 is_multi = len(selected_items) > 1
-                target_items = selected_items if is_multi else [self]
+                target_items = selected_items if is_multi else [this_item]
                 multi_label = f" ({len(selected_items)})" if is_multi else ""
             else:
-                target_items = [self]
+                target_items = [this_item]
                 multi_label = ""
                 is_multi = False
             
@@ -1449,7 +913,7 @@ class ImageCard(QFrame):
             exif_action.triggered.connect(lambda: self._show_complete_exif(target_items))
             menu.addAction(exif_action)
 
-            menu.exec(event.globalPos())
+            menu.exec(global_pos)
             
         except Exception as e:
             logger.warning("Errore context menu: %s", e, exc_info=True)
@@ -1490,135 +954,6 @@ class ImageCard(QFrame):
     # ═══════════════════════════════════════════════════════════════
     #                         UTILITY METHODS
     # ═══════════════════════════════════════════════════════════════
-
-    def _update_rating_color_display(self):
-        """Aggiorna display di rating (stelle) e color label sulla thumbnail"""
-        try:
-            # RATING (stelle celesti)
-            rating = self.image_data.get('lr_rating') or self.image_data.get('rating')
-            if rating is not None:
-                try:
-                    rating_val = int(rating)
-                    if 1 <= rating_val <= 5:
-                        stars = '★' * rating_val
-                        self.rating_label.setText(stars)
-                        self.rating_label.show()
-                    else:
-                        self.rating_label.hide()
-                except (ValueError, TypeError):
-                    self.rating_label.hide()
-            else:
-                self.rating_label.hide()
-
-            # COLOR LABEL (quadratino colorato)
-            color_label = self.image_data.get('color_label')
-            if color_label:
-                color_hex = COLOR_LABELS.get(color_label)
-                if not color_hex:
-                    # Prova match case-insensitive
-                    for key, val in COLOR_LABELS.items():
-                        if key.lower() == color_label.lower():
-                            color_hex = val
-                            break
-                if color_hex:
-                    self.color_label_indicator.setStyleSheet(f"""
-                        background-color: {color_hex};
-                        border: 1px solid rgba(255, 255, 255, 0.5);
-                        border-radius: 2px;
-                    """)
-                    self.color_label_indicator.show()
-                else:
-                    self.color_label_indicator.hide()
-            else:
-                self.color_label_indicator.hide()
-
-        except Exception as e:
-            logger.warning("Errore _update_rating_color_display: %s", e, exc_info=True)
-
-    def set_selected(self, selected):
-        """Imposta stato selezione"""
-        self._selected = selected
-        self.checkbox.setChecked(selected)
-        self._update_style()
-        self.selection_changed.emit(self, selected)
-    
-    def is_selected(self):
-        """Ritorna stato selezione"""
-        return self._selected
-    
-    def _update_style(self):
-        """Aggiorna stile in base allo stato"""
-        if self._selected:
-            border_color = COLORS['ambra']
-            bg_color = COLORS['grafite_light']
-        else:
-            border_color = COLORS['blu_petrolio']
-            bg_color = COLORS['grafite']
-        
-        self.setStyleSheet(f"""
-            ImageCard {{
-                background-color: {bg_color};
-                border: 2px solid {border_color};
-                border-radius: 6px;
-            }}
-            ImageCard:hover {{
-                border-color: {COLORS['blu_petrolio_light']};
-            }}
-        """)
-    
-    def refresh_display(self):
-        """Refresh del display della card con dati aggiornati"""
-        try:
-            # Aggiorna tags display
-            if hasattr(self, 'tags_label'):
-                ai_tags = self.image_data.get('ai_tags')
-                user_tags = self.image_data.get('user_tags') 
-                
-                all_tags = []
-                if ai_tags:
-                    try:
-                        if isinstance(ai_tags, str):
-                            ai_tags = json.loads(ai_tags) if ai_tags else []
-                        all_tags.extend(ai_tags)
-                    except Exception as e:
-                        logger.debug(f"Parsing ai_tags display fallito: {e}")
-
-                if user_tags:
-                    try:
-                        if isinstance(user_tags, str):
-                            user_tags = json.loads(user_tags) if user_tags else []
-                        all_tags.extend(user_tags)
-                    except Exception as e:
-                        logger.debug(f"Parsing user_tags display fallito: {e}")
-                
-                if all_tags:
-                    display_tags = all_tags[:3]
-                    more_count = len(all_tags) - 3
-                    tag_text = " • ".join(display_tags)
-                    if more_count > 0:
-                        tag_text += f" (+{more_count})"
-                    self.tags_label.setText(tag_text)
-                else:
-                    self.tags_label.setText(t("widgets.label.no_tags"))
-
-            # Aggiorna descrizione display
-            if hasattr(self, 'desc_label'):
-                description = self.image_data.get('ai_description', '').strip()
-                if description:
-                    display_desc = description if len(description) <= 60 else description[:57] + "..."
-                    self.desc_label.setText(display_desc)
-                else:
-                    self.desc_label.setText(t("widgets.label.no_description"))
-
-            # Aggiorna rating e color label
-            self._update_rating_color_display()
-
-            # Forza repaint
-            self.update()
-
-        except Exception as e:
-            logger.warning(f"Errore refresh_display: {e}", exc_info=True)
-    
     
     def _open_folder(self, items):
         """Apri cartella contenente le immagini, con dialog informativo per file mancanti"""
@@ -2225,6 +1560,7 @@ class ImageCard(QFrame):
 
             deleted = 0
             failed = 0
+            removed = []
 
             gallery = getattr(self, '_gallery', None)
 
@@ -2234,14 +1570,7 @@ class ImageCard(QFrame):
                     try:
                         if db_manager.delete_image(image_id):
                             deleted += 1
-                            # Rimuovi dai riferimenti della gallery prima di distruggere il widget
-                            if gallery is not None:
-                                if item in gallery.selected_items:
-                                    gallery.selected_items.remove(item)
-                                if item in gallery.cards:
-                                    gallery.cards.remove(item)
-                            item.setParent(None)
-                            item.deleteLater()
+                            removed.append(item)
                         else:
                             failed += 1
                     except Exception as e:
@@ -2250,20 +1579,9 @@ class ImageCard(QFrame):
                 else:
                     failed += 1
 
-            # Aggiorna stato bottoni e contatore gallery dopo le cancellazioni
-            if gallery is not None and deleted > 0:
-                has_results = len(gallery.cards) > 0
-                gallery.select_all_btn.setEnabled(has_results)
-                has_selection = len(gallery.selected_items) > 0
-                gallery.deselect_all_btn.setEnabled(has_selection)
-                count_left = len(gallery.cards)
-                from i18n import t as _t
-                gallery.count_label.setText(
-                    _t("gallery.label.count", count=count_left) if count_left > 0
-                    else _t("gallery.label.no_results_count")
-                )
-                if not has_selection:
-                    gallery.selection_label.setText("")
+            # Toglie le righe dalla gallery (aggiorna anche contatore e bottoni)
+            if gallery is not None and removed and hasattr(gallery, 'remove_items'):
+                gallery.remove_items(removed)
 
             # Messaggio risultato
             if deleted > 0:
@@ -2323,79 +1641,12 @@ class ImageCard(QFrame):
 
         # Aggiorna badge XMP
         XMPBadgeIntegration.replace_refresh_after_database_operation(items, operation_type)
-
-    def _force_data_refresh(self):
-        """Forza refresh dei dati image_data - FIXED: Implementazione specifica"""
-        try:
-            # TODO: In una vera implementazione, qui ricaricheresti dal database
-            # Per ora forziamo l'invalidazione della cache
-            
-            # Reset cached unified tags
-            if hasattr(self, '_unified_tags_cache'):
-                delattr(self, '_unified_tags_cache')
-            
-            # Reset tooltip cache
-            if hasattr(self, '_tooltip_cache'):
-                delattr(self, '_tooltip_cache')
-
-        except Exception as e:
-            logger.warning("Errore force data refresh: %s", e, exc_info=True)
-    
-    def _refresh_badges(self):
-        """Refresh completo dei badge scores/indicators"""
-        try:
-            if hasattr(self, 'info_frame') and self.info_frame.layout():
-                # Clear existing widgets
-                layout = self.info_frame.layout()
-                while layout.count():
-                    child = layout.takeAt(0)
-                    if child.widget():
-                        child.widget().deleteLater()
-                
-                # Rebuild con dati aggiornati
-                self._build_scores_and_indicators(layout)
-                
-                # Force layout update
-                self.info_frame.updateGeometry()
-                self.update()
-                
-        except Exception as e:
-            logger.warning("Errore refresh badges: %s", e, exc_info=True)
     
     def _invalidate_tooltip_cache(self):
         """Invalida cache tooltip per forzare rebuild"""
-        try:
-            # Reset area corrente per forzare rebuild
-            self._current_tooltip_area = None
-
-            # Clear tooltip Qt
-            self.setToolTip("")
-
-            # Reset cached tooltip data
-            if hasattr(self, '_cached_semantic_tooltip'):
-                delattr(self, '_cached_semantic_tooltip')
-            if hasattr(self, '_cached_technical_tooltip'):
-                delattr(self, '_cached_technical_tooltip')
-            # Reset anche cache tags unificati
-            if hasattr(self, '_unified_tags_cache'):
-                delattr(self, '_unified_tags_cache')
-
-        except Exception as e:
-            logger.warning("Errore invalidate tooltip cache: %s", e, exc_info=True)
+        if self._item is not None:
+            self._item._invalidate_tooltip_cache()
     
-    def _update_visual_state(self):
-        """Aggiorna stato visuale generale"""
-        try:
-            # Force repaint
-            self.update()
-            self.repaint()
-            
-            # Update parent se ha metodo refresh
-            if hasattr(self.parent(), 'update'):
-                self.parent().update()
-                
-        except Exception as e:
-            logger.warning("Errore update visual state: %s", e, exc_info=True)
     
     def _show_complete_exif(self, items):
         """Mostra dialog con TUTTI i dati EXIF"""
@@ -3788,10 +3039,11 @@ class ImageCard(QFrame):
         """Refresh dello stato XMP. Gestione definitiva RAW vs JPG."""
         if not XMP_SUPPORT_AVAILABLE:
             return
+        if self._item is not None:
+            self._item.refresh_xmp_state()
+            return
 
         try:
-            from xmp_manager_extended import XMPManagerExtended, XMPSyncState,    get_sync_ui_config, get_xmp_sync_tooltip
-
             # CACHE CHECK con controllo sicurezza
             if hasattr(self, '_xmp_state_cache') and hasattr(self, '_xmp_info_cache') and self._xmp_info_cache:
                 state = self._xmp_state_cache
@@ -3811,28 +3063,13 @@ class ImageCard(QFrame):
             if info is None:
                 return
             
-            category = info.get('category', 'standard')
             self.xmp_state = state
-        
-            ui_config = get_sync_ui_config(state)
-        
-            # Resto del codice identico...
-            if state == XMPSyncState.PERFECT_SYNC:
-                label_text = "XMP SYNC" if category == 'raw' else "EMB SYNC"
-            elif state == XMPSyncState.DB_ONLY:
-                label_text = "DB ONLY"
-            elif state == XMPSyncState.MIXED_STATE:
-                label_text = "MIX SYNC"
-            elif 'DIRTY' in str(state) or 'DIFF' in str(state) or state == XMPSyncState.MIXED_DIRTY:
-                label_text = "MIX DIFF" if state == XMPSyncState.MIXED_DIRTY else \
-                        ("XMP DIFF" if category == 'raw' else "EMB DIFF")
-            else:
-                label_text = ui_config["label"]
-            
+            label_text, badge_color, badge_class, badge_tooltip = _xmp_badge(state, info)
+
             self.xmp_label.setText(label_text)
-            self.xmp_label.setObjectName(ui_config["class"])
+            self.xmp_label.setObjectName(badge_class)
             self.xmp_label.setStyleSheet(f"""
-                background-color: {ui_config["color"]};
+                background-color: {badge_color};
                 color: white;
                 padding: 2px 4px;
                 border-radius: 2px;
@@ -3843,7 +3080,7 @@ class ImageCard(QFrame):
             if self.xmp_label.isHidden():
                 self.xmp_label.show()
             
-            self.xmp_label.setToolTip(get_xmp_sync_tooltip(state, info))
+            self.xmp_label.setToolTip(badge_tooltip)
         
         except Exception as e:
             print(f"Errore critico in refresh_xmp_state: {e}")
@@ -4884,7 +4121,6 @@ class LLMTagDialog(QDialog):
 # Export delle classi principali
 __all__ = [
     'ImageCard',
-    'FlowLayout',
     'UserTagDialog',
     'RemoveTagDialog',
     'LLMTagDialog',
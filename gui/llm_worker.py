@@ -98,6 +98,7 @@ class LLMWorkerThread(QThread):
                     bioclip_context=self.bioclip_context,
                     category_hint=category_hint,
                     location_hint=location_hint,
+                    file_hash=item.image_data.get('file_hash'),
                 )
                 
                 if result:
@@ -260,6 +260,7 @@ class AppHeader(QFrame):
         'cpu':     '#C88B2E',   # ambra — caricato su CPU (VRAM insufficiente)
         'error':   '#E74C3C',   # rosso — abilitato ma non caricato (anomalia)
         'missing': '#606060',   # grigio — disabilitato
+        'pending': '#1C4F63',   # blu petrolio — caricamento al primo utilizzo (lazy)
     }
 
     def update_model_status(self, model_id: str, status: str, label: str = None):
@@ -269,6 +270,7 @@ class AppHeader(QFrame):
             model_id: chiave del modello ('clip', 'dinov2', 'bioclip',
                       'aesthetic', 'technical', 'llm', 'exiftool', 'database')
             status:   'ok' (VRAM) | 'cpu' (ambra) | 'error' (rosso) | 'missing' (grigio)
+                      | 'pending' (blu, modello lazy non ancora caricato)
             label:    testo opzionale (usato per cambiare 'Ollama' → 'LM Studio')
         """
         if model_id not in self._model_indicators:
@@ -605,19 +607,9 @@ class MainWindow(QMainWindow):
         self._status_timer.timeout.connect(self._check_dynamic_status)
         self._status_timer.start()
 
-    def _update_model_status_indicators(self):
-        """Legge lo stato dei modelli AI inizializzati e aggiorna i semafori nell'header.
-
-        Logica semafori:
-          verde  (ok)      — modello caricato in VRAM (GPU)
-          ambra  (cpu)     — modello caricato su CPU (VRAM insufficiente)
-          rosso  (error)   — modello abilitato ma non caricato (anomalia)
-          grigio (missing) — modello disabilitato dall'utente
-        """
-        emb_gen = self.ai_models.get('embedding_generator')
-        if emb_gen is None:
-            return
-
+    def _update_ai_model_indicators(self, emb_gen):
+        """Semafori dei modelli AI (SigLIP, DINOv2, BioCLIP, Aesthetic, MUSIQ).
+        Chiamato all'avvio e, finché restano modelli lazy da caricare, dal timer di stato."""
         emb_cfg = emb_gen.embedding_config.get('models', {})
 
         # Device per-modello: legge dalla cache dell'embedding_generator
@@ -628,9 +620,18 @@ class MainWindow(QMainWindow):
             dev = str(_devices.get(model_key, 'cpu'))
             return 'ok' if dev != 'cpu' else 'cpu'
 
+        # Modelli lazy non ancora caricati: leggere i loro attributi li caricherebbe
+        _model_state = getattr(emb_gen, 'model_state', None)
+        _pending = {
+            k for k in ('clip', 'dinov2', 'bioclip', 'aesthetic', 'technical')
+            if _model_state is not None and _model_state(k) in ('pending', 'loading')
+        }
+
         # CLIP
         clip_enabled = emb_cfg.get('clip', {}).get('enabled', False)
-        if emb_gen.clip_model is not None:
+        if 'clip' in _pending:
+            self.header.update_model_status('clip', 'pending')
+        elif emb_gen.clip_model is not None:
             self.header.update_model_status('clip', _gpu_status('clip'))
         elif clip_enabled:
             self.header.update_model_status('clip', 'error')
@@ -639,7 +640,9 @@ class MainWindow(QMainWindow):
 
         # DINOv2
         dino_enabled = emb_cfg.get('dinov2', {}).get('enabled', False)
-        if emb_gen.dinov2_model is not None:
+        if 'dinov2' in _pending:
+            self.header.update_model_status('dinov2', 'pending')
+        elif emb_gen.dinov2_model is not None:
             self.header.update_model_status('dinov2', _gpu_status('dinov2'))
         elif dino_enabled:
             self.header.update_model_status('dinov2', 'error')
@@ -648,7 +651,9 @@ class MainWindow(QMainWindow):
 
         # BioCLIP (ha fallback CPU proprio)
         bio_enabled = emb_cfg.get('bioclip', {}).get('enabled', False)
-        if emb_gen.bioclip_classifier is not None:
+        if 'bioclip' in _pending:
+            self.header.update_model_status('bioclip', 'pending')
+        elif emb_gen.bioclip_classifier is not None:
             if getattr(emb_gen, 'bioclip_on_cpu', False):
                 self.header.update_model_status('bioclip', 'cpu')
             else:
@@ -660,7 +665,9 @@ class MainWindow(QMainWindow):
 
         # Aesthetic
         aes_enabled = emb_cfg.get('aesthetic', {}).get('enabled', False)
-        if emb_gen.aesthetic_model is not None:
+        if 'aesthetic' in _pending:
+            self.header.update_model_status('aesthetic', 'pending')
+        elif emb_gen.aesthetic_model is not None:
             self.header.update_model_status('aesthetic', _gpu_status('aesthetic'))
         elif aes_enabled:
             self.header.update_model_status('aesthetic', 'error')
@@ -669,7 +676,9 @@ class MainWindow(QMainWindow):
 
         # Technical (MUSIQ)
         tech_enabled = emb_cfg.get('technical', {}).get('enabled', False)
-        if getattr(emb_gen, 'musiq_available', False):
+        if 'technical' in _pending:
+            self.header.update_model_status('technical', 'pending')
+        elif getattr(emb_gen, 'musiq_available', False):
             musiq_dev = str(getattr(emb_gen, 'musiq_device', 'cpu'))
             if musiq_dev != 'cpu':
                 self.header.update_model_status('technical', 'ok')
@@ -680,6 +689,24 @@ class MainWindow(QMainWindow):
         else:
             self.header.update_model_status('technical', 'missing')
 
+    def _update_model_status_indicators(self):
+        """Legge lo stato dei modelli AI inizializzati e aggiorna i semafori nell'header.
+
+        Logica semafori:
+          verde  (ok)      — modello caricato in VRAM (GPU)
+          ambra  (cpu)     — modello caricato su CPU (VRAM insufficiente)
+          rosso  (error)   — modello abilitato ma non caricato (anomalia)
+          grigio (missing) — modello disabilitato dall'utente
+          blu    (pending) — caricamento lazy al primo utilizzo
+        """
+        emb_gen = self.ai_models.get('embedding_generator')
+        if emb_gen is None:
+            return
+
+        emb_cfg = emb_gen.embedding_config.get('models', {})
+
+        self._update_ai_model_indicators(emb_gen)
+
         # LLM backend — label dinamica in base al plugin attivo
         plugin = getattr(emb_gen, 'llm_plugin', None)
         llm_enabled = emb_cfg.get('llm_vision', {}).get('enabled', False)
@@ -729,6 +756,11 @@ class MainWindow(QMainWindow):
         if emb_gen is None:
             return
 
+        # Modelli lazy: i semafori passano da 'pending' allo stato reale dopo il primo utilizzo
+        if getattr(emb_gen, '_ai_indicators_pending', True):
+            self._update_ai_model_indicators(emb_gen)
+            emb_gen._ai_indicators_pending = getattr(emb_gen, 'lazy_models', False)
+
         # LLM: re-verifica disponibilità del plugin (fa un HTTP ping leggero)
         plugin = getattr(emb_gen, 'llm_plugin', None)
         llm_enabled = emb_gen.embedding_config.get('models', {}).get('llm_vision', {}).get('enabled', False)
@@ -22,6 +22,8 @@ import time
 import json
 import threading
 import queue
+import os
+from contextlib import contextmanager, nullcontext
 
 import logging
 
@@ -69,6 +71,7 @@ class PhotoBarrier:
                 prep = self._prep_cache.get(pkey)
                 if prep is not None:
                     prep['thumbnail'] = None  # LLM usa disco: libera PIL Image dalla RAM
+                    prep['prepared'] = None
                 if self._llm_queue is not None:
                     self._llm_queue.put(self._image_path)
                 else:
@@ -101,13 +104,60 @@ class DiskThumbRef:
                     pass
 
 
+class DeviceIOLimiter:
+    """Limita le letture concorrenti per dispositivo di storage (st_dev).
+
+    Un HDD USB meccanico crolla con letture parallele (seek continui): di
+    default ogni dispositivo ammette una lettura alla volta, mentre EXIF,
+    decodifica e hash delle foto già lette proseguono negli altri worker.
+    device_limits: {prefisso_percorso: limite} per dischi veloci (es. NVMe).
+    """
+
+    def __init__(self, default_limit: int = 1, device_limits=None):
+        self._default = max(1, int(default_limit))
+        # Prefisso più lungo per primo: vince la regola più specifica
+        self._prefix_limits = sorted(
+            ((os.path.normcase(str(Path(p).expanduser().resolve())), max(1, int(n)))
+             for p, n in (device_limits or {}).items()),
+            key=lambda x: -len(x[0]))
+        self._sems  = {}
+        self._lock  = threading.Lock()
+
+    @property
+    def default_limit(self) -> int:
+        return self._default
+
+    def limit_for(self, path) -> int:
+        s = os.path.normcase(str(path))
+        for prefix, n in self._prefix_limits:
+            if s == prefix or s.startswith(prefix.rstrip(os.sep) + os.sep):
+                return n
+        return self._default
+
+    @contextmanager
+    def slot(self, path):
+        """Context manager: occupa uno slot di lettura sul dispositivo del file."""
+        try:
+            dev = os.stat(path).st_dev
+        except OSError:
+            dev = None
+        with self._lock:
+            sem = self._sems.get(dev)
+            if sem is None:
+                sem = threading.Semaphore(self.limit_for(path))
+                self._sems[dev] = sem
+        with sem:
+            yield
+
+
 class ProcessingWorker(QThread):
     """Worker thread per processing immagini — ARCHITETTURA THREAD PER MODELLO
 
     Flusso:
-      Fase 0 (ExifTool thread): lettura unica da USB in RAM → file temp su SSD locale →
-        EXIF + geo + hash + thumbnail in parallelo → DB INSERT → distribuisce
-        (image_path, PhotoBarrier) nella coda di ogni modello attivo.
+      Fase 0 (ExifTool thread + pool di N worker prep): lettura unica in RAM (limitata
+        per dispositivo) → file temp su SSD locale → EXIF + geo + hash + thumbnail in
+        parallelo → DB INSERT → distribuisce (image_path, PhotoBarrier) nella coda
+        di ogni modello attivo.
 
       Fase 1 (thread per-modello): ogni modello attivo ha il proprio thread e Queue
         con backpressure (maxsize calcolato su budget RAM 1 GB).
@@ -197,11 +247,42 @@ class ProcessingWorker(QThread):
         except Exception:
             return False
 
+    # Default di embedding.batching (config_new.yaml)
+    _BATCH_DEFAULTS = {
+        'max_batch': {'cpu': 8, 'gpu': 16, 'mps': 8},
+        'max_wait_ms': 50,
+        'target_batch_s': 4.0,
+    }
+
+    def _model_batch_cfg(self, config, emb_gen, model_key):
+        """Parametri micro-batch per un modello in base al suo device.
+
+        embedding.batching.max_batch è per device (cpu / gpu / mps);
+        embedding.models.<modello>.max_batch, se presente, ha la precedenza.
+        MUSIQ non ha una forward pass batch: resta a 1.
+        """
+        emb_cfg  = config.get('embedding', {})
+        batching = {**self._BATCH_DEFAULTS, **(emb_cfg.get('batching') or {})}
+        per_device = {**self._BATCH_DEFAULTS['max_batch'], **(batching.get('max_batch') or {})}
+        try:
+            device = str(emb_gen._device_for(model_key)).split(':')[0]
+        except Exception:
+            device = 'cpu'
+        device_key = device if device in ('cpu', 'mps') else 'gpu'
+        max_batch = emb_cfg.get('models', {}).get(model_key, {}).get('max_batch', per_device.get(device_key, 1))
+        if model_key == 'technical':
+            max_batch = 1
+        return {
+            'max_batch': max(1, int(max_batch)),
+            'max_wait_ms': batching.get('max_wait_ms', 50),
+            'target_batch_s': batching.get('target_batch_s', 4.0),
+        }
+
     # ─────────────────────────────────────────────────────────────
     # RUN — Orchestratore principale
     # ─────────────────────────────────────────────────────────────
     def run(self):
-        """Fase 0 (prep sequenziale) + Fase 1 (modelli paralleli)"""
+        """Fase 0 (pool prep) + Fase 1 (modelli paralleli)"""
         try:
             import sys
             sys.path.insert(0, str(get_app_dir()))
@@ -336,18 +417,17 @@ class ProcessingWorker(QThread):
                     self.log_message.emit(f"❌ Directory input non trovata: {input_dir}", "error")
                     self.finished.emit({'total': 0, 'processed': 0, 'errors': 1})
                     return
-                all_images = []
-                seen_files = set()
-                for ext in supported_formats:
-                    for pattern in [f"*{ext}", f"*{ext.upper()}"]:
-                        found = input_dir.rglob(pattern) if self.include_subdirs else input_dir.glob(pattern)
-                        for fp in found:
-                            if fp.name.startswith('.'):
-                                continue
-                            dk = str(fp).lower() if self.include_subdirs else fp.name.lower()
-                            if dk not in seen_files:
-                                seen_files.add(dk)
-                                all_images.append(fp)
+                # Visita unica con snapshot per cartella: ogni cartella viene
+                # elencata, ma nelle cartelle invariate dall'ultima scansione i
+                # file già noti non richiedono stat (file_scanner)
+                from file_scanner import DirectoryScanner, STATUS_MISSING
+                scanner = DirectoryScanner(db_manager.conn, supported_formats,
+                                           recursive=self.include_subdirs)
+                all_images = [Path(e.path) for e in scanner.scan(input_dir.resolve())
+                              if e.status != STATUS_MISSING]
+                self.log_message.emit(
+                    f"🗂️ Scansione: {scanner.stats['dirs_scanned']} cartelle lette, "
+                    f"{scanner.stats['dirs_skipped']} invariate (senza stat)", "debug")
 
             if not all_images:
                 self.log_message.emit("⚠️ Nessuna immagine trovata nella directory input", "warning")
@@ -594,7 +674,8 @@ class ProcessingWorker(QThread):
                     args=(mk, db_field, infer_fn, is_emb,
                           model_queues[mk], prep_cache,
                           embedding_generator, db_manager,
-                          emb_flags, stats, model_total, processing_mode, use_disk),
+                          emb_flags, stats, model_total, processing_mode, use_disk,
+                          self._model_batch_cfg(config, embedding_generator, mk)),
                     name=f"model-{mk}", daemon=True
                 )
                 model_threads.append(t)
@@ -607,7 +688,8 @@ class ProcessingWorker(QThread):
                     args=(model_queues['bioclip'], prep_cache,
                           embedding_generator, db_manager,
                           emb_flags, stats, model_total, processing_mode,
-                          bioclip_results, bioclip_lock, bioclip_use_disk),
+                          bioclip_results, bioclip_lock, bioclip_use_disk,
+                          self._model_batch_cfg(config, embedding_generator, 'bioclip')),
                     name="model-bioclip", daemon=True
                 )
                 model_threads.append(t)
@@ -836,12 +918,15 @@ class ProcessingWorker(QThread):
     def _prep_image(self, image_path, raw_processor, config, db_manager,
                     processing_mode, emb_flags, llm_gen_config,
                     temp_dir=None, geo_plugin=None, geo_plugin_cfg=None,
-                    disk_consumers=0):
+                    disk_consumers=0, io_limiter=None, hashing=None):
         """Estrae EXIF + thumbnail in parallelo, poi geo + hash + DB insert.
         Le due operazioni più lente (exif e thumb) vengono sovrapposte con
         due thread interni sincronizzati tramite threading.Event.
         temp_dir: directory SSD per file temporanei (None → temp di sistema).
-        Ritorna dict con dati prep oppure None in caso di errore fatale."""
+        io_limiter: DeviceIOLimiter condiviso tra i worker prep (None = nessun limite).
+        hashing: (algoritmo, quick_check) da _hashing_cfg (None = md5 senza pre-check).
+        Ritorna dict con dati prep, {'skipped_duplicate': True} se la foto è
+        già nel catalogo, oppure None in caso di errore fatale."""
         _tmp_path = None  # file temporaneo su SSD locale — pulito nel finally
         try:
             fname  = image_path.name
@@ -875,32 +960,57 @@ class ProcessingWorker(QThread):
             else:
                 max_size = 0
 
-            # ── Lettura unica del file in RAM ────────────────────────
+            # ── Lettura unica del file: copia su SSD + hash ──────────
             # Su HDD USB meccanico (13MB/s), 3 thread che leggono lo stesso
-            # file in parallelo causano seek multipli devastanti. Leggiamo
-            # il file una volta sola in RAM, poi i thread lavorano dalla cache.
+            # file in parallelo causano seek multipli devastanti. Il file
+            # viene letto una volta sola, a blocchi da 1 MB: ogni blocco va
+            # nell'hash e nel file temporaneo, poi i thread lavorano dal temp.
+            # Niente file intero in RAM (PSD/TIFF da 1 GB × worker prep).
+            # Con più worker prep la lettura passa dal limite per dispositivo:
+            # su HDD USB resta una alla volta, come con il produttore singolo.
+            from utils.hashing import copy_and_hash, hash_file, quick_hash
+            algorithm, quick_check = hashing or ('md5', False)
+            file_hash = None
             _t_read = time.monotonic()
             try:
-                _file_bytes = image_path.read_bytes()
+                with (io_limiter.slot(image_path) if io_limiter is not None else nullcontext()):
+                    # Pre-check duplicati: dimensione + primo/ultimo MB. Solo se
+                    # un'altra foto ha lo stesso quick hash si calcola subito
+                    # l'hash completo; se è già nel DB la foto non viene copiata.
+                    q_hash = quick_hash(image_path)
+                    if quick_check and processing_mode == 'new_only':
+                        with self._db_lock:
+                            _candidate = db_manager.quick_hash_exists(q_hash)
+                        if _candidate:
+                            file_hash = hash_file(image_path, algorithm)
+                            with self._db_lock:
+                                _duplicate = db_manager.image_exists(file_hash)
+                            if _duplicate:
+                                self.log_message.emit(f"⏭️ Già nel DB (altro percorso), saltato: {fname}", "debug")
+                                # Metadati già estratti nel blocco: non verranno consumati
+                                if hasattr(raw_processor, 'discard_prefetched'):
+                                    raw_processor.discard_prefetched(image_path)
+                                return {'image_path': image_path, 'skipped_duplicate': True}
+
+                    # File temporaneo su disco locale (SSD) per ExifTool e rawpy
+                    # (entrambi richiedono un path, non accettano bytes direttamente)
+                    import tempfile
+                    _tmp_file = tempfile.NamedTemporaryFile(
+                        suffix=image_path.suffix, delete=False,
+                        dir=str(temp_dir) if temp_dir else None)  # temp_dir configurabile via config
+                    _tmp_path = Path(_tmp_file.name)
+                    try:
+                        # Hash già calcolato dal pre-check: solo copia
+                        _copy_hash = copy_and_hash(image_path, _tmp_file,
+                                                   None if file_hash else algorithm)
+                    finally:
+                        _tmp_file.close()
+                    file_hash = file_hash or _copy_hash
             except Exception as _re:
                 self.log_message.emit(f"⚠️ Impossibile leggere {fname}: {_re}", "error")
                 return None
             _read_dur = time.monotonic() - _t_read
 
-            # File temporaneo su disco locale (SSD) per ExifTool e rawpy
-            # (entrambi richiedono un path, non accettano bytes direttamente)
-            import tempfile
-            _suffix = image_path.suffix
-            _tmp_file = tempfile.NamedTemporaryFile(
-                suffix=_suffix, delete=False,
-                dir=str(temp_dir) if temp_dir else None)  # temp_dir configurabile via config
-            _tmp_path = Path(_tmp_file.name)
-            try:
-                _tmp_file.write(_file_bytes)
-                _tmp_file.flush()
-            finally:
-                _tmp_file.close()
-
             # ── Thread A: EXIF (path originale — stay_open + sidecar XMP) ──
             # Usa image_path originale: ExifTool stay_open è già ottimizzato
             # e il sidecar .xmp deve trovarsi accanto al file originale.
@@ -910,7 +1020,10 @@ class ProcessingWorker(QThread):
             def _do_exif():
                 _t = time.monotonic()
                 try:
-                    md = raw_processor.extract_raw_metadata(image_path, local_path=_tmp_path)
+                    # Con l'anteprima in preparazione l'analisi B/N la usa (Thread B):
+                    # niente seconda apertura del RAW qui
+                    md = raw_processor.extract_raw_metadata(
+                        image_path, local_path=_tmp_path, bw_analysis=not need_thumb)
                 except Exception as e:
                     self.log_message.emit(f"⚠️ Errore EXIF {fname}: {e}", "warning")
                     md = {}
@@ -920,42 +1033,45 @@ class ProcessingWorker(QThread):
 
             # ── Thread B: thumbnail (dal file temporaneo su SSD locale) ──
             # rawpy e PIL beneficiano del file su SSD invece che USB.
-            thumb_result = {}   # {'thumbnail': PIL|None, 'thumb_dur': float}
+            # Una sola decodifica: l'anteprima diventa un PreparedImage da cui
+            # derivano analisi B/N, thumbnail gallery e livelli dei profili modello.
+            thumb_result = {}   # {'thumbnail': PIL|None, 'prepared': PreparedImage|None,
+                                #  'is_monochrome': int, 'thumb_dur': float}
             thumb_done   = threading.Event()
 
             def _do_thumb():
                 if not need_thumb:
                     thumb_result['thumbnail'] = None
+                    thumb_result['prepared'] = None
                     thumb_result['thumb_dur'] = 0.0
                     thumb_done.set()
                     return
                 _t = time.monotonic()
-                thumb_result['thumbnail'] = self._prepare_image_for_ai_corrected(
-                    _tmp_path, raw_processor, is_raw, target_size=max_size)
-                thumb_result['thumb_dur'] = time.monotonic() - _t
-                thumb_done.set()
-
-            # ── Thread C: hash MD5 (dai bytes già in RAM) ────────────
-            hash_result  = {}   # {'file_hash': str|None, 'hash_dur': float}
-            hash_done    = threading.Event()
-
-            def _do_hash():
-                import hashlib
-                _th = time.monotonic()
                 try:
-                    hash_result['file_hash'] = hashlib.md5(_file_bytes).hexdigest()
-                except Exception:
-                    hash_result['file_hash'] = None
-                hash_result['hash_dur'] = time.monotonic() - _th
-                hash_done.set()
+                    thumbnail = self._prepare_image_for_ai_corrected(
+                        _tmp_path, raw_processor, is_raw, target_size=max_size)
+                    prepared = None
+                    if thumbnail is not None and hasattr(thumbnail, 'size'):
+                        from prepared_image import PreparedImage
+                        prepared = PreparedImage(thumbnail)
+                        thumbnail = prepared.base
+                        thumb_result['is_monochrome'] = raw_processor.detect_monochrome(
+                            image=prepared.analysis(), name=fname)
+                    else:
+                        # Anteprima non estraibile: analisi B/N dal file come prima
+                        thumb_result['is_monochrome'] = raw_processor.detect_monochrome(
+                            _tmp_path, name=fname)
+                    thumb_result['thumbnail'] = thumbnail
+                    thumb_result['prepared'] = prepared
+                finally:
+                    thumb_result['thumb_dur'] = time.monotonic() - _t
+                    thumb_done.set()
 
-            # Avvia tutti e tre i thread in parallelo
+            # Avvia i due thread in parallelo (l'hash è già stato calcolato con la copia)
             t_exif  = threading.Thread(target=_do_exif,  daemon=True)
             t_thumb = threading.Thread(target=_do_thumb, daemon=True)
-            t_hash  = threading.Thread(target=_do_hash,  daemon=True)
             t_exif.start()
             t_thumb.start()
-            t_hash.start()
 
             # Aspetta EXIF (serve per geo + DB insert)
             exif_done.wait()
@@ -974,13 +1090,15 @@ class ProcessingWorker(QThread):
                 'llm_generated': False,
                 'app_version': '1.0',
                 'tags': json.dumps([], ensure_ascii=False),
+                'quick_hash': q_hash,
             }
+            if file_hash:
+                image_data['file_hash'] = file_hash
             extracted_metadata = exif_result.get('metadata', {})
             if extracted_metadata:
                 for key, value in extracted_metadata.items():
                     if key not in ['is_raw', 'raw_info']:
                         image_data[key] = value
-            # file_hash aggiunto dopo hash_done.wait() (thread C in parallelo)
 
             # --- Geo hierarchy (dopo EXIF, GPS disponibile) ---
             _t_geo = time.monotonic()
@@ -1026,14 +1144,12 @@ class ProcessingWorker(QThread):
                     self.log_message.emit(f"⚠️ Geo no-GPS {fname}: {geo_err}", "warning")
             _t_geo_dur = time.monotonic() - _t_geo
 
-            # --- Aspetta hash (serve prima del blocco DB per il check duplicati) ---
-            hash_done.wait()
-            _t_hash_dur = hash_result['hash_dur']
-            file_hash = hash_result.get('file_hash')
-            if file_hash:
-                image_data['file_hash'] = file_hash
+            # --- Aspetta thumbnail: is_monochrome arriva dall'anteprima ---
+            thumb_done.wait()
+            if 'is_monochrome' in thumb_result:
+                image_data['is_monochrome'] = thumb_result['is_monochrome']
 
-            # --- DB insert (dopo EXIF+geo+hash, thumb ancora in corso) ---
+            # --- DB insert (dopo EXIF+geo+thumb) ---
             _t_db = time.monotonic()
             is_new    = False
             ai_fields = {}
@@ -1055,6 +1171,8 @@ class ProcessingWorker(QThread):
                     self.log_message.emit(f"🔄 DB aggiornato (reprocess): {fname}", "debug")
                 elif image_exists:
                     self.log_message.emit(f"⏭️ Già nel DB, saltato: {fname}", "debug")
+                    thumb_done.wait()
+                    return {'image_path': image_path, 'skipped_duplicate': True}
                 else:
                     image_id = db_manager.insert_image(image_data)
                     is_new = True
@@ -1063,21 +1181,16 @@ class ProcessingWorker(QThread):
                     else:
                         self.log_message.emit(f"❌ DB inserimento fallito: {fname}", "error")
                         thumb_done.wait()
-                        _file_bytes = None
                         return None
             _t_db_dur = time.monotonic() - _t_db
 
-            # --- Aspetta thumbnail (hash già atteso sopra) ---
-            thumb_done.wait()
             _t_thumb_dur = thumb_result['thumb_dur']
             thumbnail    = thumb_result.get('thumbnail')
-
-            # Libera bytes in RAM (il file temporaneo viene pulito nel finally)
-            _file_bytes = None
+            prepared     = thumb_result.get('prepared')
 
             # Salva thumbnail cache gallery (per UI) — il thumbnail PIL
             # resta in RAM nel prep_cache per i thread modello (no disco)
-            if thumbnail and hasattr(thumbnail, 'size'):
+            if prepared is not None:
                 try:
                     from utils.thumb_cache import save_gallery_thumb
                     from PIL import Image as _PILImage
@@ -1092,13 +1205,12 @@ class ProcessingWorker(QThread):
                     }
                     orientation = image_data.get('orientation')
                     ops = _ORIENT_OPS.get(int(orientation), []) if orientation and orientation != 1 else []
-                    if ops:
-                        thumb_oriented = thumbnail.copy()
-                        for op in ops:
-                            thumb_oriented = thumb_oriented.transpose(op)
-                        save_gallery_thumb(image_path, thumb_oriented)
-                    else:
-                        save_gallery_thumb(image_path, thumbnail)
+                    # 150px dalla piramide: rotazione e salvataggio sulla thumb piccola
+                    gallery_thumb = prepared.gallery()
+                    for op in ops:
+                        gallery_thumb = gallery_thumb.transpose(op)
+                    # Chiave = percorso come nel catalogo (letto dalla gallery)
+                    save_gallery_thumb(Path(image_data['filepath']), gallery_thumb)
                 except Exception as _e:
                     logger.warning(f"Errore thumbnail cache gallery: {_e}")
             elif need_thumb and is_raw:
@@ -1106,6 +1218,11 @@ class ProcessingWorker(QThread):
                     f"⚠️ {fname}: nessuna immagine estraibile dal RAW — "
                     f"embedding e LLM saltati", "warning")
 
+            # Payload LLM (profilo llm_vision) dall'anteprima già decodificata:
+            # le generazioni successive dalla gallery non riaprono il RAW
+            if prepared is not None and file_hash:
+                self._save_llm_payload(config, file_hash, prepared, fname)
+
             # Salva thumbnail su disco per modelli lenti (LLM, MUSIQ su CPU).
             # L'ultimo modello lento a finire cancella il file via DiskThumbRef.release().
             thumbnail_disk = None
@@ -1126,13 +1243,14 @@ class ProcessingWorker(QThread):
 
             _t_total = time.monotonic() - _t0
             self.log_message.emit(
-                f"⏱ prep {fname}: read={_read_dur:.2f}s exif={_t_exif_dur:.2f}s "
-                f"hash={_t_hash_dur:.2f}s geo={_t_geo_dur:.2f}s db={_t_db_dur:.2f}s "
+                f"⏱ prep {fname}: read+hash={_read_dur:.2f}s exif={_t_exif_dur:.2f}s "
+                f"geo={_t_geo_dur:.2f}s db={_t_db_dur:.2f}s "
                 f"thumb={_t_thumb_dur:.2f}s tot={_t_total:.2f}s", "debug")
 
             return {
                 'image_path':     image_path,
                 'thumbnail':      thumbnail,       # PIL Image in RAM per modelli veloci GPU
+                'prepared':       prepared,        # PreparedImage: livelli per profilo (stessa base)
                 'thumbnail_disk': thumbnail_disk,  # DiskThumbRef JPEG per modelli lenti CPU
                 'image_data':     image_data,
                 'geo_hierarchy':  geo_hierarchy,
@@ -1165,106 +1283,137 @@ class ProcessingWorker(QThread):
     def _thread_model_worker(self, model_key, db_field, infer_fn, is_embedding,
                              model_queue, prep_cache,
                              emb_gen, db_manager,
-                             emb_flags, stats, total, processing_mode, use_disk=False):
+                             emb_flags, stats, total, processing_mode, use_disk=False,
+                             batch_cfg=None):
         """Thread dedicato a un singolo modello embedding.
 
         Consuma (image_path, barrier) dalla propria Queue con backpressure.
-        Al termine di ogni foto chiama barrier.done(model_key) per segnalare
-        al PhotoBarrier che questo modello ha completato.
+        Micro-batch: dopo la prima foto drena le altre già in coda, fino a
+        batch_cfg['max_batch'] o alla scadenza max_wait_ms, ed esegue una sola
+        forward pass. Poi chiama barrier.done(model_key) foto per foto, così
+        ogni PhotoBarrier si sblocca appena il suo risultato è scritto.
         """
         import numpy as np
+        from concurrent.futures import ThreadPoolExecutor, TimeoutError as _FuturesTimeout
+
+        batch_cfg  = batch_cfg or {}
+        max_batch  = max(1, int(batch_cfg.get('max_batch', 1)))
+        max_wait   = float(batch_cfg.get('max_wait_ms', 50)) / 1000.0
+        target_s   = float(batch_cfg.get('target_batch_s', 4.0))
+        cur_batch  = max_batch      # limite adattivo: dimezza se il batch è lento, raddoppia se rapido
+        _INFER_TIMEOUT = 120        # secondi max per forward pass
 
         overwrite   = emb_flags.get(model_key, {}).get('overwrite', False)
         _db_pending = 0
         i = 0  # contatore foto elaborate da questo thread
+        stop = False
+        # Executor persistente: il timeout non richiede più un pool nuovo per ogni foto
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"infer-{model_key}")
 
-        self.log_message.emit(f"🧠 Thread {model_key.upper()} avviato", "info")
-
-        while self.is_running:
-            try:
-                item = model_queue.get(timeout=2.0)
-            except queue.Empty:
-                continue
-
-            if item is None:
-                break  # sentinella
-
-            if not self._wait_if_paused():
-                break
+        def _release(image_path, barrier, prep):
+            # prep letto prima di done(): l'ultima barrier lo toglie da prep_cache
+            barrier.done(model_key)
+            if prep and use_disk:
+                # Modello su disco: rilascia DiskThumbRef (l'ultimo cancella il file)
+                disk_ref = prep.get('thumbnail_disk')
+                if disk_ref is not None:
+                    disk_ref.release()
 
-            i += 1
-            image_path, barrier = item
-            fname = image_path.name        # solo per log
-            pkey  = str(image_path)        # chiave prep_cache (percorso completo)
+        self.log_message.emit(f"🧠 Thread {model_key.upper()} avviato (batch max {max_batch})", "info")
 
-            # Attendi che ExifTool abbia scritto il prep (raramente necessario:
-            # ExifTool mette la foto in coda solo dopo aver scritto il prep)
-            _waited = 0
-            while pkey not in prep_cache:
-                if not self.is_running:
-                    barrier.done(model_key)
-                    return
-                time.sleep(0.01)
-                _waited += 1
-                if _waited > 500:
-                    self.log_message.emit(f"⚠️ {model_key.upper()} timeout attesa prep {fname}", "warning")
-                    break
-
-            prep = prep_cache.get(pkey)
-            if prep is None:
-                barrier.done(model_key)
-                self._emit_progress_throttled(model_key, i, total)
-                continue
+        try:
+            while self.is_running and not stop:
+                try:
+                    item = model_queue.get(timeout=2.0)
+                except queue.Empty:
+                    continue
 
-            file_hash = prep.get('image_data', {}).get('file_hash')
-            is_new    = prep.get('is_new', True)
-            ai_fields = prep.get('ai_fields', {})
+                if item is None:
+                    break  # sentinella
 
-            # Legge thumbnail da disco o da RAM in base a disk_queue del modello
-            if use_disk:
-                disk_ref = prep.get('thumbnail_disk')
-                if disk_ref is not None:
+                # Drena la coda fino al limite del batch o alla scadenza
+                items = [item]
+                deadline = time.monotonic() + max_wait
+                while len(items) < cur_batch:
+                    remaining = deadline - time.monotonic()
                     try:
-                        from PIL import Image as _PILImg
-                        thumb = _PILImg.open(str(disk_ref.path)).copy()
-                    except Exception as _de:
-                        self.log_message.emit(
-                            f"❌ {model_key.upper()} {fname}: lettura thumbnail disco: {_de}", "error")
-                        thumb = None
-                else:
-                    thumb = None
-            else:
-                thumb = prep.get('thumbnail')
+                        nxt = (model_queue.get(timeout=remaining) if remaining > 0
+                               else model_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        stop = True  # sentinella: elabora il batch e poi esci
+                        break
+                    items.append(nxt)
 
-            update_data = {}
+                # Foto del batch non ancora rilasciate: pausa/stop o errore a metà
+                # batch non devono lasciare barrier bloccate né thumbnail su disco
+                released = 0
+                try:
+                    if not self._wait_if_paused():
+                        break
 
-            if thumb is not None:
-                # Skip se campo già presente e overwrite OFF
-                if overwrite or is_new or not ai_fields.get(db_field, False):
-                    try:
-                        from concurrent.futures import ThreadPoolExecutor, TimeoutError as _FuturesTimeout
-                        _INFER_TIMEOUT = 120  # secondi max per foto
+                    # Prep e thumbnail per ogni foto del batch
+                    entries = []
+                    for image_path, barrier in items:
+                        prep = self._await_model_prep(model_key, image_path, prep_cache)
+                        if not self.is_running:
+                            return
+                        entry = {'path': image_path, 'barrier': barrier, 'prep': prep,
+                                 'thumb': None, 'result': None}
+                        if prep is not None:
+                            ai_fields = prep.get('ai_fields', {})
+                            # Skip se campo già presente e overwrite OFF
+                            if overwrite or prep.get('is_new', True) or not ai_fields.get(db_field, False):
+                                entry['thumb'] = self._load_model_thumb(model_key, prep, use_disk,
+                                                                        image_path.name, emb_gen)
+                        entries.append(entry)
+
+                    # Una forward pass per tutto il batch
+                    todo = [e for e in entries if e['thumb'] is not None]
+                    if todo:
                         _t = time.monotonic()
-                        with ThreadPoolExecutor(max_workers=1) as _ex:
-                            _future = _ex.submit(infer_fn, [thumb])
-                            try:
-                                results = _future.result(timeout=_INFER_TIMEOUT)
-                            except _FuturesTimeout:
-                                self.log_message.emit(
-                                    f"⏰ {model_key.upper()} timeout ({_INFER_TIMEOUT}s) su {fname} — foto saltata",
-                                    "warning")
-                                with self._stats_lock:
-                                    stats['model_timeouts'].setdefault(pkey, set()).add(model_key)
-                                results = None
+                        results = None
+                        try:
+                            _future = executor.submit(infer_fn, [e['thumb'] for e in todo])
+                            results = _future.result(timeout=_INFER_TIMEOUT)
+                        except _FuturesTimeout:
+                            names = ", ".join(e['path'].name for e in todo[:3])
+                            self.log_message.emit(
+                                f"⏰ {model_key.upper()} timeout ({_INFER_TIMEOUT}s) su {len(todo)} foto "
+                                f"({names}{'…' if len(todo) > 3 else ''}) — saltate", "warning")
+                            with self._stats_lock:
+                                for e in todo:
+                                    stats['model_timeouts'].setdefault(str(e['path']), set()).add(model_key)
+                            # Il thread bloccato resta nel vecchio pool: si riparte con uno nuovo
+                            executor.shutdown(wait=False)
+                            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"infer-{model_key}")
+                            cur_batch = max(1, cur_batch // 2)
+                        except Exception as e:
+                            self.log_message.emit(f"❌ {model_key.upper()} batch {len(todo)} foto: {e}", "error")
                         _dur = time.monotonic() - _t
 
-                        if results and results[0] is not None:
-                            result = results[0]
+                        if results:
+                            for e, result in zip(todo, results):
+                                e['result'] = result
+                            if _dur > target_s and cur_batch > 1:
+                                cur_batch = max(1, cur_batch // 2)
+                            elif _dur < target_s / 2 and len(todo) >= cur_batch and cur_batch < max_batch:
+                                cur_batch = min(max_batch, cur_batch * 2)
+                            self.log_message.emit(
+                                f"⏱ {model_key.upper()} batch {len(todo)}: {_dur:.2f}s "
+                                f"({_dur / len(todo):.2f}s/foto)", "debug")
+
+                    # Risultati → DB, poi rilascio barrier foto per foto
+                    for e in entries:
+                        update_data = {}
+                        result = e['result']
+                        if result is not None:
                             if is_embedding:
                                 if isinstance(result, np.ndarray):
                                     if np.any(np.isnan(result)):
                                         self.log_message.emit(
-                                            f"🚨 {model_key.upper()} NaN: {fname}", "error")
+                                            f"🚨 {model_key.upper()} NaN: {e['path'].name}", "error")
                                     else:
                                         update_data[db_field] = result
                                         update_data['embedding_generated'] = True
@@ -1276,157 +1425,243 @@ class ProcessingWorker(QThread):
                                 with self._stats_lock:
                                     stats[model_key] += 1
 
-                            self.log_message.emit(
-                                f"⏱ {model_key.upper()} {fname}: {_dur:.2f}s", "debug")
-
-                    except Exception as e:
-                        self.log_message.emit(f"❌ {model_key.upper()} {fname}: {e}", "error")
-
-            if update_data:
+                        prep = e['prep']
+                        if update_data:
+                            file_hash = prep.get('image_data', {}).get('file_hash')
+                            with self._db_lock:
+                                db_manager.update_image(file_hash, update_data)
+                            _db_pending += 1
+                            if _db_pending >= self._DB_COMMIT_BATCH:
+                                with self._db_lock:
+                                    try:
+                                        db_manager.conn.commit()
+                                    except Exception:
+                                        pass
+                                _db_pending = 0
+
+                        # Segnala alla barrier che questo modello ha finito la foto
+                        _release(e['path'], e['barrier'], prep)
+                        released += 1
+                        # NON azzerare prep['thumbnail'] qui: è condivisa tra tutti i modelli GPU.
+                        # Viene liberata dal thread LLM (che legge dal disco) o alla fine della sessione.
+                        i += 1
+                        self._emit_progress_throttled(model_key, i, total)
+                finally:
+                    for image_path, barrier in items[released:]:
+                        _release(image_path, barrier, prep_cache.get(str(image_path)))
+
+                # GPU crash rilevato: interrompe il thread dopo aver soddisfatto le barrier
+                if getattr(emb_gen, '_gpu_dead', False):
+                    if not self._gpu_error_reported:
+                        self._gpu_error_reported = True
+                        self.critical_gpu_error.emit(model_key, "GPU device removed (TDR)")
+                    self.is_running = False
+                    return
+        finally:
+            executor.shutdown(wait=False)
+            # Commit finale residui
+            if _db_pending > 0:
                 with self._db_lock:
-                    db_manager.update_image(file_hash, update_data)
-                _db_pending += 1
-                if _db_pending >= self._DB_COMMIT_BATCH:
-                    with self._db_lock:
-                        try:
-                            db_manager.conn.commit()
-                        except Exception:
-                            pass
-                    _db_pending = 0
-
-            # Segnala alla barrier che questo modello ha finito la foto
-            barrier.done(model_key)
-            if prep and use_disk:
-                # Modello su disco: rilascia DiskThumbRef (l'ultimo cancella il file)
-                disk_ref = prep.get('thumbnail_disk')
-                if disk_ref is not None:
-                    disk_ref.release()
-            # NON azzerare prep['thumbnail'] qui: è condivisa tra tutti i modelli GPU.
-            # Viene liberata dal thread LLM (che legge dal disco) o alla fine della sessione.
-            self._emit_progress_throttled(model_key, i, total)
-
-            # GPU crash rilevato: interrompe il thread dopo aver soddisfatto la barrier
-            if getattr(emb_gen, '_gpu_dead', False):
-                if not self._gpu_error_reported:
-                    self._gpu_error_reported = True
-                    self.critical_gpu_error.emit(model_key, "GPU device removed (TDR)")
-                self.is_running = False
-                return
-
-        # Commit finale residui
-        if _db_pending > 0:
-            with self._db_lock:
-                try:
-                    db_manager.conn.commit()
-                except Exception:
-                    pass
+                    try:
+                        db_manager.conn.commit()
+                    except Exception:
+                        pass
 
         self.log_message.emit(f"✅ Thread {model_key.upper()} completato", "info")
 
+    def _await_model_prep(self, model_key, image_path, prep_cache):
+        """Attende che ExifTool abbia scritto il prep della foto (raramente necessario:
+        ExifTool mette la foto in coda solo dopo aver scritto il prep).
+        Ritorna il prep oppure None (timeout o stop)."""
+        pkey = str(image_path)  # chiave prep_cache (percorso completo)
+        _waited = 0
+        while pkey not in prep_cache:
+            if not self.is_running:
+                return None
+            time.sleep(0.01)
+            _waited += 1
+            if _waited > 500:
+                self.log_message.emit(f"⚠️ {model_key.upper()} timeout attesa prep {image_path.name}", "warning")
+                break
+        return prep_cache.get(pkey)
+
+    # Modelli che ridimensionano al proprio profilo in _prepare_image_for_model:
+    # dalla RAM ricevono il livello PreparedImage già alla target_size.
+    # SigLIP (processor) e MUSIQ gestiscono da sé la dimensione: ricevono la base.
+    _MODEL_PROFILES = {
+        'dinov2': 'dinov2_embedding',
+        'aesthetic': 'aesthetic_score',
+        'bioclip': 'bioclip_classification',
+    }
+
+    def _save_llm_payload(self, config, file_hash, prepared, fname):
+        """JPEG al profilo llm_vision nella cache payload (utils.llm_payload_cache)."""
+        try:
+            from utils.llm_payload_cache import (get_payload_store, payload_key,
+                                                 encode_llm_payload, resampling_name)
+            store = get_payload_store(config)
+            if store is None:
+                return
+            # Stessi valori di EmbeddingGenerator._load_optimization_profiles
+            profile = config.get('image_optimization', {}).get('profiles', {}).get('llm_vision', {}) or {}
+            target_size = int(profile.get('target_size', 512))
+            resampling = resampling_name(profile.get('resampling', 'LANCZOS'))
+            key = payload_key(file_hash, target_size, resampling)
+            if store.contains(key):
+                return
+            from PIL import Image as _PILImage
+            level = prepared.level(target_size, getattr(_PILImage.Resampling, resampling))
+            store.put(key, encode_llm_payload(level, target_size, resampling))
+        except Exception as _e:
+            logger.debug(f"Payload LLM non salvato per {fname}: {_e}")
+
+    def _load_model_thumb(self, model_key, prep, use_disk, fname, emb_gen=None):
+        """Thumbnail da disco o da RAM in base a disk_queue del modello."""
+        if not use_disk:
+            prepared = prep.get('prepared')
+            profile_name = self._MODEL_PROFILES.get(model_key)
+            if prepared is not None and profile_name and emb_gen is not None:
+                profile = emb_gen.optimization_profiles.get(profile_name)
+                if profile:
+                    return prepared.level(profile['target_size'], profile['resampling'])
+            return prep.get('thumbnail')
+        disk_ref = prep.get('thumbnail_disk')
+        if disk_ref is None:
+            return None
+        try:
+            from PIL import Image as _PILImg
+            return _PILImg.open(str(disk_ref.path)).copy()
+        except Exception as _de:
+            self.log_message.emit(
+                f"❌ {model_key.upper()} {fname}: lettura thumbnail disco: {_de}", "error")
+            return None
+
     # ─────────────────────────────────────────────────────────────
     # THREAD BIOCLIP (separato — produce contesto per LLM)
     # ─────────────────────────────────────────────────────────────
     def _thread_bioclip_worker(self, model_queue, prep_cache,
                                emb_gen, db_manager,
                                emb_flags, stats, total, processing_mode,
-                               bioclip_results, bioclip_lock, use_disk=False):
+                               bioclip_results, bioclip_lock, use_disk=False,
+                               batch_cfg=None):
         """Thread dedicato a BioCLIP.
 
-        Come _thread_model_worker ma in più salva il contesto
-        tassonomico in bioclip_results per il thread LLM.
+        Come _thread_model_worker (micro-batch con una sola forward pass) ma in
+        più salva il contesto tassonomico in bioclip_results per il thread LLM.
         Chiama barrier.done('bioclip') al termine di ogni foto.
         """
+        from concurrent.futures import ThreadPoolExecutor, TimeoutError as _FuturesTimeout
         from embedding_generator import EmbeddingGenerator
 
+        batch_cfg   = batch_cfg or {}
+        max_batch   = max(1, int(batch_cfg.get('max_batch', 1)))
+        max_wait    = float(batch_cfg.get('max_wait_ms', 50)) / 1000.0
+        target_s    = float(batch_cfg.get('target_batch_s', 4.0))
+        cur_batch   = max_batch
+        _BIOCLIP_TIMEOUT = 120  # secondi max per forward pass
+
         overwrite   = emb_flags.get('bioclip', {}).get('overwrite', False)
         _db_pending = 0
         i = 0  # contatore foto elaborate da questo thread
+        stop = False
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer-bioclip")
 
-        self.log_message.emit("🌿 Thread BioCLIP avviato", "info")
-
-        while self.is_running:
-            try:
-                item = model_queue.get(timeout=2.0)
-            except queue.Empty:
-                continue
-
-            if item is None:
-                break
-
-            if not self._wait_if_paused():
-                break
+        self.log_message.emit(f"🌿 Thread BioCLIP avviato (batch max {max_batch})", "info")
 
-            i += 1
-            image_path, barrier = item
-            fname = image_path.name        # solo per log
-            pkey  = str(image_path)        # chiave prep_cache (percorso completo)
+        try:
+            while self.is_running and not stop:
+                try:
+                    item = model_queue.get(timeout=2.0)
+                except queue.Empty:
+                    continue
 
-            _waited = 0
-            while pkey not in prep_cache:
-                if not self.is_running:
-                    barrier.done('bioclip')
-                    return
-                time.sleep(0.01)
-                _waited += 1
-                if _waited > 500:
-                    self.log_message.emit(f"⚠️ BioCLIP timeout attesa prep {fname}", "warning")
+                if item is None:
                     break
 
-            prep = prep_cache.get(pkey)
-            if prep is None:
-                barrier.done('bioclip')
-                self._emit_progress_throttled('bioclip', i, total)
-                continue
+                # Drena la coda fino al limite del batch o alla scadenza
+                items = [item]
+                deadline = time.monotonic() + max_wait
+                while len(items) < cur_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        nxt = (model_queue.get(timeout=remaining) if remaining > 0
+                               else model_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        stop = True
+                        break
+                    items.append(nxt)
 
-            file_hash = prep.get('image_data', {}).get('file_hash')
-            is_new    = prep.get('is_new', True)
-            ai_fields = prep.get('ai_fields', {})
+                if not self._wait_if_paused():
+                    break
 
-            # Legge thumbnail da disco o da RAM in base a disk_queue di BioCLIP
-            if use_disk:
-                _bc_disk_ref = prep.get('thumbnail_disk')
-                if _bc_disk_ref is not None:
+                entries = []
+                for image_path, barrier in items:
+                    prep = self._await_model_prep('bioclip', image_path, prep_cache)
+                    if not self.is_running:
+                        for _, b in items:
+                            b.done('bioclip')
+                        return
+                    entry = {'path': image_path, 'barrier': barrier, 'prep': prep,
+                             'thumb': None, 'result': None}
+                    if prep is not None:
+                        ai_fields = prep.get('ai_fields', {})
+                        skip = (not overwrite and not prep.get('is_new', True)
+                                and ai_fields.get('bioclip_taxonomy', False))
+                        if not skip:
+                            entry['thumb'] = self._load_model_thumb('bioclip', prep, use_disk,
+                                                                    image_path.name, emb_gen)
+                    entries.append(entry)
+
+                # Una forward pass per tutto il batch (foto della stessa cella GeoSpecies insieme)
+                todo = [e for e in entries if e['thumb'] is not None]
+                if todo:
+                    geo = [{'geo_hierarchy': e['prep'].get('geo_hierarchy'),
+                            'gps_lat': e['prep'].get('gps_latitude'),
+                            'gps_lon': e['prep'].get('gps_longitude')} for e in todo]
+                    _t = time.monotonic()
+                    results = None
                     try:
-                        from PIL import Image as _PILImg
-                        thumb = _PILImg.open(str(_bc_disk_ref.path)).copy()
-                    except Exception as _de:
+                        _future = executor.submit(
+                            emb_gen.generate_bioclip_tags_batch, [e['thumb'] for e in todo], geo)
+                        results = _future.result(timeout=_BIOCLIP_TIMEOUT)
+                    except _FuturesTimeout:
+                        names = ", ".join(e['path'].name for e in todo[:3])
                         self.log_message.emit(
-                            f"❌ BioCLIP {fname}: lettura thumbnail disco: {_de}", "error")
-                        thumb = None
-                else:
-                    thumb = None
-            else:
-                thumb = prep.get('thumbnail')
-
-            update_data = {}
+                            f"⏰ BioCLIP timeout ({_BIOCLIP_TIMEOUT}s) su {len(todo)} foto "
+                            f"({names}{'…' if len(todo) > 3 else ''}) — "
+                            f"saltate, tag/descrizione/titolo potrebbero essere incompleti",
+                            "warning")
+                        with self._stats_lock:
+                            for e in todo:
+                                stats['model_timeouts'].setdefault(str(e['path']), set()).add('bioclip')
+                        executor.shutdown(wait=False)
+                        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer-bioclip")
+                        cur_batch = max(1, cur_batch // 2)
+                    except Exception as e:
+                        self.log_message.emit(f"❌ BioCLIP batch {len(todo)} foto: {e}", "error")
+                    _dur = time.monotonic() - _t
+
+                    if results:
+                        for e, result in zip(todo, results):
+                            e['result'] = result
+                        if _dur > target_s and cur_batch > 1:
+                            cur_batch = max(1, cur_batch // 2)
+                        elif _dur < target_s / 2 and len(todo) >= cur_batch and cur_batch < max_batch:
+                            cur_batch = min(max_batch, cur_batch * 2)
+                        self.log_message.emit(
+                            f"⏱ BIOCLIP batch {len(todo)}: {_dur:.2f}s "
+                            f"({_dur / len(todo):.2f}s/foto)", "debug")
 
-            if thumb is not None:
-                skip = (not overwrite and not is_new
-                        and ai_fields.get('bioclip_taxonomy', False))
-                if not skip:
-                    try:
-                        from concurrent.futures import ThreadPoolExecutor, TimeoutError as _FuturesTimeout
-                        _BIOCLIP_TIMEOUT = 120  # secondi max per foto
-                        _geo_hierarchy = prep.get('geo_hierarchy')
-                        _gps_lat = prep.get('gps_latitude')
-                        _gps_lon = prep.get('gps_longitude')
-
-                        with ThreadPoolExecutor(max_workers=1) as _ex:
-                            _future = _ex.submit(
-                                emb_gen.generate_bioclip_tags, thumb,
-                                geo_hierarchy=_geo_hierarchy,
-                                gps_lat=_gps_lat, gps_lon=_gps_lon)
-                            try:
-                                bioclip_tags, bioclip_taxonomy = _future.result(timeout=_BIOCLIP_TIMEOUT)
-                            except _FuturesTimeout:
-                                self.log_message.emit(
-                                    f"⏰ BioCLIP timeout ({_BIOCLIP_TIMEOUT}s) su {fname} — "
-                                    f"foto saltata, tag/descrizione/titolo potrebbero essere incompleti",
-                                    "warning")
-                                with self._stats_lock:
-                                    stats['model_timeouts'].setdefault(pkey, set()).add('bioclip')
-                                bioclip_tags, bioclip_taxonomy = None, None
+                for e in entries:
+                    prep = e['prep']
+                    pkey = str(e['path'])
+                    fname = e['path'].name
+                    update_data = {}
 
+                    if e['result'] is not None:
+                        bioclip_tags, bioclip_taxonomy = e['result']
                         if bioclip_taxonomy and isinstance(bioclip_taxonomy, list):
                             update_data['bioclip_taxonomy'] = json.dumps(
                                 bioclip_taxonomy, ensure_ascii=False)
@@ -1443,44 +1678,44 @@ class ProcessingWorker(QThread):
                             with self._stats_lock:
                                 stats['geospecies_skipped_no_gps'] = emb_gen.geospecies_skipped_no_gps
 
-                        # Contesto tassonomico per LLM (in memoria) — solo se non in timeout
-                        if bioclip_tags is not None or bioclip_taxonomy is not None:
-                            ctx = EmbeddingGenerator.extract_bioclip_context(bioclip_tags or [])
-                            cat = EmbeddingGenerator.extract_category_hint(bioclip_taxonomy or [])
-                            with bioclip_lock:
-                                bioclip_results[pkey] = {'context': ctx, 'category_hint': cat}
-
-                    except Exception as e:
-                        self.log_message.emit(f"❌ BioCLIP {fname}: {e}", "error")
-
-            if update_data:
+                        # Contesto tassonomico per LLM (in memoria)
+                        ctx = EmbeddingGenerator.extract_bioclip_context(bioclip_tags or [])
+                        cat = EmbeddingGenerator.extract_category_hint(bioclip_taxonomy or [])
+                        with bioclip_lock:
+                            bioclip_results[pkey] = {'context': ctx, 'category_hint': cat}
+
+                    if update_data:
+                        file_hash = prep.get('image_data', {}).get('file_hash')
+                        with self._db_lock:
+                            db_manager.update_image(file_hash, update_data)
+                        _db_pending += 1
+                        if _db_pending >= self._DB_COMMIT_BATCH:
+                            with self._db_lock:
+                                try:
+                                    db_manager.conn.commit()
+                                except Exception:
+                                    pass
+                            _db_pending = 0
+
+                    e['barrier'].done('bioclip')
+                    if prep:
+                        if use_disk:
+                            _bc_disk_ref = prep.get('thumbnail_disk')
+                            if _bc_disk_ref is not None:
+                                _bc_disk_ref.release()
+                        else:
+                            prep['thumbnail'] = None
+                            prep['prepared'] = None
+                    i += 1
+                    self._emit_progress_throttled('bioclip', i, total)
+        finally:
+            executor.shutdown(wait=False)
+            if _db_pending > 0:
                 with self._db_lock:
-                    db_manager.update_image(file_hash, update_data)
-                _db_pending += 1
-                if _db_pending >= self._DB_COMMIT_BATCH:
-                    with self._db_lock:
-                        try:
-                            db_manager.conn.commit()
-                        except Exception:
-                            pass
-                    _db_pending = 0
-
-            barrier.done('bioclip')
-            if prep:
-                if use_disk:
-                    _bc_disk_ref = prep.get('thumbnail_disk')
-                    if _bc_disk_ref is not None:
-                        _bc_disk_ref.release()
-                else:
-                    prep['thumbnail'] = None
-            self._emit_progress_throttled('bioclip', i, total)
-
-        if _db_pending > 0:
-            with self._db_lock:
-                try:
-                    db_manager.conn.commit()
-                except Exception:
-                    pass
+                    try:
+                        db_manager.conn.commit()
+                    except Exception:
+                        pass
 
         self.log_message.emit("✅ Thread BioCLIP completato", "info")
 
@@ -1723,19 +1958,67 @@ class ProcessingWorker(QThread):
                     return
             self.log_message.emit("✅ Modelli embedding pronti — avvio generazione LLM", "info")
 
-        while self.is_running:
-            # Attendi prossima immagine dalla coda (timeout per controllare is_running)
-            try:
-                image_path = llm_queue.get(timeout=2.0)
-            except queue.Empty:
-                continue
+        # Finestra LLM: max_parallel richieste in volo, payload dei prossimi
+        # `prefetch` job codificati in anticipo (llm_dispatcher)
+        from llm_dispatcher import LLMDispatcher, LLMJob
+        llm_cfg = emb_gen.config.get('embedding', {}).get('models', {}).get('llm_vision', {})
+        _LLM_TIMEOUT = llm_cfg.get('llm_timeout', 120)
+        max_parallel = max(1, int(llm_cfg.get('max_parallel') or 1))
+        prefetch = max(0, int(llm_cfg.get('prefetch', 2) or 0))
+
+        def _encode(job):
+            # Stadio encode (thread del dispatcher): payload salvato dal prep,
+            # altrimenti thumbnail disco → base64 JPEG
+            file_hash = job.context['file_hash']
+            cached = emb_gen.cached_llm_payload(file_hash) if file_hash else None
+            if cached:
+                return cached
+            from PIL import Image as _PILImg
+            with _PILImg.open(str(job.context['disk_ref'].path)) as thumb:
+                thumb.load()
+                return emb_gen.encode_llm_image(thumb, file_hash=file_hash)
+
+        def _call(job, image_b64):
+            # Sempre una sola chiamata con nucleo analitico unificato,
+            # indipendentemente dal numero di campi richiesti
+            ctx = job.context
+            return emb_gen.generate_llm_combined(
+                None, ctx['modes'],
+                max_tags=gen_tags_cfg.get('max', 10),
+                max_description_words=gen_desc_cfg.get('max', 100),
+                max_title_words=gen_title_cfg.get('max', 5),
+                bioclip_context=ctx['bioclip_context'],
+                category_hint=ctx['category_hint'],
+                location_hint=ctx['location_hint'],
+                vernacular_name=ctx['vernacular_name'],
+                image_b64=image_b64,
+                file_hash=ctx['file_hash'],
+            )
 
-            if image_path is None:
-                break  # sentinella: fine coda
+        # Contatori della cache risposte LLM a inizio run (sono cumulativi per sessione)
+        _cache_start = emb_gen.llm_cache_stats()
 
-            if not self._wait_if_paused():
-                break
+        dispatcher = LLMDispatcher(_encode, _call, max_parallel=max_parallel, prefetch=prefetch)
+        if max_parallel > 1:
+            self.log_message.emit(
+                f"⚙️ LLM: {max_parallel} richieste in parallelo, {prefetch} payload preparati in anticipo",
+                "info")
+
+        def _done(disk_ref=None):
+            nonlocal processed
+            # Ultimo consumatore del file disco — cancella il JPEG
+            if disk_ref is not None:
+                disk_ref.release()
+            processed += 1
+            self._emit_progress_throttled('llm', processed, total)
 
+            # GC periodico — libera buffer accumulati (psd-tools, PIL, numpy)
+            if processed % 100 == 0:
+                import gc
+                gc.collect()
+
+        def _prepare_job(image_path):
+            """Prep, contesto e modi da generare; None se la foto non va all'LLM."""
             fname = image_path.name        # solo per log
             pkey  = str(image_path)        # chiave prep_cache (percorso completo)
             t_start = time.time()
@@ -1747,7 +2030,7 @@ class ProcessingWorker(QThread):
             _waited = 0
             while pkey not in prep_cache:
                 if not self.is_running:
-                    return
+                    return None
                 time.sleep(0.05)
                 _waited += 1
                 if _waited > 200:
@@ -1757,37 +2040,21 @@ class ProcessingWorker(QThread):
             t_prep_wait = time.time()
 
             # LLM è l'ultimo modello: rimuove la voce da prep_cache (thumbnail RAM già
-            # liberata dal PhotoBarrier; prep locale rimane valido per questa iterazione)
+            # liberata dal PhotoBarrier; il file disco lo legge lo stadio encode)
             prep = prep_cache.pop(pkey, None)
             if not prep:
-                processed += 1
-                self._emit_progress_throttled('llm', processed, total)
-                continue
+                _done()
+                return None
 
-            file_hash = prep.get('image_data', {}).get('file_hash')
             disk_ref = prep.get('thumbnail_disk')
-            t_thumb_load = time.time()
             if disk_ref is None:
-                processed += 1
-                self._emit_progress_throttled('llm', processed, total)
-                continue
-            try:
-                from PIL import Image as _PILImg
-                thumb = _PILImg.open(str(disk_ref.path)).copy()
-            except Exception as _te:
-                logger.warning(f"LLM: impossibile leggere thumbnail disco per {fname}: {_te}")
-                disk_ref.release()
-                processed += 1
-                self._emit_progress_throttled('llm', processed, total)
-                continue
+                _done()
+                return None
 
             # Contesto BioCLIP (potrebbe non esserci se BioCLIP disabilitato)
             with bioclip_lock:
                 bc = bioclip_results.get(pkey, {})
             bioclip_context = bc.get('context')
-            category_hint = bc.get('category_hint')
-            location_hint = prep.get('location_hint')
-            geo_hierarchy = prep.get('geo_hierarchy')
 
             # Leggi vernacular_name da BioNomen (scritto in DB durante fase pre_llm)
             vernacular_name = None
@@ -1825,10 +2092,8 @@ class ProcessingWorker(QThread):
                         should_gen_title = False
 
                 if not (should_gen_tags or should_gen_desc or should_gen_title):
-                    disk_ref.release()
-                    processed += 1
-                    self._emit_progress_throttled('llm', processed, total)
-                    continue
+                    _done(disk_ref)
+                    return None
 
                 # Pulizia nome comune residuo: BioNomen disattivato in questo run ma
                 # l'immagine ha ancora un vernacular_name di una passata precedente.
@@ -1839,61 +2104,58 @@ class ProcessingWorker(QThread):
                     self.log_message.emit(
                         f"🧹 Nome comune rimosso ({fname}): BioNomen non attivo", "debug")
                     vernacular_name = None
+            except Exception as e:
+                self.log_message.emit(f"❌ LLM {fname}: {e}", "error")
+                import traceback
+                self.log_message.emit(f"Traceback: {traceback.format_exc()}", "error")
+                _done(disk_ref)
+                return None
 
-                self.log_message.emit(f"🤖 LLM: {fname}", "info")
+            # Chiamata combinata unica — tutti i modi in un solo round-trip Ollama.
+            modes = []
+            if should_gen_tags:    modes.append('tags')
+            if should_gen_desc:    modes.append('description')
+            if should_gen_title:   modes.append('title')
 
-                # Chiamata combinata unica — tutti i modi in un solo round-trip Ollama.
-                modes = []
-                if should_gen_tags:    modes.append('tags')
-                if should_gen_desc:    modes.append('description')
-                if should_gen_title:   modes.append('title')
+            return {
+                'fname': fname, 'pkey': pkey, 'file_hash': _llm_file_hash,
+                'disk_ref': disk_ref, 'modes': modes,
+                'bioclip_context': bioclip_context,
+                'category_hint': bc.get('category_hint'),
+                'location_hint': prep.get('location_hint'),
+                'geo_hierarchy': prep.get('geo_hierarchy'),
+                'vernacular_name': vernacular_name,
+                't_start': t_start, 't_prep_wait': t_prep_wait,
+            }
 
-                llm_results = {'tags': None, 'description': None, 'title': None}
-                t_llm_start = time.time()
-                try:
-                    from concurrent.futures import ThreadPoolExecutor, TimeoutError as _FuturesTimeout
-                    _LLM_TIMEOUT = emb_gen.config.get('embedding', {}).get(
-                        'models', {}).get('llm_vision', {}).get('llm_timeout', 120)
-                    # Sempre una sola chiamata con nucleo analitico unificato,
-                    # indipendentemente dal numero di campi richiesti
-                    with ThreadPoolExecutor(max_workers=1) as _ex:
-                        _future = _ex.submit(
-                            emb_gen.generate_llm_combined,
-                            thumb, modes,
-                            max_tags=gen_tags_cfg.get('max', 10),
-                            max_description_words=gen_desc_cfg.get('max', 100),
-                            max_title_words=gen_title_cfg.get('max', 5),
-                            bioclip_context=bioclip_context,
-                            category_hint=category_hint,
-                            location_hint=location_hint,
-                            vernacular_name=vernacular_name,
-                        )
-                        try:
-                            combined = _future.result(timeout=_LLM_TIMEOUT)
-                            llm_results.update(combined)
-                        except _FuturesTimeout:
-                            self.log_message.emit(
-                                f"⏰ LLM timeout ({_LLM_TIMEOUT}s) su {fname} — foto saltata",
-                                "warning")
-                            with self._stats_lock:
-                                stats['model_timeouts'].setdefault(pkey, set()).add('llm')
-                except Exception as e:
-                    self.log_message.emit(f"⚠️ LLM {fname}: {e}", "warning")
-                t_llm_end = time.time()
+        def _commit(job):
+            """Risultato di un job concluso → DB (chiamato in ordine di completamento)."""
+            ctx = job.context
+            fname = ctx['fname']
+            bioclip_context = ctx['bioclip_context']
+            vernacular_name = ctx['vernacular_name']
+            geo_hierarchy = ctx['geo_hierarchy']
+
+            if job.call_started_at is None:
+                # Stadio encode fallito: nessuna chiamata, nessuna scrittura
+                logger.warning(f"LLM: impossibile leggere thumbnail disco per {fname}: {job.error}")
+                _done(ctx['disk_ref'])
+                return
 
-                # Pulisci cache immagine LLM
-                emb_gen._cleanup_llm_image_cache()
+            try:
+                llm_results = {'tags': None, 'description': None, 'title': None}
+                if job.error is not None:
+                    self.log_message.emit(f"⚠️ LLM {fname}: {job.error}", "warning")
+                elif job.result:
+                    llm_results.update(job.result)
 
                 # ⏱ Timer diagnostico per-fase LLM
-                queue_wait_ms = (t_prep_wait - t_start) * 1000
-                thumb_load_ms = (t_thumb_load - t_prep_wait) * 1000
-                llm_call_ms = (t_llm_end - t_llm_start) * 1000
-                total_ms = (t_llm_end - t_start) * 1000
-                overhead_ms = total_ms - llm_call_ms
+                queue_wait_ms = (ctx['t_prep_wait'] - ctx['t_start']) * 1000
+                total_ms = (time.time() - ctx['t_start']) * 1000
                 self.log_message.emit(
                     f"⏱ LLM {fname}: totale {total_ms:.0f}ms "
-                    f"(coda {queue_wait_ms:.0f}ms + thumb {thumb_load_ms:.0f}ms + "
-                    f"LLM {llm_call_ms:.0f}ms + overhead {overhead_ms - queue_wait_ms - thumb_load_ms:.0f}ms)",
+                    f"(coda {queue_wait_ms:.0f}ms + thumb/encode/attesa slot {job.encode_ms:.0f}ms + "
+                    f"LLM {job.call_ms:.0f}ms)",
                     "debug"
                 )
 
@@ -1947,27 +2209,124 @@ class ProcessingWorker(QThread):
 
                 # Aggiorna DB
                 with self._db_lock:
-                    db_manager.update_image(file_hash, update_data)
+                    db_manager.update_image(ctx['file_hash'], update_data)
 
             except Exception as e:
                 self.log_message.emit(f"❌ LLM {fname}: {e}", "error")
                 import traceback
                 self.log_message.emit(f"Traceback: {traceback.format_exc()}", "error")
 
-            # Ultimo consumatore del file disco — cancella il JPEG
-            disk_ref.release()
+            _done(ctx['disk_ref'])
 
-            processed += 1
-            self._emit_progress_throttled('llm', processed, total)
+        def _drain(timeout=None):
+            # Chiamate oltre llm_timeout: foto saltata, la risposta tardiva viene scartata
+            for job in dispatcher.expired(_LLM_TIMEOUT):
+                self.log_message.emit(
+                    f"⏰ LLM timeout ({_LLM_TIMEOUT}s) su {job.context['fname']} — foto saltata",
+                    "warning")
+                with self._stats_lock:
+                    stats['model_timeouts'].setdefault(job.context['pkey'], set()).add('llm')
+                _done(job.context['disk_ref'])
+            for job in dispatcher.completed(timeout):
+                _commit(job)
+
+        queue_closed = False
+        try:
+            while self.is_running:
+                _drain()
+                if queue_closed:
+                    # Sentinella ricevuta: attende le richieste ancora in volo
+                    if not dispatcher.pending():
+                        break
+                    _drain(timeout=0.5)
+                    continue
+
+                # Attendi prossima immagine dalla coda (timeout per controllare is_running)
+                try:
+                    image_path = llm_queue.get(timeout=0.5 if dispatcher.pending() else 2.0)
+                except queue.Empty:
+                    continue
+
+                if image_path is None:
+                    queue_closed = True  # sentinella: fine coda
+                    continue
+
+                if not self._wait_if_paused():
+                    break
+
+                ctx = _prepare_job(image_path)
+                if ctx is None:
+                    continue
+
+                self.log_message.emit(f"🤖 LLM: {ctx['fname']}", "info")
+                job = LLMJob(ctx['pkey'], ctx)
+                # Finestra piena: intanto registra i risultati già arrivati
+                submitted = False
+                while self.is_running and not submitted:
+                    submitted = dispatcher.submit(job, timeout=0.5)
+                    if not submitted:
+                        _drain()
+                if not submitted:
+                    # Stop durante l'attesa: il job non entra nella finestra, il thumbnail disco va liberato
+                    if ctx['disk_ref'] is not None:
+                        ctx['disk_ref'].release()
+                    break
+        finally:
+            # Stop: le chiamate in volo finiscono da sole (timeout HTTP del plugin)
+            dispatcher.shutdown(wait=self.is_running)
+            if self.is_running:
+                # Risposte arrivate dopo l'ultimo giro del ciclo
+                for job in dispatcher.completed():
+                    _commit(job)
+            _cache_end = emb_gen.llm_cache_stats()
+            if _cache_end:
+                hits = _cache_end['hits'] - _cache_start.get('hits', 0)
+                misses = _cache_end['misses'] - _cache_start.get('misses', 0)
+                if hits or misses:
+                    self.log_message.emit(
+                        f"🗃️ Cache LLM: {hits} risposte riusate, {misses} generate "
+                        f"({_cache_end['size']} in cache)", "info")
 
-            # GC periodico — libera buffer accumulati (psd-tools, PIL, numpy)
-            if processed % 100 == 0:
-                import gc
-                gc.collect()
 
     # ─────────────────────────────────────────────────────────────
     # THREAD EXIFTOOL (produttore — estrae EXIF + distribuisce su code)
     # ─────────────────────────────────────────────────────────────
+    # Default di image_processing.prep (config_new.yaml)
+    _PREP_DEFAULTS = {
+        'workers': 0,          # worker prep (decodifica/EXIF/hash, CPU): 0 = automatico
+        'io_per_device': 1,    # letture file concorrenti per dispositivo (I/O)
+        'device_limits': {},   # {prefisso_percorso: limite} per dischi veloci
+    }
+
+    # Default di image_processing.exiftool (config_new.yaml)
+    _EXIFTOOL_DEFAULTS = {
+        'processes': 0,        # processi stay_open nel pool: 0 = uno per worker prep
+        'batch_size': 32,      # file per -execute nel prefetch metadati (≤1 = disattivo)
+        'restart_after': 500,  # ogni processo si riavvia dopo N file
+    }
+
+    # Default di image_processing.hashing (config_new.yaml)
+    _HASHING_DEFAULTS = {
+        'algorithm': 'md5',    # md5 (cataloghi esistenti) | blake2b | xxh128
+        'quick_check': True,   # pre-check duplicati su dimensione + primo/ultimo MB
+    }
+
+    def _hashing_cfg(self, config):
+        """(algoritmo, quick_check) da image_processing.hashing."""
+        from utils.hashing import resolve_algorithm
+        cfg = {**self._HASHING_DEFAULTS, **(config.get('image_processing', {}).get('hashing') or {})}
+        return resolve_algorithm(cfg.get('algorithm')), bool(cfg.get('quick_check'))
+
+    def _prep_pool_cfg(self, config):
+        """Numero di worker prep e limitatore I/O da image_processing.prep."""
+        cfg = {**self._PREP_DEFAULTS, **(config.get('image_processing', {}).get('prep') or {})}
+        workers = int(cfg.get('workers') or 0)
+        if workers <= 0:
+            # Automatico: metà dei core, massimo 4 (oltre, ExifTool e DB fanno da collo)
+            workers = min(4, max(1, (os.cpu_count() or 2) // 2))
+        limiter = DeviceIOLimiter(cfg.get('io_per_device', 1), cfg.get('device_limits'))
+        return workers, limiter
+
     def _thread_exiftool(self, images_to_process, prep_cache,
                          raw_processor, config, db_manager,
                          processing_mode, emb_flags, llm_gen_config,
@@ -1977,101 +2336,126 @@ class ProcessingWorker(QThread):
                          geo_plugin=None, geo_plugin_cfg=None):
         """Thread ExifTool (produttore).
 
+        Le foto vengono preparate da un pool di N worker (image_processing.prep).
         Per ogni immagine:
-          1. Lettura unica da USB in RAM
-          2. File temp su SSD (temp_dir configurabile)
-          3. EXIF + geo + hash + thumbnail in parallelo
+          1. Quick hash e, se già nel catalogo, salto anticipato della foto
+          2. Copia a blocchi su file temp SSD (temp_dir configurabile) con hash
+             nello stesso passaggio (limitata per dispositivo: HDD USB uno alla volta)
+          3. EXIF + geo + thumbnail in parallelo (metadati ExifTool estratti
+             a blocchi di batch_size file dal pool stay_open, un -execute per blocco)
           4. DB INSERT
           5. Crea PhotoBarrier per questa foto
           6. Distribuisce (image_path, barrier) su tutte le code modello attive
-             → la backpressure di Queue(maxsize) blocca ExifTool se un modello è lento
+             → la backpressure di Queue(maxsize) blocca il worker se un modello è lento
+             (l'ordine tra foto non conta: ogni barrier è indipendente)
           7. Se nessun modello attivo, accoda direttamente in llm_queue
 
-        Al termine invia sentinella None a ogni coda modello e alla llm_queue.
+        Quando tutti i worker hanno finito invia sentinella None a ogni coda
+        modello e alla llm_queue.
         """
         _has_model_queues = bool(model_queues)
         _feed_llm_direct  = llm_active and not _has_model_queues
-        _EXIFTOOL_RESTART_EVERY = 200
-
-        for i, image_path in enumerate(images_to_process, 1):
-            if not self._wait_if_paused():
-                break
-
-            # Reset periodico ExifTool stay_open
-            if i > 1 and i % _EXIFTOOL_RESTART_EVERY == 0:
-                try:
-                    from raw_processor import get_exiftool
-                    get_exiftool().restart()
-                    self.log_message.emit(
-                        f"🔄 ExifTool stay_open riavviato (foto {i})", "info")
-                except Exception:
-                    pass
-
-            # GC periodico — copre il caso LLM disabilitato (prep_cache pulita da PhotoBarrier,
-            # ma buffer psd-tools/PIL/numpy nel heap Python vanno rilasciati esplicitamente)
-            if i % 100 == 0:
-                import gc
-                gc.collect()
 
-            prep = self._prep_image(
-                image_path, raw_processor, config, db_manager,
-                processing_mode, emb_flags, llm_gen_config,
-                temp_dir=temp_dir,
-                geo_plugin=geo_plugin, geo_plugin_cfg=geo_plugin_cfg,
-                disk_consumers=disk_consumers,
-            )
+        n_workers, io_limiter = self._prep_pool_cfg(config)
+        n_workers = min(n_workers, max(1, total_to_process))
+        hashing = self._hashing_cfg(config)
 
-            if prep:
-                # Chiave = percorso completo: nomi duplicati in sotto-cartelle diverse
-                # non devono sovrascriversi a vicenda (causava stallo del thread LLM)
-                prep_cache[str(image_path)] = prep
-                with self._stats_lock:
-                    stats['success'] += 1
-                    stats['processed'] += 1
-                    if prep.get('image_id'):
-                        stats['processed_ids'].append(prep['image_id'])
-
-                if _has_model_queues:
-                    # Crea una barrier per questa foto: si sblocca quando tutti i
-                    # thread modello hanno chiamato done() → accoda in llm_queue
-                    _llm_q = llm_queue if llm_active else None
-                    barrier = PhotoBarrier(barrier_modelli, _llm_q, image_path, prep_cache)
-                    # Distribuisce su ogni coda modello con timeout per rispondere a stop/pausa
-                    for mk, q in model_queues.items():
-                        while self.is_running:
-                            try:
-                                q.put((image_path, barrier), timeout=0.2)
-                                break
-                            except queue.Full:
-                                continue  # riprova dopo aver controllato is_running
-                        if not self.is_running:
-                            break
-                elif _feed_llm_direct:
-                    # Nessun modello attivo: LLM riceve direttamente
-                    llm_queue.put(image_path)
-            else:
-                # Prep fallita: marker None in prep_cache per sbloccare eventuali attese
-                prep_cache[str(image_path)] = None
-                with self._stats_lock:
-                    stats['errors'] += 1
+        # Pool ExifTool: un processo per worker prep, ognuno con il proprio riavvio
+        et_cfg = {**self._EXIFTOOL_DEFAULTS,
+                  **(config.get('image_processing', {}).get('exiftool') or {})}
+        et_batch = int(et_cfg.get('batch_size') or 0)
+        try:
+            from raw_processor import get_exiftool
+            get_exiftool().configure(size=int(et_cfg.get('processes') or 0) or n_workers,
+                                     max_calls=int(et_cfg.get('restart_after') or 0))
+        except Exception as e:
+            self.log_message.emit(f"⚠️ Configurazione pool ExifTool: {e}", "warning")
+        if not hasattr(raw_processor, 'prefetch_metadata'):
+            et_batch = 0
+        self.log_message.emit(
+            f"⚙️ Prep: {n_workers} worker, letture per dispositivo: {io_limiter.default_limit}, "
+            f"metadati ExifTool a blocchi di {max(et_batch, 1)}", "info")
+
+        images_to_process = list(images_to_process)
+        _paths      = iter(images_to_process)
+        _counters   = {'started': 0, 'done': 0}
+        _count_lock = threading.Lock()
+        _chunk_events = {}   # indice blocco → Event (prefetch metadati terminato)
+
+        def _prefetch_chunk(idx, wait=True):
+            """Metadati del blocco idx con un solo -execute. Il primo worker che
+            arriva al blocco lo estrae, gli altri aspettano il risultato."""
+            chunk = images_to_process[idx * et_batch:(idx + 1) * et_batch]
+            if not chunk:
+                return
+            with _count_lock:
+                ev = _chunk_events.get(idx)
+                owner = ev is None
+                if owner:
+                    ev = _chunk_events[idx] = threading.Event()
+            if not owner:
+                if wait:
+                    ev.wait()
+                return
+            try:
+                # Le letture ExifTool passano dal limite per dispositivo come read_bytes
+                with io_limiter.slot(chunk[0]):
+                    raw_processor.prefetch_metadata(chunk)
+            except Exception as e:
+                self.log_message.emit(f"⚠️ Prefetch metadati ExifTool: {e}", "warning")
+            finally:
+                ev.set()
 
-                if _has_model_queues:
-                    # Barrier vuota (nessun modello da aspettare): accoda subito in LLM se attivo
-                    _llm_q = llm_queue if llm_active else None
-                    barrier = PhotoBarrier([], _llm_q, image_path, prep_cache)
-                    # barrier con pending vuoto → done() non viene mai chiamata,
-                    # ma LLM vedrà prep=None e salterà la foto
-                    # Alternativa più robusta: accodiamo None nei modelli per saltare,
-                    # oppure accendiamo llm_queue direttamente se llm_active
-                    if llm_active:
-                        llm_queue.put(image_path)
-                elif _feed_llm_direct and llm_active:
-                    llm_queue.put(image_path)
+        def _prep_worker():
+            while self.is_running:
+                if not self._wait_if_paused():
+                    break
+                with _count_lock:
+                    image_path = next(_paths, None)
+                    if image_path is None:
+                        break
+                    _counters['started'] += 1
+                    i = _counters['started']
+
+                if et_batch > 1:
+                    _prefetch_chunk((i - 1) // et_batch)
+                    # A metà blocco si prepara il successivo (senza attenderlo)
+                    if (i - 1) % et_batch == et_batch // 2:
+                        _prefetch_chunk((i - 1) // et_batch + 1, wait=False)
+
+                # GC periodico — copre il caso LLM disabilitato (prep_cache pulita da PhotoBarrier,
+                # ma buffer psd-tools/PIL/numpy nel heap Python vanno rilasciati esplicitamente)
+                if i % 100 == 0:
+                    import gc
+                    gc.collect()
+
+                prep = self._prep_image(
+                    image_path, raw_processor, config, db_manager,
+                    processing_mode, emb_flags, llm_gen_config,
+                    temp_dir=temp_dir,
+                    geo_plugin=geo_plugin, geo_plugin_cfg=geo_plugin_cfg,
+                    disk_consumers=disk_consumers,
+                    io_limiter=io_limiter,
+                    hashing=hashing,
+                )
+                self._dispatch_prep(image_path, prep, prep_cache, stats,
+                                    model_queues, barrier_modelli, llm_queue, llm_active)
 
-            if not self.is_running:
-                break
+                with _count_lock:
+                    _counters['done'] += 1
+                    done = _counters['done']
+                if not self.is_running:
+                    break
+                self._emit_progress_throttled('exiftool', done, total_to_process)
 
-            self._emit_progress_throttled('exiftool', i, total_to_process)
+        workers = [threading.Thread(target=_prep_worker, name=f"prep-{k}", daemon=True)
+                   for k in range(n_workers)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        if et_batch > 1:
+            raw_processor.clear_prefetched()
 
         # Sentinelle di fine per ogni coda modello
         for mk, q in model_queues.items():
@@ -2086,6 +2470,58 @@ class ProcessingWorker(QThread):
             "info"
         )
 
+    def _dispatch_prep(self, image_path, prep, prep_cache, stats,
+                       model_queues, barrier_modelli, llm_queue, llm_active):
+        """Pubblica il prep di una foto e la distribuisce alle code (thread-safe)."""
+        _has_model_queues = bool(model_queues)
+        _feed_llm_direct  = llm_active and not _has_model_queues
+
+        skipped = bool(prep and prep.get('skipped_duplicate'))
+        if prep and not skipped:
+            # Chiave = percorso completo: nomi duplicati in sotto-cartelle diverse
+            # non devono sovrascriversi a vicenda (causava stallo del thread LLM)
+            prep_cache[str(image_path)] = prep
+            with self._stats_lock:
+                stats['success'] += 1
+                stats['processed'] += 1
+                if prep.get('image_id'):
+                    stats['processed_ids'].append(prep['image_id'])
+
+            if _has_model_queues:
+                # Crea una barrier per questa foto: si sblocca quando tutti i
+                # thread modello hanno chiamato done() → accoda in llm_queue
+                _llm_q = llm_queue if llm_active else None
+                barrier = PhotoBarrier(barrier_modelli, _llm_q, image_path, prep_cache)
+                # Distribuisce su ogni coda modello con timeout per rispondere a stop/pausa
+                for mk, q in model_queues.items():
+                    while self.is_running:
+                        try:
+                            q.put((image_path, barrier), timeout=0.2)
+                            break
+                        except queue.Full:
+                            continue  # riprova dopo aver controllato is_running
+                    if not self.is_running:
+                        break
+            elif _feed_llm_direct:
+                # Nessun modello attivo: LLM riceve direttamente
+                llm_queue.put(image_path)
+        else:
+            # Prep fallita o foto già nel catalogo: marker None in prep_cache
+            # per sbloccare eventuali attese
+            prep_cache[str(image_path)] = None
+            with self._stats_lock:
+                if skipped:
+                    stats['skipped_existing'] += 1
+                else:
+                    stats['errors'] += 1
+
+            if _has_model_queues:
+                # Nessun modello da aspettare: LLM vedrà prep=None e salterà la foto
+                if llm_active:
+                    llm_queue.put(image_path)
+            elif _feed_llm_direct and llm_active:
+                llm_queue.put(image_path)
+
     # ─────────────────────────────────────────────────────────────
     # UTILITY
     # ─────────────────────────────────────────────────────────────
@@ -3744,6 +4180,16 @@ class ProcessingTab(QWidget):
 
     def scan_directory(self):
         """Scansiona directory per contare immagini NON processate"""
+        # processEvents durante la scansione: evita scansioni annidate
+        if getattr(self, '_scan_in_progress', False):
+            return
+        self._scan_in_progress = True
+        try:
+            self._scan_directory()
+        finally:
+            self._scan_in_progress = False
+
+    def _scan_directory(self):
         try:
             # Ottieni directory input dall'UI
             input_dir_text = self.input_dir_label.text().strip()
@@ -3767,48 +4213,44 @@ class ProcessingTab(QWidget):
                 self.scan_label.setText(t("processing.msg.no_formats"))
                 return
 
-            # Conta immagini (CORRETTO: evita duplicati case-sensitive)
-            all_images = []
-            seen_files = set()
             include_subdirs = self.include_subdirs_cb.isChecked()
-
-            for ext in supported_formats:
-                # Cerca sia minuscole che maiuscole
-                for pattern in [f"*{ext}", f"*{ext.upper()}"]:
-                    if include_subdirs:
-                        found_files = input_dir.rglob(pattern)
-                    else:
-                        found_files = input_dir.glob(pattern)
-                    for file_path in found_files:
-                        # Salta file nascosti (es. ._filename.jpg su macOS/Linux)
-                        if file_path.name.startswith('.'):
-                            continue
-                        # Con sotto-cartelle usa path completo per dedup, altrimenti solo nome
-                        dedup_key = str(file_path).lower() if include_subdirs else file_path.name.lower()
-                        if dedup_key not in seen_files:
-                            seen_files.add(dedup_key)
-                            all_images.append(file_path)
-            
-            # Verifica quali sono già nel database
-            images_to_process = all_images
-            already_processed = 0
-            
+            db_manager = None
             if db_path.exists():
                 try:
                     import sys
                     sys.path.insert(0, str(get_app_dir()))
                     from db_manager_new import DatabaseManager
-                    
                     db_manager = DatabaseManager(str(db_path))
-                    processed_files = db_manager.get_all_images()
-                    if include_subdirs:
-                        processed_paths = {Path(f['filepath']).resolve().as_posix().lower() for f in processed_files}
-                        images_to_process = [img for img in all_images
-                                           if img.resolve().as_posix().lower() not in processed_paths]
-                    else:
-                        processed_names = {Path(f['filepath']).name.lower() for f in processed_files}
-                        images_to_process = [img for img in all_images
-                                           if img.name.lower() not in processed_names]
+                except Exception as e:
+                    self.scan_label.setText(t("processing.msg.db_error", error=e))
+                    return
+
+            # Visita unica con os.scandir: ogni cartella viene elencata, ma
+            # nelle cartelle invariate dall'ultima scansione dimensione e mtime
+            # dei file già noti vengono dallo snapshot nel DB (file_scanner).
+            # Il conteggio avanza a mano a mano nell'etichetta.
+            from file_scanner import DirectoryScanner, STATUS_MISSING
+            scanner = DirectoryScanner(db_manager.conn if db_manager else None,
+                                       supported_formats, recursive=include_subdirs)
+            all_images = []
+            for entry in scanner.scan(input_dir.resolve()):
+                if entry.status == STATUS_MISSING:
+                    continue
+                all_images.append(entry.path)
+                if len(all_images) % 2000 == 0:
+                    self.scan_label.setText(t("processing.msg.scan_progress", count=len(all_images)))
+                    QApplication.processEvents()
+
+            # Verifica quali sono già nel database (solo la colonna filepath)
+            images_to_process = all_images
+            already_processed = 0
+            coverage = {}
+
+            if db_manager is not None:
+                try:
+                    processed_paths = {fp.lower() for fp in db_manager.get_all_filepaths() if fp}
+                    images_to_process = [img for img in all_images
+                                         if img.lower() not in processed_paths]
                     already_processed = len(all_images) - len(images_to_process)
 
                     # Copertura per-modello — query aggregata veloce anche su 100k foto
@@ -3817,8 +4259,6 @@ class ProcessingTab(QWidget):
                 except Exception as e:
                     self.scan_label.setText(t("processing.msg.db_error", error=e))
                     return
-            else:
-                coverage = {}
 
             total_found = len(all_images)
             to_process = len(images_to_process)
@@ -3842,6 +4282,12 @@ class ProcessingTab(QWidget):
                         + '</span>'
                     )
 
+            # Differenze rispetto alla scansione precedente (solo se esisteva uno snapshot)
+            _sc = scanner.stats
+            if _sc['dirs_known'] and (_sc['new'] or _sc['changed'] or _sc['missing']):
+                coverage_html += '<br>' + t("processing.msg.scan_changes", new=_sc['new'],
+                                            changed=_sc['changed'], missing=_sc['missing'])
+
             # Salva il numero di immagini da processare per la logica del pulsante
             self.images_to_process_count = to_process
 
@@ -4030,6 +4476,9 @@ class ProcessingTab(QWidget):
                     and self._plugin_rows.get(m.get('id', ''), {}).get('check', QCheckBox()).isChecked()
                 ]
 
+            # Modelli lazy usati da questo processing: caricati qui, non nel worker
+            self._preload_lazy_models(embedding_model_flags)
+
             self.worker = ProcessingWorker(
                 self.config_path,
                 input_dir_text,
@@ -4257,6 +4706,39 @@ class ProcessingTab(QWidget):
         """Aggiorna progresso generale (legacy — non utilizzato nel flusso multi-thread)"""
         pass
     
+    def _preload_lazy_models(self, embedding_model_flags):
+        """Carica nel main thread i modelli lazy attivi (embedding.loading.mode: lazy).
+
+        Altrimenti il primo accesso li caricherebbe nel ProcessingWorker, mentre
+        l'inizializzazione torch/CUDA/ctranslate2 deve restare nel main thread
+        (come in modalità eager con lo splash).
+        """
+        emb_gen = self.embedding_gen
+        if emb_gen is None or not getattr(emb_gen, 'lazy_models', False):
+            return
+        keys = [k for k, flags in embedding_model_flags.items() if flags.get('active')]
+        if not keys:
+            return
+
+        def _on_model(key, label, state, done, total, elapsed):
+            if state == 'loading':
+                self.add_log_message(t("splash.msg.model_loading", model=label,
+                                       current=done + 1, total=total), "info")
+            elif state == 'ready':
+                self.add_log_message(t("splash.msg.model_ready", model=label,
+                                       seconds=f"{elapsed:.1f}"), "info")
+            else:
+                self.add_log_message(t("splash.msg.model_failed", model=label), "warning")
+            QApplication.processEvents()
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            emb_gen.preload_models(keys, progress_callback=_on_model)
+        except Exception as e:
+            logger.error(f"Caricamento modelli lazy: {e}", exc_info=True)
+        finally:
+            QApplication.restoreOverrideCursor()
+
     def add_log_message(self, message, level):
         """Aggiunge messaggio al log terminale e, se attivo, al file log.
         I messaggi debug vengono soppressi dalla GUI durante il processing attivo
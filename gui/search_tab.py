@@ -4,7 +4,6 @@ Campo unico con switch semantica/tag + filtri EXIF
 CORRECTED: Fix ricerca semantica con embedding_generator corretto
 """
 
-import os
 import yaml
 import sys
 import logging
@@ -283,9 +282,10 @@ class SearchTab(QWidget):
         if self._dir_widget is not None:
             selected_dirs = self._dir_widget.get_selected_dirs()
             if selected_dirs:
-                dir_clauses = " OR ".join(["filepath LIKE ?" for _ in selected_dirs])
-                conditions.append(f"({dir_clauses})")
-                params.extend([d.rstrip(os.sep) + os.sep + "%" for d in selected_dirs])
+                from db_manager_new import directory_filter
+                dir_clause, dir_params = directory_filter(selected_dirs)
+                conditions.append(dir_clause)
+                params.extend(dir_params)
 
         # --- CAMERA (Make + Model combinato) ---
         camera = self.camera_combo.currentText()
@@ -589,6 +589,14 @@ class SearchTab(QWidget):
                     QMessageBox.critical(self, t("search.msg.search_error_title"), str(e))
                     self.search_active = False
                     return
+        elif mode == "tags" and query:
+            # Traduttori Argos in modalità lazy: preparati qui, non nel SearchWorker
+            emb_gen = self.ai_models.get('embedding_generator')
+            if emb_gen is not None and hasattr(emb_gen, 'ensure_translators'):
+                try:
+                    emb_gen.ensure_translators()
+                except Exception as e:
+                    logger.warning(f"Traduttori non disponibili: {e}")
 
         self._search_worker = SearchWorker(
             config_path=self.config_path,
@@ -142,6 +142,8 @@ class SplashScreen(QWidget):
 
         # Contatore per progress
         self._log_count = 0
+        # True dopo il primo evento ModelRegistry: la barra segue i modelli, non i log
+        self._model_progress = False
         # Guardia anti-rientranza per processEvents()
         self._processing_events = False
 
@@ -245,10 +247,12 @@ class SplashScreen(QWidget):
             self.log_text.verticalScrollBar().maximum()
         )
 
-        # Aggiorna progress (cresce con i messaggi, max 95%)
+        # Aggiorna progress (cresce con i messaggi, max 95%) finché non
+        # arrivano gli eventi per modello di on_model_progress()
         self._log_count += 1
-        progress_val = min(95, self._log_count * 3)
-        self.progress.setValue(progress_val)
+        if not self._model_progress:
+            progress_val = min(95, self._log_count * 3)
+            self.progress.setValue(progress_val)
 
         # Aggiorna sottotitolo con ultimo messaggio significativo
         if any(x in message for x in ['✅', '🔧', '🚀', '📦', 'Caric', 'Inizial', 'Loading', 'Init']):
@@ -273,6 +277,21 @@ class SplashScreen(QWidget):
             finally:
                 self._processing_events = False
 
+    def on_model_progress(self, key, label, state, done, total, elapsed):
+        """Avanzamento reale per modello (listener ModelRegistry, caricamento eager).
+        Chiamato nel main thread dal loop di caricamento sincrono."""
+        if not self._model_progress:
+            self._model_progress = True
+            self._progress_base = self.progress.value()
+        if state == 'loading':
+            self.subtitle.setText(t("splash.msg.model_loading", model=label, current=done + 1, total=total))
+        elif state == 'ready':
+            self.add_log(t("splash.msg.model_ready", model=label, seconds=f"{elapsed:.1f}"))
+        else:
+            self.add_log(t("splash.msg.model_failed", model=label))
+        span = 95 - self._progress_base
+        self.progress.setValue(self._progress_base + span * done // max(total, 1))
+
     def finish(self):
         """Completa il caricamento.
         Non eseguire operazioni Qt qui: su Linux, spacy/ctranslate2 rimangono
@@ -547,7 +566,7 @@ def run_with_splash():
         from embedding_generator import EmbeddingGenerator
 
         splash.add_log(t("splash.msg.init_loading"))
-        emb_gen = EmbeddingGenerator(_config)
+        emb_gen = EmbeddingGenerator(_config, progress_callback=splash.on_model_progress)
 
         splash.add_log(t("splash.msg.init_ui"))
 
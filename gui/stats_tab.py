@@ -18,6 +18,7 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QThread, QObject, pyqtSignal
 from PyQt6.QtGui import QFont, QColor, QPainter
 from gui.directory_dialog import DirectoryTreeWidget
+from db_manager_new import directory_filter
 
 _MESI_IT = ["gen", "feb", "mar", "apr", "mag", "giu", "lug", "ago", "set", "ott", "nov", "dic"]
 
@@ -66,11 +67,7 @@ class StatsWorker(QObject):
         self.selected_dirs = selected_dirs
 
     def _path_filter(self):
-        if not self.selected_dirs:
-            return "1=1", []
-        clauses = " OR ".join(["filepath LIKE ?" for _ in self.selected_dirs])
-        params  = [str(d) + "%" for d in self.selected_dirs]
-        return f"({clauses})", params
+        return directory_filter(self.selected_dirs)
 
     def run(self):
         conn = None
@@ -700,11 +697,7 @@ class StatsTab(QWidget):
 
     def _path_filter(self):
         """Restituisce (where_fragment, params) per il filtro directory attivo."""
-        if not self._selected_dirs:
-            return "1=1", []
-        clauses = " OR ".join(["filepath LIKE ?" for _ in self._selected_dirs])
-        params = [str(d) + "%" for d in self._selected_dirs]
-        return f"({clauses})", params
+        return directory_filter(self._selected_dirs)
 
     # ------------------------------------------------------------------
     # Costruzione UI
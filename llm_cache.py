@@ -0,0 +1,145 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+LLM Cache - Risposte LLM Vision indirizzate per contenuto.
+
+Prima ogni rigenerazione di tag, descrizione o titolo passava per
+_call_llm_vision_unified e costava un'inferenza vision completa, anche con
+lo stesso file, lo stesso modello e lo stesso prompt già elaborati: ripresa
+dopo un crash, overwrite riattivato, duplicati in altre cartelle.
+
+Qui:
+  - response_key(): sha256 di immagine (payload_key di file_hash e profilo
+    llm_vision, o hash del payload se manca il file_hash), backend +
+    modello, prompt finale (contesto BioCLIP, luogo,
+    nome comune già inclusi), parametri di generazione e max_tokens
+  - LLMResponseCache: risposta grezza (prima del parsing) in
+    llm_cache.sqlite accanto al catalogo, letta per chiave senza caricare
+    il file in memoria
+  - max_entries con eviction LRU (fino al 90%, come lo ThumbStore) e
+    contatori hit/miss per il log del processing
+
+Modulo senza dipendenze PyQt.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STORE_FILENAME = 'llm_cache.sqlite'
+
+DEFAULT_MAX_ENTRIES = 20000
+
+# Parametri che non cambiano la risposta: esclusi dalla chiave
+_NON_OUTPUT_PARAMS = ('timeout', 'keep_alive')
+
+
+def payload_hash(image_b64: str) -> str:
+    """Identità dell'immagine quando il file_hash non è noto (gallery on-demand)."""
+    return 'b64:' + hashlib.sha256(image_b64.encode('ascii', 'ignore')).hexdigest()
+
+
+def response_key(image_id: str, backend: str, prompt: str,
+                 params: Dict[str, Any], max_tokens: int) -> str:
+    """Chiave della risposta: cambia se cambia qualunque cosa inviata al modello.
+
+    image_id deve identificare i pixel inviati, non solo il file: con il
+    file_hash si passa utils.llm_payload_cache.payload_key (target_size,
+    resampling e qualità JPEG del profilo llm_vision).
+    """
+    gen = {k: v for k, v in params.items() if k not in _NON_OUTPUT_PARAMS}
+    raw = json.dumps([image_id, backend, prompt, gen, int(max_tokens)],
+                     sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Risposte LLM in una tabella SQLite con limite di voci ed eviction LRU."""
+
+    def __init__(self, path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_used ON llm_responses(used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        """Risposta salvata o None (conta hit/miss)."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+                self._conn.execute("UPDATE llm_responses SET used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                return row[0]
+        except sqlite3.Error as e:
+            # Il file è un'ottimizzazione: un errore di I/O non deve fermare la generazione
+            logger.debug(f"Cache LLM: lettura fallita ({e})")
+            return None
+
+    def put(self, key: str, response: str):
+        if not response:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO llm_responses (key, response, created, used) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now))
+                self._count += cur.rowcount
+                if self._count > self.max_entries:
+                    self._evict()
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Cache LLM: scrittura fallita ({e})")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self._count,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+            self._count = 0
+            self.hits = self.misses = 0
+
+    def _evict(self):
+        """Rimuove le meno usate fino al 90% del limite (evita eviction a ogni put)."""
+        target = int(self.max_entries * 0.9)
+        removed = self._conn.execute(
+            "DELETE FROM llm_responses WHERE key IN ("
+            "SELECT key FROM llm_responses ORDER BY used LIMIT ?)",
+            (max(0, self._count - target),)).rowcount
+        self._count -= removed
+        logger.debug(f"Cache LLM: {removed} risposte rimosse (LRU), {self._count} in cache")
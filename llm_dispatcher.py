@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+LLM Dispatcher - Finestra di richieste LLM Vision in volo con codifica anticipata.
+
+Prima il thread LLM del processing lavorava una foto alla volta: prompt,
+_prepare_llm_image (resize + JPEG + base64) e attesa della risposta di
+LLMVisionPlugin.generate prima di passare alla foto successiva. Ollama e
+LM Studio servono richieste in parallelo, e la codifica del payload (CPU)
+poteva sovrapporsi all'attesa di rete.
+
+Qui:
+  - stadio encode: un piccolo pool prepara il payload appena il job entra
+    nella finestra, quindi fino a `prefetch` payload sono pronti prima che
+    si liberi uno slot di chiamata
+  - stadio call: al massimo `max_parallel` richieste in volo
+  - submit() blocca (con timeout) quando la finestra max_parallel + prefetch
+    è piena: backpressure verso la coda a monte
+  - completed() restituisce i job finiti in ordine di completamento; chi
+    consuma (il thread LLM) scrive nel DB nello stesso ordine
+  - expired(): job in chiamata da più di N secondi, segnalati una volta
+    sola e il cui risultato tardivo viene scartato
+
+Modulo senza dipendenze PyQt.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PARALLEL = 1
+DEFAULT_PREFETCH = 2
+
+
+class LLMJob:
+    """Una foto nella finestra: payload, risultato ed eventuale errore."""
+
+    __slots__ = ('key', 'context', 'payload', 'result', 'error',
+                 'submitted_at', 'call_started_at', 'finished_at', 'expired')
+
+    def __init__(self, key: str, context: Any = None):
+        self.key = key
+        self.context = context
+        self.payload = None
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.submitted_at = time.monotonic()
+        self.call_started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expired = False
+
+    @property
+    def encode_ms(self) -> float:
+        if self.call_started_at is None:
+            return 0.0
+        return (self.call_started_at - self.submitted_at) * 1000
+
+    @property
+    def call_ms(self) -> float:
+        if self.call_started_at is None or self.finished_at is None:
+            return 0.0
+        return (self.finished_at - self.call_started_at) * 1000
+
+
+class LLMDispatcher:
+    """
+    Pipeline a due stadi (encode → call) con finestra limitata.
+
+    Args:
+        encode: job → payload (es. base64 JPEG); None = job concluso senza chiamata
+        call: (job, payload) → risultato; eseguita su max_parallel thread
+        max_parallel: richieste contemporanee verso il server LLM
+        prefetch: payload codificati in anticipo oltre a quelli in volo
+    """
+
+    def __init__(self, encode: Callable[[LLMJob], Any],
+                 call: Callable[[LLMJob, Any], Any],
+                 max_parallel: int = DEFAULT_MAX_PARALLEL,
+                 prefetch: int = DEFAULT_PREFETCH):
+        self.encode = encode
+        self.call = call
+        self.max_parallel = max(1, int(max_parallel))
+        self.prefetch = max(0, int(prefetch))
+        self._slots = threading.BoundedSemaphore(self.max_parallel + self.prefetch)
+        # La codifica è breve rispetto alla chiamata: due thread tengono il passo
+        self._encode_pool = ThreadPoolExecutor(
+            max_workers=max(1, min(2, self.prefetch)), thread_name_prefix='llm-encode')
+        self._call_pool = ThreadPoolExecutor(
+            max_workers=self.max_parallel, thread_name_prefix='llm-call')
+        self._done: "queue.Queue[LLMJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._active: List[LLMJob] = []
+
+    # ── API ──────────────────────────────────────────────────────────
+
+    def submit(self, job: LLMJob, timeout: Optional[float] = None) -> bool:
+        """Mette il job nella finestra; False se non si è liberato uno slot entro timeout."""
+        acquired = self._slots.acquire(timeout=timeout) if timeout is not None else self._slots.acquire()
+        if not acquired:
+            return False
+        job.submitted_at = time.monotonic()
+        with self._lock:
+            self._active.append(job)
+        self._encode_pool.submit(self._run_encode, job)
+        return True
+
+    def completed(self, timeout: Optional[float] = None) -> List[LLMJob]:
+        """Job conclusi in ordine di completamento (attende al più timeout se nessuno è pronto)."""
+        jobs = []
+        try:
+            if timeout:
+                jobs.append(self._done.get(timeout=timeout))
+            while True:
+                jobs.append(self._done.get_nowait())
+        except queue.Empty:
+            pass
+        return jobs
+
+    def expired(self, limit: float) -> List[LLMJob]:
+        """Job in chiamata da più di limit secondi (restituiti una volta; il risultato sarà scartato)."""
+        now = time.monotonic()
+        late = []
+        with self._lock:
+            for job in self._active:
+                if (not job.expired and job.call_started_at is not None
+                        and job.finished_at is None and now - job.call_started_at > limit):
+                    job.expired = True
+                    late.append(job)
+        return late
+
+    def pending(self) -> int:
+        """Job nella finestra non ancora restituiti da completed()."""
+        with self._lock:
+            # I job scaduti sono già stati restituiti da expired()
+            return sum(1 for job in self._active if not job.expired) + self._done.qsize()
+
+    def shutdown(self, wait: bool = True):
+        """Chiude i pool; con wait=False le chiamate in volo terminano per conto loro."""
+        self._encode_pool.shutdown(wait=wait, cancel_futures=not wait)
+        self._call_pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    # ── Interni ──────────────────────────────────────────────────────
+
+    def _run_encode(self, job: LLMJob):
+        try:
+            job.payload = self.encode(job)
+        except Exception as e:
+            job.error = e
+        if job.payload is None:
+            self._finish(job)
+            return
+        self._call_pool.submit(self._run_call, job)
+
+    def _run_call(self, job: LLMJob):
+        job.call_started_at = time.monotonic()
+        try:
+            job.result = self.call(job, job.payload)
+        except Exception as e:
+            job.error = e
+        finally:
+            job.payload = None   # il base64 non serve più
+        self._finish(job)
+
+    def _finish(self, job: LLMJob):
+        with self._lock:
+            job.finished_at = time.monotonic()
+            # Prima in _done e poi fuori da _active, sotto lo stesso lock:
+            # pending() non vede mai il job sparire da entrambi
+            if not job.expired:
+                self._done.put(job)
+            if job in self._active:
+                self._active.remove(job)
+        self._slots.release()
+        if job.expired:
+            logger.debug(f"LLM: risposta tardiva scartata per {job.key}")
@@ -0,0 +1,191 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Model Registry - Caricamento modelli AI con stato per modello, eager o lazy.
+
+Prima EmbeddingGenerator caricava SigLIP, DINOv2, Aesthetic, MUSIQ e BioCLIP
+uno dopo l'altro nel main thread, leggendo i pesi da disco a freddo.
+
+Qui ogni modello è una voce registrata con il proprio loader:
+  - eager: load_all() li costruisce in sequenza nel thread chiamante (main
+    thread allo splash), mentre prefetch_files() legge in parallelo i file
+    dei pesi nella cache del sistema operativo; la costruzione di un modello
+    si sovrappone così alla lettura dei successivi
+  - lazy: nessun caricamento all'avvio; ensure() carica il modello al primo
+    utilizzo, una sola volta (gli altri thread attendono lo stesso Future)
+
+La costruzione resta seriale: torch/CUDA/MKL non tollerano inizializzazioni
+concorrenti da più thread (vedi gui/splash_screen.run_with_splash).
+I listener ricevono (key, label, stato, completati, totale, secondi).
+
+Modulo senza dipendenze PyQt.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_DISABLED = 'disabled'
+STATE_PENDING = 'pending'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+# Blocco di lettura del prefetch pesi
+_PREFETCH_CHUNK = 8 * 1024 * 1024
+
+# Estensioni dei file pesi da pre-leggere
+WEIGHT_SUFFIXES = ('.safetensors', '.bin', '.pt', '.pth', '.npy', '.onnx')
+
+
+class _Entry:
+    __slots__ = ('key', 'label', 'loader', 'state', 'future', 'owner', 'elapsed')
+
+    def __init__(self, key: str, label: str, loader: Callable[[], bool]):
+        self.key = key
+        self.label = label
+        self.loader = loader
+        self.state = STATE_PENDING
+        self.future: Optional[Future] = None
+        self.owner: Optional[int] = None   # thread che sta caricando
+        self.elapsed = 0.0
+
+
+class ModelRegistry:
+    """Registro dei modelli abilitati con caricamento una-tantum per modello."""
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable] = []
+
+    def register(self, key: str, label: str, loader: Callable[[], bool]):
+        """Registra un modello. loader() carica e ritorna True se disponibile."""
+        self._entries[key] = _Entry(key, label, loader)
+
+    def add_listener(self, callback: Callable):
+        """callback(key, label, state, done, total, elapsed) a ogni cambio di stato."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    def state(self, key: str) -> str:
+        entry = self._entries.get(key)
+        return entry.state if entry is not None else STATE_DISABLED
+
+    def pending(self) -> List[str]:
+        return [k for k, e in self._entries.items() if e.state in (STATE_PENDING, STATE_LOADING)]
+
+    def ensure(self, key: str) -> bool:
+        """Carica il modello se non ancora caricato; True se disponibile.
+
+        Il primo thread che lo richiede esegue il loader, gli altri attendono.
+        Un accesso dallo stesso thread durante il caricamento ritorna subito
+        (il loader legge e scrive i propri attributi).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if entry.state in (STATE_READY, STATE_FAILED):
+            return entry.state == STATE_READY
+
+        with self._lock:
+            if entry.state in (STATE_READY, STATE_FAILED):
+                return entry.state == STATE_READY
+            if entry.future is not None:
+                if entry.owner == threading.get_ident():
+                    return False
+                future, owner = entry.future, False
+            else:
+                future = entry.future = Future()
+                entry.owner = threading.get_ident()
+                entry.state = STATE_LOADING
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        self._notify(entry)
+        _t = time.monotonic()
+        try:
+            ok = bool(entry.loader())
+        except Exception as e:
+            logger.error(f"Caricamento {entry.label} fallito: {e}")
+            ok = False
+        entry.elapsed = time.monotonic() - _t
+        entry.state = STATE_READY if ok else STATE_FAILED
+        entry.owner = None
+        future.set_result(ok)
+        logger.debug(f"Modello {entry.label}: {entry.state} in {entry.elapsed:.1f}s")
+        self._notify(entry)
+        return ok
+
+    def load_all(self, keys: Optional[Iterable[str]] = None):
+        """Carica in sequenza i modelli indicati (default: tutti i registrati)."""
+        for key in list(keys) if keys is not None else self.keys:
+            self.ensure(key)
+
+    def _notify(self, entry: _Entry):
+        done = sum(1 for e in self._entries.values() if e.state in (STATE_READY, STATE_FAILED))
+        for callback in self._listeners:
+            try:
+                callback(entry.key, entry.label, entry.state, done, len(self._entries), entry.elapsed)
+            except Exception as e:
+                logger.debug(f"Listener registry modelli: {e}")
+
+
+def prefetch_files(paths: Iterable[Path], workers: int = 4) -> Optional[threading.Thread]:
+    """Legge i file in background (thread daemon) per portarli nella cache del SO.
+
+    Solo I/O: nessuna libreria nativa coinvolta. I file più grandi partono
+    per primi. Ritorna il thread coordinatore (None se nulla da leggere).
+    Nessun log dai thread: durante l'avvio lo splash inoltra i messaggi di
+    logging al proprio widget Qt, utilizzabile solo dal main thread.
+    """
+    files = []
+    for p in paths:
+        try:
+            files.append((p.stat().st_size, p))
+        except OSError:
+            continue
+    if not files:
+        return None
+    files.sort(key=lambda f: f[0], reverse=True)
+    queue_files = [p for _, p in files]
+    lock = threading.Lock()
+
+    def _reader():
+        while True:
+            with lock:
+                if not queue_files:
+                    return
+                path = queue_files.pop(0)
+            try:
+                with open(path, 'rb', buffering=0) as f:
+                    while f.read(_PREFETCH_CHUNK):
+                        pass
+            except OSError:
+                pass  # il loader riporterà l'errore leggendo lo stesso file
+
+    def _run():
+        readers = [threading.Thread(target=_reader, name=f"weights-prefetch-{k}", daemon=True)
+                   for k in range(max(1, min(workers, len(queue_files))))]
+        for r in readers:
+            r.start()
+        for r in readers:
+            r.join()
+
+    coordinator = threading.Thread(target=_run, name="weights-prefetch", daemon=True)
+    coordinator.start()
+    return coordinator
@@ -352,6 +352,14 @@ def load_config() -> dict:
         return defaults
 
 
+def config_mtime() -> float:
+    """mtime di config.json (0 se assente): chi tiene cache rilegge la config solo se cambia."""
+    try:
+        return _CONFIG_PATH.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
 def save_config(cfg: dict) -> None:
     _CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
     with open(_CONFIG_PATH, "w", encoding="utf-8") as f:
@@ -446,6 +454,38 @@ def get_species_subset(lat: float, lon: float,
 
 # ── Cache ──────────────────────────────────────────────────────────────────
 
+# Indici TreeOfLife per cella salvati accanto alle checklist (vedi geospecies_cache.py)
+SUBSET_INDEX_PREFIX = "bioclip_subset_"
+
+
+def cell_checklist_files(lat_min: int, lon_min: int, config: dict) -> list:
+    """Checklist presenti in cache per la cella e i taxon abilitati.
+
+    Esclude i file più vecchi di cache_days (data di modifica = data di
+    download): stesso criterio di scadenza di get_species_subset senza
+    aprire i JSON.
+    """
+    cache_dir = _get_cache_dir(config)
+    cache_days = int(config.get('cache_days', DEFAULT_CACHE_DAYS))
+    max_age = cache_days * 86400
+    now = datetime.now(timezone.utc).timestamp()
+    c_key = cell_key(lat_min, lon_min)
+    files = []
+    for taxon in config.get('enabled_taxa', DEFAULT_TAXA) or []:
+        path = _cache_path(cache_dir, f"checklist_B_{c_key}_{taxon}")
+        try:
+            if now - path.stat().st_mtime <= max_age:
+                files.append(path)
+        except OSError:
+            continue
+    return files
+
+
+def subset_index_dir(config: dict) -> Path:
+    """Cartella degli indici per cella (la stessa delle checklist)."""
+    return _get_cache_dir(config)
+
+
 def _get_cache_dir(config: dict) -> Path:
     custom = config.get("cache_dir", "")
     if custom:
@@ -736,4 +776,6 @@ def clear_all_cache(config: dict) -> int:
         for path in cache_dir.glob("checklist_*.json"):
             path.unlink()
             count += 1
+        for path in cache_dir.glob(f"{SUBSET_INDEX_PREFIX}*.npy"):
+            path.unlink()
     return count
@@ -0,0 +1,97 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Prepared Image - Immagine decodificata una volta e piramide di derivate.
+
+Prima, per ogni RAW, la preparazione apriva il file due volte: il thread
+thumbnail per l'anteprima dei modelli, extract_raw_metadata di nuovo con
+rawpy.imread solo per l'analisi B/N su un 50×50. La thumbnail gallery da
+150px era un altro ridimensionamento dall'anteprima a piena dimensione.
+
+Qui l'anteprima decodificata (base) produce su richiesta, con cache:
+  - level(size, resampling): lato lungo al target_size di un profilo
+    modello/LLM, calcolato dalla base con la stessa aritmetica di
+    EmbeddingGenerator._prepare_image_for_model (risultato identico)
+  - gallery(): 150px per utils.thumb_cache, dal livello più piccolo
+    già calcolato che la contiene
+  - analysis(): 50×50 per RAWProcessor.detect_monochrome, dalla gallery
+
+Le immagini restituite sono condivise tra i thread modello: non vanno
+modificate sul posto (copy() prima di thumbnail() e simili).
+
+Modulo senza dipendenze PyQt.
+"""
+
+import threading
+from typing import Dict, Tuple
+
+from PIL import Image
+
+from utils.thumb_cache import THUMB_CACHE_SIZE
+
+# Lato dell'immagine di analisi B/N (come RAWProcessor._is_monochrome_image)
+ANALYSIS_SIZE = 50
+
+
+def fit_size(size: Tuple[int, int], target_size: int) -> Tuple[int, int]:
+    """Dimensioni con lato lungo target_size (come _prepare_image_for_model)."""
+    w, h = size
+    scale = target_size / max(w, h)
+    return int(w * scale), int(h * scale)
+
+
+class PreparedImage:
+    """Anteprima decodificata con livelli ridimensionati calcolati una volta."""
+
+    def __init__(self, base: Image.Image):
+        if base.mode not in ('RGB', 'L'):
+            base = base.convert('RGB')
+        self.base = base
+        self._levels: Dict[tuple, Image.Image] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.base.size
+
+    def level(self, target_size: int, resampling=Image.Resampling.LANCZOS) -> Image.Image:
+        """Base ridotta a lato lungo target_size (la base stessa se già più piccola)."""
+        if max(self.base.size) <= target_size:
+            return self.base
+        key = (int(target_size), resampling)
+        with self._lock:
+            cached = self._levels.get(key)
+        if cached is not None:
+            return cached
+        # Calcolo fuori dal lock: i thread modello chiedono livelli diversi in parallelo
+        resized = self.base.resize(fit_size(self.base.size, target_size), resampling)
+        with self._lock:
+            return self._levels.setdefault(key, resized)
+
+    def gallery(self) -> Image.Image:
+        """Thumbnail gallery (lato lungo THUMB_CACHE_SIZE)."""
+        key = ('gallery',)
+        with self._lock:
+            cached = self._levels.get(key)
+            # Sorgente: il livello più piccolo che contiene ancora la gallery
+            sources = [img for k, img in self._levels.items()
+                       if isinstance(k[0], int) and max(img.size) >= THUMB_CACHE_SIZE]
+        if cached is not None:
+            return cached
+        source = min(sources, key=lambda img: img.size[0] * img.size[1], default=self.base)
+        thumb = source.copy()
+        thumb.thumbnail((THUMB_CACHE_SIZE, THUMB_CACHE_SIZE), Image.Resampling.LANCZOS)
+        with self._lock:
+            return self._levels.setdefault(key, thumb)
+
+    def analysis(self) -> Image.Image:
+        """Immagine RGB ANALYSIS_SIZE×ANALYSIS_SIZE per l'analisi B/N."""
+        key = ('analysis',)
+        with self._lock:
+            cached = self._levels.get(key)
+        if cached is not None:
+            return cached
+        sample = self.gallery().convert('RGB').resize(
+            (ANALYSIS_SIZE, ANALYSIS_SIZE), Image.Resampling.LANCZOS)
+        with self._lock:
+            return self._levels.setdefault(key, sample)
@@ -0,0 +1,221 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Query Cache - LRU degli embedding testuali SigLIP e delle traduzioni Argos.
+
+Prima ogni ricerca ripassava la query nella text tower SigLIP e nei modelli
+Argos (una traduzione per ogni parte separata da virgola), anche quando
+l'utente rilanciava la stessa query cambiando solo un filtro o la soglia.
+
+Qui:
+  - LRUCache limitata per numero di voci, con contatori hit/miss
+  - embedding testuali con chiave (id modello, query normalizzata),
+    traduzioni con chiave (coppia di lingue, testo)
+  - QueryStore facoltativo: un piccolo file SQLite accanto al catalogo
+    da cui la LRU riparte alla sessione successiva
+
+Le voci persistite vengono caricate in memoria all'apertura: get() non
+legge mai da disco.
+
+Modulo senza dipendenze PyQt.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+
+STORE_FILENAME = 'query_cache.sqlite'
+
+# Separatore dei campi della chiave nel file SQLite
+_KEY_SEP = '\x1f'
+
+
+def normalize_query(text: str) -> str:
+    """Query senza spazi iniziali/finali e con spazi interni singoli."""
+    return ' '.join(str(text).split())
+
+
+# ── Codifica valori per il file SQLite ───────────────────────────────
+
+def encode_embedding(value: np.ndarray) -> bytes:
+    return np.asarray(value, dtype=np.float32).tobytes()
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32).copy()
+
+
+def encode_text(value: str) -> bytes:
+    return value.encode('utf-8')
+
+
+def decode_text(blob: bytes) -> str:
+    return bytes(blob).decode('utf-8')
+
+
+class QueryStore:
+    """File SQLite condiviso dalle LRU: una riga per voce, tabella unica per tipo."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_cache (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                used REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self._conn.commit()
+
+    def load(self, kind: str, limit: int):
+        """Voci più recenti del tipo indicato, dalla meno alla più recente."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM query_cache WHERE kind = ? ORDER BY used DESC LIMIT ?",
+                (kind, limit)).fetchall()
+        return list(reversed(rows))
+
+    def put(self, kind: str, key: str, value: bytes, max_entries: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_cache (kind, key, value, used) VALUES (?, ?, ?, ?)",
+                (kind, key, value, time.time()))
+            # Stesso limite della LRU in memoria
+            self._conn.execute(
+                "DELETE FROM query_cache WHERE kind = ? AND key NOT IN ("
+                "SELECT key FROM query_cache WHERE kind = ? ORDER BY used DESC LIMIT ?)",
+                (kind, kind, max_entries))
+            self._conn.commit()
+
+    def touch(self, kind: str, key: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE query_cache SET used = ? WHERE kind = ? AND key = ?",
+                (time.time(), kind, key))
+            self._conn.commit()
+
+    def clear(self, kind: Optional[str] = None):
+        with self._lock:
+            if kind is None:
+                self._conn.execute("DELETE FROM query_cache")
+            else:
+                self._conn.execute("DELETE FROM query_cache WHERE kind = ?", (kind,))
+            self._conn.commit()
+
+
+class LRUCache:
+    """LRU thread-safe con contatori hit/miss, persistita facoltativamente.
+
+    Args:
+        kind: nome del tipo di voce ('text_embedding', 'translation', ...)
+        max_entries: voci tenute (in memoria e nel file)
+        encode / decode: valore ↔ bytes per il QueryStore
+        store: QueryStore (None = solo memoria)
+    """
+
+    def __init__(self, kind: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 encode: Callable[[Any], bytes] = encode_text,
+                 decode: Callable[[bytes], Any] = decode_text,
+                 store: Optional[QueryStore] = None):
+        self.kind = kind
+        self.max_entries = max(1, int(max_entries))
+        self.encode = encode
+        self.decode = decode
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        if store is not None:
+            self._load()
+
+    # ── API ──────────────────────────────────────────────────────────
+
+    def get(self, key: Tuple[Hashable, ...]):
+        """Valore in cache o None (conta hit/miss)."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key]
+            else:
+                self.misses += 1
+                return None
+        if self.store is not None:
+            self._store_call(self.store.touch, self.kind, self._store_key(key))
+        return value
+
+    def put(self, key: Tuple[Hashable, ...], value):
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.store is not None:
+            self._store_call(self.store.put, self.kind, self._store_key(key),
+                             self.encode(value), self.max_entries)
+
+    def get_or_compute(self, key: Tuple[Hashable, ...], compute: Callable[[], Any]):
+        """Valore in cache, altrimenti compute() (salvato se non None)."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+        if self.store is not None:
+            self._store_call(self.store.clear, self.kind)
+
+    # ── Interni ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def _store_key(key: Tuple[Hashable, ...]) -> str:
+        return _KEY_SEP.join(str(k) for k in key)
+
+    def _load(self):
+        rows = self._store_call(self.store.load, self.kind, self.max_entries) or []
+        for raw_key, blob in rows:
+            try:
+                self._entries[tuple(raw_key.split(_KEY_SEP))] = self.decode(blob)
+            except Exception as e:
+                logger.debug(f"Cache {self.kind}: voce non leggibile ({e})")
+        if rows:
+            logger.debug(f"Cache {self.kind}: {len(self._entries)} voci da {self.store.path.name}")
+
+    def _store_call(self, method, *args):
+        # Il file è un'ottimizzazione: un errore di I/O non deve bloccare la ricerca
+        try:
+            return method(*args)
+        except sqlite3.Error as e:
+            logger.debug(f"Cache {self.kind}: file {self.store.path.name} non disponibile ({e})")
+            return None
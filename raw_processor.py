@@ -11,6 +11,7 @@ import tempfile
 import inspect
 import threading
 import os
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 from PIL import Image
@@ -69,32 +70,50 @@ class ExifToolStayOpen:
     Usato SOLO per output testuale (JSON). I comandi binari (-b)
     usano subprocess separati perché {ready} non viene emesso
     dopo output binario.
-    Thread-safe tramite lock interno.
+    Thread-safe tramite lock interno. Di norma non si usa direttamente:
+    get_exiftool() ritorna un ExifToolPool che ne gestisce K istanze.
+    Con merge_stderr=True errori e avvisi arrivano nello stesso testo letto
+    da execute_text() (processi di scrittura dell'export XMP).
     """
 
-    def __init__(self):
+    def __init__(self, max_calls: int = 0, merge_stderr: bool = False):
         self._proc = None
         self._lock = threading.Lock()
-        self._call_count = 0  # contatore comandi eseguiti
+        self._call_count = 0      # file elaborati dall'ultimo avvio
+        self.max_calls = max_calls  # riavvio dopo N file (0 = mai): libera la memoria del Perl
+        self.merge_stderr = merge_stderr
+        self.pending = 0          # richieste in corso o in attesa (gestito da ExifToolPool)
+
+    @property
+    def is_running(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
 
     def restart(self):
         """Riavvia il processo ExifTool — azzera eventuale stato accumulato."""
         with self._lock:
-            if self._proc is not None and self._proc.poll() is None:
-                try:
-                    self._proc.stdin.write(b'-stay_open\nFalse\n')
-                    self._proc.stdin.flush()
-                    self._proc.wait(timeout=5)
-                except Exception:
-                    self._proc.terminate()
-            self._proc = None
-            self._call_count = 0
-            logger.info("ExifTool stay_open: processo riavviato (reset periodico)")
+            self._stop()
+            logger.info("ExifTool stay_open: processo riavviato")
+
+    def _stop(self):
+        """Chiude il processo (chiamare con il lock acquisito)."""
+        if self._proc is not None and self._proc.poll() is None:
+            try:
+                self._proc.stdin.write(b'-stay_open\nFalse\n')
+                self._proc.stdin.flush()
+                self._proc.wait(timeout=5)
+            except Exception:
+                self._proc.terminate()
+        self._proc = None
+        self._call_count = 0
 
     def _start(self):
         """Avvia il processo ExifTool in stay_open mode."""
         if self._proc is not None and self._proc.poll() is None:
-            return
+            # Salute del processo: dopo max_calls file si riparte da un Perl pulito
+            if not self.max_calls or self._call_count < self.max_calls:
+                return
+            logger.debug(f"ExifTool stay_open: riavvio dopo {self._call_count} file")
+            self._stop()
         kwargs = {}
         if os.name == 'nt':
             kwargs['creationflags'] = 0x08000000  # CREATE_NO_WINDOW
@@ -102,22 +121,48 @@ class ExifToolStayOpen:
             [_exiftool_executable(), '-stay_open', 'True', '-@', '-'],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
+            stderr=subprocess.STDOUT if self.merge_stderr else subprocess.DEVNULL,
             **kwargs
         )
+        self._call_count = 0
         logger.info("ExifTool stay_open: processo avviato")
 
     def execute_json(self, *args: str) -> list:
         """Esegue un comando ExifTool e ritorna il risultato come lista JSON.
         Solo per comandi che producono output testuale (no -b).
         """
+        return self._execute(list(args), n_files=1)
+
+    def execute_json_batch(self, files, *args: str) -> list:
+        """Un solo -execute per più file: ExifTool ritorna un array JSON con un
+        oggetto per file leggibile (campo SourceFile). I file illeggibili mancano."""
+        files = [str(f) for f in files]
+        if not files:
+            return []
+        return self._execute(list(args) + files, n_files=len(files))
+
+    def execute_text(self, *args: str) -> Optional[str]:
+        """Esegue un comando (es. scrittura) e ritorna l'output testuale fino a
+        {ready}; None se il processo non è avviabile o si è interrotto."""
+        return self._send(list(args), n_files=1)
+
+    def _execute(self, args: list, n_files: int) -> list:
+        text = self._send(args, n_files)
+        if text:
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError as e:
+                logger.error(f"ExifTool stay_open JSON error: {e}")
+        return []
+
+    def _send(self, args: list, n_files: int) -> Optional[str]:
         with self._lock:
             # Avvia o riavvia se necessario
             try:
                 self._start()
             except Exception as e:
                 logger.error(f"ExifTool stay_open: impossibile avviare: {e}")
-                return []
+                return None
 
             cmd = '\n'.join(args) + '\n-execute\n'
             try:
@@ -133,7 +178,7 @@ class ExifToolStayOpen:
                     self._proc.stdin.flush()
                 except Exception as e:
                     logger.error(f"ExifTool stay_open: riavvio fallito: {e}")
-                    return []
+                    return None
 
             # Leggi risposta riga per riga fino a {ready}
             lines = []
@@ -143,36 +188,25 @@ class ExifToolStayOpen:
                     if not line:
                         logger.error("ExifTool stay_open: stdout chiuso inaspettatamente")
                         self._proc = None
-                        break
+                        return None
                     if line.strip() == b'{ready}':
                         break
                     lines.append(line.decode('utf-8', errors='replace'))
             except Exception as e:
                 logger.error(f"ExifTool stay_open: errore lettura: {e}")
                 self._proc = None
-                return []
+                return None
 
-            self._call_count += 1
-            text = ''.join(lines).strip()
-            if text:
-                try:
-                    return json.loads(text)
-                except json.JSONDecodeError as e:
-                    logger.error(f"ExifTool stay_open JSON error: {e}")
-            return []
+            self._call_count += n_files
+            return ''.join(lines).strip()
 
     def close(self):
         """Chiude il processo ExifTool."""
         with self._lock:
-            if self._proc is not None and self._proc.poll() is None:
-                try:
-                    self._proc.stdin.write(b'-stay_open\nFalse\n')
-                    self._proc.stdin.flush()
-                    self._proc.wait(timeout=5)
-                except Exception:
-                    self._proc.terminate()
+            was_running = self.is_running
+            self._stop()
+            if was_running:
                 logger.info("ExifTool stay_open: processo chiuso")
-            self._proc = None
 
     def __del__(self):
         try:
@@ -181,21 +215,99 @@ class ExifToolStayOpen:
             pass
 
 
-# Istanza globale — un solo processo ExifTool per tutta l'app
+class ExifToolPool:
+    """K processi ExifTool stay_open con dispatch al meno occupato.
+
+    Con un solo processo tutti i worker prep si mettevano in fila dietro
+    lo stesso interprete Perl. I processi partono al primo utilizzo; a parità
+    di carico si preferisce uno già avviato.
+    """
+
+    # File per singolo -execute in execute_json_batch (risposta JSON contenuta)
+    BATCH_CHUNK = 200
+
+    def __init__(self, size: int = 1, max_calls: int = 0):
+        self._lock = threading.Lock()
+        self._procs = [ExifToolStayOpen(max_calls) for _ in range(max(1, int(size)))]
+
+    @property
+    def size(self) -> int:
+        return len(self._procs)
+
+    def configure(self, size: Optional[int] = None, max_calls: Optional[int] = None):
+        """Ridimensiona il pool e/o imposta il riavvio per processo (max_calls file)."""
+        removed = []
+        with self._lock:
+            if max_calls is not None:
+                for et in self._procs:
+                    et.max_calls = max(0, int(max_calls))
+            if size:
+                size = max(1, int(size))
+                mc = self._procs[0].max_calls
+                while len(self._procs) < size:
+                    self._procs.append(ExifToolStayOpen(mc))
+                # I processi in eccesso vengono chiusi fuori dal lock del pool
+                while len(self._procs) > size:
+                    removed.append(self._procs.pop())
+        for et in removed:
+            et.close()
+
+    @contextmanager
+    def _acquire(self):
+        with self._lock:
+            et = min(self._procs, key=lambda p: (p.pending, not p.is_running))
+            et.pending += 1
+        try:
+            yield et
+        finally:
+            with self._lock:
+                et.pending -= 1
+
+    def execute_json(self, *args: str) -> list:
+        """Come ExifToolStayOpen.execute_json, sul processo meno occupato."""
+        with self._acquire() as et:
+            return et.execute_json(*args)
+
+    def execute_json_batch(self, files, *args: str) -> list:
+        """Metadati di più file con pochi round-trip (BATCH_CHUNK file per -execute).
+        Ritorna la lista concatenata degli oggetti JSON (uno per file letto)."""
+        files = [str(f) for f in files]
+        results = []
+        for start in range(0, len(files), self.BATCH_CHUNK):
+            with self._acquire() as et:
+                results.extend(et.execute_json_batch(files[start:start + self.BATCH_CHUNK], *args))
+        return results
+
+    def restart(self):
+        for et in list(self._procs):
+            et.restart()
+
+    def close(self):
+        for et in list(self._procs):
+            et.close()
+
+
+# Istanza globale — un pool di processi ExifTool per tutta l'app
 _exiftool_instance = None
 _exiftool_instance_lock = threading.Lock()
 
 
-def get_exiftool() -> ExifToolStayOpen:
-    """Ritorna l'istanza globale ExifTool stay_open (lazy init)."""
+def get_exiftool() -> ExifToolPool:
+    """Ritorna il pool globale ExifTool stay_open (lazy init, 1 processo finché
+    configure() non lo allarga)."""
     global _exiftool_instance
     if _exiftool_instance is None:
         with _exiftool_instance_lock:
             if _exiftool_instance is None:
-                _exiftool_instance = ExifToolStayOpen()
+                _exiftool_instance = ExifToolPool()
     return _exiftool_instance
 
 
+def _source_key(path) -> str:
+    """Chiave di confronto per SourceFile di ExifTool (che su Windows usa '/')."""
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
 class CallerOptimizer:
     """Sistema di rilevamento automatico del chiamante per ottimizzazione"""
 
@@ -272,6 +384,10 @@ class RAWProcessor:
         
         # Dimensioni ottimali per CLIP - CRITICO per embedding validi (DEPRECATO)
         self.ai_target_size = 512  # Mantenuto per compatibilità
+
+        # Metadati ExifTool estratti in anticipo (prefetch_metadata), per SourceFile
+        self._prefetched: Dict[str, Dict[str, Any]] = {}
+        self._prefetch_lock = threading.Lock()
         
     def _load_optimization_profiles(self, config_profiles: Dict) -> Dict:
         """Carica profili ottimizzazione da config con fallback hardcoded"""
@@ -427,13 +543,17 @@ class RAWProcessor:
         """
         return self.optimization_profiles.get(profile_name, self.optimization_profiles['default'])
         
-    def extract_raw_metadata(self, raw_path: Path, local_path: Path = None) -> Dict[str, Any]:
+    def extract_raw_metadata(self, raw_path: Path, local_path: Path = None,
+                             bw_analysis: bool = True) -> Dict[str, Any]:
         """
         Estrazione unificata EXIF + XMP completi per tutti i formati.
 
         raw_path:   path originale (USB/rete) — usato per EXIF stay_open e sidecar XMP
         local_path: path copia locale su SSD (opzionale) — usato per analisi B/N su file
                     non-RAW (evita lettura PIL da USB). Se None usa raw_path.
+        bw_analysis: False se il chiamante calcola is_monochrome dall'anteprima
+                     già decodificata (detect_monochrome con image): il file
+                     non viene riaperto.
 
         Strategia:
         - RAW (ORF, CR2, etc.): EXIF embedded + XMP sidecar (.xmp)
@@ -466,26 +586,10 @@ class RAWProcessor:
 
             # ===== ANALISI BIANCO/NERO (ottimizzata) =====
             # Per file non-RAW usa local_path (SSD) se disponibile: PIL evita USB
-            _bw_path = local_path if (local_path is not None and not self.is_raw_file(raw_path)) else raw_path
-            try:
-                # Estrazione veloce dedicata per analisi B/N
-                bw_image = self._extract_for_bw_analysis(_bw_path)
-                if bw_image:
-                    is_mono = self._is_monochrome_image(bw_image)
-                    metadata['is_monochrome'] = 1 if is_mono else 0
-                    logger.info(f"🎨 Analisi B/N per {raw_path.name}: {is_mono}")
-                    # Chiudi l'immagine per liberare memoria
-                    try:
-                        bw_image.close()
-                    except Exception:
-                        pass
-                else:
-                    metadata['is_monochrome'] = 0
-                    logger.warning(f"❌ Immagine non estratta per analisi B/N: {raw_path.name}")
-            except Exception as e:
-                logger.error(f"Errore analisi B/N per {raw_path.name}: {e}")
-                metadata['is_monochrome'] = 0
-            
+            if bw_analysis:
+                _bw_path = local_path if (local_path is not None and not self.is_raw_file(raw_path)) else raw_path
+                metadata['is_monochrome'] = self.detect_monochrome(_bw_path, name=raw_path.name)
+
             logger.debug(f"Estrazione completata per {raw_path.name}: {len(metadata)} campi")
             
         except Exception as e:
@@ -871,10 +975,64 @@ class RAWProcessor:
 
     # ===== RESTO DEI METODI ORIGINALI (invariati) =====
     
+    # ===== PREFETCH METADATI IN BATCH =====
+
+    def prefetch_metadata(self, paths) -> int:
+        """Estrae con un solo -execute EXIF + XMP embedded (e sidecar XMP dei RAW)
+        di più file. extract_raw_metadata consuma poi i risultati dalla cache
+        invece di fare un round-trip ExifTool per file.
+
+        Returns:
+            Numero di file di cui sono stati letti i metadati
+        """
+        targets = [Path(p) for p in paths]
+        files = list(targets)
+        for p in targets:
+            if self.is_raw_file(p):
+                sidecar = self._find_xmp_sidecar(p)
+                if sidecar is not None:
+                    files.append(sidecar)
+        if not files:
+            return 0
+        data_list = get_exiftool().execute_json_batch(files, '-json', '-G', '-a', '-s', '-e')
+        with self._prefetch_lock:
+            for data in data_list:
+                src = data.get('SourceFile') if isinstance(data, dict) else None
+                if src:
+                    self._prefetched[_source_key(src)] = data
+        return len(data_list)
+
+    def _pop_prefetched(self, path: Path) -> Optional[Dict[str, Any]]:
+        if not self._prefetched:
+            return None
+        with self._prefetch_lock:
+            return self._prefetched.pop(_source_key(path), None)
+
+    def discard_prefetched(self, path):
+        """Scarta i metadati prefetch di un file che non verrà elaborato
+        (es. duplicato saltato dal pre-check), sidecar XMP compreso."""
+        if not self._prefetched:
+            return
+        path = Path(path)
+        # Tutti i nomi possibili del sidecar (_find_xmp_sidecar), senza stat
+        candidates = (path, path.with_suffix('.xmp'), path.with_suffix('.XMP'),
+                      Path(str(path) + '.xmp'), Path(str(path) + '.XMP'))
+        with self._prefetch_lock:
+            for p in candidates:
+                self._prefetched.pop(_source_key(p), None)
+
+    def clear_prefetched(self):
+        """Scarta i metadati prefetch non consumati (es. foto saltate per errore)."""
+        with self._prefetch_lock:
+            self._prefetched.clear()
+
     def _extract_with_exiftool(self, file_path: Path) -> Dict[str, Any]:
         """Estrazione EXIF + XMP embedded con ExifTool JSON.
         Usa processo stay_open per eliminare l'overhead di avvio Perl per ogni foto.
         Fallback a subprocess separato in caso di errore."""
+        cached = self._pop_prefetched(file_path)
+        if cached is not None:
+            return cached
         try:
             et = get_exiftool()
             data_list = et.execute_json('-json', '-G', '-a', '-s', '-e', str(file_path))
@@ -897,9 +1055,8 @@ class RAWProcessor:
                 logger.error(f"ExifTool error for {file_path.name}: {e2}")
             return {}
 
-    def _extract_xmp_sidecar(self, raw_path: Path) -> Dict[str, Any]:
-        """Estrazione XMP sidecar per file RAW.
-        Usa processo stay_open per eliminare l'overhead di avvio Perl."""
+    def _find_xmp_sidecar(self, raw_path: Path) -> Optional[Path]:
+        """Percorso del sidecar XMP di un RAW, None se assente."""
         xmp_path = raw_path.with_suffix('.xmp')
         if not xmp_path.exists():
             xmp_path = raw_path.with_suffix('.XMP')
@@ -909,7 +1066,18 @@ class RAWProcessor:
         if not xmp_path.exists():
             xmp_path = Path(str(raw_path) + '.XMP')
         if not xmp_path.exists():
+            return None
+        return xmp_path
+
+    def _extract_xmp_sidecar(self, raw_path: Path) -> Dict[str, Any]:
+        """Estrazione XMP sidecar per file RAW.
+        Usa processo stay_open per eliminare l'overhead di avvio Perl."""
+        xmp_path = self._find_xmp_sidecar(raw_path)
+        if xmp_path is None:
             return {}
+        cached = self._pop_prefetched(xmp_path)
+        if cached is not None:
+            return cached
         try:
             et = get_exiftool()
             data_list = et.execute_json('-json', '-G', '-a', '-s', '-e', str(xmp_path))
@@ -1301,6 +1469,32 @@ class RAWProcessor:
         except Exception:
             return None
     
+    def detect_monochrome(self, file_path: Optional[Path] = None, image: Optional[Image.Image] = None,
+                          name: Optional[str] = None) -> int:
+        """
+        Flag is_monochrome (1/0).
+        image: immagine già decodificata (es. PreparedImage.analysis()) — il
+        file non viene aperto. Altrimenti estrazione veloce da file_path.
+        """
+        name = name or (file_path.name if file_path is not None else '?')
+        try:
+            bw_image = image if image is not None else (
+                self._extract_for_bw_analysis(file_path) if file_path is not None else None)
+            if bw_image:
+                is_mono = self._is_monochrome_image(bw_image)
+                logger.info(f"🎨 Analisi B/N per {name}: {is_mono}")
+                if image is None:
+                    # Chiudi l'immagine per liberare memoria
+                    try:
+                        bw_image.close()
+                    except Exception:
+                        pass
+                return 1 if is_mono else 0
+            logger.warning(f"❌ Immagine non estratta per analisi B/N: {name}")
+        except Exception as e:
+            logger.error(f"Errore analisi B/N per {name}: {e}")
+        return 0
+
     def _extract_for_bw_analysis(self, file_path: Path) -> Optional[Image.Image]:
         """
         Estrazione VELOCE e SICURA specificamente per analisi B/N.
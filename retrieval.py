@@ -1,6 +1,5 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
-import pickle
 import numpy as np
 import logging
 import re
@@ -9,6 +8,9 @@ import json
 from pathlib import Path
 from PyQt6.QtCore import QCoreApplication
 
+from embedding_index import get_embedding_matrix
+from ann_index import ann_config
+
 logger = logging.getLogger(__name__)
 
 class ImageRetrieval:
@@ -18,7 +20,6 @@ class ImageRetrieval:
         self.config = config
         self.max_results = config.get('search', {}).get('max_results', 100)
         self.default_threshold = 0.15 # Abbassiamo il default dato il rumore multilingua
-        self.stems_cache = {}  # Cache per stems delle immagini
         # Motivo dell'ultimo risultato vuoto ('no_embeddings' o None): permette
         # alla UI di spiegare il perché invece di mostrare solo "0 risultati"
         self.last_empty_reason = None
@@ -145,57 +146,47 @@ class ImageRetrieval:
         query_tag = " ".join(query_variants)
         logger.info(f"🔤 Query: '{query_text}' | Varianti tag: {query_variants}")
 
-        # 3. SQL FETCH — due passaggi per supportare cancel e minimizzare memoria:
-        # Passaggio A: solo id + clip_embedding (blob pesanti, nessun metadato)
+        # 3. MATRICE EMBEDDING — caricata una volta per sessione e condivisa
+        # (embedding_index): la query diventa una moltiplicazione matrice-vettore,
+        # i filtri SQL si applicano come maschera sugli id.
         #
         # Solo per la ricerca semantica: _tag_pipeline confronta esclusivamente
         # testo (tags, llm_tags, title, description, vernacular_name) e non tocca
         # mai gli embedding. Caricarli in modalità tag era inutile e — peggio —
-        # il "if not emb_list: return" più sotto azzerava la ricerca per tag su
+        # il controllo "nessun embedding" più sotto azzerava la ricerca per tag su
         # database senza embedding, dove invece i tag ci sono eccome.
-        id_list  = []
-        emb_list = []
+        emb_matrix  = None
+        allowed_ids = None
         if mode == "semantic":
-            emb_sql = "SELECT id, clip_embedding FROM images WHERE clip_embedding IS NOT NULL"
-            if filters_sql:
-                emb_sql += f" AND {filters_sql}"
-
+            emb_matrix = get_embedding_matrix(self.db.db_path, 'clip_embedding')
             try:
-                self.db.cursor.execute(emb_sql, filter_params or [])
+                if not emb_matrix.ensure_loaded(self.db.conn, cancel_flag=cancel_flag):
+                    logger.info("Ricerca annullata durante fetch embedding")
+                    return [], 0
             except Exception as e:
                 logger.error(f"Errore SQL embedding fetch: {e}")
                 return [], 0
+            # Indice ANN: si attiva da solo sui cataloghi grandi (search.ann)
+            emb_matrix.configure_ann(ann_config(self.config))
 
-            # Deserializzazione in batch con check cancel ogni 500 righe
-            BATCH = 500
-            while True:
-                if cancel_flag is not None and cancel_flag():
-                    logger.info("Ricerca annullata durante fetch embedding")
+            # Filtri → solo gli id ammessi (nessun blob letto)
+            if filters_sql:
+                try:
+                    self.db.cursor.execute(f"SELECT id FROM images WHERE {filters_sql}",
+                                           filter_params or [])
+                    allowed_ids = np.fromiter((r[0] for r in self.db.cursor.fetchall()),
+                                              dtype=np.int64)
+                except Exception as e:
+                    logger.error(f"Errore SQL embedding fetch: {e}")
                     return [], 0
-                rows = self.db.cursor.fetchmany(BATCH)
-                if not rows:
-                    break
-                for row_id, raw_data in rows:
-                    try:
-                        if isinstance(raw_data, bytes):
-                            if len(raw_data) >= 2 and raw_data[0] == 0x80 and raw_data[1] in (2, 3, 4, 5):
-                                import pickle as _pk
-                                emb_raw = _pk.loads(raw_data)
-                                emb = np.array(emb_raw.get('image_embedding') if isinstance(emb_raw, dict) else emb_raw, dtype=np.float32)
-                            elif len(raw_data) >= 4 and len(raw_data) % 4 == 0:
-                                emb = np.frombuffer(raw_data, dtype=np.float32).copy()
-                            else:
-                                continue
-                        else:
-                            emb = np.array(raw_data, dtype=np.float32)
-                        id_list.append(row_id)
-                        emb_list.append(emb)
-                    except Exception:
-                        pass
+                available = emb_matrix.count_ids(allowed_ids)
+            else:
+                available = emb_matrix.count
 
             # Senza embedding la ricerca semantica non ha nulla da confrontare.
             # Vale solo qui: la pipeline tag lavora su testo e prosegue comunque.
-            if not emb_list:
+            # Embedding di dimensione diversa non contano qui: li segnala la pipeline.
+            if not available and not emb_matrix.skipped:
                 # Caso tipico: SigLIP non installato → nessuna foto ha l'impronta
                 # visiva. La ricerca semantica è la modalità predefinita, quindi
                 # l'utente vede "nessun risultato" pur avendo foto ben etichettate.
@@ -208,7 +199,7 @@ class ImageRetrieval:
                 )
                 return [], 0
 
-            logger.info(f"Embedding caricati: {len(emb_list)} su {total_found_in_db} totali")
+            logger.info(f"Embedding disponibili: {available} su {total_found_in_db} totali")
 
         # 4. LOGICA DI SOGLIA
         threshold = min_threshold if min_threshold is not None else self.default_threshold
@@ -216,15 +207,21 @@ class ImageRetrieval:
         # 5. DISPATCH PIPELINE
         if mode == "semantic":
             results = self._semantic_pipeline(
-                query_tag, query_en, id_list, emb_list,
+                query_tag, query_en, emb_matrix, allowed_ids,
                 deep_search, signal_callback, threshold, strictness,
                 include_description, cancel_flag=cancel_flag,
                 filters_sql=filters_sql, filter_params=filter_params,
                 plugin_cols=self._plugin_columns(),
                 precomputed_query_emb=query_emb,
             )
+        elif self.db.ensure_search_index():
+            # Tag pipeline su indice FTS5: metadati letti solo per i risultati
+            results = self._fts_tag_pipeline(
+                query_variants, filters_sql, filter_params, self._plugin_columns(),
+                effective_limit, fuzzy=fuzzy,
+                include_description=include_description, include_title=include_title)
         else:
-            # Tag pipeline: serve il fetch completo con metadati
+            # Tag pipeline senza FTS5: serve il fetch completo con metadati
             plugin_cols = self._plugin_columns()
             full_sql = f"""
             SELECT id, filepath, filename, clip_embedding, tags, llm_tags, description, title,
@@ -248,16 +245,21 @@ class ImageRetrieval:
         # Applichiamo il limite richiesto dall'utente sulla lista finale elaborata
         final_results = results[:effective_limit]
 
+        stats_fn = getattr(self.embedding_gen, 'query_cache_stats', None)
+        if stats_fn is not None:
+            logger.debug(f"Cache query (hit/miss): {stats_fn()}")
+
         return final_results, total_found_in_db
     
-    def _semantic_pipeline(self, query_tag, query_en, id_list, emb_list,
+    def _semantic_pipeline(self, query_tag, query_en, emb_matrix, allowed_ids,
                            deep_search, signal_callback, threshold, strictness,
                            include_description, cancel_flag=None,
                            filters_sql=None, filter_params=None, plugin_cols="",
                            precomputed_query_emb=None):
         """Pipeline semantica SigLIP + deep search testuale.
 
-        Riceve id_list e emb_list già deserializzati dal fetch leggero.
+        Riceve la matrice embedding condivisa (già normalizzata) e gli id
+        ammessi dai filtri (None = nessun filtro).
         Carica i metadati solo per i candidati che superano la soglia.
         """
         import re
@@ -275,34 +277,29 @@ class ImageRetrieval:
             query_emb = np.array(res_query.get('text_embedding') if isinstance(res_query, dict) else res_query)
         expected_dim = query_emb.shape[0]
 
-        # Filtra embedding con dimensione incompatibile
-        valid_ids  = []
-        valid_embs = []
-        skipped = 0
-        for img_id, emb in zip(id_list, emb_list):
-            if emb.shape[0] != expected_dim:
-                skipped += 1
-                continue
-            valid_ids.append(img_id)
-            valid_embs.append(emb)
-
-        if skipped:
+        # 2. Similarità coseno vettorizzata — una sola moltiplicazione sulla matrice.
+        # La matrice tiene solo la dimensione prevalente: se la query ha l'altra
+        # (catalogo a metà migrazione) si usano dal DB gli embedding compatibili
+        if emb_matrix.dim is not None and emb_matrix.dim != expected_dim:
             logger.warning(
-                f"⚠️ {skipped} embedding ignorati (dimensione {emb_list[0].shape[0] if emb_list else '?'} "
+                f"⚠️ {emb_matrix.count} embedding ignorati (dimensione {emb_matrix.dim} "
                 f"!= attesa {expected_dim}). Rielaborare le foto per rigenerare gli embedding SigLIP."
             )
-        if not valid_embs:
-            return []
+            valid_ids, similarities = emb_matrix.similarities_from_db(
+                self.db.conn, query_emb, allowed_ids, cancel_flag=cancel_flag)
+        else:
+            if emb_matrix.skipped:
+                logger.warning(
+                    f"⚠️ {emb_matrix.skipped} embedding ignorati (dimensione diversa "
+                    f"da {expected_dim}). Rielaborare le foto per rigenerare gli embedding SigLIP."
+                )
+            valid_ids, similarities = emb_matrix.similarities(query_emb, allowed_ids)
 
         if cancel_flag is not None and cancel_flag():
             return []
-
-        # 2. Similarità coseno vettorizzata — una sola operazione numpy
-        emb_matrix   = np.stack(valid_embs)                         # (N, D)
-        query_norm   = query_emb / (np.linalg.norm(query_emb) + 1e-8)
-        row_norms    = np.linalg.norm(emb_matrix, axis=1, keepdims=True)
-        emb_norm     = emb_matrix / (row_norms + 1e-8)
-        similarities = (emb_norm @ query_norm).astype(float)        # (N,)
+        similarities = similarities.astype(float)                    # (N,)
+        if not valid_ids.size:
+            return []
 
         pre_threshold = (threshold - 0.40) if deep_search else threshold
         passing_indices = np.where(similarities >= pre_threshold)[0]
@@ -315,7 +312,7 @@ class ImageRetrieval:
             return []
 
         # 3. Fetch metadati solo per i candidati che superano la soglia
-        passing_ids = [valid_ids[i] for i in passing_indices]
+        passing_ids = [int(valid_ids[i]) for i in passing_indices]
         placeholders = ",".join("?" * len(passing_ids))
         meta_sql = f"""
         SELECT id, filepath, filename, tags, llm_tags, description, title,
@@ -338,8 +335,15 @@ class ImageRetrieval:
         query_words  = [w.strip(",.?!").lower() for w in query_tag.split() if len(w) >= 3]
         match_length = max(4, min(9, 4 + int(strictness * 5)))
 
+        # Con l'indice FTS5: foto che contengono ogni radice, una query per parola
+        # al posto delle regex per foto (None = indice non disponibile)
+        word_hits = None
+        if deep_search and query_words and self.db.ensure_search_index():
+            word_hits = self._fts_prefix_hits(
+                [w[:min(match_length, len(w))] for w in query_words], include_description)
+
         for idx in passing_indices:
-            img_id = valid_ids[idx]
+            img_id = int(valid_ids[idx])
             img = meta_by_id.get(img_id)
             if img is None:
                 continue
@@ -348,18 +352,20 @@ class ImageRetrieval:
             debug_info   = "Solo SigLIP"
 
             if deep_search and query_words:
-                desc      = str(img.get('description', '')).lower() if include_description else ""
-                title     = str(img.get('title', '')).lower()
-                tags      = str(img.get('tags', '[]')).lower()
-                llm_tags  = str(img.get('llm_tags', '[]')).lower()
-                vernacular = str(img.get('vernacular_name', '') or '').lower()
-                full_text = f" {title} {desc} {tags} {llm_tags} {vernacular} ".replace('"', ' ').replace("'", " ").replace(",", " ").replace(".", " ")
+                if word_hits is None:
+                    desc      = str(img.get('description', '')).lower() if include_description else ""
+                    title     = str(img.get('title', '')).lower()
+                    tags      = str(img.get('tags', '[]')).lower()
+                    llm_tags  = str(img.get('llm_tags', '[]')).lower()
+                    vernacular = str(img.get('vernacular_name', '') or '').lower()
+                    full_text = f" {title} {desc} {tags} {llm_tags} {vernacular} ".replace('"', ' ').replace("'", " ").replace(",", " ").replace(".", " ")
 
                 matches = 0
                 match_details = []
                 for word in query_words:
                     root = word[:min(match_length, len(word))]
-                    if re.search(r'\b' + re.escape(root), full_text):
+                    if (img_id in word_hits.get(root, ()) if word_hits is not None
+                            else re.search(r'\b' + re.escape(root), full_text)):
                         matches += 1
                         match_details.append(f"{word}→{root}✓")
                     else:
@@ -393,7 +399,7 @@ class ImageRetrieval:
         # versione diversa di transformers → spazi non allineati → rielaborare foto
         if results:
             best_score = results[0][0]
-            if best_score < 0.20 and len(valid_embs) > 5:
+            if best_score < 0.20 and len(valid_ids) > 5:
                 logger.warning(
                     f"⚠️ Score CLIP massimo molto basso ({best_score:.3f}). "
                     f"Gli embedding nel database potrebbero essere incompatibili con il modello attuale. "
@@ -408,6 +414,116 @@ class ImageRetrieval:
 
         return final_results
 
+    def _fts_prefix_hits(self, roots, include_description=True):
+        """Radice → id delle foto con una parola che inizia così (deep search)."""
+        import search_index
+        columns = [c for c in search_index.COLUMNS if include_description or c != 'description']
+        hits = {}
+        for root in dict.fromkeys(roots):
+            self.db.cursor.execute(
+                f"SELECT rowid FROM {search_index.TABLE} WHERE {search_index.TABLE} MATCH ?",
+                (search_index.match_expression([search_index.quote(root, prefix=True)], columns),))
+            hits[root] = {r[0] for r in self.db.cursor.fetchall()}
+        return hits
+
+    def _fts_tag_pipeline(self, query_text, filters_sql, filter_params, plugin_cols, limit,
+                          fuzzy=True, include_description=True, include_title=True):
+        """Pipeline Tag sull'indice FTS5 (search_index), stessa logica di _tag_pipeline.
+
+        Una MATCH per termine dà le foto che lo contengono: il punteggio resta
+        il rapporto di match della variante migliore. Il bonus da 0 a 0.1,
+        prima legato alla lunghezza del testo, viene dal rank bm25. I metadati
+        si leggono solo per i primi `limit` risultati.
+        """
+        import search_index
+
+        variants = [query_text] if isinstance(query_text, str) else list(query_text)
+        variants = [v for v in variants if v and str(v).strip()]
+
+        if fuzzy:
+            # Stem di 4 caratteri → prefisso FTS, parole di 3 caratteri → token esatto
+            variant_terms = [search_index.stem_terms(self._normalize(v)) for v in variants]
+        else:
+            # Termini esatti: prima erano sottostringhe, qui inizio di parola
+            variant_terms = [
+                [search_index.quote(self._normalize(t), prefix=True) for t in str(v).split() if t.strip()]
+                for v in variants
+            ]
+        variant_terms = [terms for terms in variant_terms if terms]
+        if not variant_terms:
+            return []
+        logger.info(f"🏷️ Tag Search [FTS {'FUZZY' if fuzzy else 'EXACT'}] - Termini per variante: {variant_terms}")
+
+        columns = [c for c in search_index.COLUMNS
+                   if (include_title or c != 'title') and (include_description or c != 'description')]
+        table = search_index.TABLE
+        where = f"{table} MATCH ?"
+        params = list(filter_params or [])
+        if filters_sql:
+            where += f" AND rowid IN (SELECT id FROM images WHERE {filters_sql})"
+
+        all_terms = list(dict.fromkeys(t for terms in variant_terms for t in terms))
+        try:
+            term_rows = {}
+            for term in all_terms:
+                self.db.cursor.execute(f"SELECT rowid FROM {table} WHERE {where}",
+                                       [search_index.match_expression([term], columns)] + params)
+                term_rows[term] = {r[0] for r in self.db.cursor.fetchall()}
+
+            self.db.cursor.execute(
+                f"SELECT rowid, {search_index.bm25_expression()} FROM {table} WHERE {where}",
+                [search_index.match_expression(all_terms, columns)] + params)
+            ranks = dict(self.db.cursor.fetchall())
+        except Exception as e:
+            logger.error(f"Errore ricerca FTS: {e}")
+            return []
+        if not ranks:
+            return []
+
+        # bm25 è negativo: più basso = più pertinente
+        best_rank = min(ranks.values())
+        scored = []
+        for img_id, rank in ranks.items():
+            best_ratio = 0.0
+            for terms in variant_terms:
+                matched = sum(1 for t in terms if img_id in term_rows[t])
+                if matched:
+                    best_ratio = max(best_ratio, matched / len(terms))
+            if best_ratio <= 0:
+                continue
+            if fuzzy:
+                bonus = 0.1 * rank / best_rank if best_rank < 0 else 0.0
+            else:
+                bonus = 0.1  # Base bonus per exact match
+            scored.append((round(best_ratio + bonus, 3), rank, img_id))
+
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        scored = scored[:limit]
+        if not scored:
+            return []
+
+        ids = [img_id for _, _, img_id in scored]
+        placeholders = ",".join("?" * len(ids))
+        self.db.cursor.execute(f"""
+            SELECT id, filepath, filename, tags, llm_tags, description, title,
+                   camera_make, camera_model, lens_model, focal_length, aperture,
+                   iso, shutter_speed, width, height, datetime_original,
+                   datetime_digitized, datetime_modified, processed_date,
+                   aesthetic_score, technical_score, lr_rating, color_label,
+                   bioclip_taxonomy, geo_hierarchy, is_raw{plugin_cols}
+            FROM images WHERE id IN ({placeholders})
+        """, ids)
+        cols = [d[0] for d in self.db.cursor.description]
+        by_id = {row[0]: dict(zip(cols, row)) for row in self.db.cursor.fetchall()}
+
+        results = []
+        for score, _, img_id in scored:
+            img = by_id.get(img_id)
+            if img is not None:
+                img['final_score'] = score
+                results.append(img)
+        return results
+
     def _tag_pipeline(self, query_text, candidates, fuzzy=True, include_description=True, include_title=True):
         """Pipeline Tag unica e definitiva: gestisce sia ricerca ESATTA che FUZZY.
 
@@ -469,10 +585,7 @@ class ImageRetrieval:
             # 3. Logica di Match con scoring
             if fuzzy:
                 # Conta quanti stems matchano per calcolare score
-                img_id = img.get('id')
-                if img_id not in self.stems_cache:
-                    self.stems_cache[img_id] = self._get_stems(content_text)
-                img_stems = self.stems_cache[img_id]
+                img_stems = self._get_stems(content_text)
 
                 # Ogni variante è valutata a sé: vince il rapporto di match
                 # migliore, così una traduzione infelice non penalizza la query
@@ -0,0 +1,213 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Search Index - Indice full-text FTS5 su tag, titolo, descrizione e nome comune.
+
+Prima la ricerca per tag leggeva i metadati completi di tutte le foto
+filtrate e per ognuna faceva in Python parsing JSON di tags/llm_tags,
+normalizzazione NFD e stemming, con una cache degli stem mai invalidata.
+
+Qui:
+  - tabella FTS5 contentless images_fts (rowid = images.id), tokenizer
+    unicode61 remove_diacritics 2 (accenti ignorati come in _normalize)
+    e indice di prefisso a 4 caratteri, lo stem della ricerca fuzzy
+  - trigger su images la tengono allineata a ogni INSERT / DELETE e UPDATE
+    di title, description, tags, llm_tags e vernacular_name (plugin
+    BioNomen), chiunque scriva: DatabaseManager, plugin, tools/
+  - tags e llm_tags sono array JSON: si indicizza il testo decodificato
+    dei singoli tag (json_each), non il JSON grezzo, che con ensure_ascii
+    conterrebbe gli accenti come sequenze \\u00e9
+
+Tabella contentless: la cancellazione richiede i valori indicizzati, che i
+trigger leggono da OLD. La colonna vernacular_name nasce quando il plugin la
+aggiunge: ensure() ricrea i trigger e ricostruisce l'indice quando cambia.
+
+Modulo senza dipendenze PyQt.
+"""
+
+import logging
+import re
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'images_fts'
+
+# Colonne indicizzate (stesso nome in images)
+COLUMNS = ('title', 'description', 'tags', 'llm_tags', 'vernacular_name')
+
+# Colonne che contengono un array JSON di tag
+JSON_COLUMNS = ('tags', 'llm_tags')
+
+# Versione delle espressioni dei trigger: cambiandola ensure() li ricrea
+# e ricostruisce l'indice anche sui DB esistenti
+_TRIGGER_VERSION = 2
+
+# Pesi bm25 per colonna, nell'ordine di COLUMNS: tag e nome comune
+# descrivono il soggetto, la descrizione è testo lungo e generico
+BM25_WEIGHTS = (2.0, 1.0, 3.0, 2.0, 3.0)
+
+# Lunghezza dello stem della ricerca fuzzy (indice di prefisso FTS5)
+STEM_LENGTH = 4
+
+_TRIGGERS = ('trg_images_fts_insert', 'trg_images_fts_delete', 'trg_images_fts_update')
+
+_WORD_RE = re.compile(r'\b\w{3,}\b')
+
+# SQLite senza FTS5: si riprova solo al riavvio (niente avvisi a ogni apertura DB)
+_fts5_missing = False
+
+
+def available(conn) -> bool:
+    """True se la tabella FTS esiste (SQLite compilato con FTS5)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)
+    ).fetchone() is not None
+
+
+def unsupported() -> bool:
+    """True se la creazione della tabella è già fallita per FTS5 assente."""
+    return _fts5_missing
+
+
+def _image_columns(conn) -> set:
+    return {r[1] for r in conn.execute("PRAGMA table_info(images)").fetchall()}
+
+
+def _value(prefix: str, column: str) -> str:
+    """Espressione SQL del valore indicizzato: per i tag il testo decodificato."""
+    ref = f"{prefix}.{column}"
+    if column not in JSON_COLUMNS:
+        return ref
+    # CASE annidati: json_type() su testo non JSON solleverebbe un errore
+    return (f"CASE WHEN json_valid({ref}) THEN CASE WHEN json_type({ref}) = 'array' "
+            f"THEN (SELECT group_concat(value, ' ') FROM json_each({ref})) ELSE {ref} END "
+            f"ELSE {ref} END")
+
+
+def _values(prefix: str, present: set) -> str:
+    """Valori per le colonne FTS da NEW/OLD (NULL per colonne assenti in images)."""
+    return ", ".join(_value(prefix, c) if c in present else "NULL" for c in COLUMNS)
+
+
+def _signature(present: set) -> str:
+    """Commento nel corpo dei trigger: versione e colonne di images indicizzate alla creazione."""
+    return f"-- fts v{_TRIGGER_VERSION}: {','.join(c for c in COLUMNS if c in present)}"
+
+
+def is_current(conn) -> bool:
+    """True se tabella e trigger esistono e coprono le colonne attuali di images."""
+    if not available(conn):
+        return False
+    signature = _signature(_image_columns(conn))
+    current = [
+        sql for (sql,) in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_images_fts_%'")
+    ]
+    return len(current) == len(_TRIGGERS) and all(signature in (sql or '') for sql in current)
+
+
+def ensure(conn) -> bool:
+    """Crea tabella e trigger se mancano o non corrispondono alle colonne di images.
+
+    Ricostruisce l'indice quando ricrea i trigger. Non fa commit: il
+    chiamante decide la transazione. Ritorna False se FTS5 non è disponibile.
+    """
+    global _fts5_missing
+    if not available(conn):
+        if _fts5_missing:
+            return False
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE {TABLE} USING fts5(
+                    {', '.join(COLUMNS)},
+                    content='',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='{STEM_LENGTH}'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Indice di ricerca FTS5 non disponibile: {e}")
+            _fts5_missing = True
+            return False
+
+    if is_current(conn):
+        return True
+
+    present = _image_columns(conn)
+    indexed = [c for c in COLUMNS if c in present]
+    signature = _signature(present)
+
+    for name in _TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cols = ", ".join(COLUMNS)
+    new_values = _values('NEW', present)
+    old_values = _values('OLD', present)
+    conn.execute(f"""
+        CREATE TRIGGER trg_images_fts_insert AFTER INSERT ON images
+        BEGIN
+            {signature}
+            INSERT INTO {TABLE} (rowid, {cols}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_images_fts_delete AFTER DELETE ON images
+        BEGIN
+            {signature}
+            INSERT INTO {TABLE} ({TABLE}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER trg_images_fts_update AFTER UPDATE OF {', '.join(indexed)} ON images
+        BEGIN
+            {signature}
+            INSERT INTO {TABLE} ({TABLE}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO {TABLE} (rowid, {cols}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    rebuild(conn, present)
+    return True
+
+
+def rebuild(conn, present: Optional[set] = None):
+    """Svuota e ripopola l'indice dalla tabella images."""
+    present = present if present is not None else _image_columns(conn)
+    _t = time.monotonic()
+    conn.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('delete-all')")
+    conn.execute(
+        f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) "
+        f"SELECT id, {_values('images', present)} FROM images")
+    count = conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+    logger.info(f"Indice di ricerca FTS5 ricostruito: {count} foto in {time.monotonic() - _t:.2f}s")
+
+
+# ── Espressioni MATCH ────────────────────────────────────────────────
+
+def quote(term: str, prefix: bool = False) -> str:
+    """Termine FTS5 tra virgolette (nessun operatore interpretato), '*' = prefisso."""
+    return '"' + term.replace('"', '""') + '"' + ('*' if prefix else '')
+
+
+def stem_terms(normalized_text: str) -> List[str]:
+    """Termini FTS della ricerca fuzzy: stesso stemming della vecchia pipeline.
+
+    Parole di 3 caratteri: token esatto. Da 4 caratteri in su: prefisso dei
+    primi 4 (lo stem), che trova anche le parole indicizzate più lunghe.
+    """
+    terms = []
+    for word in _WORD_RE.findall(normalized_text):
+        term = quote(word[:STEM_LENGTH], prefix=True) if len(word) >= STEM_LENGTH else quote(word)
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def match_expression(terms: Iterable[str], columns: Sequence[str], operator: str = 'OR') -> str:
+    """Espressione MATCH sulle colonne indicate: {col1 col2} : (t1 OR t2 ...)."""
+    return "{" + " ".join(columns) + "} : (" + f" {operator} ".join(terms) + ")"
+
+
+def bm25_expression() -> str:
+    return f"bm25({TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})"
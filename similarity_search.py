@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+Similarity Search - "Trova simili" DINOv2 vettorizzato.
+
+Prima la gallery faceva SELECT * su tutte le foto con embedding DINOv2 (EXIF
+JSON ed entrambi i blob per ogni riga) e poi un ciclo Python con un prodotto
+scalare per foto, sul thread GUI. Su cataloghi grandi erano minuti.
+
+Qui:
+  - la matrice DINOv2 normalizzata è quella condivisa di embedding_index
+    (caricata dallo store su disco se completo, altrimenti solo id + blob)
+  - la finestra di sessione diventa un predicato SQL sull'indice datetime_original
+  - top-k con np.argpartition, metadati letti solo per i k risultati
+
+Modulo senza dipendenze PyQt: lo esegue SimilarSearchWorker in gui/gallery_tab.py.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from embedding_index import get_embedding_matrix
+
+logger = logging.getLogger(__name__)
+
+# Formato date nel DB dopo _normalize_datetime: confrontabile come stringa
+_DB_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Formato EXIF grezzo, presente nelle righe scritte prima della normalizzazione
+# (vedi _parse_db_datetime in gui/gallery_tab.py)
+_EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+class SimilaritySearch:
+    """Ricerca per similarità visiva DINOv2 a partire da una foto del catalogo."""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        # Motivo dell'ultimo risultato vuoto, letto dalla UI ('no_reference_embedding')
+        self.last_empty_reason: Optional[str] = None
+
+    def session_ids(self, ref_dt: datetime, minutes: int) -> np.ndarray:
+        """Id delle foto scattate entro ±minutes dalla data di riferimento.
+
+        I primi due rami usano l'indice idx_datetime_original, uno per formato
+        (ISO normalizzato ed EXIF "YYYY:MM:DD"); l'ultimo recupera le foto
+        senza data di scatto tramite digitized/modified, come faceva il
+        filtro Python.
+        """
+        delta = timedelta(minutes=minutes)
+        lo, hi = ref_dt - delta, ref_dt + delta
+        iso = (lo.strftime(_DB_DATETIME_FORMAT), hi.strftime(_DB_DATETIME_FORMAT))
+        exif = (lo.strftime(_EXIF_DATETIME_FORMAT), hi.strftime(_EXIF_DATETIME_FORMAT))
+        self.db.cursor.execute("""
+            SELECT id FROM images WHERE datetime_original BETWEEN ? AND ?
+            UNION
+            SELECT id FROM images WHERE datetime_original BETWEEN ? AND ?
+            UNION
+            SELECT id FROM images
+            WHERE (datetime_original IS NULL OR datetime_original = '')
+              AND (COALESCE(NULLIF(datetime_digitized, ''), datetime_modified) BETWEEN ? AND ?
+                   OR COALESCE(NULLIF(datetime_digitized, ''), datetime_modified) BETWEEN ? AND ?)
+        """, iso + exif + iso + exif)
+        return np.fromiter((r[0] for r in self.db.cursor.fetchall()), dtype=np.int64)
+
+    def find_similar(self, ref_id: int, threshold: float, max_results: int,
+                     ref_dt: Optional[datetime] = None, session_minutes: Optional[int] = None,
+                     cancel_flag=None) -> List[Dict[str, Any]]:
+        """Foto più simili alla foto ref_id, ordinate per similarità decrescente.
+
+        Args:
+            ref_id: id della foto di riferimento
+            threshold: similarità coseno minima
+            max_results: numero massimo di risultati (top-k)
+            ref_dt / session_minutes: se entrambi presenti, limita alla sessione
+            cancel_flag: callable opzionale, True per interrompere
+
+        Returns:
+            Lista di dict con i metadati (senza blob embedding) + 'similarity_score'.
+            Lista vuota se annullata, senza risultati o senza embedding di riferimento.
+        """
+        self.last_empty_reason = None
+        emb_matrix = get_embedding_matrix(self.db.db_path, 'dinov2_embedding')
+        if not emb_matrix.ensure_loaded(self.db.conn, cancel_flag=cancel_flag):
+            logger.info("Trova simili annullato durante il caricamento embedding")
+            return []
+
+        ref = emb_matrix.vector(ref_id)
+        if ref is None:
+            self.last_empty_reason = 'no_reference_embedding'
+            return []
+
+        allowed_ids = None
+        if ref_dt is not None and session_minutes:
+            allowed_ids = self.session_ids(ref_dt, session_minutes)
+            logger.debug(f"Filtro sessione ±{session_minutes} min: {len(allowed_ids)} foto")
+            if not allowed_ids.size:
+                return []
+
+        if cancel_flag is not None and cancel_flag():
+            return []
+
+        ids, sims = emb_matrix.similarities(ref, allowed_ids)
+        keep = np.flatnonzero(sims >= threshold)
+        if keep.size > max_results:
+            keep = keep[np.argpartition(-sims[keep], max_results - 1)[:max_results]]
+        keep = keep[np.argsort(-sims[keep], kind='stable')]
+        logger.info(f"Trova simili: {len(keep)} risultati su {len(ids)} embedding DINOv2")
+        if not keep.size:
+            return []
+
+        return self._fetch_metadata([int(i) for i in ids[keep]], [float(s) for s in sims[keep]])
+
+    def _fetch_metadata(self, ids: List[int], scores: List[float]) -> List[Dict[str, Any]]:
+        """Metadati completi per i soli risultati, esclusi i blob embedding."""
+        self.db.cursor.execute("PRAGMA table_info(images)")
+        cols = [r[1] for r in self.db.cursor.fetchall() if not r[1].endswith('_embedding')]
+        placeholders = ",".join("?" * len(ids))
+        self.db.cursor.execute(
+            f"SELECT {', '.join(cols)} FROM images WHERE id IN ({placeholders})", ids
+        )
+        by_id = {row[0]: dict(zip(cols, row)) for row in self.db.cursor.fetchall()}
+
+        results = []
+        for img_id, score in zip(ids, scores):
+            image_data = by_id.get(img_id)
+            if image_data is not None:
+                image_data['similarity_score'] = score
+                results.append(image_data)
+        return results
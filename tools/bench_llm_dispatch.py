@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+OffGallery — bench_llm_dispatch.py
+==================================
+Misura offline il throughput del dispatcher LLM (llm_dispatcher) contro un
+server finto compatibile con Ollama /api/generate: latenza fissa per
+richiesta e un numero limitato di slot paralleli lato server.
+
+Nessun modello, nessuna GPU, nessun file del catalogo: serve a scegliere
+llm_vision.max_parallel / prefetch e a verificare che il throughput cresca
+con il parallelismo del server.
+
+Uso / Usage
+-----------
+  # 40 immagini, server con 4 slot e 0.5 s per richiesta, finestre 1/2/4/8:
+  python bench_llm_dispatch.py
+
+  # Parametri espliciti:
+  python bench_llm_dispatch.py --images 60 --server-slots 2 --latency 1.0 --parallel 1,2,4
+
+Compatibilità / Compatibility
+------------------------------
+  Python 3.8+  —  Windows, Linux, macOS
+  Richiede l'ambiente OffGallery (Pillow; requests per il plugin Ollama)
+  e la cartella del progetto.
+"""
+
+import argparse
+import base64
+import io
+import json
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+# ---------------------------------------------------------------------------
+# Server finto Ollama
+# ---------------------------------------------------------------------------
+
+MOCK_RESPONSE = "TITLE: Airone in volo\nTAGS: airone,uccello,volo,cielo\nDESCRIPTION: Un airone in volo."
+
+
+def make_handler(slots: threading.Semaphore, latency: float, counters: dict):
+    class MockOllamaHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            with slots:   # come OLLAMA_NUM_PARALLEL: le richieste in eccesso attendono
+                with counters['lock']:
+                    counters['active'] += 1
+                    counters['peak'] = max(counters['peak'], counters['active'])
+                time.sleep(latency)
+                with counters['lock']:
+                    counters['active'] -= 1
+            body = json.dumps({
+                'response': MOCK_RESPONSE,
+                'eval_count': 20,
+                'eval_duration': int(latency * 1e9),
+                'total_duration': int(latency * 1e9),
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MockOllamaHandler
+
+
+def start_mock_server(server_slots: int, latency: float):
+    counters = {'lock': threading.Lock(), 'active': 0, 'peak': 0}
+    handler = make_handler(threading.Semaphore(server_slots), latency, counters)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+# ---------------------------------------------------------------------------
+# Client: plugin Ollama del progetto, altrimenti urllib
+# ---------------------------------------------------------------------------
+
+def find_project_root() -> Path | None:
+    candidate = Path(__file__).resolve().parent
+    for _ in range(5):
+        if (candidate / "config_new.yaml").exists():
+            return candidate
+        candidate = candidate.parent
+    return None
+
+
+def make_generate(endpoint: str):
+    """Funzione (image_b64, prompt) → testo; usa OllamaPlugin se importabile."""
+    try:
+        from plugins.llm_ollama.plugin import OllamaPlugin
+        plugin = OllamaPlugin({'endpoint': endpoint, 'timeout': 60})
+        print("Client: plugin Ollama (requests.Session)")
+        return lambda image_b64, prompt: plugin.generate(image_b64, prompt, 64, {})
+    except ImportError as e:
+        print(f"Client: urllib (plugin Ollama non importabile: {e})")
+
+    def _generate(image_b64, prompt):
+        payload = json.dumps({'prompt': prompt, 'images': [image_b64], 'stream': False}).encode()
+        req = urllib.request.Request(f"{endpoint}/api/generate", data=payload,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=60) as r:
+            return json.loads(r.read()).get('response')
+    return _generate
+
+
+def make_encode(size: int):
+    """Stadio encode come EmbeddingGenerator.encode_llm_image: resize + JPEG + base64."""
+    from PIL import Image
+
+    def _encode(job):
+        img = Image.new('RGB', (size * 3, size * 2), (job.context % 255, 90, 120))
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=95)
+        return base64.b64encode(buf.getvalue()).decode('utf-8')
+    return _encode
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def run_once(llm_dispatcher, encode, generate, images: int, max_parallel: int, prefetch: int):
+    dispatcher = llm_dispatcher.LLMDispatcher(
+        encode, lambda job, payload: generate(payload, "TITLE/TAGS/DESCRIPTION"),
+        max_parallel=max_parallel, prefetch=prefetch)
+    t0 = time.monotonic()
+    done, errors = 0, 0
+    for i in range(images):
+        dispatcher.submit(llm_dispatcher.LLMJob(f"img{i:04d}", i))
+        for job in dispatcher.completed():
+            done += 1
+            errors += job.error is not None or not job.result
+    while dispatcher.pending():
+        for job in dispatcher.completed(timeout=0.5):
+            done += 1
+            errors += job.error is not None or not job.result
+    elapsed = time.monotonic() - t0
+    dispatcher.shutdown()
+    return elapsed, done, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del dispatcher LLM Vision")
+    parser.add_argument('--images', type=int, default=40, help="immagini per prova (default 40)")
+    parser.add_argument('--latency', type=float, default=0.5, help="secondi per richiesta lato server (default 0.5)")
+    parser.add_argument('--server-slots', type=int, default=4, help="richieste servite in parallelo dal server (default 4)")
+    parser.add_argument('--parallel', default='1,2,4,8', help="valori di max_parallel da provare (default 1,2,4,8)")
+    parser.add_argument('--prefetch', type=int, default=2, help="payload preparati in anticipo (default 2)")
+    parser.add_argument('--size', type=int, default=512, help="lato lungo del payload JPEG (default 512)")
+    args = parser.parse_args()
+
+    root = find_project_root()
+    if root is None:
+        print("[ERRORE] Cartella del progetto OffGallery non trovata.", file=sys.stderr)
+        sys.exit(1)
+    sys.path.insert(0, str(root))
+    try:
+        import llm_dispatcher
+        encode = make_encode(args.size)
+    except ImportError as e:
+        print(
+            f"[ERRORE] {e}\n"
+            "Esegui lo script dall'ambiente OffGallery (es. conda activate OffGallery).",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    server, counters = start_mock_server(args.server_slots, args.latency)
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    generate = make_generate(endpoint)
+    print(f"Server finto: {endpoint} — {args.server_slots} slot, {args.latency:.2f}s per richiesta\n")
+
+    print(f"{'max_parallel':>12}  {'tempo':>8}  {'img/s':>7}  {'picco server':>12}  {'errori':>6}")
+    for value in [int(v) for v in args.parallel.split(',') if v.strip()]:
+        counters['peak'] = 0
+        elapsed, done, errors = run_once(llm_dispatcher, encode, generate,
+                                         args.images, value, args.prefetch)
+        print(f"{value:>12}  {elapsed:>7.2f}s  {done / elapsed:>7.2f}  {counters['peak']:>12}  {errors:>6}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
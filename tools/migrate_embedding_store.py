@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+OffGallery — migrate_embedding_store.py
+========================================
+Crea lo store embedding su disco (file float32 mappabili in memoria) copiando
+gli embedding SigLIP e DINOv2 già presenti nel database, senza rielaborare
+nessun file immagine.
+
+Necessario per archivi indicizzati prima della versione che ha introdotto lo
+store: finché non esiste, ricerca semantica e "trova simili" leggono i blob
+dal database SQLite (più lento). I DB creati da zero hanno già lo store.
+
+Chiudere OffGallery prima di eseguire lo script.
+
+Uso / Usage
+-----------
+  # Anteprima (nessuna modifica):
+  python migrate_embedding_store.py
+
+  # Esecuzione effettiva:
+  python migrate_embedding_store.py --apply
+
+  # Percorso DB manuale (se config_new.yaml non trovato):
+  python migrate_embedding_store.py --db /path/to/offgallery.sqlite --apply
+
+Compatibilità / Compatibility
+------------------------------
+  Python 3.8+  —  Windows, Linux, macOS
+  Richiede l'ambiente OffGallery (numpy) e la cartella del progetto.
+"""
+
+import argparse
+import sqlite3
+import sys
+from collections import Counter
+from pathlib import Path
+
+
+# ---------------------------------------------------------------------------
+# Ricerca automatica del DB (identica agli altri script migrate_*)
+# ---------------------------------------------------------------------------
+
+def find_project_root() -> Path | None:
+    candidate = Path(__file__).resolve().parent
+    for _ in range(5):
+        if (candidate / "config_new.yaml").exists():
+            return candidate
+        candidate = candidate.parent
+    return None
+
+
+def find_db_from_config(project_root: Path) -> Path | None:
+    config_path = project_root / "config_new.yaml"
+    try:
+        text = config_path.read_text(encoding="utf-8")
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("database:"):
+                raw = stripped.split(":", 1)[1].strip().strip('"').strip("'")
+                db_path = Path(raw)
+                if not db_path.is_absolute():
+                    db_path = project_root / db_path
+                return db_path.resolve()
+    except Exception:
+        pass
+    return None
+
+
+def resolve_db_path(cli_db: str | None) -> Path:
+    if cli_db:
+        p = Path(cli_db).resolve()
+        if not p.exists():
+            print(f"[ERRORE] DB non trovato: {p}", file=sys.stderr)
+            sys.exit(1)
+        return p
+    root = find_project_root()
+    if root:
+        db = find_db_from_config(root)
+        if db and db.exists():
+            return db
+        fallback = root / "database" / "offgallery.sqlite"
+        if fallback.exists():
+            return fallback
+    print(
+        "[ERRORE] Impossibile trovare il database.\n"
+        "Specifica il percorso con: --db /percorso/offgallery.sqlite",
+        file=sys.stderr,
+    )
+    sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# Moduli del progetto (formato store e decodifica blob)
+# ---------------------------------------------------------------------------
+
+def import_project_modules():
+    """Importa embedding_store / embedding_index dalla root del progetto."""
+    root = find_project_root()
+    if root is None:
+        print("[ERRORE] Cartella del progetto OffGallery non trovata.", file=sys.stderr)
+        sys.exit(1)
+    sys.path.insert(0, str(root))
+    try:
+        import embedding_store
+        import embedding_index
+    except ImportError as e:
+        print(
+            f"[ERRORE] {e}\n"
+            "Esegui lo script dall'ambiente OffGallery (es. conda activate OffGallery).",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    return embedding_store, embedding_index
+
+
+# ---------------------------------------------------------------------------
+# Migrazione
+# ---------------------------------------------------------------------------
+
+BATCH = 1000
+
+
+def progress_bar(current: int, total: int, width: int = 40) -> str:
+    filled = int(width * current / total) if total else 0
+    bar = "█" * filled + "░" * (width - filled)
+    pct = 100 * current // total if total else 0
+    return f"[{bar}] {pct:3d}%  {current}/{total}"
+
+
+def dominant_dim(conn, column: str) -> tuple[int | None, Counter]:
+    """Dimensione prevalente degli embedding raw float32 (lunghezza blob / 4)."""
+    dims = Counter()
+    for length, n in conn.execute(
+        f"SELECT length({column}), COUNT(*) FROM images "
+        f"WHERE {column} IS NOT NULL GROUP BY length({column})"
+    ):
+        if length and length % 4 == 0:
+            dims[length // 4] += n
+    return (dims.most_common(1)[0][0] if dims else None), dims
+
+
+def migrate_column(conn, db_path: Path, column: str, apply: bool, modules) -> None:
+    embedding_store, embedding_index = modules
+    import numpy as np
+
+    total = conn.execute(
+        f"SELECT COUNT(*) FROM images WHERE {column} IS NOT NULL"
+    ).fetchone()[0]
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM images").fetchone()[0]
+    dim, dims = dominant_dim(conn, column)
+    if dim is None and total:
+        # Solo blob pickle legacy: la dimensione si legge decodificandone uno
+        blob = conn.execute(
+            f"SELECT {column} FROM images WHERE {column} IS NOT NULL LIMIT 1"
+        ).fetchone()[0]
+        emb = embedding_index.decode_embedding_blob(blob)
+        dim = int(emb.shape[0]) if emb is not None else None
+        if dim is None:
+            print(f"  [{column}] embedding illeggibili — saltata.")
+            print()
+            return
+
+    store = embedding_store.get_embedding_store(db_path, column)
+    print(f"  [{column}]")
+    print(f"    Embedding nel DB     : {total}")
+    if store.exists:
+        state = "completo" if store.is_complete else "incompleto"
+        print(f"    Store esistente      : {state} (dim={store.dim}) — verrà riscritto")
+
+    if total == 0:
+        print("    Nessun embedding da copiare.")
+        if apply:
+            store.create(complete=True)
+            print("    [OK] Store vuoto creato.")
+        print()
+        return
+
+    print(f"    Dimensione prevalente: {dim}")
+    other = sum(n for d, n in dims.items() if d != dim)
+    if other:
+        print(f"    Altre dimensioni     : {other} (escluse, come nella ricerca)")
+    size_mb = (max_id + 1) * (dim or 0) * 4 / (1024 * 1024)
+    print(f"    Spazio su disco      : ~{size_mb:.0f} MB")
+
+    if not apply:
+        print()
+        return
+
+    stats = {'done': 0, 'skipped': 0}
+
+    def batches():
+        cur = conn.execute(
+            f"SELECT id, {column} FROM images WHERE {column} IS NOT NULL"
+        )
+        while True:
+            rows = cur.fetchmany(BATCH)
+            if not rows:
+                break
+            ids, vecs = [], []
+            for row_id, blob in rows:
+                emb = embedding_index.decode_embedding_blob(blob)
+                if emb is not None and emb.shape[0] == dim:
+                    ids.append(row_id)
+                    vecs.append(emb)
+                else:
+                    stats['skipped'] += 1
+            stats['done'] += len(rows)
+            print(f"\r    {progress_bar(stats['done'], total)}", end="", flush=True)
+            if ids:
+                yield np.asarray(ids, dtype=np.int64), np.stack(vecs)
+
+    written = store.rebuild(dim, max_id + 1, batches())
+    print()
+    print(f"    [OK] {written} embedding scritti in {store.data_path}")
+    if stats['skipped']:
+        print(f"    Esclusi (dimensione diversa o illeggibili): {stats['skipped']}")
+    print()
+
+
+def run_migration(db_path: Path, apply: bool) -> None:
+    print(f"\n  Database : {db_path}")
+    print(f"  Modalità : {'SCRITTURA (--apply)' if apply else 'DRY-RUN (solo anteprima)'}")
+    print()
+
+    modules = import_project_modules()
+    embedding_store = modules[0]
+    print(f"  Store    : {embedding_store.get_store_dir(db_path)}")
+    print()
+
+    conn = sqlite3.connect(db_path)
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(images)")}
+    for column in embedding_store.STORE_COLUMNS:
+        if column not in cols:
+            print(f"  [{column}] colonna assente nel DB — saltata.")
+            continue
+        migrate_column(conn, db_path, column, apply, modules)
+
+    if not apply:
+        print("  [DRY-RUN] Esegui con --apply per creare lo store.")
+        print()
+    conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Entrypoint
+# ---------------------------------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="OffGallery — creazione store embedding su disco",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--db", metavar="PATH",
+                        help="Percorso esplicito al file offgallery.sqlite")
+    parser.add_argument("--apply", action="store_true",
+                        help="Crea lo store (default: dry-run)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  OffGallery — Migrazione Store Embedding")
+    print("=" * 60)
+
+    db_path = resolve_db_path(args.db)
+    run_migration(db_path, apply=args.apply)
+
+
+if __name__ == "__main__":
+    main()
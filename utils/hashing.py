@@ -0,0 +1,107 @@
+"""
+Hash dei file a lettura in streaming (blocchi da 1 MB).
+Prima il prep leggeva l'intero file in RAM per calcolare l'MD5: con RAW da
+80 MB o PSD/TIFF da 1 GB e più worker in parallelo la memoria esplodeva.
+
+- hash_file / copy_and_hash: hash completo (chiave univoca file_hash nel DB)
+- quick_hash: dimensione + primo e ultimo MB, per il pre-check duplicati
+
+L'MD5 resta il default: è la chiave dei cataloghi esistenti. Gli algoritmi
+alternativi (blake2b, xxh128 se il pacchetto xxhash è installato) producono
+valori con prefisso "algoritmo:" e vanno scelti su un catalogo nuovo: le foto
+già presenti con hash MD5 non verrebbero più riconosciute.
+"""
+import hashlib
+import logging
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+# Blocco di lettura per hash e copia
+CHUNK_SIZE = 1024 * 1024
+
+# Porzione letta in testa e in coda dal quick hash
+QUICK_SPAN = 1024 * 1024
+
+ALGORITHMS = ('md5', 'blake2b', 'xxh128')
+
+_xxh_warned = False
+
+
+def resolve_algorithm(name: Optional[str]) -> str:
+    """Normalizza il nome algoritmo da config; xxh128 senza xxhash → blake2b."""
+    global _xxh_warned
+    name = (name or 'md5').strip().lower()
+    if name not in ALGORITHMS:
+        logger.warning(f"Algoritmo hash sconosciuto '{name}', uso md5")
+        return 'md5'
+    if name == 'xxh128' and xxhash is None:
+        if not _xxh_warned:
+            logger.warning("Pacchetto xxhash non installato: hash blake2b al posto di xxh128")
+            _xxh_warned = True
+        return 'blake2b'
+    return name
+
+
+def new_hasher(algorithm: str):
+    """Oggetto hash con interfaccia update()/hexdigest()."""
+    if algorithm == 'xxh128':   # già risolto da resolve_algorithm: xxhash presente
+        return xxhash.xxh3_128()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=16)
+    return hashlib.md5()
+
+
+def format_hash(algorithm: str, hexdigest: str) -> str:
+    """Valore salvato in file_hash: MD5 senza prefisso (compatibile), altri "algo:hex"."""
+    return hexdigest if algorithm == 'md5' else f"{algorithm}:{hexdigest}"
+
+
+def hash_file(path: Path, algorithm: str = 'md5') -> str:
+    """Hash completo del file letto a blocchi, senza caricarlo in RAM."""
+    hasher = new_hasher(algorithm)
+    with open(path, 'rb') as src:
+        for block in iter(lambda: src.read(CHUNK_SIZE), b''):
+            hasher.update(block)
+    return format_hash(algorithm, hasher.hexdigest())
+
+
+def copy_and_hash(path: Path, dst: BinaryIO, algorithm: Optional[str] = 'md5') -> Optional[str]:
+    """Copia il file in dst (file aperto in scrittura) calcolando l'hash nello stesso passaggio.
+
+    Con algorithm=None copia soltanto e ritorna None (hash già noto).
+    """
+    hasher = new_hasher(algorithm) if algorithm else None
+    with open(path, 'rb') as src:
+        for block in iter(lambda: src.read(CHUNK_SIZE), b''):
+            if hasher is not None:
+                hasher.update(block)
+            dst.write(block)
+    dst.flush()
+    return format_hash(algorithm, hasher.hexdigest()) if hasher is not None else None
+
+
+def quick_hash(path: Path) -> str:
+    """Impronta veloce: dimensione + primo e ultimo MB (file piccoli: per intero).
+
+    Non identifica un file: due file con stesso quick hash vanno confermati
+    con l'hash completo. Serve solo a scartare in fretta i non duplicati.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as src:
+        size = src.seek(0, 2)
+        hasher.update(size.to_bytes(8, 'little'))
+        src.seek(0)
+        if size <= 2 * QUICK_SPAN:
+            hasher.update(src.read())
+        else:
+            hasher.update(src.read(QUICK_SPAN))
+            src.seek(size - QUICK_SPAN)
+            hasher.update(src.read(QUICK_SPAN))
+    return hasher.hexdigest()
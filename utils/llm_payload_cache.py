@@ -0,0 +1,174 @@
+"""
+Cache su disco dei payload LLM Vision (JPEG al profilo llm_vision).
+
+Prima il JPEG inviato al server LLM esisteva solo per la durata della
+chiamata: la gallery (run_llm_tagging_batch, LLMWorkerThread) creava ogni
+volta un RAWProcessor e riestraeva l'anteprima del RAW per ogni foto,
+anche se il processing l'aveva già decodificata.
+
+Ora: una tabella SQLite (WAL) in cache/llm_payloads.sqlite
+  - chiave = file_hash + target_size, resampling e qualità JPEG del
+    profilo: cambiando il profilo le voci vecchie non vengono più lette
+  - scritta dal processing quando ha già l'anteprima decodificata
+    (PreparedImage), letta da EmbeddingGenerator prima di aprire il file
+  - budget in byte (llm_vision.payload_cache.max_mb) con eviction LRU
+
+Il file_hash identifica il contenuto: una foto modificata ha un hash
+diverso e non riusa il payload vecchio.
+"""
+import io
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from utils.thumb_cache import get_thumb_cache_dir
+
+logger = logging.getLogger(__name__)
+
+STORE_FILENAME = 'llm_payloads.sqlite'
+
+DEFAULT_MAX_MB = 512
+
+# Qualità JPEG del payload (EmbeddingGenerator.encode_llm_image)
+LLM_JPEG_QUALITY = 85
+
+# Risoluzione del campo 'used' (LRU): letture ravvicinate non riscrivono la riga
+_TOUCH_GRANULARITY = 60
+
+_RESAMPLING_NAMES = ('LANCZOS', 'BILINEAR', 'BICUBIC', 'NEAREST')
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class PayloadStore:
+    """Payload JPEG in una tabella SQLite con budget in byte ed eviction LRU."""
+
+    def __init__(self, db_path: Path, max_bytes: int):
+        self.db_path = Path(db_path)
+        self.max_bytes = max(1, int(max_bytes))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS payloads (
+                key TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_payloads_used ON payloads(used)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM payloads").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM payloads WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = int(time.time())
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, used FROM payloads WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > _TOUCH_GRANULARITY:
+                self._conn.execute("UPDATE payloads SET used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            return bytes(row[0])
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM payloads WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO payloads (key, data, size, used) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), len(data), int(time.time())))
+            self._total += len(data) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM payloads")
+            self._conn.commit()
+            self._total = 0
+
+    def _evict(self):
+        """Rimuove le voci meno usate fino al 90% del budget (evita eviction a ogni put)."""
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        rows = self._conn.execute("SELECT key, size FROM payloads ORDER BY used").fetchall()
+        victims = []
+        for key, size in rows:
+            if self._total <= target:
+                break
+            victims.append((key,))
+            self._total -= size
+            removed += 1
+        self._conn.executemany("DELETE FROM payloads WHERE key = ?", victims)
+        logger.debug(f"Cache payload LLM: {removed} voci rimosse (LRU), {self._total // 1024} KB in uso")
+
+
+def payload_cache_config(config: dict) -> dict:
+    """Sezione embedding.models.llm_vision.payload_cache ({} se assente)."""
+    llm_cfg = (config or {}).get('embedding', {}).get('models', {}).get('llm_vision', {}) or {}
+    return llm_cfg.get('payload_cache', {}) or {}
+
+
+def get_payload_store(config: dict) -> Optional[PayloadStore]:
+    """PayloadStore condiviso (creato al primo uso), None se disattivato o non apribile."""
+    global _store
+    cache_cfg = payload_cache_config(config)
+    if not cache_cfg.get('enabled', True):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    max_mb = int(cache_cfg.get('max_mb') or DEFAULT_MAX_MB)
+                except (TypeError, ValueError):
+                    max_mb = DEFAULT_MAX_MB
+                try:
+                    _store = PayloadStore(get_thumb_cache_dir() / STORE_FILENAME, max_mb * 1024 * 1024)
+                except Exception as e:
+                    logger.warning(f"Cache payload LLM non disponibile: {e}")
+                    _store = False
+    return _store or None
+
+
+def resampling_name(resampling) -> str:
+    """Nome del filtro PIL (enum o stringa di config) per la chiave."""
+    name = getattr(resampling, 'name', None) or str(resampling or 'LANCZOS')
+    name = name.upper()
+    return name if name in _RESAMPLING_NAMES else 'LANCZOS'
+
+
+def payload_key(file_hash: str, target_size: int, resampling) -> str:
+    return f"{file_hash}:{int(target_size)}:{resampling_name(resampling)}:{LLM_JPEG_QUALITY}"
+
+
+def encode_llm_payload(img, target_size: int, resampling) -> bytes:
+    """PIL → JPEG con lato lungo target_size (senza upscale), RGB o L."""
+    from PIL import Image
+
+    filt = getattr(Image.Resampling, resampling_name(resampling))
+    if max(img.size) > target_size:
+        img = img.copy()
+        img.thumbnail((target_size, target_size), filt)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    # Codifica JPEG direttamente in memoria (no file temporaneo su disco)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=LLM_JPEG_QUALITY)
+    return buf.getvalue()
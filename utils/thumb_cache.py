@@ -1,40 +1,295 @@
 """
 Cache locale per thumbnail gallery (150px JPEG).
 Popolata durante il processing, letta in gallery per evitare ExifTool.
+
+Prima: un file JPEG per foto in cache/thumbs/, nome = SHA256 del percorso
+risolto (un resolve() a ogni lettura), nessun limite di spazio e nessuna
+invalidazione se la foto veniva modificata.
+
+Ora: una tabella SQLite (WAL) in cache/thumbs.sqlite
+  - chiave = percorso come nel catalogo (images.filepath), validata con
+    dimensione e mtime del file: una foto modificata rigenera la thumbnail
+  - budget in byte (image_processing.thumb_cache.max_mb) con eviction LRU
+  - load_gallery_thumbs_many: una pagina di thumbnail con una sola query
+
+I JPEG della vecchia cache vengono importati una sola volta, in background
+all'apertura dello store (percorsi dal catalogo); poi la cartella
+cache/thumbs/ viene rimossa e le letture mancate non toccano più il disco.
 """
 import hashlib
 import logging
+import os
+import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Optional
-from utils.paths import get_app_dir
+from typing import Dict, Iterable, Optional, Tuple
+from utils.paths import get_app_dir, get_config_path
 
 logger = logging.getLogger(__name__)
 
 # Dimensione thumbnail gallery — deve corrispondere a ImageCard.THUMB_SIZE
 THUMB_CACHE_SIZE = 150
 
+DEFAULT_MAX_MB = 1024
+
+STORE_FILENAME = 'thumbs.sqlite'
+
+# Risoluzione del campo 'used' (LRU): letture ravvicinate non riscrivono la riga
+_TOUCH_GRANULARITY = 60
+
+# Parametri per query IN (...) — sotto il limite SQLite di 999
+_IN_CHUNK = 500
+
+_store = None
+_store_lock = threading.Lock()
+
+# Vecchia cache (un JPEG per foto): migrata una volta per processo, se la cartella esiste
+_legacy_started = False
+
 
 def get_thumb_cache_dir() -> Path:
-    """Directory cache thumbnail: {app_dir}/cache/thumbs/"""
-    cache_dir = get_app_dir() / "cache" / "thumbs"
+    """Directory cache: {app_dir}/cache/"""
+    cache_dir = get_app_dir() / "cache"
     cache_dir.mkdir(parents=True, exist_ok=True)
     return cache_dir
 
 
-def _cache_path(filepath: Path) -> Path:
-    """
-    Percorso file cache per un'immagine.
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(dimensione, mtime ns) del file, None se non accessibile."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ThumbStore:
+    """Thumbnail JPEG in una tabella SQLite con budget in byte ed eviction LRU."""
+
+    def __init__(self, db_path: Path, max_bytes: int):
+        self.db_path = Path(db_path)
+        self.max_bytes = max(1, int(max_bytes))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS thumbs (
+                path TEXT PRIMARY KEY,
+                file_size INTEGER,
+                mtime_ns INTEGER,
+                data BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                used INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_thumbs_used ON thumbs(used)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbs").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, bytes]:
+        """Thumbnail valide per i percorsi indicati (i mancanti non compaiono)."""
+        paths = list(dict.fromkeys(str(p) for p in paths))
+        rows = []
+        with self._lock:
+            for i in range(0, len(paths), _IN_CHUNK):
+                chunk = paths[i:i + _IN_CHUNK]
+                rows.extend(self._conn.execute(
+                    f"SELECT path, file_size, mtime_ns, data FROM thumbs "
+                    f"WHERE path IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+
+        found, stale = {}, []
+        for path, size, mtime_ns, data in rows:
+            sig = _file_signature(path)
+            # File non raggiungibile (disco scollegato): la thumbnail resta valida
+            if sig is not None and sig != (size, mtime_ns):
+                stale.append(path)
+                continue
+            found[path] = bytes(data)
+
+        now = int(time.time())
+        with self._lock:
+            if stale:
+                self._delete(stale)
+            found_paths = list(found)
+            for i in range(0, len(found_paths), _IN_CHUNK):
+                chunk = found_paths[i:i + _IN_CHUNK]
+                self._conn.execute(
+                    f"UPDATE thumbs SET used = ? WHERE used < ? AND path IN ({','.join('?' * len(chunk))})",
+                    [now, now - _TOUCH_GRANULARITY, *chunk])
+            self._conn.commit()
+        return found
+
+    def put(self, path: str, data: bytes, signature: Optional[Tuple[int, int]] = None):
+        """Salva la thumbnail; signature = (dimensione, mtime ns), letta dal file se None."""
+        path = str(path)
+        size, mtime_ns = signature or _file_signature(path) or (None, None)
+        with self._lock:
+            old = self._conn.execute("SELECT nbytes FROM thumbs WHERE path = ?", (path,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbs (path, file_size, mtime_ns, data, nbytes, used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, sqlite3.Binary(data), len(data), int(time.time())))
+            self._total += len(data) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM thumbs")
+            self._conn.commit()
+            self._total = 0
+
+    def _delete(self, paths):
+        for path in paths:
+            row = self._conn.execute("SELECT nbytes FROM thumbs WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM thumbs WHERE path = ?", (path,))
+                self._total -= row[0]
+
+    def _evict(self):
+        """Rimuove le meno usate fino al 90% del budget (evita eviction a ogni put)."""
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        while self._total > target:
+            rows = self._conn.execute(
+                "SELECT path, nbytes FROM thumbs ORDER BY used LIMIT 256").fetchall()
+            if not rows:
+                self._total = 0
+                break
+            for path, nbytes in rows:
+                if self._total <= target:
+                    break
+                self._conn.execute("DELETE FROM thumbs WHERE path = ?", (path,))
+                self._total -= nbytes
+                removed += 1
+        logger.debug(f"Cache thumbnail: {removed} voci rimosse (LRU), {self._total // 1024} KB in uso")
+
+
+def thumb_cache_config() -> dict:
+    """Sezione image_processing.thumb_cache del config ({} se assente o illeggibile)."""
+    try:
+        import yaml
+        with open(get_config_path(), 'r', encoding='utf-8') as f:
+            cfg = yaml.safe_load(f) or {}
+        return (cfg.get('image_processing', {}) or {}).get('thumb_cache', {}) or {}
+    except Exception:
+        return {}
+
+
+def _max_bytes_from_config() -> int:
+    try:
+        return int(thumb_cache_config().get('max_mb') or DEFAULT_MAX_MB) * 1024 * 1024
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_MB * 1024 * 1024
 
-    Chiave = SHA256(percorso_assoluto_completo) → univocità garantita.
-    Due file con lo stesso nome in directory diverse producono hash diversi:
-        /foto/2024/IMG_001.NEF → sha256("/foto/2024/IMG_001.NEF")[:24] → a3f8c2d9b1e4...jpg
-        /backup/IMG_001.NEF   → sha256("/backup/IMG_001.NEF")[:24]    → 7b2e4f8a1c3d...jpg
 
-    filepath.resolve() normalizza a percorso assoluto canonico (segue symlink).
-    Nessuna dipendenza dal nome file, nessun conflitto tra directory diverse.
+def get_thumb_store() -> ThumbStore:
+    """ThumbStore condiviso (creato al primo uso)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ThumbStore(get_thumb_cache_dir() / STORE_FILENAME, _max_bytes_from_config())
+                _start_legacy_migration(_store)
+    return _store
+
+
+def _legacy_dir() -> Path:
+    return get_app_dir() / "cache" / "thumbs"
+
+
+def _legacy_key(filepath: Path) -> str:
+    """Nome del JPEG nella vecchia cache: sha256(percorso risolto)[:24]"""
+    return hashlib.sha256(str(filepath.resolve()).encode()).hexdigest()[:24]
+
+
+def _catalog_filepaths():
+    """Percorsi delle foto nel catalogo (paths.database), None se non leggibile."""
+    try:
+        import yaml
+        with open(get_config_path(), 'r', encoding='utf-8') as f:
+            cfg = yaml.safe_load(f) or {}
+        db_path = Path((cfg.get('paths', {}) or {}).get('database') or 'database/offgallery.sqlite')
+        db_path = db_path if db_path.is_absolute() else get_app_dir() / db_path
+        if not db_path.exists():
+            return None
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return [fp for (fp,) in conn.execute(
+                "SELECT filepath FROM images WHERE filepath IS NOT NULL")]
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.debug(f"Catalogo non leggibile per la migrazione thumbnail: {e}")
+        return None
+
+
+def _start_legacy_migration(store: ThumbStore):
+    """Avvia (una volta per processo) l'import della vecchia cache, se presente."""
+    global _legacy_started
+    if _legacy_started:
+        return
+    _legacy_started = True
+    if _legacy_dir().is_dir():
+        threading.Thread(target=_migrate_legacy, args=(store,), daemon=True,
+                         name='thumb-legacy-import').start()
+
+
+def _migrate_legacy(store: ThumbStore):
+    """Importa nello store i JPEG della vecchia cache, poi rimuove cache/thumbs/.
+
+    I nomi dei file sono hash dei percorsi: si ricavano dal catalogo. I JPEG
+    senza foto corrispondente sono orfani e vengono eliminati con la cartella.
+    Se il catalogo non è leggibile la cartella resta e si riprova al prossimo avvio.
     """
-    key = hashlib.sha256(str(filepath.resolve()).encode()).hexdigest()[:24]
-    return get_thumb_cache_dir() / f"{key}.jpg"
+    import shutil
+    legacy_dir = _legacy_dir()
+    try:
+        legacy_keys = {f.stem for f in legacy_dir.glob('*.jpg')}
+        if legacy_keys:
+            filepaths = _catalog_filepaths()
+            if filepaths is None:
+                return
+            imported = 0
+            for fp in filepaths:
+                try:
+                    key = _legacy_key(Path(fp))
+                except OSError:
+                    continue
+                if key not in legacy_keys:
+                    continue
+                legacy_keys.discard(key)
+                if fp in store.get_many([fp]):
+                    continue   # già rigenerata nello store
+                try:
+                    store.put(fp, (legacy_dir / f"{key}.jpg").read_bytes())
+                    imported += 1
+                except OSError as e:
+                    logger.debug(f"Import thumbnail vecchia cache fallito per {fp}: {e}")
+            logger.info(f"Cache thumbnail: {imported} JPEG importati dalla vecchia cache")
+        shutil.rmtree(legacy_dir, ignore_errors=True)
+    except Exception as e:
+        logger.warning(f"Migrazione vecchia cache thumbnail interrotta: {e}")
+
+
+def encode_gallery_thumb(pil_image) -> bytes:
+    """JPEG della thumbnail gallery (lato lungo THUMB_CACHE_SIZE) da una PIL Image."""
+    from PIL import Image
+    import io
+    img = pil_image.copy()
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    img.thumbnail((THUMB_CACHE_SIZE, THUMB_CACHE_SIZE), Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, 'JPEG', quality=82, optimize=True)
+    return buf.getvalue()
 
 
 def save_gallery_thumb(filepath: Path, pil_image) -> bool:
@@ -43,41 +298,43 @@ def save_gallery_thumb(filepath: Path, pil_image) -> bool:
     Chiamato durante il processing dopo estrazione cached_thumbnail.
 
     Args:
-        filepath: Path assoluto del file originale (usato come chiave cache)
+        filepath: Path del file originale come nel catalogo (chiave cache)
         pil_image: PIL.Image già estratta dal processing (qualsiasi dimensione)
 
     Returns:
         True se salvato con successo, False altrimenti
     """
     try:
-        from PIL import Image
-        img = pil_image.copy()
-        if img.mode not in ('RGB', 'L'):
-            img = img.convert('RGB')
-        img.thumbnail((THUMB_CACHE_SIZE, THUMB_CACHE_SIZE), Image.Resampling.LANCZOS)
-        dest = _cache_path(filepath)
-        img.save(str(dest), 'JPEG', quality=82, optimize=True)
-        logger.debug(f"Thumbnail cache salvata: {filepath.name} → {dest.name}")
+        get_thumb_store().put(str(filepath), encode_gallery_thumb(pil_image))
+        logger.debug(f"Thumbnail cache salvata: {filepath.name}")
         return True
     except Exception as e:
         logger.warning(f"Impossibile salvare thumbnail cache per {filepath.name}: {e}")
         return False
 
 
+def load_gallery_thumbs_many(filepaths: Iterable[Path]) -> Dict[str, bytes]:
+    """
+    Legge in una sola query i bytes JPEG di più foto (una pagina di gallery).
+
+    Returns:
+        dict str(filepath) → bytes per le thumbnail in cache e ancora valide
+    """
+    try:
+        return get_thumb_store().get_many(str(p) for p in filepaths)
+    except Exception as e:
+        logger.debug(f"Cache thumbnail non disponibile: {e}")
+        return {}
+
+
 def load_gallery_thumb_bytes(filepath: Path) -> Optional[bytes]:
     """
-    Legge bytes JPEG dalla cache (veloce, ~5ms).
+    Legge bytes JPEG dalla cache.
 
     Args:
-        filepath: Path assoluto del file originale
+        filepath: Path del file originale come nel catalogo
 
     Returns:
-        bytes JPEG se in cache, None altrimenti (cache miss)
+        bytes JPEG se in cache, None altrimenti (cache miss o foto modificata)
     """
-    try:
-        dest = _cache_path(filepath)
-        if dest.exists():
-            return dest.read_bytes()
-    except Exception as e:
-        logger.debug(f"Cache miss o errore per {filepath.name}: {e}")
-    return None
+    return load_gallery_thumbs_many([filepath]).get(str(filepath))
@@ -0,0 +1,248 @@
+"""
+Servizio thumbnail gallery per le foto non ancora in cache.
+
+Prima ogni miss diventava un _ThumbnailLoader sul QThreadPool globale: per
+un RAW un processo exiftool -b -PreviewImage, per gli altri formati la
+lettura dell'intero file per ricavarne 150px. Scorrere una cartella appena
+importata da un altro computer lanciava centinaia di processi Perl.
+
+Ora:
+  - pool dedicato di pochi thread (image_processing.thumb_cache.workers)
+  - RAW: anteprima embedded con rawpy.extract_thumb nel processo,
+    exiftool solo se LibRaw non la trova o rawpy manca
+  - JPEG: Image.draft() decodifica direttamente a 1/2..1/8 (scaling DCT)
+  - coda a priorità: prima le righe visibili, poi il prefetch della
+    schermata successiva; cancel() toglie le richieste delle righe uscite
+    dal viewport prima che un worker le prenda
+
+Le thumbnail prodotte finiscono nello ThumbStore: la volta dopo sono hit.
+"""
+import heapq
+import io
+import itertools
+import logging
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils.subprocess_utils import subprocess_creation_kwargs
+from utils.thumb_cache import (
+    THUMB_CACHE_SIZE, encode_gallery_thumb, get_thumb_store, thumb_cache_config
+)
+
+logger = logging.getLogger(__name__)
+
+RAW_EXTENSIONS = {'.cr2', '.cr3', '.nef', '.arw', '.orf', '.rw2',
+                  '.pef', '.dng', '.nrw', '.srf', '.sr2'}
+
+DEFAULT_WORKERS = 3
+
+# Priorità in coda (valore più basso = prima)
+PRIORITY_VISIBLE = 0
+PRIORITY_BACKGROUND = 1
+
+_service = None
+_service_lock = threading.Lock()
+
+
+# ── Estrazione ───────────────────────────────────────────────────────
+
+def _open_reduced(data_or_path):
+    """PIL Image con decodifica ridotta (draft) se il formato la supporta (JPEG)."""
+    from PIL import Image
+    source = io.BytesIO(data_or_path) if isinstance(data_or_path, bytes) else str(data_or_path)
+    img = Image.open(source)
+    img.draft('RGB', (THUMB_CACHE_SIZE, THUMB_CACHE_SIZE))
+    img.load()
+    return img
+
+
+def _raw_preview(filepath: Path):
+    """Anteprima embedded del RAW via LibRaw; None se assente o non supportata."""
+    try:
+        import rawpy
+    except ImportError:
+        return None
+    try:
+        with rawpy.imread(str(filepath)) as raw:
+            thumb = raw.extract_thumb()
+        if thumb.format == rawpy.ThumbFormat.JPEG:
+            return _open_reduced(bytes(thumb.data))
+        if thumb.format == rawpy.ThumbFormat.BITMAP:
+            from PIL import Image
+            return Image.fromarray(thumb.data)
+    except Exception as e:
+        # LibRawNoThumbnailError, formato non supportato, file illeggibile
+        logger.debug(f"rawpy extract_thumb {filepath.name}: {e}")
+    return None
+
+
+def _exiftool_preview(filepath: Path):
+    """Fallback RAW: PreviewImage via exiftool (un processo per file)."""
+    try:
+        result = subprocess.run(
+            ['exiftool', '-b', '-PreviewImage', str(filepath)],
+            capture_output=True, timeout=10,
+            **subprocess_creation_kwargs()
+        )
+        if result.returncode == 0 and result.stdout:
+            return _open_reduced(result.stdout)
+    except Exception as e:
+        logger.debug(f"exiftool PreviewImage {filepath.name}: {e}")
+    return None
+
+
+def make_gallery_thumb(filepath: Path) -> Optional[bytes]:
+    """
+    Thumbnail gallery dal file originale, salvata nello ThumbStore.
+
+    Returns:
+        bytes JPEG (lato lungo THUMB_CACHE_SIZE); per formati che PIL non
+        apre, i bytes originali (li decodifica Qt, non vanno in cache);
+        None se il file non è leggibile.
+    """
+    filepath = Path(filepath)
+    if filepath.suffix.lower() in RAW_EXTENSIONS:
+        img = _raw_preview(filepath) or _exiftool_preview(filepath)
+    else:
+        try:
+            img = _open_reduced(filepath)
+        except Exception as e:
+            logger.debug(f"Thumbnail PIL {filepath.name}: {e}")
+            try:
+                return filepath.read_bytes()
+            except OSError:
+                return None
+    if img is None:
+        return None
+
+    data = encode_gallery_thumb(img)
+    try:
+        get_thumb_store().put(str(filepath), data)
+    except Exception as e:
+        logger.warning(f"Cache write fallita per {filepath.name}: {e}")
+    return data
+
+
+# ── Coda e worker ────────────────────────────────────────────────────
+
+class _Request:
+    __slots__ = ('path', 'callbacks', 'priority', 'seq')
+
+    def __init__(self, path: Path, callback, priority: int, seq: int):
+        self.path = path
+        self.callbacks: List[Callable] = [callback]
+        self.priority = priority
+        self.seq = seq
+
+
+class ThumbService:
+    """Pool di worker con coda a priorità per le thumbnail mancanti.
+
+    I callback ricevono bytes o None e sono chiamati dal thread worker:
+    lato GUI vanno inoltrati con un segnale Qt.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(1, int(workers))
+        self._cond = threading.Condition()
+        self._heap = []                                 # (priorità, seq, chiave)
+        self._queued: Dict[str, _Request] = {}
+        self._running: Dict[str, _Request] = {}
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+
+    def request(self, filepath, callback: Callable[[Optional[bytes]], None],
+                priority: int = PRIORITY_VISIBLE):
+        """Accoda la thumbnail; richieste per lo stesso file condividono l'estrazione."""
+        key = str(filepath)
+        with self._cond:
+            req = self._running.get(key) or self._queued.get(key)
+            if req is not None:
+                req.callbacks.append(callback)
+                if key in self._queued and priority < req.priority:
+                    self._push(key, req, priority)
+                return
+            req = _Request(Path(filepath), callback, priority, 0)
+            self._queued[key] = req
+            self._push(key, req, priority)
+            self._ensure_workers()
+            self._cond.notify()
+
+    def prioritize(self, filepaths: Iterable):
+        """Porta in testa le richieste in coda dei file indicati (righe visibili)."""
+        with self._cond:
+            for filepath in filepaths:
+                key = str(filepath)
+                req = self._queued.get(key)
+                if req is not None and req.priority > PRIORITY_VISIBLE:
+                    self._push(key, req, PRIORITY_VISIBLE)
+
+    def cancel(self, filepath) -> bool:
+        """Toglie la richiesta se non è ancora partita (i callback non verranno chiamati)."""
+        with self._cond:
+            return self._queued.pop(str(filepath), None) is not None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queued) + len(self._running)
+
+    # ── Interni ──────────────────────────────────────────────────────
+
+    def _push(self, key: str, req: _Request, priority: int):
+        # Le voci superate restano nell'heap e vengono scartate al pop (seq diverso)
+        req.priority = priority
+        req.seq = next(self._seq)
+        heapq.heappush(self._heap, (priority, req.seq, key))
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"thumb-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next(self) -> _Request:
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                _, seq, key = heapq.heappop(self._heap)
+                req = self._queued.get(key)
+                if req is not None and req.seq == seq:
+                    del self._queued[key]
+                    self._running[key] = req
+                    return req
+
+    def _worker(self):
+        while True:
+            req = self._next()
+            key = str(req.path)
+            try:
+                data = make_gallery_thumb(req.path)
+            except Exception as e:
+                logger.debug(f"Thumbnail {req.path.name}: {e}")
+                data = None
+            with self._cond:
+                self._running.pop(key, None)
+                callbacks = list(req.callbacks)
+            for callback in callbacks:
+                try:
+                    callback(data)
+                except Exception as e:
+                    logger.debug(f"Callback thumbnail {req.path.name}: {e}")
+
+
+def get_thumb_service() -> ThumbService:
+    """ThumbService condiviso; worker da image_processing.thumb_cache.workers."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                try:
+                    workers = int(thumb_cache_config().get('workers') or DEFAULT_WORKERS)
+                except (TypeError, ValueError):
+                    workers = DEFAULT_WORKERS
+                _service = ThumbService(workers)
+    return _service
@@ -2,6 +2,10 @@
 XMP Badge Manager - Gestore centralizzato per refresh badge XMP
 Gestisce il ricalcolo e aggiornamento dei badge XMP in background
 preservando la logica esistente in refresh_xmp_state()
+
+Il worker elabora la coda a pagine: lo stato salvato nel catalogo
+(xmp_sync_cache) vale se mtime di file e sidecar e campi DB non sono
+cambiati; le sole card rimanenti vengono lette con un batch ExifTool.
 """
 
 import logging
@@ -16,12 +20,16 @@ class XMPBadgeWorker(QObject):
     """Worker per calcolo badge XMP in background thread"""
     badge_computed = pyqtSignal(object, str)  # (ImageCard, reason)
     batch_completed = pyqtSignal(int, str)    # (processed_count, reason)
-    
+
+    # Card per pagina: una query di lookup e un batch ExifTool ciascuna
+    PAGE_SIZE = 48
+
     def __init__(self):
         super().__init__()
         self.queue = []
         self.processing = False
         self.mutex = QMutex()
+        self._sync_cache = None
         
     def clear_queue(self):
         """Svuota la coda (thread-safe). Chiamare prima di ogni nuovo batch gallery."""
@@ -53,7 +61,7 @@ class XMPBadgeWorker(QObject):
         Calcola stato XMP nel worker thread (I/O disco, nessun widget Qt).
         Pre-popola la cache sulla card, poi emette il signal al main thread.
         Il main thread trova la cache pronta → aggiorna solo l'UI (~1ms, nessun blocco).
-        Invocato nel worker thread tramite QTimer.singleShot 3-arg: non blocca il main thread.
+        Invocato nel worker thread tramite QMetaObject.invokeMethod: non blocca il main thread.
         """
         self.processing = True
         processed = 0
@@ -72,30 +80,12 @@ class XMPBadgeWorker(QObject):
                 with QMutexLocker(self.mutex):
                     if not self.queue:
                         break
-                    card, reason = self.queue.pop(0)
-                    current_reason = reason
+                    page = self.queue[:self.PAGE_SIZE]
+                    del self.queue[:self.PAGE_SIZE]
+                    current_reason = page[-1][1]
 
                 try:
-                    filename = getattr(card, 'image_data', {}).get('filename', 'unknown')
-                    logger.debug(f"🔄 XMP analisi: {filename}")
-
-                    # Lettura disco nel worker thread (sicuro, non tocca Qt)
-                    if xmp_manager and getattr(card, 'filepath', None):
-                        from pathlib import Path
-                        state, info = xmp_manager.analyze_xmp_sync_state(
-                            Path(card.filepath), card.image_data
-                        )
-                        if state is not None and info is not None:
-                            # Pre-popola cache: il main thread userà questi valori
-                            # senza ulteriore disk I/O
-                            card._xmp_state_cache = state
-                            card._xmp_info_cache = info
-
-                    # Segnala al main thread di aggiornare l'UI con la cache pronta.
-                    # Connessione queued (cross-thread) → main thread la processa tra gli eventi scroll.
-                    self.badge_computed.emit(card, reason)
-                    processed += 1
-
+                    processed += self._process_page(page, xmp_manager)
                 except Exception as e:
                     logger.error(f"❌ Errore calcolo badge XMP: {e}")
                     continue
@@ -107,6 +97,97 @@ class XMPBadgeWorker(QObject):
             self.batch_completed.emit(processed, current_reason)
             logger.info(f"✅ XMP Worker: completato batch {processed} badges - reason: {current_reason}")
 
+    def _process_page(self, page, xmp_manager) -> int:
+        """
+        Una pagina di card: stato dal catalogo se la chiave (mtime file/sidecar,
+        stile sidecar, campi DB) coincide, altrimenti analisi con letture
+        ExifTool raccolte in un solo batch. Ritorna il numero di card emesse.
+        """
+        if xmp_manager is None:
+            for card, reason in page:
+                self.badge_computed.emit(card, reason)
+            return len(page)
+
+        from xmp_manager_extended import XMPSyncState
+        from xmp_sync_cache import sync_key
+
+        cache = self._get_sync_cache()
+        entries = []
+        for card, reason in page:
+            filepath = getattr(card, 'filepath', None)
+            if not filepath:
+                entries.append((card, reason, None, None, None))
+                continue
+            filepath = Path(filepath)
+            key, xmp_mtime = sync_key(
+                filepath, xmp_manager.existing_sidecar(filepath), xmp_manager.sidecar_style,
+                xmp_manager._get_db_payload(card.image_data)
+            )
+            entries.append((card, reason, filepath, key, xmp_mtime))
+
+        saved = cache.lookup(card.image_data.get('id') for card, *_ in entries) if cache else {}
+
+        emitted = 0
+        to_analyze = []
+        for card, reason, filepath, key, xmp_mtime in entries:
+            stored = saved.get(card.image_data.get('id')) if filepath else None
+            if stored and stored.get('key') == key:
+                try:
+                    # Pre-popola cache: il main thread userà questi valori
+                    # senza ulteriore disk I/O
+                    card._xmp_state_cache = XMPSyncState(stored['state'])
+                    card._xmp_info_cache = stored.get('info') or {}
+                except (KeyError, ValueError):
+                    to_analyze.append((card, reason, filepath, key, xmp_mtime))
+                    continue
+            elif filepath:
+                to_analyze.append((card, reason, filepath, key, xmp_mtime))
+                continue
+            # Segnala al main thread di aggiornare l'UI con la cache pronta.
+            # Connessione queued (cross-thread) → main thread la processa tra gli eventi scroll.
+            self.badge_computed.emit(card, reason)
+            emitted += 1
+
+        if not to_analyze:
+            return emitted
+
+        # Sidecar ed embedded di tutta la pagina in un batch ExifTool
+        xmp_manager.prefetch_sync_sources([filepath for _, _, filepath, _, _ in to_analyze])
+        results = []
+        try:
+            for card, reason, filepath, key, xmp_mtime in to_analyze:
+                logger.debug(f"🔄 XMP analisi: {card.image_data.get('filename', 'unknown')}")
+                state, info = xmp_manager.analyze_xmp_sync_state(filepath, card.image_data)
+                if state is not None and info is not None:
+                    card._xmp_state_cache = state
+                    card._xmp_info_cache = info
+                    if state != XMPSyncState.ERROR:
+                        results.append((card.image_data.get('id'), key, state.value, info, xmp_mtime))
+                self.badge_computed.emit(card, reason)
+                emitted += 1
+        finally:
+            xmp_manager.clear_prefetch()
+
+        if cache and results:
+            cache.store(results)
+        return emitted
+
+    def _get_sync_cache(self):
+        """XMPSyncCache sul catalogo del config (None se il percorso non è noto)."""
+        if self._sync_cache is None:
+            try:
+                import yaml
+                from utils.paths import get_config_path
+                from xmp_sync_cache import XMPSyncCache
+                with open(get_config_path(), 'r', encoding='utf-8') as f:
+                    db_path = (yaml.safe_load(f) or {}).get('paths', {}).get('database', '')
+                # False: catalogo non trovato, non si riprova a ogni pagina
+                self._sync_cache = XMPSyncCache(db_path) if db_path and Path(db_path).exists() else False
+            except Exception as e:
+                logger.debug(f"Cache stato XMP non disponibile: {e}")
+                self._sync_cache = False
+        return self._sync_cache or None
+
 
 class XMPBadgeManager(QObject):
     """Gestore centralizzato per refresh badge XMP"""
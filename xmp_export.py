@@ -0,0 +1,480 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+XMP Export - Scrittura XMP sidecar/embedded in batch su ExifTool stay_open.
+
+Prima ExportTab._write_xmp_sidecar / _write_xmp_embedded lanciavano per ogni
+foto fino a quattro processi ExifTool (Title/Description/Rating/Label,
+Subject e HierarchicalSubject esistenti, poi la scrittura), nel thread GUI
+dietro un QProgressDialog: 20k foto = decine di migliaia di avvii Perl.
+
+Qui:
+  - letture dei valori esistenti (flag preserva/unisci) per blocchi di
+    READ_CHUNK file con un solo -execute sul pool get_exiftool()
+  - scritture: un blocco -execute per file su `writers` processi
+    stay_open dedicati (stderr unito: gli errori restano per file)
+  - un file di destinazione già nel blocco corrente (es. IMG_1.CR2 e
+    IMG_1.JPG → IMG_1.xmp in directory unica) passa al blocco successivo,
+    che lo rilegge dopo la scrittura precedente come faceva il ciclo seriale
+  - cancel() tra un file e l'altro; ogni foto produce un ExportResult
+
+Modulo senza dipendenze PyQt.
+"""
+
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITERS = 2
+
+# File per lettura batch dei valori esistenti (e per blocco di scritture)
+READ_CHUNK = 64
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_SKIPPED = 'skipped'
+
+# Valori letti da sidecar/file per i flag preserva e unisci
+_EXISTING_READ_ARGS = (
+    '-json',
+    '-XMP-dc:Title', '-XMP-dc:Description',
+    '-XMP-xmp:Rating', '-XMP-xmp:Label',
+    '-XMP-dc:Subject', '-XMP-lr:HierarchicalSubject',
+)
+
+_EMBEDDED_EXTENSIONS = ('.jpg', '.jpeg', '.tif', '.tiff', '.dng')
+_RAW_EXTENSIONS = ('.cr2', '.nef', '.arw', '.raf', '.orf', '.rw2', '.cr3', '.rwl', '.srw',
+                   '.pef', '.3fr', '.fff', '.iiq', '.mos', '.mrw', '.x3f')
+
+_SUMMARY_RE = re.compile(r"(\d+) image files? (updated|created|unchanged)")
+
+
+class ExportResult:
+    """Esito di una scrittura XMP (una foto, un tipo)."""
+
+    __slots__ = ('filepath', 'kind', 'status', 'target', 'message')
+
+    def __init__(self, filepath: str, kind: str, status: str,
+                 target: Optional[str] = None, message: str = ''):
+        self.filepath = filepath
+        self.kind = kind          # 'sidecar' | 'embedded' | 'source' (file mancante)
+        self.status = status      # STATUS_OK | STATUS_FAILED | STATUS_SKIPPED
+        self.target = target
+        self.message = message
+
+
+def file_capabilities(filepath) -> Dict[str, Any]:
+    """Capacità di scrittura metadata per tipo file."""
+    ext = Path(filepath).suffix.lower()
+    return {
+        'can_embedded': ext in _EMBEDDED_EXTENSIONS,
+        'is_raw': ext in _RAW_EXTENSIONS,
+        'is_dng': ext == '.dng',
+        'extension': ext,
+    }
+
+
+def parse_tags(tags_data) -> List[str]:
+    """Tag unificati dal DB (JSON, stringa separata da virgole o lista) → lista."""
+    if not tags_data:
+        return []
+    try:
+        if isinstance(tags_data, str):
+            # BUGFIX: Gestisci stringhe mal formattate da versioni precedenti
+            if tags_data.startswith('[') and not tags_data.startswith('["'):
+                # Stringa tipo "[tag1, tag2]" invece di JSON corretto
+                clean_str = tags_data.strip('[]')
+                return [tag.strip(' "\'') for tag in clean_str.split(',') if tag.strip()]
+            return json.loads(tags_data)
+        elif isinstance(tags_data, list):
+            return tags_data
+        return []
+    except Exception as e:
+        logger.debug(f"Parsing tags fallito ({e!r}), uso fallback stringa")
+        if isinstance(tags_data, str):
+            clean_str = tags_data.strip('[]')
+            return [tag.strip(' "\'') for tag in clean_str.split(',') if tag.strip()]
+        return []
+
+
+def _unique_ci(values: Iterable[str]) -> List[str]:
+    """Deduplica case-insensitive mantenendo il primo e l'ordine."""
+    seen, out = set(), []
+    for v in values:
+        if v.lower() not in seen:
+            seen.add(v.lower())
+            out.append(v)
+    return out
+
+
+def _lang_alt(raw) -> str:
+    if isinstance(raw, dict):
+        raw = raw.get('x-default', '') or next(iter(raw.values()), '')
+    return str(raw).strip() if raw else ''
+
+
+def _as_list(raw) -> List[str]:
+    if raw is None:
+        return []
+    if not isinstance(raw, list):
+        raw = [raw]
+    return [str(v) for v in raw]
+
+
+def parse_existing(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Oggetto JSON ExifTool → {title, description, rating, color_label, keywords, hierarchical}."""
+    existing = {
+        'title': _lang_alt(data.get('Title', '')),
+        'description': _lang_alt(data.get('Description', '')),
+        'color_label': str(data.get('Label') or '').strip(),
+        'hierarchical': _as_list(data.get('HierarchicalSubject')),
+    }
+    rating_raw = data.get('Rating')
+    if rating_raw is not None:
+        try:
+            existing['rating'] = int(rating_raw)
+        except (ValueError, TypeError):
+            pass
+    # Keywords malformati (con pipe) scartati: sono rami gerarchici finiti in dc:Subject
+    keywords = []
+    for kw in _as_list(data.get('Subject')):
+        if '|' in kw:
+            logger.warning("Scartato keyword malformato: %s", kw)
+        elif kw.strip():
+            keywords.append(kw.strip())
+    existing['keywords'] = keywords
+    return existing
+
+
+def read_existing(paths: List[Path]) -> Dict[str, Dict[str, Any]]:
+    """Valori XMP esistenti di più file con un -execute (chiave _source_key)."""
+    if not paths:
+        return {}
+    from raw_processor import get_exiftool, _source_key
+    found = {}
+    try:
+        for data in get_exiftool().execute_json_batch(paths, *_EXISTING_READ_ARGS):
+            src = data.get('SourceFile') if isinstance(data, dict) else None
+            if src:
+                found[_source_key(src)] = parse_existing(data)
+    except Exception as e:
+        logger.warning(f"Lettura XMP esistenti in batch fallita: {e}")
+    return found
+
+
+def sidecar_target(image_file: Path, options: dict) -> Optional[Path]:
+    """Percorso del sidecar in base a naming e destinazione (None = directory mancante)."""
+    naming = options['format'].get('sidecar_naming', 'lightroom')
+    if options['path']['original']:
+        base_dir = image_file.parent
+    else:
+        single_dir = options['path']['single_dir']
+        if not single_dir:
+            return None
+        base_dir = Path(single_dir)
+    if naming == 'darktable':
+        return base_dir / (image_file.name + '.xmp')
+    return base_dir / f"{image_file.stem}.xmp"
+
+
+def build_write_args(image_data: Dict[str, Any], existing: Dict[str, Any],
+                     options: dict, sidecar: bool) -> List[str]:
+    """Argomenti ExifTool di scrittura per una foto (senza il file di destinazione).
+
+    existing: valori già presenti nella destinazione ({} se non esiste).
+    """
+    adv = options['advanced']
+    do_merge_kw          = adv.get('xmp_merge_keywords', True)
+    do_overwrite_ai_tags = adv.get('xmp_overwrite_ai_tags', False)
+    do_pres_title        = adv.get('xmp_preserve_title', True)
+    do_pres_desc         = adv.get('xmp_preserve_description', True)
+    do_pres_rate         = adv.get('xmp_preserve_rating', True)
+    do_pres_color        = adv.get('xmp_preserve_color_label', True)
+
+    args = ['-overwrite_original']
+    if sidecar:
+        args += ['-api', 'Compact=OneDesc']
+
+    # KEYWORDS — merge=ON: keywords già presenti + quelli DB; merge=OFF: sostituzione.
+    # Azzera e riscrivi in un colpo solo (evita duplicati da += su valori preesistenti)
+    keywords = _unique_ci(str(k) for k in parse_tags(image_data.get('tags', '')) if k)
+    if do_merge_kw:
+        keywords = _unique_ci(list(dict.fromkeys(existing.get('keywords', []))) + keywords)
+    args.append("-XMP-dc:Subject=")
+    for kw in keywords:
+        args.append(f"-XMP-dc:Subject+={kw}")
+
+    # TITLE
+    title = image_data.get('title', '') or ''
+    if not title:
+        title = (image_data.get('filename', '') or '').split('.')[0]
+    if title and (not do_pres_title or not existing.get('title')):
+        args.append(f"-XMP-dc:Title={title}")
+
+    # DESCRIPTION
+    description = image_data.get('description', '')
+    if description:
+        description = description.replace("x-default ", "").strip()
+        if not do_pres_desc or not existing.get('description'):
+            args.append(f"-XMP-dc:Description={description}")
+
+    # RATING (XMP-xmp:Rating)
+    rating = image_data.get('lr_rating') or image_data.get('rating')
+    if rating is not None:
+        try:
+            rating_int = int(rating)
+            if 1 <= rating_int <= 5 and (not do_pres_rate or existing.get('rating') is None):
+                args.append(f"-XMP-xmp:Rating={rating_int}")
+        except (ValueError, TypeError):
+            pass
+
+    # COLOR LABEL (XMP-xmp:Label — standard Adobe/Lightroom)
+    color_label = image_data.get('color_label', '') or ''
+    if color_label and (not do_pres_color or not existing.get('color_label')):
+        args.append(f"-XMP-xmp:Label={color_label}")
+
+    # HIERARCHICALSUBJECT: tre rami AI|Taxonomy (BioCLIP), GeOFF| (geo), AI|Tags| (LLM).
+    # Degli esistenti si tolgono solo i rami che verranno riscritti; un solo "="
+    # seguito da tutti i += (due "=" nella stessa scrittura azzererebbero il ramo precedente)
+    bioclip_taxonomy_raw = image_data.get('bioclip_taxonomy', '')
+    geo_hierarchy = image_data.get('geo_hierarchy', '')
+    llm_tags_raw = image_data.get('llm_tags', '')
+
+    bioclip_hier_path = None
+    if bioclip_taxonomy_raw:
+        try:
+            from embedding_generator import EmbeddingGenerator
+            taxonomy = json.loads(bioclip_taxonomy_raw) if isinstance(bioclip_taxonomy_raw, str) else bioclip_taxonomy_raw
+            if taxonomy and isinstance(taxonomy, list):
+                bioclip_hier_path = EmbeddingGenerator.build_hierarchical_taxonomy(taxonomy, prefix="AI|Taxonomy")
+        except Exception as e:
+            logger.warning(f"Errore build tassonomia BioCLIP export: {e}")
+
+    llm_hier_paths = []
+    if llm_tags_raw:
+        try:
+            llm_list = json.loads(llm_tags_raw) if isinstance(llm_tags_raw, str) else llm_tags_raw
+            if isinstance(llm_list, list):
+                llm_hier_paths = [f"AI|Tags|{t}" for t in llm_list if t and str(t).strip()]
+        except Exception:
+            pass
+
+    if bioclip_hier_path or geo_hierarchy or llm_hier_paths:
+        kept = [
+            s for s in existing.get('hierarchical', [])
+            if not (bioclip_hier_path and s.startswith('AI|Taxonomy'))
+            and not (geo_hierarchy and s.startswith('GeOFF|'))
+            and not (do_overwrite_ai_tags and llm_hier_paths and s.startswith('AI|Tags|'))
+        ]
+        args.append("-XMP-lr:HierarchicalSubject=")
+        for subject in kept:
+            args.append(f"-XMP-lr:HierarchicalSubject+={subject}")
+        if bioclip_hier_path:
+            args.append(f"-XMP-lr:HierarchicalSubject+={bioclip_hier_path}")
+        if geo_hierarchy:
+            args.append(f"-XMP-lr:HierarchicalSubject+={geo_hierarchy}")
+        for llm_path in llm_hier_paths:
+            args.append(f"-XMP-lr:HierarchicalSubject+={llm_path}")
+
+    return _escape_multiline(args)
+
+
+def _escape_multiline(args: List[str]) -> List[str]:
+    """Nel flusso -@ ogni riga è un argomento: con valori su più righe usa -ec
+    (sequenze C nei valori) ed escape di backslash e a capo."""
+    if not any('\n' in a or '\r' in a for a in args):
+        return args
+    escaped = ['-ec']
+    for a in args:
+        if a.startswith('-XMP') and '=' in a:
+            tag, value = a.split('=', 1)
+            value = value.replace('\\', '\\\\').replace('\r', '\\r').replace('\n', '\\n')
+            a = f"{tag}={value}"
+        escaped.append(a)
+    return escaped
+
+
+def parse_write_output(text: Optional[str]) -> Tuple[bool, str]:
+    """(riuscito, messaggio) dall'output di una scrittura ExifTool."""
+    if text is None:
+        return False, "ExifTool non disponibile o interrotto"
+    errors = [line.strip() for line in text.splitlines() if line.strip().startswith('Error')]
+    done = any(int(m.group(1)) > 0 for m in _SUMMARY_RE.finditer(text))
+    if done and not errors:
+        return True, ''
+    return False, '; '.join(errors) or text.strip() or "nessun file aggiornato"
+
+
+class XMPExportEngine:
+    """
+    Export XMP di una lista di foto (dict image_data) con ExifTool stay_open.
+
+    Args:
+        options: opzioni di ExportTab.get_export_options()
+        writers: processi ExifTool di scrittura in parallelo
+    """
+
+    def __init__(self, options: dict, writers: int = DEFAULT_WRITERS):
+        self.options = options
+        self.writers = max(1, int(writers))
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def canceled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self, items: List[Dict[str, Any]],
+            progress: Optional[Callable[[int, str], None]] = None) -> List[ExportResult]:
+        """Esporta gli item; progress(foto concluse, filename) dopo ogni foto.
+
+        Le foto non elaborate per annullamento non compaiono nei risultati.
+        """
+        from raw_processor import ExifToolStayOpen
+
+        fmt = self.options['format']
+        if fmt.get('sidecar') and not self.options['path']['original']:
+            single_dir = self.options['path']['single_dir']
+            if single_dir:
+                Path(single_dir).mkdir(parents=True, exist_ok=True)
+
+        procs: "queue.Queue[ExifToolStayOpen]" = queue.Queue()
+        all_procs = [ExifToolStayOpen(merge_stderr=True) for _ in range(self.writers)]
+        for et in all_procs:
+            procs.put(et)
+
+        results: List[ExportResult] = []
+        done = 0
+        pending = list(items)
+        try:
+            with ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix='xmp-export') as pool:
+                while pending and not self.canceled:
+                    chunk, pending = self._take_chunk(pending)
+                    for image_data, chunk_results in self._run_chunk(chunk, pool, procs):
+                        results.extend(chunk_results)
+                        done += 1
+                        if progress is not None:
+                            progress(done, image_data.get('filename', ''))
+        finally:
+            for et in all_procs:
+                et.close()
+        return results
+
+    # ── Interni ──────────────────────────────────────────────────────
+
+    def _targets(self, image_data: Dict[str, Any]) -> List[Tuple[str, Optional[Path]]]:
+        """(tipo, destinazione) da scrivere per una foto; destinazione None = saltata."""
+        fmt = self.options['format']
+        source = Path(image_data.get('filepath', ''))
+        targets = []
+        if fmt.get('sidecar'):
+            targets.append(('sidecar', sidecar_target(source, self.options)))
+        if fmt.get('embedded'):
+            caps = file_capabilities(source)
+            skip = ((caps['is_raw'] and not caps['is_dng'])
+                    or (caps['is_dng'] and not fmt.get('dng_allow_embedded'))
+                    or not caps['can_embedded'])
+            targets.append(('embedded', None if skip else source))
+        return targets
+
+    def _take_chunk(self, items):
+        """Fino a READ_CHUNK foto senza destinazioni ripetute; le altre restano in coda."""
+        chunk, rest, seen = [], [], set()
+        from raw_processor import _source_key
+        for image_data in items:
+            if len(chunk) >= READ_CHUNK:
+                rest.append(image_data)
+                continue
+            keys = {_source_key(t) for _, t in self._targets(image_data) if t is not None}
+            if keys & seen:
+                rest.append(image_data)
+                continue
+            seen |= keys
+            chunk.append(image_data)
+        return chunk, rest
+
+    def _run_chunk(self, chunk, pool, procs):
+        """Lettura batch degli esistenti, poi scritture in parallelo; genera (foto, risultati)."""
+        from raw_processor import _source_key
+
+        # Esistenti: sidecar già presenti e file per l'embedded, un solo -execute
+        to_read = []
+        for image_data in chunk:
+            for _, target in self._targets(image_data):
+                if target is not None and target.exists():
+                    to_read.append(target)
+        existing = read_existing(to_read)
+
+        futures = []
+        for image_data in chunk:
+            source = Path(image_data.get('filepath', ''))
+            if not source.exists():
+                logger.warning(f"File non esiste: {source}")
+                futures.append((image_data, None, [ExportResult(
+                    str(source), 'source', STATUS_FAILED, message="file non trovato")]))
+                continue
+            jobs, immediate = [], []
+            for kind, target in self._targets(image_data):
+                if target is None:
+                    if kind == 'sidecar':
+                        logger.error("Directory unica non specificata per %s", source.name)
+                        immediate.append(ExportResult(str(source), kind, STATUS_FAILED,
+                                                      message="directory di output mancante"))
+                    else:
+                        immediate.append(ExportResult(str(source), kind, STATUS_SKIPPED,
+                                                      message="embedded non supportato"))
+                    continue
+                args = build_write_args(image_data, existing.get(_source_key(target), {}),
+                                        self.options, sidecar=(kind == 'sidecar'))
+                jobs.append((kind, target, args))
+            future = pool.submit(self._write_photo, source, jobs, procs) if jobs else None
+            futures.append((image_data, future, immediate))
+
+        for image_data, future, immediate in futures:
+            photo_results = list(immediate)
+            if future is not None:
+                photo_results.extend(future.result())
+            yield image_data, photo_results
+
+    def _write_photo(self, source: Path, jobs, procs) -> List[ExportResult]:
+        if self.canceled:
+            return []
+        et = procs.get()
+        try:
+            results = []
+            for kind, target, args in jobs:
+                ok, message = parse_write_output(et.execute_text(*args, str(target)))
+                if not ok:
+                    logger.error(f"ExifTool {kind} errore per {source.name}: {message}")
+                results.append(ExportResult(str(source), kind,
+                                            STATUS_OK if ok else STATUS_FAILED,
+                                            str(target), message))
+            return results
+        finally:
+            procs.put(et)
+
+
+def mark_synced(db_path, filepaths: Iterable[str]):
+    """sync_state = PERFECT_SYNC per i sidecar scritti, in una transazione."""
+    rows = [(fp,) for fp in filepaths]
+    if not rows:
+        return
+    try:
+        conn = sqlite3.connect(str(db_path), timeout=10)
+        try:
+            conn.executemany("UPDATE images SET sync_state = 'PERFECT_SYNC' WHERE filepath = ?", rows)
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error("Errore aggiornamento sync_state: %s", e, exc_info=True)
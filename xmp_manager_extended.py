@@ -60,6 +60,10 @@ class XMPManagerExtended:
                            '.raf', '.rw2', '.raw', '.pef', '.ptx', '.rwl', '.3fr', '.iiq', '.x3f']
         self.standard_formats = ['.jpg', '.jpeg', '.tiff', '.tif', '.png']
 
+        # JSON ExifTool letti in batch da prefetch_sync_sources (chiave: _source_key)
+        self._embedded_prefetch: Dict[str, Dict[str, Any]] = {}
+        self._raw_processor = None
+
         if not self.exiftool_available:
             logger.warning("⚠️ ExifTool non disponibile - supporto XMP embedded limitato")
 
@@ -265,6 +269,18 @@ class XMPManagerExtended:
         
         return self.write_xmp_by_format(file_path, xmp_dict, mode, dng_options)
     
+    # HAL: Leggiamo i tag specifici ovunque siano (XMP, IPTC o EXIF)
+    _EMBEDDED_READ_ARGS = (
+        '-json',
+        '-G',           # HAL: Molto importante! Aggiunge il gruppo (es. IPTC:Keywords)
+        '-Subject',
+        '-Keywords',
+        '-Description',
+        '-ImageDescription',
+        '-Rating',
+        '-xmp:all',     # Continuiamo a prendere tutto l'XMP
+    )
+
     def read_xmp_embedded(self, file_path: Path) -> Optional[Dict[str, Any]]:
         """
         CORRECTED: Legge XMP embedded con protezione RAW rigorosa
@@ -284,27 +300,18 @@ class XMPManagerExtended:
             return None
             
         try:
-            # Estrai XMP embedded as JSON per parsing facile
-            # HAL: Leggiamo i tag specifici ovunque siano (XMP, IPTC o EXIF)
-            cmd = [
-            *XMPManagerExtended._exiftool_cmd,
-            '-json',
-            '-G',           # HAL: Molto importante! Aggiunge il gruppo (es. IPTC:Keywords)
-            '-Subject',
-            '-Keywords',
-            '-Description',
-            '-ImageDescription',
-            '-Rating',
-            '-xmp:all',     # Continuiamo a prendere tutto l'XMP
-            str(file_path)
-        ]
-            
-            result = subprocess.run(cmd, capture_output=True, timeout=30,
-                                    **subprocess_creation_kwargs())
+            from raw_processor import _source_key
+            data = self._embedded_prefetch.pop(_source_key(file_path), None)
+            if data is None:
+                # Estrai XMP embedded as JSON per parsing facile
+                cmd = [*XMPManagerExtended._exiftool_cmd, *self._EMBEDDED_READ_ARGS, str(file_path)]
 
-            if result.returncode == 0 and result.stdout:
-                data = json.loads(result.stdout.decode())[0]
-                
+                result = subprocess.run(cmd, capture_output=True, timeout=30,
+                                        **subprocess_creation_kwargs())
+                if result.returncode == 0 and result.stdout:
+                    data = json.loads(result.stdout.decode())[0]
+
+            if data:
                 # Filtra tag XMP in base al tipo di file
                 if file_path.suffix.upper() in ['.ORF', '.CR2', '.NEF', '.ARW', '.RAF', '.RW2']:
                     # RAW: Solo metadati creativi da XMP sidecar (no EXIF tecnici)
@@ -395,6 +402,62 @@ class XMPManagerExtended:
                 return candidate
         return primary  # non esiste ancora, restituisce il path canonico
 
+    def existing_sidecar(self, file_path: Path) -> Optional[Path]:
+        """Sidecar .xmp della foto nello stile corrente, None se non esiste."""
+        sidecar_path = self._resolve_sidecar_path(file_path)
+        return sidecar_path if sidecar_path.exists() else None
+
+    def _get_raw_processor(self):
+        """RAWProcessor per il parsing dei sidecar, creato una volta per manager."""
+        if self._raw_processor is None:
+            from raw_processor import RAWProcessor
+            # Crea RAWProcessor minimale se non abbiamo config
+            self._raw_processor = RAWProcessor(self.config or {'image_processing': {'raw_processing': {}}})
+        return self._raw_processor
+
+    def prefetch_sync_sources(self, file_paths: List[Path]) -> int:
+        """
+        Legge con pochi round-trip ExifTool (stay_open, BATCH_CHUNK file per
+        -execute) sidecar ed XMP embedded di una pagina di foto.
+        read_xmp_sidecar / read_xmp_embedded consumano poi i risultati invece
+        di un'esecuzione per file; chiamare clear_prefetch() a fine pagina.
+
+        Returns:
+            Numero di file letti
+        """
+        if not self.exiftool_available:
+            return 0
+        sidecars, embedded = [], []
+        for file_path in file_paths:
+            file_path = Path(file_path)
+            sidecar_path = self.existing_sidecar(file_path)
+            if sidecar_path is not None:
+                sidecars.append(sidecar_path)
+            if self._get_file_category(file_path) in ('standard', 'dng'):
+                embedded.append(file_path)
+
+        read = 0
+        try:
+            if sidecars:
+                read += self._get_raw_processor().prefetch_metadata(sidecars)
+            if embedded:
+                from raw_processor import get_exiftool, _source_key
+                for data in get_exiftool().execute_json_batch(embedded, *self._EMBEDDED_READ_ARGS):
+                    src = data.get('SourceFile') if isinstance(data, dict) else None
+                    if src:
+                        self._embedded_prefetch[_source_key(src)] = data
+                        read += 1
+        except Exception as e:
+            # Le letture mancanti ripiegano sulla lettura per file
+            logger.warning(f"Prefetch XMP in batch fallito: {e}")
+        return read
+
+    def clear_prefetch(self):
+        """Scarta i risultati di prefetch_sync_sources non consumati."""
+        self._embedded_prefetch.clear()
+        if self._raw_processor is not None:
+            self._raw_processor.clear_prefetched()
+
     def read_xmp_sidecar(self, file_path: Path) -> Optional[Dict[str, Any]]:
         """
         UNIFICATO: Legge XMP sidecar usando RAWProcessor per consistenza totale
@@ -408,14 +471,7 @@ class XMPManagerExtended:
         try:
             # UNIFICAZIONE: Usa RAWProcessor per parsing completo e intelligente
             # Questo garantisce stessa logica di fallback e mapping dell'estrazione iniziale
-            from raw_processor import RAWProcessor
-            
-            # Crea RAWProcessor temporaneo se non abbiamo config
-            if not hasattr(self, 'raw_processor'):
-                temp_config = self.config or {'image_processing': {'raw_processing': {}}}
-                raw_processor = RAWProcessor(temp_config)
-            else:
-                raw_processor = self.raw_processor
+            raw_processor = self._get_raw_processor()
             
             # USA STESSO METODO dell'estrazione iniziale
             exif_data = raw_processor._extract_with_exiftool(sidecar_path)
@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# Copyright (C) 2024-2026 Michele Mulè <hegomm@gmail.com>
+"""
+XMP Sync Cache - Stato di sincronizzazione XMP persistito nel catalogo.
+
+Prima il worker dei badge chiamava analyze_xmp_sync_state per ogni card a
+ogni caricamento della gallery: lettura del sidecar via ExifTool e, per
+JPEG/TIFF/DNG, un subprocess exiftool separato per l'XMP embedded, anche
+se da allora non era cambiato nulla.
+
+Qui:
+  - sync_key(): mtime (ns) del file e del sidecar, stile sidecar e impronta
+    dei campi DB che il confronto usa; solo stat(), nessuna lettura
+  - XMPSyncCache.lookup(): stato e info salvati per una pagina di card
+    con una query; validi solo se la chiave salvata coincide
+  - XMPSyncCache.store(): sync_state, last_xmp_mtime, last_sync_check_at
+    e xmp_sync_info (JSON {key, state, info}) in una transazione
+
+Lo stato ERROR non viene salvato: al caricamento successivo si riprova.
+
+Modulo senza dipendenze PyQt.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Parametri per query IN (...) — sotto il limite SQLite di 999
+_IN_CHUNK = 500
+
+
+def _mtime_ns(path: Optional[Path]) -> int:
+    """mtime in ns, 0 se il file non esiste."""
+    if path is None:
+        return 0
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def payload_digest(db_payload: Dict[str, Any]) -> str:
+    """Impronta dei campi DB confrontati con l'XMP (XMPManagerExtended._get_db_payload)."""
+    raw = json.dumps(db_payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def sync_key(file_path: Path, sidecar_path: Optional[Path], sidecar_style: str,
+             db_payload: Dict[str, Any]) -> Tuple[str, int]:
+    """
+    Chiave di validità dello stato XMP di una foto.
+
+    Returns:
+        (chiave, mtime XMP in secondi) — mtime del sidecar se presente,
+        altrimenti del file (XMP embedded); 0 se nessuno dei due esiste
+    """
+    file_mtime = _mtime_ns(file_path)
+    sidecar_mtime = _mtime_ns(sidecar_path)
+    key = f"{file_mtime}:{sidecar_mtime}:{sidecar_style}:{payload_digest(db_payload)}"
+    return key, (sidecar_mtime or file_mtime) // 1_000_000_000
+
+
+class XMPSyncCache:
+    """Lettura/scrittura dello stato XMP salvato nella tabella images.
+
+    Errori SQLite (catalogo bloccato, colonna assente su un DB non migrato)
+    vengono solo loggati: la cache è un'ottimizzazione, il badge si calcola
+    comunque.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+        return self._conn
+
+    def lookup(self, image_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """id → {key, state, info} per le foto con uno stato salvato."""
+        ids = list(dict.fromkeys(i for i in image_ids if i is not None))
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                for start in range(0, len(ids), _IN_CHUNK):
+                    chunk = ids[start:start + _IN_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT id, xmp_sync_info FROM images "
+                        f"WHERE xmp_sync_info IS NOT NULL AND id IN ({','.join('?' * len(chunk))})",
+                        chunk).fetchall()
+                    for image_id, raw in rows:
+                        try:
+                            found[image_id] = json.loads(raw)
+                        except (TypeError, ValueError):
+                            continue
+        except sqlite3.Error as e:
+            logger.debug(f"Cache stato XMP non disponibile ({e})")
+        return found
+
+    def store(self, entries: Iterable[Tuple[int, str, str, Dict[str, Any], int]]):
+        """Salva (id, chiave, stato, info, mtime XMP in secondi) in una transazione."""
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        rows = [
+            (state, xmp_mtime or None, now,
+             json.dumps({'key': key, 'state': state, 'info': info}, default=str),
+             image_id)
+            for image_id, key, state, info, xmp_mtime in entries
+            if image_id is not None
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.executemany(
+                    "UPDATE images SET sync_state = ?, last_xmp_mtime = ?, "
+                    "last_sync_check_at = ?, xmp_sync_info = ? WHERE id = ?", rows)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Salvataggio stato XMP fallito ({e})")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None